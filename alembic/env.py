@@ -13,6 +13,12 @@ from app.models.document import Document
 from app.models.job import Job, GigInterest
 from app.models.payment import Payment
 from app.models.rating import Rating
+from app.models.dashboard_stats import UserDashboardStats
+from app.models.message import Message
+from app.models.conversation import Conversation, ConversationParticipant
+from app.models.notification_outbox import NotificationOutbox
+from app.models.pesapal_ipn import PesapalIpnRegistration, PesapalIpnEvent
+from app.models.metrics_daily import MetricsDaily
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
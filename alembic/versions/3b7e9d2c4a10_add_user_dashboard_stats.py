@@ -0,0 +1,56 @@
+"""add_user_dashboard_stats
+
+Revision ID: 3b7e9d2c4a10
+Revises: 14a8ca2ff8af
+Create Date: 2026-10-17 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9d2c4a10'
+down_revision: Union[str, Sequence[str], None] = '14a8ca2ff8af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_dashboard_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('interested_gigs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_earned', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('average_rating', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('total_ratings', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('repeat_clients', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_hours', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('top_sectors', sa.Text(), nullable=True),
+        sa.Column('top_job_types', sa.Text(), nullable=True),
+        sa.Column('recent_completed_gigs', sa.Text(), nullable=True),
+        sa.Column('assigned_gigs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_gigs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('open_gigs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_interests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_spent', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'role', name='unique_dashboard_stats_per_role')
+    )
+    op.create_index(op.f('ix_user_dashboard_stats_id'), 'user_dashboard_stats', ['id'], unique=False)
+    op.create_index(op.f('ix_user_dashboard_stats_user_id'), 'user_dashboard_stats', ['user_id'], unique=False)
+    # Rows for existing profiles: python scripts/rebuild_dashboard_stats.py --missing
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_dashboard_stats_user_id'), table_name='user_dashboard_stats')
+    op.drop_index(op.f('ix_user_dashboard_stats_id'), table_name='user_dashboard_stats')
+    op.drop_table('user_dashboard_stats')
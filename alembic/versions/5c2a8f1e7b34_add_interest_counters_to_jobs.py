@@ -0,0 +1,42 @@
+"""add_interest_counters_to_jobs
+
+Revision ID: 5c2a8f1e7b34
+Revises: 3b7e9d2c4a10
+Create Date: 2026-10-17 10:05:17.630942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2a8f1e7b34'
+down_revision: Union[str, Sequence[str], None] = '3b7e9d2c4a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('interest_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('jobs', sa.Column('pending_interest_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('jobs', sa.Column('accepted_interest_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index(op.f('ix_jobs_interest_count'), 'jobs', ['interest_count'], unique=False)
+
+    # Backfill from job_interests
+    op.execute("""
+        UPDATE jobs SET
+            interest_count = (SELECT COUNT(*) FROM job_interests ji WHERE ji.job_id = jobs.id),
+            pending_interest_count = (SELECT COUNT(*) FROM job_interests ji WHERE ji.job_id = jobs.id AND ji.status = 'pending'),
+            accepted_interest_count = (SELECT COUNT(*) FROM job_interests ji WHERE ji.job_id = jobs.id AND ji.status = 'accepted')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_jobs_interest_count'), table_name='jobs')
+    op.drop_column('jobs', 'accepted_interest_count')
+    op.drop_column('jobs', 'pending_interest_count')
+    op.drop_column('jobs', 'interest_count')
@@ -0,0 +1,40 @@
+"""add_job_search_index
+
+Revision ID: 7d4f0b9a2e61
+Revises: 5c2a8f1e7b34
+Create Date: 2026-10-17 11:20:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4f0b9a2e61'
+down_revision: Union[str, Sequence[str], None] = '5c2a8f1e7b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The SQLite FTS5 table and triggers are created at app startup by app.services.job_search
+    from app.services.job_search import PostgresSearchBackend
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {PostgresSearchBackend.INDEX_NAME} "
+            f"ON jobs USING GIN (({PostgresSearchBackend.vector_sql()}))"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_jobs_search_vector")
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('jobs_fts_ai', 'jobs_fts_ad', 'jobs_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS jobs_fts")
@@ -0,0 +1,80 @@
+"""add_conversations
+
+Revision ID: a1c3e5f7b902
+Revises: 7d4f0b9a2e61
+Create Date: 2026-10-17 13:05:12.730416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5f7b902'
+down_revision: Union[str, Sequence[str], None] = '7d4f0b9a2e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'conversations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_low_id', sa.Integer(), nullable=False),
+        sa.Column('user_high_id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_low_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_high_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_low_id', 'user_high_id', name='unique_conversation_pair')
+    )
+    op.create_index(op.f('ix_conversations_id'), 'conversations', ['id'], unique=False)
+    op.create_index(op.f('ix_conversations_user_low_id'), 'conversations', ['user_low_id'], unique=False)
+    op.create_index(op.f('ix_conversations_user_high_id'), 'conversations', ['user_high_id'], unique=False)
+    op.create_index(op.f('ix_conversations_job_id'), 'conversations', ['job_id'], unique=False)
+
+    op.create_table(
+        'conversation_participants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('other_user_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['other_user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('conversation_id', 'user_id', name='unique_conversation_participant')
+    )
+    op.create_index(op.f('ix_conversation_participants_id'), 'conversation_participants', ['id'], unique=False)
+    op.create_index(op.f('ix_conversation_participants_conversation_id'), 'conversation_participants',
+                    ['conversation_id'], unique=False)
+    op.create_index('ix_conversation_participants_inbox', 'conversation_participants',
+                    ['user_id', 'last_message_at'], unique=False)
+    # Conversations for existing messages: python scripts/rebuild_conversations.py
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversation_participants_inbox', table_name='conversation_participants')
+    op.drop_index(op.f('ix_conversation_participants_conversation_id'), table_name='conversation_participants')
+    op.drop_index(op.f('ix_conversation_participants_id'), table_name='conversation_participants')
+    op.drop_table('conversation_participants')
+    op.drop_index(op.f('ix_conversations_job_id'), table_name='conversations')
+    op.drop_index(op.f('ix_conversations_user_high_id'), table_name='conversations')
+    op.drop_index(op.f('ix_conversations_user_low_id'), table_name='conversations')
+    op.drop_index(op.f('ix_conversations_id'), table_name='conversations')
+    op.drop_table('conversations')
@@ -0,0 +1,30 @@
+"""add_notification_outbox_retry_columns
+
+Revision ID: a8d0f2b4c679
+Revises: f6b8d0e2a457
+Create Date: 2026-10-17 21:14:37.502918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d0f2b4c679'
+down_revision: Union[str, Sequence[str], None] = 'f6b8d0e2a457'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notification_outbox', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.add_column('notification_outbox', sa.Column('failed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notification_outbox', 'failed_at')
+    op.drop_column('notification_outbox', 'next_attempt_at')
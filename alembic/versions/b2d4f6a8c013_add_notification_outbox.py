@@ -0,0 +1,46 @@
+"""add_notification_outbox
+
+Revision ID: b2d4f6a8c013
+Revises: a1c3e5f7b902
+Create Date: 2026-10-17 15:42:08.114027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a8c013'
+down_revision: Union[str, Sequence[str], None] = 'a1c3e5f7b902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event', sa.String(length=100), nullable=False),
+        sa.Column('room', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notification_outbox_id'), 'notification_outbox', ['id'], unique=False)
+    op.create_index(op.f('ix_notification_outbox_claim_token'), 'notification_outbox', ['claim_token'], unique=False)
+    op.create_index('ix_notification_outbox_pending', 'notification_outbox', ['dispatched_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notification_outbox_pending', table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_claim_token'), table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_id'), table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,39 @@
+"""add_pesapal_ipn_registrations
+
+Revision ID: c3e5a7b9d124
+Revises: b2d4f6a8c013
+Create Date: 2026-10-17 17:20:44.508913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7b9d124'
+down_revision: Union[str, Sequence[str], None] = 'b2d4f6a8c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pesapal_ipn_registrations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('base_url', sa.String(length=255), nullable=False),
+        sa.Column('callback_url', sa.String(length=500), nullable=False),
+        sa.Column('ipn_id', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('base_url', 'callback_url', name='unique_pesapal_ipn_registration')
+    )
+    op.create_index(op.f('ix_pesapal_ipn_registrations_id'), 'pesapal_ipn_registrations', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pesapal_ipn_registrations_id'), table_name='pesapal_ipn_registrations')
+    op.drop_table('pesapal_ipn_registrations')
@@ -0,0 +1,34 @@
+"""add_payment_status_check_columns
+
+Revision ID: d4f6b8c0e235
+Revises: c3e5a7b9d124
+Create Date: 2026-10-17 18:05:12.731406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8c0e235'
+down_revision: Union[str, Sequence[str], None] = 'c3e5a7b9d124'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payments', sa.Column('status_checked_at', sa.DateTime(), nullable=True))
+    op.add_column('payments', sa.Column('next_status_check_at', sa.DateTime(), nullable=True))
+    op.add_column('payments', sa.Column('status_check_attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index(op.f('ix_payments_next_status_check_at'), 'payments', ['next_status_check_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payments_next_status_check_at'), table_name='payments')
+    op.drop_column('payments', 'status_check_attempts')
+    op.drop_column('payments', 'next_status_check_at')
+    op.drop_column('payments', 'status_checked_at')
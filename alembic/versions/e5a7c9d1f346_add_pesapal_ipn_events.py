@@ -0,0 +1,47 @@
+"""add_pesapal_ipn_events
+
+Revision ID: e5a7c9d1f346
+Revises: d4f6b8c0e235
+Create Date: 2026-10-17 18:52:37.164028
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9d1f346'
+down_revision: Union[str, Sequence[str], None] = 'd4f6b8c0e235'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pesapal_ipn_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_tracking_id', sa.String(length=100), nullable=False),
+        sa.Column('notification_type', sa.String(length=50), nullable=False),
+        sa.Column('merchant_reference', sa.String(length=100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('delivery_count', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('order_tracking_id', 'notification_type', name='unique_pesapal_ipn_event')
+    )
+    op.create_index(op.f('ix_pesapal_ipn_events_id'), 'pesapal_ipn_events', ['id'], unique=False)
+    op.create_index('ix_pesapal_ipn_events_pending', 'pesapal_ipn_events', ['processed_at', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pesapal_ipn_events_pending', table_name='pesapal_ipn_events')
+    op.drop_index(op.f('ix_pesapal_ipn_events_id'), table_name='pesapal_ipn_events')
+    op.drop_table('pesapal_ipn_events')
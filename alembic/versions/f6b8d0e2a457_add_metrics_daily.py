@@ -0,0 +1,53 @@
+"""add_metrics_daily
+
+Revision ID: f6b8d0e2a457
+Revises: e5a7c9d1f346
+Create Date: 2026-10-17 20:14:03.582917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e2a457'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c9d1f346'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'metrics_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('dimension', sa.String(length=50), nullable=False),
+        sa.Column('entity_type', sa.String(length=30), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('event_count', sa.Integer(), nullable=False),
+        sa.Column('amount_sum', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dimension', 'entity_type', 'entity_id', 'day', name='unique_metrics_daily_bucket')
+    )
+    op.create_index(op.f('ix_metrics_daily_id'), 'metrics_daily', ['id'], unique=False)
+
+    # Rebuilding a day reads only that day's rows
+    op.create_index('ix_users_created_at', 'users', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_created_at', 'jobs', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_job_interests_created_at', 'job_interests', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_payments_completed_at', 'payments', ['completed_at'], unique=False, if_not_exists=True)
+    # History for existing rows: python scripts/rollup_metrics.py --backfill
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_completed_at', table_name='payments', if_exists=True)
+    op.drop_index('ix_job_interests_created_at', table_name='job_interests', if_exists=True)
+    op.drop_index('ix_jobs_created_at', table_name='jobs', if_exists=True)
+    op.drop_index('ix_users_created_at', table_name='users', if_exists=True)
+    op.drop_index(op.f('ix_metrics_daily_id'), table_name='metrics_daily')
+    op.drop_table('metrics_daily')
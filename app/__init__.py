@@ -5,6 +5,11 @@ from flask_login import LoginManager
 from flask_bootstrap import Bootstrap
 from app.database import Base, engine, SessionLocal
 from app.models import role as _role_models
+from app.models import dashboard_stats as _dashboard_stats_models
+from app.models import conversation as _conversation_models
+from app.models import notification_outbox as _notification_outbox_models
+from app.models import pesapal_ipn as _pesapal_ipn_models
+from app.models import metrics_daily as _metrics_daily_models
 from app.routes.auth import auth_blueprint
 from app.routes.payments import payments_blueprint
 from app.routes.health import health_blueprint
@@ -83,6 +88,105 @@ def _ensure_users_password_reset_columns(app: Flask) -> None:
     except Exception as e:
         app.logger.error(f"Failed to ensure users password reset columns: {e}")
 
+def _ensure_jobs_interest_count_columns(app: Flask) -> None:
+    """Ensure the denormalized jobs interest counters exist (SQLite-safe, no-op if present)."""
+    try:
+        inspector = inspect(engine)
+        try:
+            col_names = {col['name'] for col in inspector.get_columns('jobs')}
+        except Exception:
+            return
+
+        missing = [name for name in ('interest_count', 'pending_interest_count', 'accepted_interest_count')
+                   if name not in col_names]
+        if not missing:
+            return
+
+        dialect = engine.dialect.name
+        with engine.begin() as conn:
+            for name in missing:
+                if dialect == 'postgresql':
+                    conn.execute(text(f"ALTER TABLE jobs ADD COLUMN IF NOT EXISTS {name} INTEGER NOT NULL DEFAULT 0"))
+                else:
+                    conn.execute(text(f"ALTER TABLE jobs ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_interest_count ON jobs (interest_count)"))
+        app.logger.warning(f"Added missing jobs interest counter columns: {', '.join(missing)}; "
+                           "run scripts/reconcile_interest_counts.py to backfill them")
+    except Exception as e:
+        app.logger.error(f"Failed to ensure jobs interest counter columns: {e}")
+
+def _ensure_payments_status_check_columns(app: Flask) -> None:
+    """Ensure the payment reconciliation bookkeeping columns exist (SQLite-safe, no-op if present)."""
+    try:
+        inspector = inspect(engine)
+        try:
+            col_names = {col['name'] for col in inspector.get_columns('payments')}
+        except Exception:
+            return
+
+        dialect = engine.dialect.name
+        datetime_type = 'TIMESTAMP' if dialect == 'postgresql' else 'DATETIME'
+        columns = {
+            'status_checked_at': datetime_type,
+            'next_status_check_at': datetime_type,
+            'status_check_attempts': 'INTEGER NOT NULL DEFAULT 0',
+        }
+        missing = [name for name in columns if name not in col_names]
+        if not missing:
+            return
+
+        with engine.begin() as conn:
+            for name in missing:
+                if dialect == 'postgresql':
+                    conn.execute(text(f"ALTER TABLE payments ADD COLUMN IF NOT EXISTS {name} {columns[name]}"))
+                else:
+                    conn.execute(text(f"ALTER TABLE payments ADD COLUMN {name} {columns[name]}"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payments_next_status_check_at ON payments (next_status_check_at)"))
+        app.logger.info(f"Added missing payments status check columns: {', '.join(missing)}")
+    except Exception as e:
+        app.logger.error(f"Failed to ensure payments status check columns: {e}")
+
+def _ensure_notification_outbox_retry_columns(app: Flask) -> None:
+    """Ensure the outbox retry backoff and dead-letter columns exist (SQLite-safe, no-op if present)."""
+    try:
+        inspector = inspect(engine)
+        try:
+            col_names = {col['name'] for col in inspector.get_columns('notification_outbox')}
+        except Exception:
+            return
+
+        dialect = engine.dialect.name
+        datetime_type = 'TIMESTAMP' if dialect == 'postgresql' else 'DATETIME'
+        missing = [name for name in ('next_attempt_at', 'failed_at') if name not in col_names]
+        if not missing:
+            return
+
+        with engine.begin() as conn:
+            for name in missing:
+                if dialect == 'postgresql':
+                    conn.execute(text(f"ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS {name} {datetime_type}"))
+                else:
+                    conn.execute(text(f"ALTER TABLE notification_outbox ADD COLUMN {name} {datetime_type}"))
+        app.logger.info(f"Added missing notification outbox retry columns: {', '.join(missing)}")
+    except Exception as e:
+        app.logger.error(f"Failed to ensure notification outbox retry columns: {e}")
+
+_ROLLUP_SOURCE_INDEXES = (
+    ("ix_users_created_at", "users", "created_at"),
+    ("ix_jobs_created_at", "jobs", "created_at"),
+    ("ix_job_interests_created_at", "job_interests", "created_at"),
+    ("ix_payments_completed_at", "payments", "completed_at"),
+)
+
+def _ensure_rollup_source_indexes(app: Flask) -> None:
+    """Index the timestamps the metrics_daily rollups filter on (no-op if present)."""
+    try:
+        with engine.begin() as conn:
+            for index_name, table, column in _ROLLUP_SOURCE_INDEXES:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})"))
+    except Exception as e:
+        app.logger.error(f"Failed to ensure rollup source indexes: {e}")
+
 def create_app():
     global socketio
 
@@ -112,21 +216,30 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.id == int(user_id)).first()
-            return user
-        finally:
-            db.close()
+        from app.middleware.identity import get_request_identity
+        identity = get_request_identity(user_id)
+        return identity.user if identity else None
     
-    # Initialize SocketIO with session support
+    # Initialize SocketIO with session support; a message queue lets every worker reach every room.
+    # async_mode is auto-detected, so eventlet workers (wsgi.py) get eventlet and plain runs get threading
+    from app.config import settings
+    from app.services.socket_queue import socketio_queue_options, describe_queue
     socketio = SocketIO(app, 
                        cors_allowed_origins="*", 
                        manage_session=True,
-                       async_mode='threading',
                        logger=True,
-                       engineio_logger=True)
+                       engineio_logger=True,
+                       **socketio_queue_options(settings.SOCKETIO_MESSAGE_QUEUE, settings.SOCKETIO_CHANNEL))
+    app.logger.info(f"Socket.IO message queue: {describe_queue(settings.SOCKETIO_MESSAGE_QUEUE)}")
+    
+    # Track connected sockets in the store the message queue uses, so every worker sees them
+    from app.services.presence import configure_presence
+    configure_presence(settings.SOCKETIO_MESSAGE_QUEUE, prefix=f'{settings.SOCKETIO_CHANNEL}-presence')
+
+    # Shared page fragments (home page) are cached per worker or in Redis and dropped on writes
+    from app.services.page_cache import configure_page_cache
+    configure_page_cache(settings.PAGE_CACHE_URL, ttl=settings.PAGE_CACHE_TTL_SECONDS,
+                         max_entries=settings.PAGE_CACHE_MAX_ENTRIES)
 
     # Register blueprints
     # Web routes (Jinja templates) - no prefix
@@ -178,10 +291,44 @@ def create_app():
     Base.metadata.create_all(bind=engine)
     _ensure_notifications_role_context_column(app)
     _ensure_users_password_reset_columns(app)
+    _ensure_jobs_interest_count_columns(app)
+    _ensure_payments_status_check_columns(app)
+    _ensure_notification_outbox_retry_columns(app)
+    _ensure_rollup_source_indexes(app)
+    
+    from app.services.job_search import init_search_backend
+    app.logger.info(f"Job search backend: {init_search_backend(engine).name}")
     
     # Import and register socket events (must be after socketio initialization)
     from app.sockets import register_socketio_events, set_socketio
     set_socketio(socketio)
     register_socketio_events(socketio)
-
+    
     return app, socketio
+
+
+def start_background_workers(socketio) -> None:
+    """
+    Start the per-process background loops. Called by the server entry points (wsgi.py, main.py)
+    after create_app, so apps built by tests and scripts run no threads of their own.
+    """
+    from app.config import settings
+
+    # Emit queued real-time notifications after their transactions commit
+    if settings.NOTIFICATION_OUTBOX_DISPATCHER == 'thread':
+        from app.services.notification_outbox import start_outbox_dispatcher
+        start_outbox_dispatcher(socketio)
+
+    # Settle pending payments that never received an IPN
+    if settings.PAYMENT_RECONCILER == 'thread':
+        from app.services.payment_reconciliation import start_payment_reconciler
+        start_payment_reconciler(socketio)
+
+    # Keep today's metrics_daily buckets current for the dashboards
+    if settings.METRICS_ROLLUP_REFRESHER == 'thread':
+        from app.services.metrics_rollup import start_metrics_refresher
+        start_metrics_refresher(socketio)
+
+    # Keep this worker's sockets in the shared presence registry alive
+    from app.services.presence import start_presence_heartbeat
+    start_presence_heartbeat(socketio)
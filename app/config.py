@@ -24,5 +24,26 @@ class Settings:
     PESAPAL_CONSUMER_SECRET = os.getenv("PESAPAL_CONSUMER_SECRET")
     PESAPAL_CALLBACK_URL = os.getenv("PESAPAL_CALLBACK_URL")
     PESAPAL_BASE_URL = os.getenv("PESAPAL_BASE_URL", "https://cybqa.pesapal.com/pesapalv3/api")
+    # IPN id from the PesaPal dashboard; when unset it is registered once and stored in pesapal_ipn_registrations
+    PESAPAL_IPN_ID = os.getenv("PESAPAL_IPN_ID")
+    # Job search backend: auto (Postgres tsvector / SQLite FTS5), postgres, sqlite_fts or like
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+    # Socket.IO pub/sub queue shared by all workers (redis://..., memory:// for tests); unset = single worker
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "qgig-socketio")
+    # Run the notification outbox dispatcher inside each web worker ("thread", started by wsgi.py and
+    # main.py) or not at all ("off", when scripts/dispatch_notification_outbox.py runs as its own process)
+    NOTIFICATION_OUTBOX_DISPATCHER = os.getenv("NOTIFICATION_OUTBOX_DISPATCHER", "thread")
+    # Poll PesaPal for pending payments inside each web worker ("thread", started by wsgi.py and main.py)
+    # or not at all ("off", when scripts/reconcile_payments.py runs as its own process)
+    PAYMENT_RECONCILER = os.getenv("PAYMENT_RECONCILER", "thread")
+    # Refresh the metrics_daily rollups inside each web worker ("thread", started by wsgi.py and main.py)
+    # or not at all ("off", when scripts/rollup_metrics.py --watch runs as its own process)
+    METRICS_ROLLUP_REFRESHER = os.getenv("METRICS_ROLLUP_REFRESHER", "thread")
+    # Cache for shared page fragments (home page stats and recent gigs): unset or memory:// keeps an
+    # in-process LRU per worker, redis://... shares it between workers
+    PAGE_CACHE_URL = os.getenv("PAGE_CACHE_URL")
+    PAGE_CACHE_TTL_SECONDS = int(os.getenv("PAGE_CACHE_TTL_SECONDS", "60"))
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1024"))
 
 settings = Settings()
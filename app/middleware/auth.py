@@ -2,8 +2,7 @@ from functools import wraps
 from flask import request, jsonify, session
 import jwt
 from app.config import settings
-from app.database import SessionLocal
-from app.models.user import User, UserRole
+from app.middleware.identity import get_request_identity
 
 
 def _normalize_role_value(role_value):
@@ -32,27 +31,6 @@ def _get_active_role_from_request():
     return None
 
 
-def _user_has_role(db, user, role_name: str) -> bool:
-    if not user or not role_name:
-        return False
-
-    # Prefer new many-to-many relationship
-    try:
-        from app.models.role import Role, UserRoleAssignment
-        role = db.query(Role).filter(Role.name == role_name).first()
-        if role:
-            exists = db.query(UserRoleAssignment).filter(
-                UserRoleAssignment.user_id == user.id,
-                UserRoleAssignment.role_id == role.id
-            ).first()
-            if exists:
-                return True
-    except Exception:
-        pass
-
-    # Backward-compatible fallback
-    return _normalize_role_value(getattr(user, "role", None)) == role_name
-
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -64,9 +42,8 @@ def token_required(f):
             try:
                 token = auth_header.split(" ")[1]
                 data = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-                db = SessionLocal()
-                current_user = db.query(User).filter(User.id == data['user_id']).first()
-                db.close()
+                identity = get_request_identity(data['user_id'])
+                current_user = identity.user if identity else None
                 
                 if not current_user:
                     return jsonify({"error": "Invalid token"}), 401
@@ -80,9 +57,8 @@ def token_required(f):
         
         # Fallback to session-based authentication
         elif 'user_id' in session:
-            db = SessionLocal()
-            current_user = db.query(User).filter(User.id == session['user_id']).first()
-            db.close()
+            identity = get_request_identity(session['user_id'])
+            current_user = identity.user if identity else None
             
             if not current_user:
                 return jsonify({"error": "Invalid session"}), 401
@@ -107,12 +83,9 @@ def role_required(*allowed_roles):
             if active_role not in allowed_role_names:
                 return jsonify({"error": "Access forbidden: insufficient permissions"}), 403
 
-            db = SessionLocal()
-            try:
-                if not _user_has_role(db, current_user, active_role):
-                    return jsonify({"error": "Access forbidden: role not assigned to user"}), 403
-            finally:
-                db.close()
+            identity = get_request_identity(current_user.id)
+            if not identity or not identity.has_role(active_role):
+                return jsonify({"error": "Access forbidden: role not assigned to user"}), 403
 
             return f(current_user, *args, **kwargs)
         return decorated
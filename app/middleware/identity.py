@@ -0,0 +1,125 @@
+"""
+Request-scoped identity cache
+Loads the authenticated user, assigned role names and profile rows once per request
+and shares them between the auth decorators, context processors and route bodies
+"""
+from typing import Optional, Set
+from flask import g, session, has_request_context
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.professional import Professional
+from app.models.institution import Institution
+from app.models.role import Role, UserRoleAssignment
+
+
+class RequestIdentity:
+    """Authenticated user plus everything the decorators need to authorize a request"""
+
+    def __init__(self, user: User, role_names: Set[str], professional: Optional[Professional] = None,
+                 institution: Optional[Institution] = None):
+        self.user = user
+        self.role_names = role_names
+        self.professional = professional
+        self.institution = institution
+
+    @property
+    def user_id(self) -> int:
+        return self.user.id
+
+    @property
+    def professional_id(self) -> Optional[int]:
+        return self.professional.id if self.professional else None
+
+    @property
+    def institution_id(self) -> Optional[int]:
+        return self.institution.id if self.institution else None
+
+    @property
+    def legacy_role(self) -> Optional[str]:
+        role_value = getattr(self.user, "role", None)
+        if role_value is None:
+            return None
+        return getattr(role_value, "value", str(role_value))
+
+    def has_role(self, role_name: str) -> bool:
+        """Role assignment check with fallback to the legacy users.role column"""
+        if not role_name:
+            return False
+        return role_name in self.role_names or self.legacy_role == role_name
+
+
+def load_identity(db, user_id) -> Optional[RequestIdentity]:
+    """
+    Load a user with its role names and profiles in a single round trip.
+    One row is returned per assigned role, so the result set stays tiny.
+    """
+    rows = db.query(User, Professional, Institution, Role.name).outerjoin(
+        Professional, Professional.user_id == User.id
+    ).outerjoin(
+        Institution, Institution.user_id == User.id
+    ).outerjoin(
+        UserRoleAssignment, UserRoleAssignment.user_id == User.id
+    ).outerjoin(
+        Role, Role.id == UserRoleAssignment.role_id
+    ).filter(User.id == user_id).all()
+
+    if not rows:
+        return None
+
+    user, professional, institution, _ = rows[0]
+    role_names = {role_name for _, _, _, role_name in rows if role_name}
+    return RequestIdentity(user, role_names, professional, institution)
+
+
+def get_request_identity(user_id=None) -> Optional[RequestIdentity]:
+    """
+    Return the identity for user_id (defaults to the session user), loading it at most
+    once per request. Returned ORM objects are detached and must be treated as read-only.
+    """
+    if user_id is None:
+        user_id = session.get('user_id')
+    if user_id is None:
+        return None
+
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    cache = g.setdefault('_identity_cache', {}) if has_request_context() else {}
+    if user_id in cache:
+        return cache[user_id]
+
+    db = SessionLocal()
+    try:
+        identity = load_identity(db, user_id)
+    finally:
+        db.close()
+
+    cache[user_id] = identity
+    return identity
+
+
+def clear_request_identity(user_id=None) -> None:
+    """Drop cached identities after the request changed the user, its roles or profiles"""
+    if not has_request_context():
+        return
+    cache = g.get('_identity_cache')
+    if not cache:
+        return
+    if user_id is None:
+        cache.clear()
+    else:
+        cache.pop(int(user_id), None)
+
+
+def get_current_professional() -> Optional[Professional]:
+    """Professional profile of the session user, read from the request identity"""
+    identity = get_request_identity()
+    return identity.professional if identity else None
+
+
+def get_current_institution() -> Optional[Institution]:
+    """Institution profile of the session user, read from the request identity"""
+    identity = get_request_identity()
+    return identity.institution if identity else None
@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+
+class Conversation(Base):
+    """A message thread between two users, stored once per pair with user_low_id < user_high_id"""
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_low_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_high_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Gig the most recent job-related message was about
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    # Latest message sent in the thread, regardless of per-user deletes
+    last_message_id = Column(Integer, ForeignKey("messages.id", ondelete="SET NULL"), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    participants = relationship("ConversationParticipant", back_populates="conversation",
+                                cascade="all, delete-orphan")
+
+    __table_args__ = (
+        UniqueConstraint('user_low_id', 'user_high_id', name='unique_conversation_pair'),
+    )
+
+
+class ConversationParticipant(Base):
+    """Per-user view of a conversation: unread counter, read pointer and last message that user can still see"""
+    __tablename__ = "conversation_participants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    other_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    unread_count = Column(Integer, default=0, nullable=False)
+    last_read_message_id = Column(Integer, nullable=True)
+
+    # Newest message this participant has not deleted; NULL hides the conversation from their inbox
+    last_message_id = Column(Integer, ForeignKey("messages.id", ondelete="SET NULL"), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    conversation = relationship("Conversation", back_populates="participants")
+
+    __table_args__ = (
+        UniqueConstraint('conversation_id', 'user_id', name='unique_conversation_participant'),
+        Index('ix_conversation_participants_inbox', 'user_id', 'last_message_at'),
+    )
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+
+class UserDashboardStats(Base):
+    """Materialized per-user, per-role dashboard counters read by the web context processor"""
+    __tablename__ = "user_dashboard_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    role = Column(String(20), nullable=False)
+
+    # Professional counters
+    interested_gigs = Column(Integer, default=0, nullable=False)
+    total_earned = Column(Float, default=0, nullable=False)
+    average_rating = Column(Float, default=0, nullable=False)
+    total_ratings = Column(Integer, default=0, nullable=False)
+    repeat_clients = Column(Integer, default=0, nullable=False)
+    total_hours = Column(Float, default=0, nullable=False)
+    top_sectors = Column(Text, default='[]', nullable=True)  # JSON list of {name, count}
+    top_job_types = Column(Text, default='[]', nullable=True)  # JSON list of {name, count}
+    recent_completed_gigs = Column(Text, default='[]', nullable=True)  # JSON snapshot of the last completed gigs
+
+    # Shared counters
+    assigned_gigs = Column(Integer, default=0, nullable=False)
+    completed_gigs = Column(Integer, default=0, nullable=False)
+
+    # Institution counters
+    open_gigs = Column(Integer, default=0, nullable=False)
+    pending_interests = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'role', name='unique_dashboard_stats_per_role'),
+    )
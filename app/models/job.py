@@ -32,6 +32,11 @@ class Job(Base):
     job_type = Column(String(100), nullable=True, index=True)
     sector = Column(String(100), nullable=True, index=True)
     
+    # Denormalized job_interests counters, maintained by app.services.interest_counters
+    interest_count = Column(Integer, default=0, server_default='0', nullable=False, index=True)
+    pending_interest_count = Column(Integer, default=0, server_default='0', nullable=False)
+    accepted_interest_count = Column(Integer, default=0, server_default='0', nullable=False)
+    
     institution = relationship("Institution", backref="jobs")
     assigned_professional = relationship("Professional", foreign_keys=[assigned_professional_id], backref="assigned_gigs")
 
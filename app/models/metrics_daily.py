@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+
+class MetricsDaily(Base):
+    """
+    Per-day rollup of a platform metric, maintained by app.services.metrics_rollup.
+    entity_type/entity_id scope the bucket ('platform'/0, or e.g. 'institution'/<id>).
+    """
+    __tablename__ = "metrics_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    dimension = Column(String(50), nullable=False)  # revenue, signups, gigs, interests
+    entity_type = Column(String(30), nullable=False, default='platform')
+    entity_id = Column(Integer, nullable=False, default=0)
+    event_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('dimension', 'entity_type', 'entity_id', 'day', name='unique_metrics_daily_bucket'),
+    )
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.database import Base
+from datetime import datetime
+
+
+class NotificationOutbox(Base):
+    """
+    Socket.IO events written in the same transaction as the change they announce.
+    A dispatcher claims pending rows by stamping dispatched_at and claim_token, then emits them.
+    Failed emits wait until next_attempt_at; rows that used up their attempts get failed_at.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event = Column(String(100), nullable=False)
+    room = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    claim_token = Column(String(32), nullable=True, index=True)  # dispatcher batch that owns the row
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # retry backoff; NULL = due now
+    failed_at = Column(DateTime, nullable=True)  # dead letter: gave up after the last attempt
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    dispatched_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_notification_outbox_pending', 'dispatched_at', 'id'),
+    )
@@ -30,6 +30,11 @@ class Payment(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     
+    # Background status reconciliation (app.services.payment_reconciliation)
+    status_checked_at = Column(DateTime, nullable=True)
+    next_status_check_at = Column(DateTime, nullable=True, index=True)
+    status_check_attempts = Column(Integer, default=0, nullable=False)
+    
     gig = relationship("Job", backref="payments")
     institution = relationship("Institution", backref="payments")
     professional = relationship("Professional", backref="payments_received")
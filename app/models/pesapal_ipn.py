@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+
+class PesapalIpnRegistration(Base):
+    """
+    IPN id PesaPal issued for a callback URL, so workers and restarts reuse one registration
+    instead of calling RegisterIPN again.
+    """
+    __tablename__ = "pesapal_ipn_registrations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    base_url = Column(String(255), nullable=False)
+    callback_url = Column(String(500), nullable=False)
+    ipn_id = Column(String(100), nullable=False)  # empty while the claiming worker calls RegisterIPN
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('base_url', 'callback_url', name='unique_pesapal_ipn_registration'),
+    )
+
+
+class PesapalIpnEvent(Base):
+    """
+    An IPN delivery from PesaPal, stored by the webhook and processed later by
+    app.services.payment_ipn. One row per (order_tracking_id, notification_type);
+    repeated deliveries only bump delivery_count.
+    """
+    __tablename__ = "pesapal_ipn_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_tracking_id = Column(String(100), nullable=False)
+    notification_type = Column(String(50), nullable=False)
+    merchant_reference = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=True)  # JSON as delivered
+    delivery_count = Column(Integer, default=1, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=True)  # retry time, or the lease of the worker holding it
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('order_tracking_id', 'notification_type', name='unique_pesapal_ipn_event'),
+        Index('ix_pesapal_ipn_events_pending', 'processed_at', 'next_attempt_at'),
+    )
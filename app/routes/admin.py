@@ -8,6 +8,9 @@ from app.models.professional import Professional
 from app.models.institution import Institution
 from app.models.rating import Rating
 from app.middleware.auth import token_required, role_required
+from app.services import admin_analytics, page_cache
+from app.services.pagination import paginate_keyset, estimated_count, page_args, InvalidCursor
+from app.services.exports import stream_export, export_format, InvalidExportFormat
 from sqlalchemy import func
 from datetime import datetime
 import os
@@ -20,55 +23,38 @@ admin_blueprint = Blueprint("admin", __name__)
 def get_system_metrics(current_user):
     db = SessionLocal()
     try:
-        total_users = db.query(User).count()
-        total_professionals = db.query(Professional).count()
-        total_institutions = db.query(Institution).count()
-        
-        total_gigs = db.query(Job).count()
-        open_gigs = db.query(Job).filter(Job.status == JobStatus.OPEN).count()
-        assigned_gigs = db.query(Job).filter(Job.status == JobStatus.ASSIGNED).count()
-        completed_gigs = db.query(Job).filter(Job.status == JobStatus.COMPLETED).count()
-        
-        total_payments = db.query(Payment).count()
-        completed_payments = db.query(Payment).filter(Payment.status == TransactionStatus.COMPLETED).count()
-        pending_payments = db.query(Payment).filter(Payment.status == TransactionStatus.PENDING).count()
-        total_revenue = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.COMPLETED
-        ).scalar() or 0
-        
-        verified_professionals = db.query(Professional).join(User).join(Document).filter(
-            Document.status == DocumentStatus.APPROVED
-        ).distinct().count()
-        
-        pending_documents = db.query(Document).filter(Document.status == DocumentStatus.PENDING).count()
-        
-        avg_rating = db.query(func.avg(Rating.rating)).scalar() or 0
+        users = admin_analytics.user_breakdown(db)
+        gigs = admin_analytics.job_breakdown(db)
+        payments = admin_analytics.payment_breakdown(db)
+        documents = admin_analytics.document_breakdown(db)
+        ratings = admin_analytics.rating_summary(db)
         
         return jsonify({
             "users": {
-                "total": total_users,
-                "professionals": total_professionals,
-                "institutions": total_institutions
+                "total": users['total'],
+                "professionals": users['professionals'],
+                "institutions": users['institutions']
             },
             "gigs": {
-                "total": total_gigs,
-                "open": open_gigs,
-                "assigned": assigned_gigs,
-                "completed": completed_gigs
+                "total": gigs['total'],
+                "open": gigs['open'],
+                "assigned": gigs['assigned'],
+                "completed": gigs['completed']
             },
             "payments": {
-                "total": total_payments,
-                "completed": completed_payments,
-                "pending": pending_payments,
-                "total_revenue": float(total_revenue)
+                "total": payments['total'],
+                "completed": payments['completed'],
+                "pending": payments['pending'],
+                "total_revenue": payments['revenue']
             },
             "verification": {
-                "verified_professionals": verified_professionals,
-                "pending_documents": pending_documents
+                "verified_professionals": documents['verified_professionals'],
+                "pending_documents": documents['pending']
             },
             "ratings": {
-                "average_rating": round(float(avg_rating), 2)
-            }
+                "average_rating": ratings['average']
+            },
+            "page_cache": page_cache.stats()
         }), 200
         
     finally:
@@ -80,7 +66,14 @@ def get_system_metrics(current_user):
 def get_all_users(current_user):
     db = SessionLocal()
     try:
-        users = db.query(User).all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        query = db.query(User)
+        try:
+            page = paginate_keyset(query, [(User.id, True)], cursor, limit,
+                                   estimated_count('admin:users', lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        users = page.items
         
         return jsonify({
             "users": [{
@@ -89,12 +82,78 @@ def get_all_users(current_user):
                 "role": u.role.value,
                 "is_active": u.is_active,
                 "created_at": u.created_at.isoformat()
-            } for u in users]
+            } for u in users],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
         db.close()
 
+# kind -> (columns, build_query) for /api/admin/export/<kind>; see app.services.exports
+ADMIN_EXPORTS = {
+    'users': ([
+        ('id', User.id),
+        ('email', User.email),
+        ('username', User.username),
+        ('role', User.role),
+        ('is_active', User.is_active),
+        ('created_at', User.created_at)
+    ], lambda query: query.order_by(User.id)),
+    'payments': ([
+        ('id', Payment.id),
+        ('gig_id', Payment.gig_id),
+        ('gig_title', Job.title),
+        ('institution_id', Payment.institution_id),
+        ('professional_id', Payment.professional_id),
+        ('amount', Payment.amount),
+        ('status', Payment.status),
+        ('merchant_reference', Payment.pesapal_merchant_reference),
+        ('order_tracking_id', Payment.pesapal_order_tracking_id),
+        ('payment_method', Payment.payment_method),
+        ('created_at', Payment.created_at),
+        ('completed_at', Payment.completed_at)
+    ], lambda query: query.select_from(Payment).outerjoin(Job, Job.id == Payment.gig_id).order_by(Payment.id)),
+    'jobs': ([
+        ('id', Job.id),
+        ('title', Job.title),
+        ('institution', Institution.institution_name),
+        ('location', Job.location),
+        ('pay_amount', Job.pay_amount),
+        ('status', Job.status),
+        ('is_urgent', Job.is_urgent),
+        ('assigned_professional_id', Job.assigned_professional_id),
+        ('interest_count', Job.interest_count),
+        ('created_at', Job.created_at),
+        ('expiry_date', Job.expiry_date)
+    ], lambda query: query.select_from(Job).outerjoin(Institution, Institution.id == Job.institution_id).order_by(Job.id)),
+    'documents': ([
+        ('id', Document.id),
+        ('user_email', User.email),
+        ('professional_id', Document.professional_id),
+        ('document_type', Document.document_type),
+        ('file_name', Document.file_name),
+        ('file_size', Document.file_size),
+        ('status', Document.status),
+        ('uploaded_at', Document.uploaded_at),
+        ('reviewed_at', Document.reviewed_at)
+    ], lambda query: query.select_from(Document).outerjoin(User, User.id == Document.user_id).order_by(Document.id)),
+}
+
+
+@admin_blueprint.get("/export/<kind>")
+@token_required
+@role_required(UserRole.ADMIN)
+def export_table(current_user, kind):
+    """Stream every row of users, payments, jobs or documents as CSV (default) or NDJSON (?format=ndjson)"""
+    if kind not in ADMIN_EXPORTS:
+        return jsonify({"error": f"Unknown export: {kind}"}), 404
+    try:
+        fmt = export_format(request.args.get('format'))
+    except InvalidExportFormat as e:
+        return jsonify({"error": str(e)}), 400
+    columns, build_query = ADMIN_EXPORTS[kind]
+    return stream_export(columns, build_query, fmt, f'qgig_{kind}')
+
 @admin_blueprint.put("/users/<int:user_id>/suspend")
 @token_required
 @role_required(UserRole.ADMIN)
@@ -146,7 +205,14 @@ def activate_user(current_user, user_id):
 def get_pending_documents(current_user):
     db = SessionLocal()
     try:
-        documents = db.query(Document).filter(Document.status == DocumentStatus.PENDING).all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        query = db.query(Document).filter(Document.status == DocumentStatus.PENDING)
+        try:
+            page = paginate_keyset(query, [(Document.id, True)], cursor, limit,
+                                   estimated_count('admin:documents:pending', lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        documents = page.items
         
         return jsonify({
             "documents": [{
@@ -155,7 +221,8 @@ def get_pending_documents(current_user):
                 "document_type": d.document_type.value,
                 "file_path": d.file_path,
                 "uploaded_at": d.uploaded_at.isoformat()
-            } for d in documents]
+            } for d in documents],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
@@ -216,7 +283,14 @@ def reject_document(current_user, doc_id):
 def get_all_gigs(current_user):
     db = SessionLocal()
     try:
-        gigs = db.query(Job).all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        query = db.query(Job)
+        try:
+            page = paginate_keyset(query, [(Job.id, True)], cursor, limit,
+                                   estimated_count('admin:gigs', lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        gigs = page.items
         
         return jsonify({
             "gigs": [{
@@ -227,7 +301,8 @@ def get_all_gigs(current_user):
                 "assigned_professional_id": g.assigned_professional_id,
                 "pay_amount": g.pay_amount,
                 "created_at": g.created_at.isoformat()
-            } for g in gigs]
+            } for g in gigs],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
@@ -239,7 +314,14 @@ def get_all_gigs(current_user):
 def get_all_payments(current_user):
     db = SessionLocal()
     try:
-        payments = db.query(Payment).all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        query = db.query(Payment)
+        try:
+            page = paginate_keyset(query, [(Payment.id, True)], cursor, limit,
+                                   estimated_count('admin:payments', lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        payments = page.items
         
         return jsonify({
             "payments": [{
@@ -249,7 +331,8 @@ def get_all_payments(current_user):
                 "status": p.status.value,
                 "created_at": p.created_at.isoformat(),
                 "completed_at": p.completed_at.isoformat() if p.completed_at else None
-            } for p in payments]
+            } for p in payments],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
@@ -261,7 +344,14 @@ def get_all_payments(current_user):
 def get_all_documents(current_user):
     db = SessionLocal()
     try:
-        documents = db.query(Document).all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        query = db.query(Document)
+        try:
+            page = paginate_keyset(query, [(Document.id, True)], cursor, limit,
+                                   estimated_count('admin:documents', lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        documents = page.items
         
         return jsonify({
             "documents": [{
@@ -275,7 +365,8 @@ def get_all_documents(current_user):
                 "uploaded_at": d.uploaded_at.isoformat(),
                 "reviewed_at": d.reviewed_at.isoformat() if d.reviewed_at else None,
                 "admin_notes": d.admin_notes
-            } for d in documents]
+            } for d in documents],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
@@ -424,7 +515,14 @@ def filter_payments(current_user):
         if professional_id:
             query = query.filter(Payment.professional_id == int(professional_id))
         
-        payments = query.all()
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=200)
+        count_key = f"admin:payments:{status}:{institution_id}:{professional_id}"
+        try:
+            page = paginate_keyset(query, [(Payment.id, True)], cursor, limit,
+                                   estimated_count(count_key, lambda: query.count()))
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        payments = page.items
         
         return jsonify({
             "payments": [{
@@ -436,7 +534,8 @@ def filter_payments(current_user):
                 "status": p.status.value,
                 "created_at": p.created_at.isoformat(),
                 "completed_at": p.completed_at.isoformat() if p.completed_at else None
-            } for p in payments]
+            } for p in payments],
+            "pagination": page.to_dict()
         }), 200
         
     finally:
@@ -8,7 +8,9 @@ from app.models.professional import Professional
 from app.models.institution import Institution
 from app.models.rating import Rating
 from app.middleware.auth import token_required, role_required
-from sqlalchemy import func, extract, and_
+from app.services import admin_analytics as admin_analytics_service
+from app.services import earnings as earnings_service
+from sqlalchemy import func, and_
 from datetime import datetime, timedelta
 
 analytics_blueprint = Blueprint("analytics", __name__)
@@ -19,120 +21,44 @@ analytics_blueprint = Blueprint("analytics", __name__)
 def admin_analytics(current_user):
     db = SessionLocal()
     try:
-        total_users = db.query(User).count()
-        total_professionals = db.query(Professional).count()
-        total_institutions = db.query(Institution).count()
-        active_users = db.query(User).filter(User.is_active == True).count()
-        
-        total_gigs = db.query(Job).count()
-        open_gigs = db.query(Job).filter(Job.status == JobStatus.OPEN).count()
-        assigned_gigs = db.query(Job).filter(Job.status == JobStatus.ASSIGNED).count()
-        completed_gigs = db.query(Job).filter(Job.status == JobStatus.COMPLETED).count()
-        
-        total_payments = db.query(Payment).count()
-        completed_payments = db.query(Payment).filter(Payment.status == TransactionStatus.COMPLETED).count()
-        pending_payments = db.query(Payment).filter(Payment.status == TransactionStatus.PENDING).count()
-        failed_payments = db.query(Payment).filter(Payment.status == TransactionStatus.FAILED).count()
-        
-        total_revenue = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.COMPLETED
-        ).scalar() or 0
-        
-        pending_documents = db.query(Document).filter(Document.status == DocumentStatus.PENDING).count()
-        approved_documents = db.query(Document).filter(Document.status == DocumentStatus.APPROVED).count()
-        rejected_documents = db.query(Document).filter(Document.status == DocumentStatus.REJECTED).count()
-        
-        avg_rating = db.query(func.avg(Rating.rating)).scalar() or 0
-        total_ratings = db.query(Rating).count()
-        
-        now = datetime.utcnow()
-        thirty_days_ago = now - timedelta(days=30)
-        seven_days_ago = now - timedelta(days=7)
-        
-        revenue_last_30_days = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        revenue_last_7_days = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= seven_days_ago
-        ).scalar() or 0
-        
-        gigs_last_30_days = db.query(Job).filter(Job.created_at >= thirty_days_ago).count()
-        
-        most_active_institutions = db.query(
-            Institution.id,
-            Institution.institution_name,
-            func.count(Job.id).label('gig_count')
-        ).join(Job).group_by(Institution.id, Institution.institution_name).order_by(
-            func.count(Job.id).desc()
-        ).limit(5).all()
-        
-        most_hired_professionals = db.query(
-            Professional.id,
-            Professional.full_name,
-            func.count(Job.id).label('hire_count')
-        ).join(Job, Job.assigned_professional_id == Professional.id).filter(
-            Job.status.in_([JobStatus.ASSIGNED, JobStatus.COMPLETED])
-        ).group_by(Professional.id, Professional.full_name).order_by(
-            func.count(Job.id).desc()
-        ).limit(5).all()
-        
-        daily_revenue = db.query(
-            func.date(Payment.completed_at).label('date'),
-            func.sum(Payment.amount).label('revenue')
-        ).filter(
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= thirty_days_ago
-        ).group_by(func.date(Payment.completed_at)).order_by(func.date(Payment.completed_at)).all()
+        users = admin_analytics_service.user_breakdown(db)
+        gigs = admin_analytics_service.job_breakdown(db)
+        payments = admin_analytics_service.payment_breakdown(db)
+        documents = admin_analytics_service.document_breakdown(db)
+        ratings = admin_analytics_service.rating_summary(db)
         
         return jsonify({
             "users": {
-                "total": total_users,
-                "professionals": total_professionals,
-                "institutions": total_institutions,
-                "active": active_users
+                "total": users['total'],
+                "professionals": users['professionals'],
+                "institutions": users['institutions'],
+                "active": users['active']
             },
             "gigs": {
-                "total": total_gigs,
-                "open": open_gigs,
-                "assigned": assigned_gigs,
-                "completed": completed_gigs,
-                "last_30_days": gigs_last_30_days
+                "total": gigs['total'],
+                "open": gigs['open'],
+                "assigned": gigs['assigned'],
+                "completed": gigs['completed'],
+                "last_30_days": gigs['new']
             },
             "payments": {
-                "total": total_payments,
-                "completed": completed_payments,
-                "pending": pending_payments,
-                "failed": failed_payments,
-                "total_revenue": float(total_revenue),
-                "revenue_last_30_days": float(revenue_last_30_days),
-                "revenue_last_7_days": float(revenue_last_7_days)
+                "total": payments['total'],
+                "completed": payments['completed'],
+                "pending": payments['pending'],
+                "failed": payments['failed'],
+                "total_revenue": payments['revenue'],
+                "revenue_last_30_days": payments['revenue_30d'],
+                "revenue_last_7_days": payments['revenue_7d']
             },
             "documents": {
-                "pending": pending_documents,
-                "approved": approved_documents,
-                "rejected": rejected_documents
+                "pending": documents['pending'],
+                "approved": documents['approved'],
+                "rejected": documents['rejected']
             },
-            "ratings": {
-                "average": round(float(avg_rating), 2),
-                "total": total_ratings
-            },
-            "top_institutions": [{
-                "id": inst.id,
-                "name": inst.institution_name,
-                "gig_count": inst.gig_count
-            } for inst in most_active_institutions],
-            "top_professionals": [{
-                "id": prof.id,
-                "name": prof.full_name,
-                "hire_count": prof.hire_count
-            } for prof in most_hired_professionals],
-            "daily_revenue": [{
-                "date": str(dr.date),
-                "revenue": float(dr.revenue)
-            } for dr in daily_revenue]
+            "ratings": ratings,
+            "top_institutions": admin_analytics_service.top_institutions(db),
+            "top_professionals": admin_analytics_service.top_professionals(db),
+            "daily_revenue": admin_analytics_service.daily_revenue(db, days=30)
         }), 200
         
     finally:
@@ -251,15 +177,7 @@ def professional_analytics(current_user):
             Job.status == JobStatus.ASSIGNED
         ).count()
         
-        total_earnings = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED
-        ).scalar() or 0
-        
-        pending_payments = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.PENDING
-        ).scalar() or 0
+        earnings = earnings_service.earnings_summary(db, professional.id)
         
         avg_rating = db.query(func.avg(Rating.rating)).filter(
             Rating.professional_id == professional.id
@@ -269,31 +187,6 @@ def professional_analytics(current_user):
             Rating.professional_id == professional.id
         ).count()
         
-        now = datetime.utcnow()
-        thirty_days_ago = now - timedelta(days=30)
-        
-        monthly_earnings = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        monthly_earnings_trend = db.query(
-            extract('month', Payment.completed_at).label('month'),
-            extract('year', Payment.completed_at).label('year'),
-            func.sum(Payment.amount).label('earnings')
-        ).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= datetime.utcnow() - timedelta(days=180)
-        ).group_by(
-            extract('year', Payment.completed_at),
-            extract('month', Payment.completed_at)
-        ).order_by(
-            extract('year', Payment.completed_at),
-            extract('month', Payment.completed_at)
-        ).all()
-        
         document_status = db.query(
             Document.status,
             func.count(Document.id).label('count')
@@ -308,19 +201,15 @@ def professional_analytics(current_user):
                 "active": active_gigs
             },
             "earnings": {
-                "total": float(total_earnings),
-                "pending": float(pending_payments),
-                "monthly": float(monthly_earnings)
+                "total": earnings['total_earnings'],
+                "pending": earnings['pending_amount'],
+                "monthly": earnings['recent_earnings']
             },
             "ratings": {
                 "average": round(float(avg_rating), 2),
                 "total": total_ratings
             },
-            "monthly_trend": [{
-                "month": int(trend.month),
-                "year": int(trend.year),
-                "earnings": float(trend.earnings)
-            } for trend in monthly_earnings_trend],
+            "monthly_trend": earnings_service.trend_points(earnings),
             "documents": {
                 status.status.value: status.count for status in document_status
             }
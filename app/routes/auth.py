@@ -4,6 +4,8 @@ from app.database import SessionLocal
 from app.models.user import User, UserRole
 from app.config import settings
 from app.middleware.auth import token_required, role_required
+from app.middleware.identity import clear_request_identity
+from app.services.socket_rooms import store_session_claim
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
@@ -130,6 +132,9 @@ def login():
         session['user_id'] = user.id
         session['role'] = user.role.value
         session['active_role'] = active_role
+        clear_request_identity(user.id)
+        # Precompute Socket.IO rooms so socket connects need no queries
+        store_session_claim(db, session, user.id, active_role)
         
         return jsonify({
             "message": "Login successful",
@@ -235,6 +240,8 @@ def switch_role(current_user):
         )
         db.add(audit)
         db.commit()
+        clear_request_identity(current_user.id)
+        store_session_claim(db, session, current_user.id, requested_role)
 
         # Best-effort: issue a new JWT with updated active_role
         token = jwt.encode({
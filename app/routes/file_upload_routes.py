@@ -10,6 +10,7 @@ from app.models.professional import Professional
 from app.models.document import Document, DocumentType, DocumentStatus
 from app.services.file_upload_service import FileUploadService
 from app.services.file_access_control import FileAccessControl
+from app.middleware.identity import get_request_identity, get_current_professional, clear_request_identity
 import os
 
 
@@ -20,25 +21,6 @@ def _get_active_role_from_session():
     return None
 
 
-def _user_has_role(db, user, role_name: str) -> bool:
-    if not user or not role_name:
-        return False
-
-    try:
-        from app.models.role import Role, UserRoleAssignment
-        role_row = db.query(Role).filter(Role.name == role_name).first()
-        if role_row:
-            assignment = db.query(UserRoleAssignment).filter(
-                UserRoleAssignment.user_id == user.id,
-                UserRoleAssignment.role_id == role_row.id
-            ).first()
-            if assignment:
-                return True
-    except Exception:
-        pass
-
-    return user.role and user.role.value == role_name
-
 def login_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -53,19 +35,15 @@ def role_required(role):
         def wrapper(*args, **kwargs):
             if 'user_id' not in session:
                 return jsonify({'error': 'Unauthorized'}), 401
-            db = SessionLocal()
-            try:
-                user = db.query(User).filter(User.id == session['user_id']).first()
-                active_role = _get_active_role_from_session()
-                if not active_role:
-                    return jsonify({'error': 'Forbidden'}), 403
-                if active_role != role:
-                    return jsonify({'error': 'Forbidden'}), 403
-                if not _user_has_role(db, user, active_role):
-                    return jsonify({'error': 'Forbidden'}), 403
-                return f(*args, **kwargs)
-            finally:
-                db.close()
+            identity = get_request_identity()
+            active_role = _get_active_role_from_session()
+            if not active_role:
+                return jsonify({'error': 'Forbidden'}), 403
+            if active_role != role:
+                return jsonify({'error': 'Forbidden'}), 403
+            if not identity or not identity.has_role(active_role):
+                return jsonify({'error': 'Forbidden'}), 403
+            return f(*args, **kwargs)
         return wrapper
     return decorator
 
@@ -158,7 +136,7 @@ def upload_certificate():
     db = SessionLocal()
     try:
         # Get professional
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             return jsonify({'error': 'Professional profile not found'}), 404
         
@@ -267,6 +245,7 @@ def upload_profile_picture():
         professional.profile_picture = file_info['file_path']
         
         db.commit()
+        clear_request_identity(session['user_id'])
         
         return jsonify({
             'success': True,
@@ -292,7 +271,7 @@ def get_my_files():
     """Get list of uploaded files for current professional"""
     db = SessionLocal()
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             return jsonify({'error': 'Professional profile not found'}), 404
         
@@ -323,7 +302,7 @@ def delete_file(file_id):
     """Delete uploaded file"""
     db = SessionLocal()
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             return jsonify({'error': 'Professional profile not found'}), 404
         
@@ -3,6 +3,7 @@ from app.database import SessionLocal
 from app.models.institution import Institution
 from app.models.user import UserRole
 from app.middleware.auth import token_required, role_required
+from app.middleware.identity import clear_request_identity
 
 institution_blueprint = Blueprint("institution", __name__)
 
@@ -30,6 +31,7 @@ def create_profile(current_user):
         )
         db.add(profile)
         db.commit()
+        clear_request_identity(current_user.id)
         db.refresh(profile)
         
         return jsonify({
@@ -99,6 +101,7 @@ def update_profile(current_user):
             profile.website = data["website"]
         
         db.commit()
+        clear_request_identity(current_user.id)
         db.refresh(profile)
         
         return jsonify({
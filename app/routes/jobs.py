@@ -5,6 +5,8 @@ from app.models.institution import Institution
 from app.models.professional import Professional
 from app.models.user import UserRole
 from app.middleware.auth import token_required, role_required
+from app.services.pagination import paginate_keyset, estimated_count, page_args, InvalidCursor
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 jobs_blueprint = Blueprint("jobs", __name__)
@@ -62,18 +64,35 @@ def create_job(current_user):
     finally:
         db.close()
 
+# Keyset sort orders for list_jobs: (column, descending) pairs ending in a unique column
+LIST_SORTS = {
+    'newest': [(Job.created_at, True), (Job.id, True)],
+    'oldest': [(Job.created_at, False), (Job.id, False)],
+    'price_high': [(Job.pay_amount, True), (Job.id, True)],
+    'price_low': [(Job.pay_amount, False), (Job.id, False)],
+}
+
 @jobs_blueprint.get("")
 def list_jobs():
     db = SessionLocal()
     try:
         status_filter = request.args.get('status', 'open')
+        sort = request.args.get('sort', 'newest')
+        if sort not in LIST_SORTS:
+            return jsonify({"error": f"Invalid sort. Use one of: {', '.join(LIST_SORTS)}"}), 400
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=100)
         
         # Filter out expired gigs
-        query = db.query(Job).filter(Job.status == JobStatus.OPEN)
+        query = db.query(Job).options(joinedload(Job.institution)).filter(Job.status == JobStatus.OPEN)
         query = query.filter(
             (Job.expiry_date == None) | (Job.expiry_date > datetime.utcnow())
         )
-        jobs = query.order_by(Job.created_at.desc()).all()
+        
+        estimated_total = estimated_count('api_jobs:open', lambda: query.count())
+        try:
+            page = paginate_keyset(query, LIST_SORTS[sort], cursor, limit, estimated_total)
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         return jsonify({
             "jobs": [{
@@ -93,7 +112,8 @@ def list_jobs():
                     "id": job.institution.id,
                     "name": job.institution.institution_name
                 }
-            } for job in jobs]
+            } for job in page.items],
+            "pagination": page.to_dict()
         }), 200
     finally:
         db.close()
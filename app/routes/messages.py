@@ -10,6 +10,12 @@ from app.models.professional import Professional
 from app.models.institution import Institution
 from datetime import datetime
 from functools import wraps
+from app.middleware.identity import get_request_identity
+from app.services.inbox import load_conversation_summaries
+from app.services.conversations import (
+    record_message, record_message_read, record_message_deleted, get_unread_message_count,
+    find_conversation, load_thread_page, mark_thread_read, THREAD_PAGE_SIZE
+)
 
 def login_required(f):
     """Decorator to require login for a route"""
@@ -35,7 +41,8 @@ def inject_user():
     if 'user_id' in session:
         db = SessionLocal()
         try:
-            current_user = db.query(User).filter(User.id == session['user_id']).first()
+            identity = get_request_identity()
+            current_user = identity.user if identity else None
             
             # Get unread notification count
             notification_count = db.query(Notification).filter(
@@ -46,7 +53,7 @@ def inject_user():
             # Add profile picture
             if current_user:
                 if current_user.role == UserRole.PROFESSIONAL:
-                    prof = db.query(Professional).filter(Professional.user_id == current_user.id).first()
+                    prof = identity.professional
                     if prof:
                         profile_pic = db.query(Document).filter(
                             Document.professional_id == prof.id,
@@ -74,69 +81,8 @@ def inbox():
     """Display user's message inbox with conversations"""
     db = SessionLocal()
     try:
-        user_id = session['user_id']
-        user = db.query(User).filter(User.id == user_id).first()
-        
-        # Get all messages involving this user
-        all_messages = db.query(Message).filter(
-            or_(
-                and_(Message.sender_id == user_id, Message.is_deleted_by_sender == False),
-                and_(Message.receiver_id == user_id, Message.is_deleted_by_receiver == False)
-            )
-        ).options(
-            joinedload(Message.sender),
-            joinedload(Message.receiver),
-            joinedload(Message.job)
-        ).order_by(desc(Message.created_at)).all()
-        
-        # Group by conversation partner (other user)
-        conversations_dict = {}
-        for msg in all_messages:
-            other_user_id = msg.sender_id if msg.sender_id != user_id else msg.receiver_id
-            if other_user_id not in conversations_dict:
-                conversations_dict[other_user_id] = msg
-        
-        # Convert to list
-        conversations = list(conversations_dict.values())
-        
-        # Get unread count per conversation
-        conversation_data = []
-        for msg in conversations:
-            other_user = msg.sender if msg.sender_id != user_id else msg.receiver
-            
-            # Count unread messages from this conversation
-            unread_count = db.query(Message).filter(
-                Message.sender_id == other_user.id,
-                Message.receiver_id == user_id,
-                Message.is_read == False,
-                Message.is_deleted_by_receiver == False
-            ).count()
-            
-            # Get other user's profile info
-            profile_name = None
-            if other_user.role == UserRole.PROFESSIONAL:
-                prof = db.query(Professional).filter(Professional.user_id == other_user.id).first()
-                profile_name = prof.full_name if prof and prof.full_name else other_user.email
-            elif other_user.role == UserRole.INSTITUTION:
-                inst = db.query(Institution).filter(Institution.user_id == other_user.id).first()
-                profile_name = inst.institution_name if inst and inst.institution_name else other_user.email
-            else:
-                profile_name = other_user.email
-            
-            conversation_data.append({
-                'other_user': other_user,
-                'profile_name': profile_name,
-                'last_message': msg,
-                'unread_count': unread_count,
-                'job': msg.job
-            })
-        
-        # Get total unread count
-        total_unread = db.query(Message).filter(
-            Message.receiver_id == user_id,
-            Message.is_read == False,
-            Message.is_deleted_by_receiver == False
-        ).count()
+        # One row per conversation partner: last message, unread count and display name
+        conversation_data, total_unread = load_conversation_summaries(db, session['user_id'])
         
         return render_template('messages_inbox.html',
                              conversations=conversation_data,
@@ -158,24 +104,14 @@ def conversation(other_user_id):
             flash('User not found', 'error')
             return redirect(url_for('messages.inbox'))
         
-        # Get all messages between these two users
-        messages = db.query(Message).filter(
-            or_(
-                and_(Message.sender_id == user_id, Message.receiver_id == other_user_id, Message.is_deleted_by_sender == False),
-                and_(Message.sender_id == other_user_id, Message.receiver_id == user_id, Message.is_deleted_by_receiver == False)
-            )
-        ).options(
-            joinedload(Message.job),
-            joinedload(Message.job_interest)
-        ).order_by(Message.created_at).all()
+        # Latest page of the thread; ?before=<message id> pages back through older history
+        before_id = request.args.get('before', type=int)
+        messages, has_older = load_thread_page(db, user_id, other_user_id, before_id=before_id)
         
-        # Mark all received messages as read
-        unread_messages = [m for m in messages if m.receiver_id == user_id and not m.is_read]
-        for msg in unread_messages:
-            msg.mark_as_read()
-        
-        if unread_messages:
-            db.commit()
+        # Mark everything received up to the newest message shown as read in one UPDATE
+        marked = 0
+        if messages and before_id is None:
+            marked = mark_thread_read(db, user_id, other_user_id, messages[-1].id)
         
         # Get other user's profile info
         profile_name = None
@@ -191,20 +127,54 @@ def conversation(other_user_id):
         else:
             profile_name = other_user.email
         
-        # Get related job if any
+        # Get related job if any (the gig of the latest job-related message)
         related_job = None
-        if messages:
-            for msg in reversed(messages):
-                if msg.job_id:
-                    related_job = msg.job
-                    break
+        conversation_row = find_conversation(db, user_id, other_user_id)
+        if conversation_row and conversation_row.job_id:
+            related_job = db.query(Job).filter(Job.id == conversation_row.job_id).first()
         
-        return render_template('messages_conversation.html',
+        page = render_template('messages_conversation.html',
                              messages=messages,
+                             has_older=has_older,
+                             before_id=before_id,
                              other_user=other_user,
                              profile_name=profile_name,
                              profile_info=profile_info,
                              related_job=related_job)
+        # Commit after rendering so the loaded page is not expired and reloaded row by row
+        if marked:
+            db.commit()
+        return page
+    finally:
+        db.close()
+
+@messages_blueprint.route('/api/conversation/<int:other_user_id>')
+@login_required
+def conversation_messages(other_user_id):
+    """JSON window of a conversation for the chat UI: ?before=<id> for older history, ?after=<id> for new messages"""
+    db = SessionLocal()
+    try:
+        user_id = session['user_id']
+        before_id = request.args.get('before', type=int)
+        after_id = request.args.get('after', type=int)
+        limit = max(1, min(request.args.get('limit', THREAD_PAGE_SIZE, type=int), 100))
+        
+        messages, has_older = load_thread_page(
+            db, user_id, other_user_id, before_id=before_id, after_id=after_id, limit=limit,
+            options=(joinedload(Message.sender), joinedload(Message.receiver))
+        )
+        
+        payload = {
+            'messages': [msg.to_dict() for msg in messages],
+            'has_older': has_older,
+            'oldest_id': messages[0].id if messages else before_id,
+            'newest_id': messages[-1].id if messages else after_id
+        }
+        if messages and before_id is None:
+            if mark_thread_read(db, user_id, other_user_id, messages[-1].id):
+                db.commit()
+        
+        return jsonify(payload)
     finally:
         db.close()
 
@@ -226,6 +196,9 @@ def send_message():
         if not receiver_id or not content:
             return jsonify({'error': 'Receiver and content are required'}), 400
         
+        if str(receiver_id) == str(user_id):
+            return jsonify({'error': 'You cannot send a message to yourself'}), 400
+        
         # Verify receiver exists
         receiver = db.query(User).filter(User.id == receiver_id).first()
         if not receiver:
@@ -243,18 +216,22 @@ def send_message():
         )
         
         db.add(message)
+        db.flush()
+        record_message(db, message)
         db.commit()
         db.refresh(message)
         
-        # Emit socket event for real-time delivery
-        from app.sockets import send_message_notification
-        send_message_notification(receiver_id, {
-            'message_id': message.id,
-            'sender_id': user_id,
-            'content': content,
-            'created_at': message.created_at.isoformat(),
-            'job_id': job_id
-        })
+        # Emit socket event for real-time delivery (only if the receiver has a socket open)
+        from app.services.presence import is_online
+        if is_online(receiver.id):
+            from app.sockets import send_message_notification
+            send_message_notification(receiver_id, {
+                'message_id': message.id,
+                'sender_id': user_id,
+                'content': content,
+                'created_at': message.created_at.isoformat(),
+                'job_id': job_id
+            })
         
         if request.is_json:
             return jsonify({
@@ -281,12 +258,7 @@ def unread_count():
     """Get unread message count for current user"""
     db = SessionLocal()
     try:
-        user_id = session['user_id']
-        count = db.query(Message).filter(
-            Message.receiver_id == user_id,
-            Message.is_read == False,
-            Message.is_deleted_by_receiver == False
-        ).count()
+        count = get_unread_message_count(db, session['user_id'])
         
         return jsonify({'unread_count': count})
     finally:
@@ -307,8 +279,10 @@ def mark_read(message_id):
         if not message:
             return jsonify({'error': 'Message not found'}), 404
         
-        message.mark_as_read()
-        db.commit()
+        if not message.is_read:
+            message.mark_as_read()
+            record_message_read(db, message)
+            db.commit()
         
         return jsonify({'success': True})
     finally:
@@ -327,13 +301,17 @@ def delete_message(message_id):
             return jsonify({'error': 'Message not found'}), 404
         
         # Soft delete based on user role
+        was_unread = False
         if message.sender_id == user_id:
             message.is_deleted_by_sender = True
         elif message.receiver_id == user_id:
+            was_unread = not message.is_read and not message.is_deleted_by_receiver
             message.is_deleted_by_receiver = True
         else:
             return jsonify({'error': 'Unauthorized'}), 403
         
+        db.flush()
+        record_message_deleted(db, message, user_id, was_unread=was_unread)
         db.commit()
         
         flash('Message deleted', 'success')
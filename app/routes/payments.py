@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.services.pesapal import PesaPal
+from app.services.payment_ipn import ipn_fields, record_ipn
+from app.services.payment_reconciliation import reconciler as payment_reconciler
 from app.database import SessionLocal
 from app.models.payment import Payment, TransactionStatus
 from app.models.job import Job, JobStatus
@@ -110,52 +112,30 @@ def initiate_payment(current_user):
 
 @payments_blueprint.post("/webhook")
 def webhook():
+    """Queue the IPN and acknowledge it; app.services.payment_ipn applies it in the background"""
+    data = request.get_json(silent=True) or request.args.to_dict()
+    fields = ipn_fields(data)
+    if not fields['order_tracking_id']:
+        return jsonify({"status": "error", "message": "Missing OrderTrackingId"}), 400
+
     db = SessionLocal()
     try:
-        data = request.json
-        order_tracking_id = data.get('OrderTrackingId')
-        
-        if not order_tracking_id:
-            return jsonify({"status": "error", "message": "Missing OrderTrackingId"}), 400
-        
-        payment = db.query(Payment).filter(
-            Payment.pesapal_order_tracking_id == order_tracking_id
-        ).first()
-        
-        if not payment:
-            return jsonify({"status": "error", "message": "Payment not found"}), 404
-        
-        pesapal = PesaPal()
-        status_response = pesapal.get_transaction_status(order_tracking_id)
-        
-        payment_status = status_response.get('payment_status_description', '').lower()
-        
-        if payment_status == 'completed':
-            payment.status = TransactionStatus.COMPLETED
-            payment.completed_at = datetime.utcnow()
-            payment.pesapal_transaction_id = status_response.get('transaction_id')
-            payment.payment_method = status_response.get('payment_method')
-            
-            gig = db.query(Job).filter(Job.id == payment.gig_id).first()
-            if gig:
-                gig.status = JobStatus.COMPLETED
-            
-        elif payment_status == 'failed':
-            payment.status = TransactionStatus.FAILED
-        elif payment_status == 'cancelled':
-            payment.status = TransactionStatus.CANCELLED
-        
-        payment.updated_at = datetime.utcnow()
-        db.commit()
-        
-        return jsonify({"status": "success", "message": "Webhook processed"}), 200
-        
+        record_ipn(db, data)
     except Exception as e:
         db.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
     finally:
         db.close()
 
+    payment_reconciler.wake()
+    # Acknowledgement in the format PesaPal expects; a 200 stops its retries
+    return jsonify({
+        "orderNotificationType": fields['notification_type'],
+        "orderTrackingId": fields['order_tracking_id'],
+        "orderMerchantReference": fields['merchant_reference'],
+        "status": 200
+    }), 200
+
 @payments_blueprint.get("/status/<int:payment_id>")
 @token_required
 def get_payment_status(current_user, payment_id):
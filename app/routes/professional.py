@@ -3,6 +3,7 @@ from app.database import SessionLocal
 from app.models.professional import Professional
 from app.models.user import UserRole
 from app.middleware.auth import token_required, role_required
+from app.middleware.identity import clear_request_identity
 
 professional_blueprint = Blueprint("professional", __name__)
 
@@ -32,6 +33,7 @@ def create_profile(current_user):
         )
         db.add(profile)
         db.commit()
+        clear_request_identity(current_user.id)
         db.refresh(profile)
         
         return jsonify({
@@ -103,6 +105,7 @@ def update_profile(current_user):
             profile.location = data["location"]
         
         db.commit()
+        clear_request_identity(current_user.id)
         db.refresh(profile)
         
         return jsonify({
@@ -11,6 +11,7 @@ from app.models.institution import Institution
 from app.models.job import Job, JobStatus
 from app.models.rating import Rating
 from sqlalchemy import func, desc
+from app.middleware.identity import get_request_identity, get_current_institution
 
 rating_routes_blueprint = Blueprint('rating_routes', __name__)
 
@@ -30,14 +31,10 @@ def role_required(*roles):
             if 'user_id' not in session:
                 return jsonify({'error': 'Authentication required'}), 401
             
-            db = SessionLocal()
-            try:
-                user = db.query(User).filter(User.id == session['user_id']).first()
-                if not user or user.role.value not in roles:
-                    return jsonify({'error': 'Insufficient permissions'}), 403
-                return f(*args, **kwargs)
-            finally:
-                db.close()
+            identity = get_request_identity()
+            if not identity or identity.legacy_role not in roles:
+                return jsonify({'error': 'Insufficient permissions'}), 403
+            return f(*args, **kwargs)
         return wrapper
     return decorator
 
@@ -52,7 +49,7 @@ def rate_professional(gig_id):
     db = SessionLocal()
     try:
         # Get institution
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -222,7 +219,7 @@ def can_rate_gig(gig_id):
     """Check if institution can rate this gig"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'can_rate': False, 'reason': 'Institution profile not found'}), 200
         
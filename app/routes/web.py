@@ -15,12 +15,14 @@ from app.models.document import Document, DocumentType, DocumentStatus
 from app.models.notification import Notification
 from app.models.job_interest import JobInterest, InterestStatus
 from app.models.message import Message
-from sqlalchemy import func, or_, desc, asc
+from sqlalchemy import func, or_, desc, asc, case, select
 from sqlalchemy.orm import joinedload
 from functools import wraps
 import bcrypt
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import os
+import json
 import secrets
 import hashlib
 import smtplib
@@ -30,6 +32,25 @@ import logging
 from werkzeug.utils import secure_filename
 from app.services.file_upload_service import FileUploadService
 from app.services.file_access_control import FileAccessControl
+from app.services.dashboard_stats import get_dashboard_stats, professional_context, institution_context
+from app.services.interest_loader import InterestSummary, annotate_viewer_interest
+from app.services.interest_counters import record_interest_transition, reconcile_interest_counts
+from app.services.job_search import apply_job_search
+from app.services.job_facets import get_job_facets
+from app.services.pagination import paginate_keyset, paginate_ranked, estimated_count, page_args, InvalidCursor
+from app.services.conversations import record_message, delete_user_conversations, rebuild_conversations
+from app.services.notification_outbox import enqueue_emit, enqueue_user_emit, enqueue_many
+from app.services.presence import is_room_online, online_users
+from app.services.interest_decisions import decline_pending_interests
+from app.services.socket_rooms import store_session_claim
+from app.services import admin_analytics as admin_analytics_service
+from app.services import metrics_rollup
+from app.services import page_cache
+from app.services import earnings as earnings_service
+from app.services.exports import stream_export, export_format, InvalidExportFormat
+from app.middleware.identity import (
+    get_request_identity, get_current_professional, get_current_institution, clear_request_identity
+)
 
 web_blueprint = Blueprint('web', __name__)
 
@@ -150,12 +171,10 @@ def role_required(*roles):
                 flash('Please login to access this page', 'warning')
                 return redirect(url_for('web.login'))
             
-            db = SessionLocal()
-            user = db.query(User).filter(User.id == session['user_id']).first()
-            db.close()
+            identity = get_request_identity()
 
             active_role = session.get('active_role') or session.get('role') or session.get('user_role')
-            if user and active_role and active_role not in roles:
+            if identity and active_role and active_role not in roles:
                 is_ajax = (
                     request.is_json or
                     request.headers.get('X-Requested-With') == 'XMLHttpRequest' or
@@ -186,7 +205,8 @@ def inject_user():
     
     if 'user_id' in session:
         db = SessionLocal()
-        current_user = db.query(User).filter(User.id == session['user_id']).first()
+        identity = get_request_identity()
+        current_user = identity.user if identity else None
         
         # Get active role
         active_role = session.get('active_role', current_user.role.value if current_user else None)
@@ -205,7 +225,7 @@ def inject_user():
         # Get role-specific data and profile picture
         if current_user:
             # Get professional profile
-            prof = db.query(Professional).filter(Professional.user_id == current_user.id).first()
+            prof = identity.professional
             if prof:
                 # Try to get profile picture from Document table first
                 profile_pic = db.query(Document).filter(
@@ -221,118 +241,18 @@ def inject_user():
                 current_user.profile_picture = None
             
             # Get institution profile
-            inst = db.query(Institution).filter(Institution.user_id == current_user.id).first()
+            inst = identity.institution
             
             # Collect role-specific stats based on active role
             if active_role == 'professional' and prof:
-                # Professional stats
-                interested_gigs = db.query(GigInterest).filter(
-                    GigInterest.professional_id == prof.id
-                ).count()
-                
-                assigned_gigs = db.query(Job).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.ASSIGNED
-                ).count()
-                
-                completed_gigs = db.query(Job).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED
-                ).count()
-                
-                total_earned = db.query(func.sum(Payment.amount)).filter(
-                    Payment.professional_id == prof.id,
-                    Payment.status == TransactionStatus.COMPLETED
-                ).scalar() or 0
-                
-                completed_gigs_list = db.query(Job).options(
-                    joinedload(Job.institution)
-                ).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED
-                ).order_by(desc(Job.updated_at)).limit(10).all()
-
-                average_rating, total_ratings = db.query(
-                    func.avg(Rating.rating),
-                    func.count(Rating.id)
-                ).filter(Rating.professional_id == prof.id).first()
-
-                repeat_clients = db.query(func.count(func.distinct(Job.institution_id))).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED
-                ).scalar() or 0
-
-                top_sectors = db.query(Job.sector, func.count(Job.id)).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED,
-                    Job.sector.isnot(None),
-                    Job.sector != ''
-                ).group_by(Job.sector).order_by(desc(func.count(Job.id))).limit(3).all()
-
-                top_job_types = db.query(Job.job_type, func.count(Job.id)).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED,
-                    Job.job_type.isnot(None),
-                    Job.job_type != ''
-                ).group_by(Job.job_type).order_by(desc(func.count(Job.id))).limit(3).all()
-
-                total_hours = db.query(func.sum(Job.duration_hours)).filter(
-                    Job.assigned_professional_id == prof.id,
-                    Job.status == JobStatus.COMPLETED
-                ).scalar() or 0
-
-                cv_boost = {
-                    'average_rating': float(average_rating) if average_rating is not None else 0,
-                    'total_ratings': int(total_ratings or 0),
-                    'repeat_clients': int(repeat_clients),
-                    'top_sectors': [{'name': s, 'count': int(c)} for s, c in top_sectors],
-                    'top_job_types': [{'name': t, 'count': int(c)} for t, c in top_job_types],
-                    'total_hours': float(total_hours or 0)
-                }
-                
-                role_stats = {
-                    'interested_gigs': interested_gigs,
-                    'assigned_gigs': assigned_gigs,
-                    'completed_gigs': completed_gigs,
-                    'total_earned': total_earned,
-                    'profile_completion': _calculate_profile_completion(prof)
-                }
+                stats = get_dashboard_stats(db, current_user.id, 'professional', prof.id)
+                role_stats, cv_boost, completed_gigs_list = professional_context(stats)
+                role_stats['profile_completion'] = _calculate_profile_completion(prof)
                 
             elif active_role == 'institution' and inst:
-                # Institution stats
-                open_gigs = db.query(Job).filter(
-                    Job.institution_id == inst.id,
-                    Job.status == JobStatus.OPEN
-                ).count()
-                
-                assigned_gigs = db.query(Job).filter(
-                    Job.institution_id == inst.id,
-                    Job.status == JobStatus.ASSIGNED
-                ).count()
-                
-                completed_gigs = db.query(Job).filter(
-                    Job.institution_id == inst.id,
-                    Job.status == JobStatus.COMPLETED
-                ).count()
-                
-                pending_interests = db.query(GigInterest).join(Job).filter(
-                    Job.institution_id == inst.id,
-                    Job.status == JobStatus.OPEN
-                ).count()
-                
-                total_spent = db.query(func.sum(Payment.amount)).filter(
-                    Payment.institution_id == inst.id,
-                    Payment.status == TransactionStatus.COMPLETED
-                ).scalar() or 0
-                
-                role_stats = {
-                    'open_gigs': open_gigs,
-                    'assigned_gigs': assigned_gigs,
-                    'completed_gigs': completed_gigs,
-                    'pending_interests': pending_interests,
-                    'total_spent': total_spent,
-                    'profile_completion': _calculate_institution_profile_completion(inst)
-                }
+                stats = get_dashboard_stats(db, current_user.id, 'institution', inst.id)
+                role_stats = institution_context(stats)
+                role_stats['profile_completion'] = _calculate_institution_profile_completion(inst)
         
         db.close()
     
@@ -383,37 +303,79 @@ def test_chat():
     """Test page for chat opening functionality"""
     return send_from_directory('..', 'test_chat_opening.html')
 
-@web_blueprint.route('/')
-def home():
-    from sqlalchemy.orm import joinedload
-    
+HOME_RECENT_GIGS = 6
+HOME_STATS_KEY = 'home:stats'
+HOME_RECENT_GIGS_KEY = 'home:recent_gigs'
+
+# Only the columns the fragments show; inserts and deletes always count
+page_cache.invalidate_on(Job, HOME_STATS_KEY, columns=('status',))
+page_cache.invalidate_on(Job, HOME_RECENT_GIGS_KEY, columns=(
+    'status', 'title', 'description', 'location', 'duration_hours', 'is_urgent', 'pay_amount',
+    'expiry_date', 'created_at', 'institution_id'
+))
+page_cache.invalidate_on(Institution, HOME_RECENT_GIGS_KEY, columns=('institution_name', 'contact_email'))
+page_cache.invalidate_on(Payment, HOME_STATS_KEY, columns=('status', 'amount'))
+page_cache.invalidate_on(Professional, HOME_STATS_KEY, columns=())
+
+
+def _home_stats():
     db = SessionLocal()
-    
     try:
-        # Get recent gigs with eagerly loaded institution, excluding expired ones
-        recent_gigs = db.query(Job).options(joinedload(Job.institution)).filter(
-            Job.status == JobStatus.OPEN
-        ).filter(
-            (Job.expiry_date == None) | (Job.expiry_date > datetime.utcnow())
-        ).order_by(desc(Job.created_at)).limit(6).all()
-        
-        # Add interest count to each gig
-        for gig in recent_gigs:
-            gig.interest_count = db.query(JobInterest).filter(JobInterest.job_id == gig.id).count()
-        
-        # Get stats
-        stats = {
+        return {
             'total_gigs': db.query(Job).count(),
             'total_professionals': db.query(Professional).count(),
             'completed_gigs': db.query(Job).filter(Job.status == JobStatus.COMPLETED).count(),
-            'total_paid': db.query(func.sum(Payment.amount)).filter(Payment.status == TransactionStatus.COMPLETED).scalar() or 0
+            'total_paid': float(db.query(func.sum(Payment.amount)).filter(Payment.status == TransactionStatus.COMPLETED).scalar() or 0)
         }
-        
-        return render_template('home.html', recent_gigs=recent_gigs, stats=stats)
     finally:
         db.close()
 
 
+def _home_recent_gigs():
+    """Snapshots of the newest open gigs; twice the page size so gigs expiring while cached can be skipped"""
+    db = SessionLocal()
+    try:
+        gigs = db.query(Job).options(joinedload(Job.institution)).filter(
+            Job.status == JobStatus.OPEN
+        ).filter(
+            (Job.expiry_date == None) | (Job.expiry_date > datetime.utcnow())
+        ).order_by(desc(Job.created_at)).limit(HOME_RECENT_GIGS * 2).all()
+        return [{
+            'id': gig.id,
+            'title': gig.title,
+            'description': gig.description or '',
+            'location': gig.location,
+            'duration_hours': gig.duration_hours,
+            'is_urgent': bool(gig.is_urgent),
+            'pay_amount': float(gig.pay_amount or 0),
+            'status': gig.status.value if gig.status else None,
+            'expiry_date': gig.expiry_date.isoformat() if gig.expiry_date else None,
+            'institution_name': gig.institution.institution_name if gig.institution else None,
+            'institution_email': gig.institution.contact_email if gig.institution else None
+        } for gig in gigs]
+    finally:
+        db.close()
+
+
+def _recent_gig_view(snapshot):
+    gig = dict(snapshot)
+    gig['status'] = JobStatus(gig['status']) if gig['status'] else None
+    gig['expiry_date'] = datetime.fromisoformat(gig['expiry_date']) if gig['expiry_date'] else None
+    gig['institution'] = SimpleNamespace(institution_name=gig.pop('institution_name'),
+                                         contact_email=gig.pop('institution_email'))
+    return SimpleNamespace(**gig)
+
+
+@web_blueprint.route('/')
+def home():
+    # Both fragments are shared by every visitor and served from the page cache
+    now = datetime.utcnow()
+    recent_gigs = [_recent_gig_view(snapshot) for snapshot in page_cache.cached(HOME_RECENT_GIGS_KEY, _home_recent_gigs)]
+    recent_gigs = [gig for gig in recent_gigs if gig.expiry_date is None or gig.expiry_date > now][:HOME_RECENT_GIGS]
+    stats = page_cache.cached(HOME_STATS_KEY, _home_stats)
+    return render_template('home.html', recent_gigs=recent_gigs, stats=stats)
+
+
 @web_blueprint.route('/professional/<int:professional_id>')
 @login_required
 @role_required('professional', 'institution')
@@ -464,6 +426,9 @@ def login():
             session['user_email'] = user.email
             session['user_role'] = user.role.value
             session['active_role'] = user.role.value
+            clear_request_identity(user.id)
+            # Precompute Socket.IO rooms so socket connects need no queries
+            store_session_claim(db, session, user.id, user.role.value)
             
             flash(f'Welcome back, {email.split("@")[0]}!', 'success')
             db.close()
@@ -635,6 +600,15 @@ def reset_password(token):
 
 # ===== Gig Routes =====
 
+# Keyset sort orders for browse_gigs: (column, descending) pairs ending in a unique column
+BROWSE_SORTS = {
+    'newest': [(Job.created_at, True), (Job.id, True)],
+    'oldest': [(Job.created_at, False), (Job.id, False)],
+    'price_high': [(Job.pay_amount, True), (Job.id, True)],
+    'price_low': [(Job.pay_amount, False), (Job.id, False)],
+    'popular': [(Job.interest_count, True), (Job.id, True)],
+}
+
 @web_blueprint.route('/gigs')
 def browse_gigs():
     from sqlalchemy.orm import joinedload
@@ -648,9 +622,8 @@ def browse_gigs():
         location = request.args.get('location', '')
         job_type = request.args.get('job_type', '')
         sector = request.args.get('sector', '')
-        sort = request.args.get('sort', 'newest')
+        sort = request.args.get('sort', 'relevance' if search else 'newest')
         urgent = request.args.get('urgent', '')
-        page = int(request.args.get('page', 1))
         per_page = 12
         
         # Build query with eager loading, excluding expired gigs
@@ -661,12 +634,9 @@ def browse_gigs():
             (Job.expiry_date == None) | (Job.expiry_date > datetime.utcnow())
         )
         
+        search_rank = None
         if search:
-            query = query.filter(or_(
-                Job.title.ilike(f'%{search}%'),
-                Job.description.ilike(f'%{search}%'),
-                Job.location.ilike(f'%{search}%')
-            ))
+            query, search_rank = apply_job_search(query, search)
         
         if status:
             query = query.filter(Job.status == JobStatus[status.upper()])
@@ -683,62 +653,38 @@ def browse_gigs():
         if urgent:
             query = query.filter(Job.is_urgent == True)
         
-        # Sorting
-        if sort == 'newest':
-            query = query.order_by(desc(Job.created_at))
-        elif sort == 'oldest':
-            query = query.order_by(asc(Job.created_at))
-        elif sort == 'price_high':
-            query = query.order_by(desc(Job.pay_amount))
-        elif sort == 'price_low':
-            query = query.order_by(asc(Job.pay_amount))
-        
-        # Pagination
-        total = query.count()
-        gigs = query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Add interest count and check if user has interest
+        # Keyset pagination; the total is an estimate from a short-lived count cache
+        count_key = 'browse_gigs:' + json.dumps(
+            [search, status, location, job_type, sector, urgent], separators=(',', ':')
+        )
+        estimated_total = estimated_count(count_key, lambda: query.order_by(None).count())
+        
+        cursor = request.args.get('cursor') or None
+        try:
+            if sort == 'relevance' and search_rank is not None:
+                page = paginate_ranked(query, [search_rank, desc(Job.id)], cursor, per_page, estimated_total)
+            else:
+                page = paginate_keyset(query, BROWSE_SORTS.get(sort, BROWSE_SORTS['newest']), cursor, per_page, estimated_total)
+        except InvalidCursor:
+            return redirect(url_for('web.browse_gigs', **{k: v for k, v in request.args.items() if k != 'cursor'}))
+        gigs = page.items
+        
+        # Check if user has interest (interest_count is a job column)
         professional_id = None
-        if 'user_id' in session:
-            user = db.query(User).filter(User.id == session['user_id']).first()
-            if user and user.role == UserRole.PROFESSIONAL:
-                professional = db.query(Professional).filter(Professional.user_id == user.id).first()
-                if professional:
-                    professional_id = professional.id
+        identity = get_request_identity()
+        if identity and identity.user.role == UserRole.PROFESSIONAL:
+            professional_id = identity.professional_id
         
-        for gig in gigs:
-            gig.interest_count = db.query(JobInterest).filter(JobInterest.job_id == gig.id).count()
-            gig.user_has_interest = False
-            if professional_id:
-                existing_interest = db.query(JobInterest).filter(
-                    JobInterest.job_id == gig.id,
-                    JobInterest.professional_id == professional_id
-                ).first()
-                gig.user_has_interest = existing_interest is not None
-        
-        # Get unique locations for filter
-        locations = db.query(Job.location).distinct().all()
-        locations = [loc[0] for loc in locations]
-        
-        # Pagination object
-        class Pagination:
-            def __init__(self, page, per_page, total):
-                self.page = page
-                self.per_page = per_page
-                self.total = total
-                self.pages = (total + per_page - 1) // per_page
-                self.has_prev = page > 1
-                self.has_next = page < self.pages
-                self.prev_num = page - 1
-                self.next_num = page + 1
-            
-            def iter_pages(self):
-                for i in range(1, self.pages + 1):
-                    yield i
+        annotate_viewer_interest(db, gigs, professional_id)
         
-        pagination = Pagination(page, per_page, total)
+        # Filter facets with counts, served from the facet cache
+        facets = get_job_facets(db)
         
-        return render_template('browse_gigs.html', gigs=gigs, locations=locations, pagination=pagination)
+        # Filter arguments carried over to the previous/next links
+        page_query_args = {k: v for k, v in request.args.items() if k not in ('cursor', 'page')}
+        
+        return render_template('browse_gigs.html', gigs=gigs, facets=facets, pagination=page,
+                               page_query_args=page_query_args)
     finally:
         db.close()
 
@@ -758,20 +704,13 @@ def gig_detail(gig_id):
             flash('Gig not found', 'error')
             return redirect(url_for('web.browse_gigs'))
         
-        gig.interest_count = db.query(JobInterest).filter(JobInterest.job_id == gig.id).count()
-        
-        # Check if current user has already shown interest
-        user_has_interest = False
-        if 'user_id' in session:
-            user = db.query(User).filter(User.id == session['user_id']).first()
-            if user and user.role == UserRole.PROFESSIONAL:
-                professional = db.query(Professional).filter(Professional.user_id == user.id).first()
-                if professional:
-                    existing_interest = db.query(JobInterest).filter(
-                        JobInterest.job_id == gig_id,
-                        JobInterest.professional_id == professional.id
-                    ).first()
-                    user_has_interest = existing_interest is not None
+        # Whether the current professional already showed interest
+        professional_id = None
+        identity = get_request_identity()
+        if identity and identity.user.role == UserRole.PROFESSIONAL:
+            professional_id = identity.professional_id
+        annotate_viewer_interest(db, [gig], professional_id)
+        user_has_interest = gig.user_has_interest
         
         return render_template('gig_detail.html', gig=gig, user_has_interest=user_has_interest)
     finally:
@@ -785,7 +724,7 @@ def post_gig():
         db = SessionLocal()
         
         # Get institution
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         
         if not institution:
             flash('Please complete your institution profile first', 'warning')
@@ -831,7 +770,7 @@ def my_gigs():
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         
         if not institution:
             flash('Please complete your institution profile first', 'warning')
@@ -841,16 +780,15 @@ def my_gigs():
             joinedload(Job.assigned_professional).joinedload(Professional.user)
         ).filter(Job.institution_id == institution.id).order_by(desc(Job.created_at)).all()
         
-        # Add interest count and payment status
+        # Add payment status
+        payment_statuses = {}
+        if gigs:
+            for gig_id, payment_status in db.query(Payment.gig_id, Payment.status).filter(
+                Payment.gig_id.in_([gig.id for gig in gigs])
+            ).order_by(Payment.id).all():
+                payment_statuses.setdefault(gig_id, payment_status.value)
         for gig in gigs:
-            gig.interest_count = db.query(JobInterest).filter(JobInterest.job_id == gig.id).count()
-            
-            # Check payment status
-            payment = db.query(Payment).filter(Payment.gig_id == gig.id).first()
-            if payment:
-                gig.payment_status = payment.status.value
-            else:
-                gig.payment_status = None
+            gig.payment_status = payment_statuses.get(gig.id)
         
         # Stats
         stats = {
@@ -873,7 +811,7 @@ def complete_gig(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -892,16 +830,15 @@ def complete_gig(gig_id):
         
         gig.status = JobStatus.COMPLETED
         gig.updated_at = datetime.utcnow()
-        db.commit()
         
-        # Notify the professional
-        from app import socketio
+        # Notify the professional (emitted after commit)
         professional = db.query(Professional).filter(Professional.id == gig.assigned_professional_id).first()
         if professional:
-            socketio.emit('notification', {
+            enqueue_user_emit(db, professional.user_id, 'notification', {
                 'message': f'Gig "{gig.title}" has been marked as completed! Payment pending.',
                 'type': 'success'
-            }, room=f'user_{professional.user_id}')
+            })
+        db.commit()
         
         return jsonify({'message': 'Gig marked as completed successfully'}), 200
     except Exception as e:
@@ -923,7 +860,7 @@ def initiate_payment_web(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -951,7 +888,6 @@ def initiate_payment_web(gig_id):
             return jsonify({'error': 'Professional not found'}), 404
         
         professional_user = db.query(User).filter(User.id == professional.user_id).first()
-        user = db.query(User).filter(User.id == session['user_id']).first()
         
         # Use professional's phone number for payment
         professional_phone = professional.phone_number or "0700000000"
@@ -1029,7 +965,7 @@ def retry_payment_web(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -1052,7 +988,6 @@ def retry_payment_web(gig_id):
             return jsonify({'error': 'Professional not found'}), 404
         
         professional_user = db.query(User).filter(User.id == professional.user_id).first()
-        user = db.query(User).filter(User.id == session['user_id']).first()
         
         # Use professional's phone number for payment
         professional_phone = professional.phone_number or "0700000000"
@@ -1099,13 +1034,12 @@ def retry_payment_web(gig_id):
 def check_payment_status_web(gig_id):
     """Check payment status for a gig (session-based auth)"""
     from flask import jsonify
-    from app.services.pesapal import PesaPal
     from app.models.payment import Payment, TransactionStatus
     
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -1119,7 +1053,7 @@ def check_payment_status_web(gig_id):
         if not payment:
             return jsonify({'status': 'no_payment', 'message': 'No payment found'}), 200
         
-        # If already completed or failed, return cached status
+        # Settled by the IPN webhook or the background reconciler; this endpoint never calls PesaPal
         if payment.status in [TransactionStatus.COMPLETED, TransactionStatus.FAILED, TransactionStatus.CANCELLED]:
             return jsonify({
                 'status': payment.status.value,
@@ -1127,40 +1061,6 @@ def check_payment_status_web(gig_id):
                 'completed_at': payment.completed_at.isoformat() if payment.completed_at else None
             }), 200
         
-        # Check status with PesaPal
-        if payment.pesapal_order_tracking_id:
-            try:
-                pesapal = PesaPal()
-                status_response = pesapal.get_transaction_status(payment.pesapal_order_tracking_id)
-                
-                payment_status = status_response.get('payment_status_description', '').lower()
-                
-                if payment_status == 'completed':
-                    payment.status = TransactionStatus.COMPLETED
-                    payment.completed_at = datetime.utcnow()
-                    payment.pesapal_transaction_id = status_response.get('merchant_reference')
-                    payment.payment_method = status_response.get('payment_method')
-                    db.commit()
-                    
-                    return jsonify({
-                        'status': 'completed',
-                        'amount': payment.amount,
-                        'completed_at': payment.completed_at.isoformat()
-                    }), 200
-                    
-                elif payment_status == 'failed':
-                    payment.status = TransactionStatus.FAILED
-                    db.commit()
-                    return jsonify({'status': 'failed'}), 200
-                    
-                elif payment_status == 'cancelled':
-                    payment.status = TransactionStatus.CANCELLED
-                    db.commit()
-                    return jsonify({'status': 'cancelled'}), 200
-                    
-            except Exception as e:
-                print(f"Error checking payment status: {e}")
-        
         # Still pending
         return jsonify({'status': 'pending'}), 200
         
@@ -1178,7 +1078,7 @@ def close_gig(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -1211,7 +1111,7 @@ def delete_gig_api(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -1249,14 +1149,13 @@ def delete_gig_api(gig_id):
         
         # 4. Finally delete the gig
         db.delete(gig)
-        db.commit()
         
-        # Notify affected professionals
-        from app import socketio
+        # Notify affected professionals (emitted after commit)
         for user_id in set(interested_professionals_user_ids):  # Use set to avoid duplicates
-            socketio.emit('notification', {
+            enqueue_user_emit(db, user_id, 'notification', {
                 'message': f'The gig "{gig_title}" is no longer available.'
-            }, room=f'user_{user_id}')
+            })
+        db.commit()
         
         return jsonify({'message': 'Gig deleted successfully'}), 200
     except Exception as e:
@@ -1273,7 +1172,7 @@ def delete_gig(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         gig = db.query(Job).filter(Job.id == gig_id, Job.institution_id == institution.id).first()
         
         if not gig:
@@ -1300,7 +1199,7 @@ def view_interested(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         gig = db.query(Job).options(joinedload(Job.institution)).filter(
             Job.id == gig_id, 
             Job.institution_id == institution.id
@@ -1324,7 +1223,7 @@ def view_interested(gig_id):
 def assign_gig_web(gig_id, professional_id):
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
 
@@ -1363,7 +1262,7 @@ def express_interest(gig_id):
     try:
         logger.info(f"Professional {session.get('user_id')} expressing interest in job {gig_id}")
         
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         
         if not professional:
             logger.warning(f"Professional profile not found for user {session.get('user_id')}")
@@ -1394,6 +1293,7 @@ def express_interest(gig_id):
             professional_id=professional.id
         )
         db.add(interest)
+        record_interest_transition(db, gig_id, None, InterestStatus.PENDING)
         db.flush()  # Flush to get the interest.id without committing
         
         # Create notification for institution - NOW interest.id exists
@@ -1405,37 +1305,18 @@ def express_interest(gig_id):
             role_context='institution'  # This notification is for institution role
         )
         db.add(notification)
+        db.flush()  # Assigns notification.id and created_at for the real-time payload
+        
+        # Queue the real-time notification in the same transaction; it is emitted after commit.
+        # Building it loads the professional's documents, so skip it when nobody is connected.
+        institution_id = gig.institution.id
+        if is_room_online(f'institution_{institution_id}'):
+            # Get professional documents
+            from app.services.notification_feed import load_professional_documents
+            documents = load_professional_documents(db, [professional.id])[professional.id]
+            cv_doc = documents['cv']
+            certificates = documents['certificates']
         
-        # COMMIT BEFORE EMITTING
-        db.commit()
-        db.refresh(interest)
-        db.refresh(notification)
-        
-        logger.info(f"Interest {interest.id} created, notification {notification.id} saved")
-        
-        # Get professional documents
-        from app.models.document import Document, DocumentType
-        cv_doc = db.query(Document).filter(
-            Document.professional_id == professional.id,
-            Document.document_type == DocumentType.CV
-        ).first()
-        
-        certificates = db.query(Document).filter(
-            Document.professional_id == professional.id,
-            Document.document_type == DocumentType.CERTIFICATE
-        ).all()
-        
-        logger.info(f"CV Document found: {cv_doc is not None}")
-        if cv_doc:
-            logger.info(f"CV: {cv_doc.file_name}, Size: {cv_doc.file_size}")
-        logger.info(f"Certificates found: {len(certificates)}")
-        for cert in certificates:
-            logger.info(f"Certificate: {cert.file_name}, Size: {cert.file_size}")
-        
-        # Send real-time notification via Socket.IO AFTER commit
-        try:
-            from app.sockets import send_interest_notification
-            institution_id = gig.institution.id
             notification_data = {
                 'notification_id': notification.id,
                 'job_interest_id': interest.id,
@@ -1483,23 +1364,17 @@ def express_interest(gig_id):
                     ]
                 }
             }
-            
-            # Log the complete notification data being sent
-            logger.info("=== NOTIFICATION DATA BEING SENT ===")
-            logger.info(f"Profile data: {notification_data.get('profile', {})}")
-            logger.info(f"Documents data: {notification_data.get('documents', {})}")
-            logger.info(f"CV in notification: {notification_data['documents']['cv']}")
-            logger.info(f"Certificates count in notification: {len(notification_data['documents']['certificates'])}")
-            
-            send_interest_notification(institution_id, notification_data)
-            logger.info("Socket.IO notification sent successfully")
-        except Exception as socket_error:
-            logger.error(f"Socket.IO emission failed: {socket_error}", exc_info=True)
+            enqueue_emit(db, 'job_interest_sent', notification_data, f'institution_{institution_id}')
+        
+        interest_id, notification_id = interest.id, notification.id
+        db.commit()
+        
+        logger.info(f"Interest {interest_id} created, notification {notification_id} saved")
         
         return jsonify({
             'success': True,
             'message': 'Interest submitted successfully',
-            'interest_id': interest.id
+            'interest_id': interest_id
         }), 200
         
     except Exception as e:
@@ -1518,7 +1393,7 @@ def my_assignments():
     db = SessionLocal()
     
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         
         if not professional:
             flash('Please complete your professional profile first', 'warning')
@@ -1724,6 +1599,7 @@ def update_profile():
     
     db.commit()
     db.close()
+    clear_request_identity(session['user_id'])
     
     flash('Profile updated successfully!', 'success')
     return redirect(url_for('web.profile'))
@@ -1731,68 +1607,29 @@ def update_profile():
 # ===== Other Routes =====
 
 
+NOTIFICATIONS_PER_PAGE = 25
 
 
 @web_blueprint.route('/notifications')
 @login_required
 def notifications():
-    """Display notifications filtered by active role"""
-    from sqlalchemy.orm import joinedload
-    from app.models.document import Document, DocumentType
+    """Display notifications filtered by active role, one page at a time"""
+    from app.services.notification_feed import load_notification_feed
     db = SessionLocal()
     try:
         active_role = session.get('active_role')
         if not active_role and 'user_id' in session:
-            user = db.query(User).filter(User.id == session['user_id']).first()
-            active_role = user.role.value if user else None
-        
-        # Filter notifications by active role
-        user_notifications = db.query(Notification).options(
-            joinedload(Notification.job_interest).joinedload(JobInterest.job),
-            joinedload(Notification.job_interest).joinedload(JobInterest.professional)
-        ).filter(
-            Notification.user_id == session['user_id'],
-            or_(
-                Notification.role_context == active_role,
-                Notification.role_context == None  # Include notifications for all roles
-            )
-        ).order_by(desc(Notification.created_at)).all()
-        
-        # Enrich notifications with professional profile and documents
-        notifications_data = []
-        for notif in user_notifications:
-            notif_data = {
-                'notification': notif,
-                'profile': None,
-                'documents': {'cv': None, 'certificates': []},
-                'is_verified': False
-            }
-            
-            # If this is a job interest notification, get professional data
-            if notif.job_interest_id and notif.job_interest and notif.job_interest.professional:
-                professional = notif.job_interest.professional
-                notif_data['profile'] = professional
+            identity = get_request_identity()
+            active_role = identity.legacy_role if identity else None
 
-                requires_registration = (professional.profession_category in ['Health', 'Formal']) if professional.profession_category else False
-                notif_data['is_verified'] = bool(requires_registration and professional.registration_number and professional.issuing_body)
-                
-                # Get CV
-                cv_doc = db.query(Document).filter(
-                    Document.professional_id == professional.id,
-                    Document.document_type == DocumentType.CV
-                ).first()
-                notif_data['documents']['cv'] = cv_doc
-                
-                # Get certificates
-                certificates = db.query(Document).filter(
-                    Document.professional_id == professional.id,
-                    Document.document_type == DocumentType.CERTIFICATE
-                ).all()
-                notif_data['documents']['certificates'] = certificates
-            
-            notifications_data.append(notif_data)
-        
-        return render_template('notifications.html', notifications_data=notifications_data)
+        # Notifications enriched with professional profile and documents (prefetched per page)
+        try:
+            page = load_notification_feed(db, session['user_id'], active_role,
+                                          cursor=request.args.get('cursor'), per_page=NOTIFICATIONS_PER_PAGE)
+        except InvalidCursor:
+            return redirect(url_for('web.notifications'))
+
+        return render_template('notifications.html', notifications_data=page.items, pagination=page)
     finally:
         db.close()
 
@@ -1804,38 +1641,52 @@ def payments_history():
     from sqlalchemy.orm import joinedload
 
     try:
-        user = db.query(User).filter(User.id == session['user_id']).first()
+        identity = get_request_identity()
+        user = identity.user if identity else None
 
         active_role = session.get('active_role', user.role.value if user else None)
 
         payments = []
-        payment_query = db.query(Payment).options(
-            joinedload(Payment.gig),
-            joinedload(Payment.institution),
-            joinedload(Payment.professional).joinedload(Professional.user)
-        )
+        page = None
+        stats = {'total_payments': 0, 'completed': 0, 'pending': 0, 'total_amount': 0}
+        owner_filter = None
 
         if user and active_role == 'professional':
-            professional = db.query(Professional).filter(Professional.user_id == user.id).first()
+            professional = get_current_professional()
             if professional:
-                payments = payment_query.filter(
-                    Payment.professional_id == professional.id
-                ).order_by(desc(Payment.created_at)).all()
+                owner_filter = Payment.professional_id == professional.id
         elif user and active_role == 'institution':
-            institution = db.query(Institution).filter(Institution.user_id == user.id).first()
+            institution = get_current_institution()
             if institution:
-                payments = payment_query.filter(
-                    Payment.institution_id == institution.id
-                ).order_by(desc(Payment.created_at)).all()
-
-        stats = {
-            'total_payments': len(payments),
-            'completed': len([p for p in payments if p.status == TransactionStatus.COMPLETED]),
-            'pending': len([p for p in payments if p.status == TransactionStatus.PENDING]),
-            'total_amount': sum(p.amount for p in payments if p.status == TransactionStatus.COMPLETED)
-        }
+                owner_filter = Payment.institution_id == institution.id
+
+        if owner_filter is not None:
+            payment_query = db.query(Payment).options(
+                joinedload(Payment.gig),
+                joinedload(Payment.institution),
+                joinedload(Payment.professional).joinedload(Professional.user)
+            ).filter(owner_filter)
+            try:
+                page = paginate_keyset(payment_query, [(Payment.id, True)], request.args.get('cursor'), 25)
+            except InvalidCursor:
+                return redirect(url_for('web.payments_history'))
+            payments = page.items
+
+            # Totals over every payment, not just the visible page
+            total_payments, completed, pending, total_amount = db.query(
+                func.count(Payment.id),
+                func.sum(case((Payment.status == TransactionStatus.COMPLETED, 1), else_=0)),
+                func.sum(case((Payment.status == TransactionStatus.PENDING, 1), else_=0)),
+                func.sum(case((Payment.status == TransactionStatus.COMPLETED, Payment.amount), else_=0))
+            ).filter(owner_filter).first()
+            stats = {
+                'total_payments': total_payments or 0,
+                'completed': completed or 0,
+                'pending': pending or 0,
+                'total_amount': total_amount or 0
+            }
 
-        return render_template('payments.html', payments=payments, stats=stats)
+        return render_template('payments.html', payments=payments, stats=stats, pagination=page)
     finally:
         db.close()
 
@@ -1856,8 +1707,8 @@ def payment_detail(payment_id):
             return redirect(url_for('web.payments_history'))
         
         # Verify user has access
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        institution = get_current_institution()
+        professional = get_current_professional()
         
         if not ((institution and payment.institution_id == institution.id) or 
                 (professional and payment.professional_id == professional.id)):
@@ -1875,7 +1726,7 @@ def initiate_payment_page(gig_id):
     """Web route for payment initiation page"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -1935,7 +1786,7 @@ def complete_job(gig_id):
     """Professional marks job as complete"""
     db = SessionLocal()
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             flash('Professional profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -2068,102 +1919,40 @@ def admin_dashboard():
     """Admin dashboard with comprehensive analytics"""
     db = SessionLocal()
     try:
-        from datetime import timedelta
         from sqlalchemy.orm import joinedload
         
-        # Get comprehensive analytics
-        total_users = db.query(User).count()
-        total_professionals = db.query(Professional).count()
-        total_institutions = db.query(Institution).count()
-        total_jobs = db.query(Job).count()
-        open_jobs = db.query(Job).filter(Job.status == JobStatus.OPEN).count()
-        assigned_jobs = db.query(Job).filter(Job.status == JobStatus.ASSIGNED).count()
-        completed_jobs = db.query(Job).filter(Job.status == JobStatus.COMPLETED).count()
-        
-        total_payments = db.query(Payment).count()
-        completed_payments = db.query(Payment).filter(Payment.status == TransactionStatus.COMPLETED).count()
-        pending_payments = db.query(Payment).filter(Payment.status == TransactionStatus.PENDING).count()
-        total_revenue = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.COMPLETED
-        ).scalar() or 0
-        
-        pending_documents = db.query(Document).filter(Document.status == DocumentStatus.PENDING).count()
-        approved_documents = db.query(Document).filter(Document.status == DocumentStatus.APPROVED).count()
-        rejected_documents = db.query(Document).filter(Document.status == DocumentStatus.REJECTED).count()
-        
-        # Top institutions
-        top_institutions = db.query(
-            Institution.id,
-            Institution.institution_name,
-            func.count(Job.id).label('gig_count')
-        ).join(Job).group_by(Institution.id, Institution.institution_name).order_by(
-            func.count(Job.id).desc()
-        ).limit(5).all()
-        
-        # Top professionals
-        top_professionals = db.query(
-            Professional.id,
-            Professional.full_name,
-            func.count(Job.id).label('hire_count')
-        ).join(Job, Job.assigned_professional_id == Professional.id).filter(
-            Job.status.in_([JobStatus.ASSIGNED, JobStatus.COMPLETED])
-        ).group_by(Professional.id, Professional.full_name).order_by(
-            func.count(Job.id).desc()
-        ).limit(5).all()
-        
-        # Daily revenue (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        daily_revenue = db.query(
-            func.date(Payment.completed_at).label('date'),
-            func.sum(Payment.amount).label('revenue')
-        ).filter(
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= thirty_days_ago
-        ).group_by(func.date(Payment.completed_at)).order_by(func.date(Payment.completed_at)).all()
-        
-        # Pending payments amount
-        pending_payment_amount = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == TransactionStatus.PENDING
-        ).scalar() or 0
+        user_stats = admin_analytics_service.user_breakdown(db)
+        gig_stats = admin_analytics_service.job_breakdown(db)
+        payment_stats = admin_analytics_service.payment_breakdown(db)
+        document_stats = admin_analytics_service.document_breakdown(db)
         
         analytics = {
             'users': {
-                'total': total_users,
-                'professionals': total_professionals,
-                'institutions': total_institutions
+                'total': user_stats['total'],
+                'professionals': user_stats['professionals'],
+                'institutions': user_stats['institutions']
             },
             'gigs': {
-                'total': total_jobs,
-                'open': open_jobs,
-                'assigned': assigned_jobs,
-                'completed': completed_jobs
+                'total': gig_stats['total'],
+                'open': gig_stats['open'],
+                'assigned': gig_stats['assigned'],
+                'completed': gig_stats['completed']
             },
             'payments': {
-                'total': total_payments,
-                'completed': completed_payments,
-                'pending': pending_payments,
-                'total_revenue': total_revenue,
-                'pending_amount': pending_payment_amount
+                'total': payment_stats['total'],
+                'completed': payment_stats['completed'],
+                'pending': payment_stats['pending'],
+                'total_revenue': payment_stats['revenue'],
+                'pending_amount': payment_stats['pending_amount']
             },
             'documents': {
-                'pending': pending_documents,
-                'approved': approved_documents,
-                'rejected': rejected_documents
+                'pending': document_stats['pending'],
+                'approved': document_stats['approved'],
+                'rejected': document_stats['rejected']
             },
-            'top_institutions': [{
-                'id': inst.id,
-                'name': inst.institution_name,
-                'gig_count': inst.gig_count
-            } for inst in top_institutions],
-            'top_professionals': [{
-                'id': prof.id,
-                'name': prof.full_name,
-                'hire_count': prof.hire_count
-            } for prof in top_professionals],
-            'daily_revenue': [{
-                'date': str(dr.date),
-                'revenue': float(dr.revenue)
-            } for dr in daily_revenue]
+            'top_institutions': admin_analytics_service.top_institutions(db),
+            'top_professionals': admin_analytics_service.top_professionals(db),
+            'daily_revenue': admin_analytics_service.daily_revenue(db, days=30)
         }
 
         # Tab data for server-rendered admin dashboard (avoid JWT-only API calls)
@@ -2399,7 +2188,11 @@ def delete_account():
             professional = db.query(Professional).filter(Professional.user_id == user.id).first()
             if professional:
                 # Delete job interests
+                affected_job_ids = [job_id for (job_id,) in db.query(JobInterest.job_id).filter(
+                    JobInterest.professional_id == professional.id
+                ).all()]
                 db.query(JobInterest).filter(JobInterest.professional_id == professional.id).delete()
+                reconcile_interest_counts(db, affected_job_ids)
                 # Delete professional profile
                 db.delete(professional)
         
@@ -2419,7 +2212,8 @@ def delete_account():
         # Delete notifications
         db.query(Notification).filter(Notification.user_id == user.id).delete()
         
-        # Delete messages (sent and received)
+        # Delete messages (sent and received) and the conversations built from them
+        delete_user_conversations(db, user.id)
         db.query(Message).filter(
             (Message.sender_id == user.id) | (Message.receiver_id == user.id)
         ).delete()
@@ -2470,7 +2264,7 @@ def professional_interested_page():
     """Render professional interested page"""
     db = SessionLocal()
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             flash('Professional profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -2495,7 +2289,7 @@ def show_job_interest(job_id):
         logger.info(f"Professional {session.get('user_id')} showing interest in job {job_id}")
         
         # Get professional
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             logger.error(f"Professional profile not found for user {session.get('user_id')}")
             return jsonify({'error': 'Professional profile not found'}), 404
@@ -2528,6 +2322,7 @@ def show_job_interest(job_id):
             status=InterestStatus.PENDING
         )
         db.add(interest)
+        record_interest_transition(db, job_id, None, InterestStatus.PENDING)
         db.flush()
         
         # Create notification for institution with professional name and timestamp
@@ -2538,7 +2333,7 @@ def show_job_interest(job_id):
             return jsonify({'error': 'Institution not found'}), 404
         
         # Get username or fallback to full name
-        prof_username = professional.user.username if professional.user.username else professional.full_name
+        prof_username = get_request_identity().user.username or professional.full_name
         notification = Notification(
             user_id=institution_user.id,
             title=f"New Interest in Your Gig",
@@ -2547,44 +2342,35 @@ def show_job_interest(job_id):
             role_context='institution'  # This notification is for institution role
         )
         db.add(notification)
+        db.flush()  # Assigns notification.id and created_at for the real-time payload
         
-        # COMMIT BEFORE EMITTING
+        # Queue the real-time notification; it is emitted after commit
+        institution_id = job.institution.id
+        notification_data = {
+            'notification_id': notification.id,
+            'job_interest_id': interest.id,
+            'professional_id': professional.id,
+            'professional_name': professional.full_name,
+            'job_id': job.id,
+            'job_title': job.title,
+            'institution_id': institution_id,
+            'status': 'pending',
+            'message': notification.message,
+            'timestamp': notification.created_at.isoformat()
+        }
+        if is_room_online(f'institution_{institution_id}'):
+            enqueue_emit(db, 'job_interest_sent', notification_data, f'institution_{institution_id}')
+        
+        interest_id, notification_id = interest.id, notification.id
         db.commit()
-        db.refresh(notification)
-        db.refresh(interest)
         
-        logger.info(f"Interest {interest.id} created, notification {notification.id} saved")
-        
-        # Send real-time notification via Socket.IO AFTER commit
-        try:
-            from app.sockets import send_interest_notification
-            institution_id = job.institution.id
-            
-            notification_data = {
-                'notification_id': notification.id,
-                'job_interest_id': interest.id,
-                'professional_id': professional.id,
-                'professional_name': professional.full_name,
-                'job_id': job.id,
-                'job_title': job.title,
-                'institution_id': institution_id,
-                'status': 'pending',
-                'message': notification.message,
-                'timestamp': notification.created_at.isoformat()
-            }
-            
-            logger.info(f"Emitting notification to institution {institution_id}: {notification_data}")
-            send_interest_notification(institution_id, notification_data)
-            logger.info(f"Socket.IO notification sent successfully")
-        except Exception as socket_error:
-            # Log but don't fail the request if Socket.IO fails
-            logger.error(f"Socket.IO emission failed: {socket_error}", exc_info=True)
+        logger.info(f"Interest {interest_id} created, notification {notification_id} saved")
         
         # ALWAYS return success response
         return jsonify({
             'success': True,
             'message': 'Interest submitted successfully',
-            'interest_id': interest.id
+            'interest_id': interest_id
         }), 200
         
     except Exception as e:
@@ -2608,7 +2394,7 @@ def accept_interest(interest_id):
     
     try:
         # Get institution
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -2634,42 +2420,31 @@ def accept_interest(interest_id):
         job.assigned_professional_id = interest.professional_id
         job.status = JobStatus.ACCEPTED
         
-        # Decline all other pending interests for this job
-        other_interests = db.query(JobInterest).filter(
-            JobInterest.job_id == job.id,
-            JobInterest.id != interest_id,
-            JobInterest.status == InterestStatus.PENDING
-        ).all()
+        record_interest_transition(db, job.id, InterestStatus.PENDING, InterestStatus.ACCEPTED)
         
-        for other_interest in other_interests:
-            other_interest.status = InterestStatus.DECLINED
-            other_interest.updated_at = datetime.utcnow()
-            
-            # Notify declined professionals
-            declined_user = db.query(User).filter(
-                User.id == other_interest.professional.user_id
-            ).first()
-            declined_notification = Notification(
-                user_id=declined_user.id,
-                title="Interest Declined",
-                message=f"Your interest in the gig '{job.title}' has been DECLINED.",
-                role_context='professional',  # This notification is for professional role
-                job_interest_id=other_interest.id
-            )
-            db.add(declined_notification)
-            db.flush()
-            
-            # Send real-time notification to declined professional
-            from app.sockets import send_rejection_notification
-            send_rejection_notification(declined_user.id, {
-                'notification_id': declined_notification.id,
+        # Decline all other pending interests for this job with set-based statements
+        declined_at = datetime.utcnow()
+        declined = decline_pending_interests(
+            db, job.id, interest_id,
+            title="Interest Declined",
+            message=f"Your interest in the gig '{job.title}' has been DECLINED.",
+            role_context='professional',  # These notifications are for professional role
+            now=declined_at
+        )
+        
+        # Queue one batch of real-time notifications for the declined professionals who are connected
+        online = online_users(d.user_id for d in declined)
+        if online:
+            rejected_data = {
                 'institution_name': job.institution.institution_name,
                 'job_title': job.title,
                 'job_id': job.id,
                 'decision': 'Rejected',
-                'timestamp': declined_notification.created_at.strftime('%b %d, %Y at %I:%M %p'),
-                'message': declined_notification.message
-            })
+                'timestamp': declined_at.strftime('%b %d, %Y at %I:%M %p'),
+                'message': f"Your interest in the gig '{job.title}' has been DECLINED."
+            }
+            enqueue_many(db, (('interest_rejected', dict(rejected_data, notification_id=d.notification_id),
+                               f'user_{d.user_id}') for d in declined if d.user_id in online))
         
         # Create automatic welcome message from institution to professional
         from app.models.message import Message, MessageStatus
@@ -2691,6 +2466,7 @@ def accept_interest(interest_id):
         )
         db.add(welcome_message)
         db.flush()
+        record_message(db, welcome_message)
         
         # Notify accepted professional with chat link
         accepted_notification = Notification(
@@ -2701,14 +2477,10 @@ def accept_interest(interest_id):
             job_interest_id=interest.id
         )
         db.add(accepted_notification)
+        db.flush()
         
-        db.commit()
-        db.refresh(accepted_notification)
-        db.refresh(welcome_message)
-        
-        # Send real-time notification to accepted professional
-        from app.sockets import send_acceptance_notification, send_message_notification
-        send_acceptance_notification(accepted_user.id, {
+        # Queue real-time notifications to the accepted professional
+        enqueue_user_emit(db, accepted_user.id, 'interest_accepted', {
             'notification_id': accepted_notification.id,
             'institution_name': job.institution.institution_name,
             'job_title': job.title,
@@ -2718,9 +2490,7 @@ def accept_interest(interest_id):
             'message': accepted_notification.message,
             'chat_url': f'/messages/conversation/{institution_user.id}'
         })
-        
-        # Send real-time message notification
-        send_message_notification(accepted_user.id, {
+        enqueue_user_emit(db, accepted_user.id, 'new_message', {
             'message_id': welcome_message.id,
             'sender_id': institution_user.id,
             'content': welcome_message.content,
@@ -2728,10 +2498,13 @@ def accept_interest(interest_id):
             'job_id': job.id
         })
         
+        accepted_user_id = accepted_user.id
+        db.commit()
+        
         return jsonify({
             'success': True,
             'message': 'Interest accepted successfully',
-            'chat_url': f'/messages/conversation/{accepted_user.id}'
+            'chat_url': f'/messages/conversation/{accepted_user_id}'
         })
     finally:
         db.close()
@@ -2747,7 +2520,7 @@ def decline_interest(interest_id):
     
     try:
         # Get institution
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -2768,6 +2541,7 @@ def decline_interest(interest_id):
         # Decline the interest
         interest.status = InterestStatus.DECLINED
         interest.updated_at = datetime.utcnow()
+        record_interest_transition(db, job.id, InterestStatus.PENDING, InterestStatus.DECLINED)
         
         # Notify professional
         professional_user = db.query(User).filter(
@@ -2781,13 +2555,10 @@ def decline_interest(interest_id):
             role_context='professional'  # This notification is for professional role
         )
         db.add(notification)
+        db.flush()
         
-        db.commit()
-        db.refresh(notification)
-        
-        # Send real-time notification to professional
-        from app.sockets import send_rejection_notification
-        send_rejection_notification(professional_user.id, {
+        # Queue real-time notification to professional; emitted after commit
+        enqueue_user_emit(db, professional_user.id, 'interest_rejected', {
             'notification_id': notification.id,
             'institution_name': job.institution.institution_name,
             'job_title': job.title,
@@ -2796,6 +2567,7 @@ def decline_interest(interest_id):
             'timestamp': notification.created_at.strftime('%b %d, %Y at %I:%M %p'),
             'message': notification.message
         })
+        db.commit()
         
         return jsonify({
             'success': True,
@@ -2814,7 +2586,7 @@ def cancel_interest(job_id):
     db = SessionLocal()
     
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             return jsonify({'error': 'Professional profile not found'}), 404
         
@@ -2836,7 +2608,7 @@ def cancel_interest(job_id):
         
         # Create notification for institution about cancellation
         # Get username or fallback to full name
-        prof_username = professional.user.username if professional.user.username else professional.full_name
+        prof_username = get_request_identity().user.username or professional.full_name
         notification = Notification(
             user_id=institution_user_id,
             title="Interest Withdrawn",
@@ -2846,14 +2618,14 @@ def cancel_interest(job_id):
         )
         db.add(notification)
         
+        record_interest_transition(db, job.id, interest.status, None)
         db.delete(interest)
-        db.commit()
         
-        # Notify institution via Socket.IO
-        from app import socketio
-        socketio.emit('notification', {
+        # Notify institution via Socket.IO (emitted after commit)
+        enqueue_user_emit(db, institution_user_id, 'notification', {
             'message': f'{prof_username} has withdrawn their interest in {job.title}'
-        }, room=f'user_{institution_user_id}')
+        })
+        db.commit()
         
         return jsonify({'message': 'Interest canceled successfully'}), 200
     except Exception as e:
@@ -2866,36 +2638,24 @@ def cancel_interest(job_id):
 @web_blueprint.route('/api/notifications')
 @login_required
 def get_notifications():
-    """Get notifications for current user"""
+    """Get a page of notifications for current user plus the overall unread count"""
     from flask import jsonify
+    from app.services.notification_feed import load_notification_feed, count_unread, serialize_notification
     db = SessionLocal()
     
     try:
-        from sqlalchemy.orm import joinedload
+        cursor, limit = page_args(request.args, default_limit=50, max_limit=100)
+        try:
+            page = load_notification_feed(db, session['user_id'], cursor=cursor, per_page=limit,
+                                          with_documents=False)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
 
-        notifications = db.query(Notification).options(
-            joinedload(Notification.job_interest)
-        ).filter(
-            Notification.user_id == session['user_id']
-        ).order_by(desc(Notification.created_at)).limit(50).all()
-        
-        result = []
-        for notif in notifications:
-            notif_data = {
-                'id': notif.id,
-                'title': notif.title,
-                'message': notif.message,
-                'is_read': notif.is_read,
-                'created_at': notif.created_at.isoformat()
-            }
-            
-            # Add job interest details if available
-            if notif.job_interest_id:
-                notif_data['job_interest_id'] = notif.job_interest_id
-            
-            result.append(notif_data)
-        
-        return jsonify(result)
+        return jsonify({
+            'notifications': [serialize_notification(item['notification']) for item in page.items],
+            'unread_count': count_unread(db, session['user_id']),
+            'pagination': page.to_dict()
+        })
     finally:
         db.close()
 
@@ -2909,8 +2669,8 @@ def mark_all_notifications_read():
     try:
         active_role = session.get('active_role')
         if not active_role and 'user_id' in session:
-            user = db.query(User).filter(User.id == session['user_id']).first()
-            active_role = user.role.value if user else None
+            identity = get_request_identity()
+            active_role = identity.legacy_role if identity else None
         
         # Update all unread notifications for this user and role
         updated = db.query(Notification).filter(
@@ -3092,10 +2852,9 @@ def professional_interested_jobs(professional_id):
 def professional_earnings():
     """Professional Earnings and Payment History Page"""
     from sqlalchemy.orm import joinedload
-    from datetime import datetime, timedelta
     db = SessionLocal()
     try:
-        professional = db.query(Professional).filter(Professional.user_id == session['user_id']).first()
+        professional = get_current_professional()
         if not professional:
             flash('Professional profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -3108,65 +2867,18 @@ def professional_earnings():
             Payment.professional_id == professional.id
         ).order_by(desc(Payment.created_at)).all()
         
-        # Calculate totals
-        total_earnings = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED
-        ).scalar() or 0
-        
-        pending_amount = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.PENDING
-        ).scalar() or 0
-        
-        completed_count = db.query(Payment).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED
-        ).count()
-        
-        pending_count = db.query(Payment).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.PENDING
-        ).count()
-        
-        # Monthly earnings (this month)
-        now = datetime.utcnow()
-        first_day_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        monthly_earnings = db.query(func.sum(Payment.amount)).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= first_day_of_month
-        ).scalar() or 0
-        
-        monthly_count = db.query(Payment).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= first_day_of_month
-        ).count()
-        
-        # Monthly trend (last 6 months)
-        six_months_ago = now - timedelta(days=180)
-        monthly_data = db.query(
-            func.strftime('%Y-%m', Payment.completed_at).label('month'),
-            func.sum(Payment.amount).label('amount')
-        ).filter(
-            Payment.professional_id == professional.id,
-            Payment.status == TransactionStatus.COMPLETED,
-            Payment.completed_at >= six_months_ago
-        ).group_by('month').order_by('month').all()
-        
-        monthly_trend = [{'month': m.month, 'amount': float(m.amount)} for m in monthly_data]
+        # Totals, this month and the 6-month trend from one cached aggregate
+        summary = earnings_service.earnings_summary(db, professional.id)
         
         return render_template('professional_earnings.html',
                              payments=payments,
-                             total_earnings=total_earnings,
-                             pending_amount=pending_amount,
-                             completed_count=completed_count,
-                             pending_count=pending_count,
-                             monthly_earnings=monthly_earnings,
-                             monthly_count=monthly_count,
-                             monthly_trend=monthly_trend)
+                             total_earnings=summary['total_earnings'],
+                             pending_amount=summary['pending_amount'],
+                             completed_count=summary['completed_count'],
+                             pending_count=summary['pending_count'],
+                             monthly_earnings=summary['monthly_earnings'],
+                             monthly_count=summary['monthly_count'],
+                             monthly_trend=summary['monthly_trend'])
     finally:
         db.close()
 
@@ -3215,7 +2927,7 @@ def edit_gig(gig_id):
     db = SessionLocal()
     
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.my_gigs'))
@@ -3342,7 +3054,7 @@ def respond_to_gig_interest(interest_id, action):
         
         # 4a. Ensure interest belongs to Institution
         job = interest.job
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution profile not found'}), 404
         
@@ -3369,27 +3081,17 @@ def respond_to_gig_interest(interest_id, action):
             job.assigned_professional_id = interest.professional_id
             decision = 'accepted'
             
-            # Reject all other pending interests for this job
-            other_interests = db.query(JobInterest).filter(
-                JobInterest.job_id == job.id,
-                JobInterest.id != interest_id,
-                JobInterest.status == InterestStatus.PENDING
-            ).all()
+            record_interest_transition(db, job.id, InterestStatus.PENDING, InterestStatus.ACCEPTED)
             
-            for other in other_interests:
-                other.status = InterestStatus.DECLINED
-                other.updated_at = datetime.utcnow()
-                
-                # Create notification for rejected professional
-                rejected_notif = Notification(
-                    user_id=other.professional.user_id,
-                    title="Interest Rejected",
-                    message=f"Your interest in '{gig_title}' was rejected. The position has been filled.",
-                    job_interest_id=other.id
-                )
-                db.add(rejected_notif)
+            # Reject all other pending interests for this job and notify those professionals
+            decline_pending_interests(
+                db, job.id, interest_id,
+                title="Interest Rejected",
+                message=f"Your interest in '{gig_title}' was rejected. The position has been filled."
+            )
         else:  # reject
             interest.status = InterestStatus.DECLINED
+            record_interest_transition(db, job.id, InterestStatus.PENDING, InterestStatus.DECLINED)
             decision = 'rejected'
         
         interest.updated_at = datetime.utcnow()
@@ -3406,35 +3108,22 @@ def respond_to_gig_interest(interest_id, action):
         )
         db.add(professional_notification)
         
+        # Queue Socket.IO notifications to the professional; emitted only if the commit succeeds
+        decision_data = {
+            'gig_id': job.id,
+            'gig_title': gig_title,
+            'decision': decision,
+            'institution_name': institution_name,
+            'interest_id': interest_id,
+            'message': notif_message
+        }
+        enqueue_emit(db, 'interest_decision', decision_data, f'professional_{interest.professional_id}')
+        # Also emit to user room for broader compatibility
+        enqueue_user_emit(db, professional_user_id, 'interest_decision', decision_data)
+        
         # 6. Commit DB transaction
         db.commit()
         
-        # AFTER commit - emit Socket.IO notification to professional
-        try:
-            from app import socketio
-            socketio.emit('interest_decision', {
-                'gig_id': job.id,
-                'gig_title': gig_title,
-                'decision': decision,
-                'institution_name': institution_name,
-                'interest_id': interest_id,
-                'message': notif_message
-            }, room=f'professional_{interest.professional_id}')
-            
-            # Also emit to user room for broader compatibility
-            socketio.emit('interest_decision', {
-                'gig_id': job.id,
-                'gig_title': gig_title,
-                'decision': decision,
-                'institution_name': institution_name,
-                'interest_id': interest_id,
-                'message': notif_message
-            }, room=f'user_{professional_user_id}')
-        except Exception as socket_error:
-            # Log but don't fail - DB is already committed
-            import logging
-            logging.error(f"Socket.IO emission failed: {socket_error}")
-        
         # Build response
         response_data = {
             'success': True,
@@ -3480,7 +3169,7 @@ def institution_dashboard():
     """Institution Admin Dashboard - Overview with KPI metrics"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -3496,19 +3185,18 @@ def institution_dashboard():
             Job.status.in_([JobStatus.CLOSED, JobStatus.COMPLETED])
         ).count()
         
-        # Interest metrics
-        all_interests = db.query(JobInterest).join(Job).filter(
-            Job.institution_id == institution.id
-        ).all()
-        
-        pending_interests = sum(1 for i in all_interests if i.status == InterestStatus.PENDING)
-        accepted_interests = sum(1 for i in all_interests if i.status == InterestStatus.ACCEPTED)
-        rejected_interests = sum(1 for i in all_interests if i.status == InterestStatus.DECLINED)
+        # Interest metrics from the denormalized job counters
+        total_interests, pending_interests, accepted_interests = db.query(
+            func.coalesce(func.sum(Job.interest_count), 0),
+            func.coalesce(func.sum(Job.pending_interest_count), 0),
+            func.coalesce(func.sum(Job.accepted_interest_count), 0)
+        ).filter(Job.institution_id == institution.id).first()
+        rejected_interests = total_interests - pending_interests - accepted_interests
         
         # Calculate rates with proper zero checks
         total_responded = accepted_interests + rejected_interests
         accept_rate = round((accepted_interests / total_responded * 100), 1) if total_responded > 0 else 0
-        response_rate = round((total_responded / len(all_interests) * 100), 1) if len(all_interests) > 0 else 0
+        response_rate = round((total_responded / total_interests * 100), 1) if total_interests > 0 else 0
         
         # Total unique professionals
         total_professionals = db.query(func.count(func.distinct(JobInterest.professional_id))).join(Job).filter(
@@ -3552,14 +3240,11 @@ def institution_dashboard():
         ).order_by(desc(JobInterest.created_at)).limit(5).all()
         
         # Top performing gigs
-        top_gigs = db.query(
-            Job,
-            func.count(JobInterest.id).label('interest_count')
-        ).outerjoin(JobInterest).filter(
+        top_gigs = db.query(Job).filter(
             Job.institution_id == institution.id
-        ).group_by(Job.id).order_by(desc('interest_count')).limit(5).all()
+        ).order_by(desc(Job.interest_count)).limit(5).all()
         
-        top_gigs_list = [{'title': job.title, 'status': job.status, 'interest_count': count} for job, count in top_gigs]
+        top_gigs_list = [{'title': job.title, 'status': job.status, 'interest_count': job.interest_count} for job in top_gigs]
         
         # Get unread notification count for sidebar badge
         unread_notifications = db.query(Notification).filter(
@@ -3597,38 +3282,35 @@ def institution_analytics():
     """Institution Analytics Section"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
         
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        # Interest trends
-        interests_by_day = db.query(
-            func.date(JobInterest.created_at).label('date'),
-            func.count(JobInterest.id).label('count')
-        ).join(Job).filter(
-            Job.institution_id == institution.id,
-            JobInterest.created_at >= thirty_days_ago
-        ).group_by(func.date(JobInterest.created_at)).all()
-        
-        # Status counts
-        status_counts = db.query(
-            JobInterest.status,
-            func.count(JobInterest.id).label('count')
-        ).join(Job).filter(
-            Job.institution_id == institution.id
-        ).group_by(JobInterest.status).all()
+        # Interest trends (last 30 days) from the daily rollups
+        today = datetime.utcnow().date()
+        interests_by_day = [(day, count) for day, (count, _) in metrics_rollup.daily_series(
+            db, 'interests', today - timedelta(days=30), today, entity=('institution', institution.id)
+        ).items()]
+        
+        # Status counts from the denormalized job counters
+        total_interests, pending_interests, accepted_interests = db.query(
+            func.coalesce(func.sum(Job.interest_count), 0),
+            func.coalesce(func.sum(Job.pending_interest_count), 0),
+            func.coalesce(func.sum(Job.accepted_interest_count), 0)
+        ).filter(Job.institution_id == institution.id).first()
+        status_counts = [
+            (status, count) for status, count in (
+                (InterestStatus.PENDING, pending_interests),
+                (InterestStatus.ACCEPTED, accepted_interests),
+                (InterestStatus.DECLINED, total_interests - pending_interests - accepted_interests)
+            ) if count
+        ]
         
         # Top gigs
-        top_gigs = db.query(
-            Job.title,
-            func.count(JobInterest.id).label('interest_count')
-        ).outerjoin(JobInterest).filter(
+        top_gigs = db.query(Job.title, Job.interest_count).filter(
             Job.institution_id == institution.id
-        ).group_by(Job.id).order_by(desc('interest_count')).limit(10).all()
+        ).order_by(desc(Job.interest_count)).limit(10).all()
         
         # Get unread notification count for sidebar badge
         unread_notifications = db.query(Notification).filter(
@@ -3654,43 +3336,43 @@ def institution_analytics():
 @login_required
 @role_required('institution')
 def export_institution_analytics_csv():
-    db = SessionLocal()
-    try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
-        if not institution:
-            from flask import jsonify
-            return jsonify({'error': 'Institution profile not found'}), 404
-
-        from io import StringIO
-        import csv
-        from flask import Response
-        from sqlalchemy.orm import aliased
-        from sqlalchemy import and_
-        from app.models.payment import Payment
-        from app.models.user import User
+    institution = get_current_institution()
+    if not institution:
+        return jsonify({'error': 'Institution profile not found'}), 404
+
+    try:
+        fmt = export_format(request.args.get('format'))
+    except InvalidExportFormat as e:
+        return jsonify({'error': str(e)}), 400
+
+    from sqlalchemy.orm import aliased
+    from sqlalchemy import and_
+
+    institution_id = institution.id
+    LatestPayment = aliased(Payment)
+    columns = [
+        ('date', JobInterest.created_at),
+        ('gig_title', Job.title),
+        ('professional_name', Professional.full_name),
+        ('email', User.email),
+        ('telephone_no', Professional.phone_number),
+        ('payment_paid', LatestPayment.amount),
+        ('payment_status', LatestPayment.status, lambda status: status if status is not None else 'unpaid'),
+    ]
 
-        latest_payment_ts = db.query(
+    def build_query(query):
+        latest_payment_ts = select(
             Payment.gig_id.label('gig_id'),
             Payment.professional_id.label('professional_id'),
-            Payment.institution_id.label('institution_id'),
             func.max(Payment.created_at).label('max_created_at')
-        ).filter(
-            Payment.institution_id == institution.id
+        ).where(
+            Payment.institution_id == institution_id
         ).group_by(
             Payment.gig_id,
-            Payment.professional_id,
-            Payment.institution_id
+            Payment.professional_id
         ).subquery()
 
-        LatestPayment = aliased(Payment)
-
-        rows = db.query(
-            JobInterest,
-            Job,
-            Professional,
-            User,
-            LatestPayment
-        ).join(
+        return query.select_from(JobInterest).join(
             Job, Job.id == JobInterest.job_id
         ).join(
             Professional, Professional.id == JobInterest.professional_id
@@ -3700,64 +3382,24 @@ def export_institution_analytics_csv():
             latest_payment_ts,
             and_(
                 latest_payment_ts.c.gig_id == JobInterest.job_id,
-                latest_payment_ts.c.professional_id == JobInterest.professional_id,
-                latest_payment_ts.c.institution_id == institution.id
+                latest_payment_ts.c.professional_id == JobInterest.professional_id
             )
         ).outerjoin(
             LatestPayment,
             and_(
                 LatestPayment.gig_id == latest_payment_ts.c.gig_id,
                 LatestPayment.professional_id == latest_payment_ts.c.professional_id,
-                LatestPayment.institution_id == latest_payment_ts.c.institution_id,
+                LatestPayment.institution_id == institution_id,
                 LatestPayment.created_at == latest_payment_ts.c.max_created_at
             )
-        ).filter(
-            Job.institution_id == institution.id
+        ).where(
+            Job.institution_id == institution_id
         ).order_by(
             desc(JobInterest.created_at)
-        ).all()
-
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'date',
-            'gig_title',
-            'professional_name',
-            'email',
-            'telephone_no',
-            'payment_paid',
-            'payment_status'
-        ])
-
-        for interest, job, professional, user, payment in rows:
-            payment_amount = ''
-            payment_status = ''
-            if payment:
-                payment_amount = payment.amount
-                payment_status = payment.status.value if payment.status else ''
-            else:
-                payment_status = 'unpaid'
-
-            writer.writerow([
-                interest.created_at.strftime('%Y-%m-%d %H:%M:%S') if interest.created_at else '',
-                job.title if job else '',
-                professional.full_name or '',
-                user.email if user else '',
-                professional.phone_number or '',
-                payment_amount,
-                payment_status
-            ])
-
-        csv_data = output.getvalue()
-        filename = f"institution_analytics_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-
-        return Response(
-            csv_data,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
-    finally:
-        db.close()
+
+    # Rows are streamed from a server-side cursor after this view returns
+    return stream_export(columns, build_query, fmt, 'institution_analytics')
 
 @web_blueprint.route('/institution/users')
 @login_required
@@ -3766,7 +3408,7 @@ def institution_users():
     """Institution User Management"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -3828,7 +3470,7 @@ def institution_payments():
     from sqlalchemy import exists
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -3905,7 +3547,7 @@ def professional_history(professional_id):
     """View professional interaction history with this institution"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             flash('Institution profile not found', 'error')
             return redirect(url_for('web.profile'))
@@ -3982,7 +3624,7 @@ def get_institution_metrics():
     """API endpoint for real-time dashboard metrics"""
     db = SessionLocal()
     try:
-        institution = db.query(Institution).filter(Institution.user_id == session['user_id']).first()
+        institution = get_current_institution()
         if not institution:
             return jsonify({'error': 'Institution not found'}), 404
         
@@ -4098,6 +3740,7 @@ def delete_user_admin(user_id):
         
         # Delete notifications, messages, documents
         db.query(Notification).filter(Notification.user_id == user.id).delete()
+        delete_user_conversations(db, user.id)
         db.query(Message).filter((Message.sender_id == user.id) | (Message.receiver_id == user.id)).delete()
         db.query(Document).filter(Document.user_id == user.id).delete()
         
@@ -4125,16 +3768,8 @@ def admin_jobs():
             joinedload(Job.assigned_professional)
         ).order_by(desc(Job.created_at)).all()
         
-        # Get interest counts for each job
-        job_stats = {}
-        for job in jobs:
-            interests = db.query(JobInterest).filter(JobInterest.job_id == job.id).all()
-            job_stats[job.id] = {
-                'total_interests': len(interests),
-                'pending': len([i for i in interests if i.status == InterestStatus.PENDING]),
-                'accepted': len([i for i in interests if i.status == InterestStatus.ACCEPTED]),
-                'declined': len([i for i in interests if i.status == InterestStatus.DECLINED])
-            }
+        # Interest counts come from the denormalized job counters
+        job_stats = {job.id: InterestSummary.from_job(job).to_dict() for job in jobs}
         
         return render_template('admin_jobs.html', jobs=jobs, job_stats=job_stats)
     finally:
@@ -4154,7 +3789,11 @@ def delete_job_admin(job_id):
         # Delete dependent records first to avoid FK constraint failures
         db.query(Payment).filter(Payment.gig_id == job.id).delete(synchronize_session=False)
         db.query(Rating).filter(Rating.gig_id == job.id).delete(synchronize_session=False)
+        message_user_ids = {uid for pair in db.query(Message.sender_id, Message.receiver_id).filter(
+            Message.job_id == job.id
+        ).all() for uid in pair}
         db.query(Message).filter(Message.job_id == job.id).delete(synchronize_session=False)
+        rebuild_conversations(db, message_user_ids)
 
         # Interests tables (legacy + new)
         db.query(GigInterest).filter(GigInterest.job_id == job.id).delete(synchronize_session=False)
@@ -4203,83 +3842,37 @@ def admin_analytics():
     """Admin system analytics with real data"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func
-        from datetime import datetime, timedelta
-        
-        # User statistics
-        total_users = db.query(User).count()
-        professionals_count = db.query(User).filter(User.role == UserRole.PROFESSIONAL).count()
-        institutions_count = db.query(User).filter(User.role == UserRole.INSTITUTION).count()
-        active_users = db.query(User).filter(User.is_active == True).count()
-        
-        # Job statistics
-        total_jobs = db.query(Job).count()
-        active_jobs = db.query(Job).filter(Job.status == JobStatus.OPEN).count()
-        completed_jobs = db.query(Job).filter(Job.status == JobStatus.COMPLETED).count()
-        
-        # Interest statistics
-        total_interests = db.query(JobInterest).count()
-        pending_interests = db.query(JobInterest).filter(JobInterest.status == InterestStatus.PENDING).count()
-        accepted_interests = db.query(JobInterest).filter(JobInterest.status == InterestStatus.ACCEPTED).count()
-        
-        # Document statistics
-        total_documents = db.query(Document).count()
-        verified_documents = db.query(Document).filter(Document.status == DocumentStatus.APPROVED).count()
-        pending_documents = db.query(Document).filter(Document.status == DocumentStatus.PENDING).count()
-        
-        # Recent activity (last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        new_users_30d = db.query(User).filter(User.created_at >= thirty_days_ago).count()
-        new_jobs_30d = db.query(Job).filter(Job.created_at >= thirty_days_ago).count()
-        
-        # Growth data for charts (last 7 days)
-        daily_stats = []
-        for i in range(7):
-            day = datetime.utcnow() - timedelta(days=6-i)
-            day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            
-            users_count = db.query(User).filter(
-                User.created_at >= day_start,
-                User.created_at < day_end
-            ).count()
-            
-            jobs_count = db.query(Job).filter(
-                Job.created_at >= day_start,
-                Job.created_at < day_end
-            ).count()
-            
-            daily_stats.append({
-                'date': day.strftime('%b %d'),
-                'users': users_count,
-                'jobs': jobs_count
-            })
+        users = admin_analytics_service.user_breakdown(db, since=thirty_days_ago)
+        jobs = admin_analytics_service.job_breakdown(db, since=thirty_days_ago)
+        documents = admin_analytics_service.document_breakdown(db)
         
         analytics = {
             'users': {
-                'total': total_users,
-                'professionals': professionals_count,
-                'institutions': institutions_count,
-                'active': active_users,
-                'new_30d': new_users_30d
+                'total': users['total'],
+                'professionals': users['professional_accounts'],
+                'institutions': users['institution_accounts'],
+                'active': users['active'],
+                'new_30d': users['new']
             },
             'jobs': {
-                'total': total_jobs,
-                'active': active_jobs,
-                'completed': completed_jobs,
-                'new_30d': new_jobs_30d
+                'total': jobs['total'],
+                'active': jobs['open'],
+                'completed': jobs['completed'],
+                'new_30d': jobs['new']
             },
             'interests': {
-                'total': total_interests,
-                'pending': pending_interests,
-                'accepted': accepted_interests
+                'total': jobs['interests'],
+                'pending': jobs['pending_interests'],
+                'accepted': jobs['accepted_interests']
             },
             'documents': {
-                'total': total_documents,
-                'verified': verified_documents,
-                'pending': pending_documents
+                'total': documents['total'],
+                'verified': documents['approved'],
+                'pending': documents['pending']
             },
-            'daily_stats': daily_stats
+            # Growth data for charts (last 7 days)
+            'daily_stats': admin_analytics_service.daily_signups(db, days=7)
         }
         
         return render_template('admin_analytics.html', analytics=analytics)
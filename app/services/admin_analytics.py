@@ -0,0 +1,154 @@
+"""
+Admin Analytics Service
+Platform-wide aggregates for the admin dashboards, one statement per table.
+
+Each breakdown folds what used to be a dozen COUNT/SUM queries into a single pass of
+conditional aggregates (SUM(CASE ...), portable to SQLite and Postgres), and the daily series
+are read from the metrics_daily rollups (app.services.metrics_rollup). The API
+(/api/analytics/admin, /api/admin/metrics) and the web admin pages all read from here.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, distinct, func, select
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.document import Document, DocumentStatus
+from app.models.rating import Rating
+from app.services import metrics_rollup
+
+TOP_LIMIT = 5
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def _count_of(model):
+    return select(func.count()).select_from(model).scalar_subquery()
+
+
+def user_breakdown(db, since: Optional[datetime] = None) -> dict:
+    """Users by role and activity, profile counts and sign-ups since `since` (default 30 days)"""
+    since = since or datetime.utcnow() - timedelta(days=30)
+    row = db.query(
+        func.count(User.id).label('total'),
+        _count_if(User.is_active == True).label('active'),
+        _count_if(User.role == UserRole.PROFESSIONAL).label('professional_accounts'),
+        _count_if(User.role == UserRole.INSTITUTION).label('institution_accounts'),
+        _count_if(User.created_at >= since).label('new'),
+        _count_of(Professional).label('professionals'),
+        _count_of(Institution).label('institutions')
+    ).one()
+    return dict(row._mapping)
+
+
+def job_breakdown(db, since: Optional[datetime] = None) -> dict:
+    """Jobs by status, jobs created since `since` and interest totals from the jobs' counters"""
+    since = since or datetime.utcnow() - timedelta(days=30)
+    row = db.query(
+        func.count(Job.id).label('total'),
+        _count_if(Job.status == JobStatus.OPEN).label('open'),
+        _count_if(Job.status == JobStatus.ASSIGNED).label('assigned'),
+        _count_if(Job.status == JobStatus.COMPLETED).label('completed'),
+        _count_if(Job.created_at >= since).label('new'),
+        func.coalesce(func.sum(Job.interest_count), 0).label('interests'),
+        func.coalesce(func.sum(Job.pending_interest_count), 0).label('pending_interests'),
+        func.coalesce(func.sum(Job.accepted_interest_count), 0).label('accepted_interests')
+    ).one()
+    return dict(row._mapping)
+
+
+def payment_breakdown(db, now: Optional[datetime] = None) -> dict:
+    """Payments by status, completed revenue (all time, 30 and 7 days) and the pending amount"""
+    now = now or datetime.utcnow()
+    completed = Payment.status == TransactionStatus.COMPLETED
+    row = db.query(
+        func.count(Payment.id).label('total'),
+        _count_if(completed).label('completed'),
+        _count_if(Payment.status == TransactionStatus.PENDING).label('pending'),
+        _count_if(Payment.status == TransactionStatus.FAILED).label('failed'),
+        _sum_if(completed, Payment.amount).label('revenue'),
+        _sum_if(completed & (Payment.completed_at >= now - timedelta(days=30)), Payment.amount).label('revenue_30d'),
+        _sum_if(completed & (Payment.completed_at >= now - timedelta(days=7)), Payment.amount).label('revenue_7d'),
+        _sum_if(Payment.status == TransactionStatus.PENDING, Payment.amount).label('pending_amount')
+    ).one()
+    result = dict(row._mapping)
+    for key in ('revenue', 'revenue_30d', 'revenue_7d', 'pending_amount'):
+        result[key] = float(result[key])
+    return result
+
+
+def document_breakdown(db) -> dict:
+    """Documents by status and the number of professionals with an approved document"""
+    verified_professionals = select(func.count(distinct(Professional.id))).select_from(Professional).join(
+        Document, Document.user_id == Professional.user_id
+    ).where(Document.status == DocumentStatus.APPROVED).scalar_subquery()
+    row = db.query(
+        func.count(Document.id).label('total'),
+        _count_if(Document.status == DocumentStatus.PENDING).label('pending'),
+        _count_if(Document.status == DocumentStatus.APPROVED).label('approved'),
+        _count_if(Document.status == DocumentStatus.REJECTED).label('rejected'),
+        verified_professionals.label('verified_professionals')
+    ).one()
+    return dict(row._mapping)
+
+
+def rating_summary(db) -> dict:
+    row = db.query(func.count(Rating.id).label('total'), func.avg(Rating.rating).label('average')).one()
+    return {'total': row.total, 'average': round(float(row.average or 0), 2)}
+
+
+def top_institutions(db, limit: int = TOP_LIMIT) -> List[dict]:
+    rows = db.query(
+        Institution.id,
+        Institution.institution_name,
+        func.count(Job.id).label('gig_count')
+    ).join(Job).group_by(Institution.id, Institution.institution_name).order_by(
+        func.count(Job.id).desc()
+    ).limit(limit).all()
+    return [{'id': r.id, 'name': r.institution_name, 'gig_count': r.gig_count} for r in rows]
+
+
+def top_professionals(db, limit: int = TOP_LIMIT) -> List[dict]:
+    rows = db.query(
+        Professional.id,
+        Professional.full_name,
+        func.count(Job.id).label('hire_count')
+    ).join(Job, Job.assigned_professional_id == Professional.id).filter(
+        Job.status.in_([JobStatus.ASSIGNED, JobStatus.COMPLETED])
+    ).group_by(Professional.id, Professional.full_name).order_by(
+        func.count(Job.id).desc()
+    ).limit(limit).all()
+    return [{'id': r.id, 'name': r.full_name, 'hire_count': r.hire_count} for r in rows]
+
+
+def daily_revenue(db, days: int = 30, now: Optional[datetime] = None) -> List[dict]:
+    """Completed revenue per day for the last `days` days from metrics_daily (days without revenue are omitted)"""
+    today = (now or datetime.utcnow()).date()
+    series = metrics_rollup.daily_series(db, 'revenue', today - timedelta(days=days), today)
+    return [{'date': day.isoformat(), 'revenue': float(amount)} for day, (count, amount) in series.items() if count]
+
+
+def daily_signups(db, days: int = 7, now: Optional[datetime] = None) -> List[dict]:
+    """New users and jobs per calendar day for the last `days` days from metrics_daily (oldest first, zero-filled)"""
+    today = (now or datetime.utcnow()).date()
+    first_day = today - timedelta(days=days - 1)
+    series = metrics_rollup.multi_series(db, ['signups', 'gigs'], first_day, today)
+
+    result = []
+    for i in range(days):
+        day = first_day + timedelta(days=i)
+        result.append({
+            'date': day.strftime('%b %d'),
+            'users': series['signups'].get(day, (0, 0))[0],
+            'jobs': series['gigs'].get(day, (0, 0))[0]
+        })
+    return result
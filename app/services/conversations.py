@@ -0,0 +1,316 @@
+"""
+Conversations Service
+Maintains the conversations / conversation_participants tables alongside writes to messages,
+so the inbox and unread badges read a handful of rows instead of scanning every message.
+
+Every helper runs in the caller's transaction; the caller commits. Counters are changed with
+in-database UPDATEs so concurrent sends never lose increments.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.exc import IntegrityError
+from app.models.conversation import Conversation, ConversationParticipant
+from app.models.message import Message, MessageStatus
+
+REBUILD_BATCH_SIZE = 500
+THREAD_PAGE_SIZE = 30
+
+
+def conversation_pair(user_id: int, other_user_id: int) -> Tuple[int, int]:
+    user_id, other_user_id = int(user_id), int(other_user_id)
+    return (user_id, other_user_id) if user_id < other_user_id else (other_user_id, user_id)
+
+
+def find_conversation(db, user_id: int, other_user_id: int) -> Optional[Conversation]:
+    low, high = conversation_pair(user_id, other_user_id)
+    return db.query(Conversation).filter(
+        Conversation.user_low_id == low,
+        Conversation.user_high_id == high
+    ).first()
+
+
+def get_or_create_conversation(db, user_id: int, other_user_id: int) -> Conversation:
+    """Return the pair's conversation, creating it and both participant rows if needed"""
+    if int(user_id) == int(other_user_id):
+        raise ValueError("A conversation needs two different users")
+    conversation = find_conversation(db, user_id, other_user_id)
+    if conversation:
+        return conversation
+
+    low, high = conversation_pair(user_id, other_user_id)
+    try:
+        with db.begin_nested():
+            conversation = Conversation(user_low_id=low, user_high_id=high)
+            conversation.participants = [
+                ConversationParticipant(user_id=low, other_user_id=high),
+                ConversationParticipant(user_id=high, other_user_id=low)
+            ]
+            db.add(conversation)
+    except IntegrityError:
+        # Another request created the pair first
+        conversation = find_conversation(db, user_id, other_user_id)
+    return conversation
+
+
+def _participant(db, conversation_id: int, user_id: int):
+    return db.query(ConversationParticipant).filter(
+        ConversationParticipant.conversation_id == conversation_id,
+        ConversationParticipant.user_id == user_id
+    )
+
+
+def _newer(column, message_id):
+    return or_(column == None, column < message_id)
+
+
+def record_message(db, message: Message) -> Optional[Conversation]:
+    """
+    Move the conversation pointers to a new, flushed message and count it as unread for the receiver.
+    Messages to oneself belong to no conversation (as in rebuild_conversations) and are skipped.
+    """
+    if message.sender_id == message.receiver_id:
+        return None
+    conversation = get_or_create_conversation(db, message.sender_id, message.receiver_id)
+    created_at = message.created_at
+
+    values = {Conversation.last_message_id: message.id, Conversation.last_message_at: created_at}
+    if message.job_id:
+        values[Conversation.job_id] = message.job_id
+    db.query(Conversation).filter(
+        Conversation.id == conversation.id,
+        _newer(Conversation.last_message_id, message.id)
+    ).update(values, synchronize_session=False)
+
+    db.query(ConversationParticipant).filter(
+        ConversationParticipant.conversation_id == conversation.id,
+        _newer(ConversationParticipant.last_message_id, message.id)
+    ).update({
+        ConversationParticipant.last_message_id: message.id,
+        ConversationParticipant.last_message_at: created_at
+    }, synchronize_session=False)
+
+    _participant(db, conversation.id, message.receiver_id).update({
+        ConversationParticipant.unread_count: ConversationParticipant.unread_count + 1
+    }, synchronize_session=False)
+    return conversation
+
+
+def mark_conversation_read(db, user_id: int, other_user_id: int, last_read_message_id: Optional[int],
+                           marked: int) -> None:
+    """
+    Take `marked` newly read messages (up to last_read_message_id) off the user's unread counter.
+    Messages after last_read_message_id, or arriving concurrently, stay counted.
+    """
+    conversation = find_conversation(db, user_id, other_user_id)
+    if not conversation:
+        return
+    values = {ConversationParticipant.unread_count: case(
+        (ConversationParticipant.unread_count > marked, ConversationParticipant.unread_count - marked), else_=0
+    )}
+    if last_read_message_id:
+        values[ConversationParticipant.last_read_message_id] = case(
+            (_newer(ConversationParticipant.last_read_message_id, last_read_message_id), last_read_message_id),
+            else_=ConversationParticipant.last_read_message_id
+        )
+    _participant(db, conversation.id, user_id).update(values, synchronize_session=False)
+
+
+def record_message_read(db, message: Message) -> None:
+    """Count one previously unread message as read by its receiver"""
+    conversation = find_conversation(db, message.sender_id, message.receiver_id)
+    if not conversation:
+        return
+    _participant(db, conversation.id, message.receiver_id).update({
+        ConversationParticipant.unread_count: case(
+            (ConversationParticipant.unread_count > 0, ConversationParticipant.unread_count - 1), else_=0
+        ),
+        ConversationParticipant.last_read_message_id: case(
+            (_newer(ConversationParticipant.last_read_message_id, message.id), message.id),
+            else_=ConversationParticipant.last_read_message_id
+        )
+    }, synchronize_session=False)
+
+
+def _latest_visible_message(db, user_id: int, other_user_id: int) -> Optional[Message]:
+    return db.query(Message).filter(thread_filter(user_id, other_user_id)).order_by(Message.id.desc()).first()
+
+
+def record_message_deleted(db, message: Message, user_id: int, was_unread: bool = False) -> None:
+    """
+    Update the deleting user's view after a soft delete (flushed): drop the message from their
+    unread counter and point their inbox entry at the newest message they can still see.
+    """
+    other_user_id = message.receiver_id if message.sender_id == user_id else message.sender_id
+    conversation = find_conversation(db, user_id, other_user_id)
+    if not conversation:
+        return
+    participant = _participant(db, conversation.id, user_id).first()
+    if not participant:
+        return
+
+    if was_unread and message.receiver_id == user_id and participant.unread_count > 0:
+        participant.unread_count = ConversationParticipant.unread_count - 1
+    if participant.last_message_id == message.id:
+        latest = _latest_visible_message(db, user_id, other_user_id)
+        participant.last_message_id = latest.id if latest else None
+        participant.last_message_at = latest.created_at if latest else None
+
+
+def thread_filter(user_id: int, other_user_id: int):
+    """Messages between the two users that user_id has not deleted"""
+    return or_(
+        and_(Message.sender_id == user_id, Message.receiver_id == other_user_id, Message.is_deleted_by_sender == False),
+        and_(Message.sender_id == other_user_id, Message.receiver_id == user_id, Message.is_deleted_by_receiver == False)
+    )
+
+
+def load_thread_page(db, user_id: int, other_user_id: int, before_id: Optional[int] = None,
+                     after_id: Optional[int] = None, limit: int = THREAD_PAGE_SIZE, options=()) -> Tuple[list, bool]:
+    """
+    Return (messages oldest first, has_older) for one window of the thread.
+    Without cursors this is the latest `limit` messages; before_id pages back through older
+    history and after_id returns messages newer than the client's last one (for polling).
+    """
+    query = db.query(Message).filter(thread_filter(user_id, other_user_id))
+    if options:
+        query = query.options(*options)
+
+    if after_id is not None:
+        rows = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+        return rows, False
+
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+    has_older = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_older
+
+
+def mark_thread_read(db, user_id: int, other_user_id: int, up_to_message_id: int) -> int:
+    """
+    Mark every unread message from other_user_id to user_id up to up_to_message_id as read
+    with one UPDATE and take them off the user's unread counter. Returns the number of messages marked.
+    """
+    marked = db.query(Message).filter(
+        Message.receiver_id == user_id,
+        Message.sender_id == other_user_id,
+        Message.is_read == False,
+        # Unread messages the user deleted were already taken off the counter
+        Message.is_deleted_by_receiver == False,
+        Message.id <= up_to_message_id
+    ).update({
+        Message.is_read: True,
+        Message.read_at: datetime.utcnow(),
+        Message.status: MessageStatus.READ
+    }, synchronize_session=False)
+    if marked:
+        mark_conversation_read(db, user_id, other_user_id, up_to_message_id, marked)
+    return marked
+
+
+def get_unread_message_count(db, user_id: int) -> int:
+    """Total unread messages across the user's conversations"""
+    total = db.query(func.sum(ConversationParticipant.unread_count)).filter(
+        ConversationParticipant.user_id == user_id
+    ).scalar()
+    return int(total or 0)
+
+
+def delete_user_conversations(db, user_id: int) -> None:
+    """Remove every conversation the user takes part in (used when the user is deleted)"""
+    conversation_ids = [row[0] for row in db.query(Conversation.id).filter(
+        or_(Conversation.user_low_id == user_id, Conversation.user_high_id == user_id)
+    ).all()]
+    if not conversation_ids:
+        return
+    db.query(ConversationParticipant).filter(
+        ConversationParticipant.conversation_id.in_(conversation_ids)
+    ).delete(synchronize_session=False)
+    db.query(Conversation).filter(Conversation.id.in_(conversation_ids)).delete(synchronize_session=False)
+
+
+def _message_times(db, message_ids: Iterable[int]) -> Dict[int, Tuple[object, Optional[int]]]:
+    """{message_id: (created_at, job_id)} loaded in batches"""
+    message_ids = sorted({mid for mid in message_ids if mid})
+    found = {}
+    for start in range(0, len(message_ids), REBUILD_BATCH_SIZE):
+        batch = message_ids[start:start + REBUILD_BATCH_SIZE]
+        for mid, created_at, job_id in db.query(Message.id, Message.created_at, Message.job_id).filter(
+            Message.id.in_(batch)
+        ).all():
+            found[mid] = (created_at, job_id)
+    return found
+
+
+def rebuild_conversations(db, user_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute conversations from the messages table.
+    Rebuilds every conversation when user_ids is None, otherwise only those involving user_ids.
+    Returns the number of conversations written.
+    """
+    message_scope = []
+    conversation_scope = []
+    if user_ids is not None:
+        user_ids = list({int(uid) for uid in user_ids})
+        if not user_ids:
+            return 0
+        message_scope = [or_(Message.sender_id.in_(user_ids), Message.receiver_id.in_(user_ids))]
+        conversation_scope = [or_(Conversation.user_low_id.in_(user_ids), Conversation.user_high_id.in_(user_ids))]
+
+    stale_ids = db.query(Conversation.id).filter(*conversation_scope)
+    db.query(ConversationParticipant).filter(
+        ConversationParticipant.conversation_id.in_(stale_ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    db.query(Conversation).filter(*conversation_scope).delete(synchronize_session=False)
+
+    low = case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+    high = case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+    pairs = db.query(
+        low, high, func.max(Message.id), func.max(case((Message.job_id != None, Message.id), else_=None))
+    ).filter(
+        Message.sender_id != Message.receiver_id, *message_scope
+    ).group_by(low, high).all()
+
+    # Per-participant state: newest visible message as sender and as receiver, unread and read pointers
+    sent = db.query(Message.sender_id, Message.receiver_id, func.max(Message.id)).filter(
+        Message.is_deleted_by_sender == False, *message_scope
+    ).group_by(Message.sender_id, Message.receiver_id).all()
+    received = db.query(
+        Message.receiver_id, Message.sender_id, func.max(Message.id),
+        func.sum(case((Message.is_read == False, 1), else_=0)),
+        func.max(case((Message.is_read == True, Message.id), else_=None))
+    ).filter(
+        Message.is_deleted_by_receiver == False, *message_scope
+    ).group_by(Message.receiver_id, Message.sender_id).all()
+
+    views = {}
+    for user_id, other_user_id, last_id in sent:
+        views.setdefault((user_id, other_user_id), [None, 0, None])[0] = last_id
+    for user_id, other_user_id, last_id, unread, last_read in received:
+        view = views.setdefault((user_id, other_user_id), [None, 0, None])
+        view[0] = max(filter(None, (view[0], last_id)), default=None)
+        view[1] = int(unread or 0)
+        view[2] = last_read
+
+    times = _message_times(db, [row[2] for row in pairs] + [row[3] for row in pairs] +
+                           [view[0] for view in views.values()])
+
+    for low_id, high_id, last_id, last_job_message_id in pairs:
+        last_at = times.get(last_id, (None, None))[0]
+        job_id = times.get(last_job_message_id, (None, None))[1]
+        conversation = Conversation(user_low_id=low_id, user_high_id=high_id, last_message_id=last_id,
+                                    last_message_at=last_at, job_id=job_id)
+        for user_id, other_user_id in ((low_id, high_id), (high_id, low_id)):
+            visible_id, unread, last_read = views.get((user_id, other_user_id), (None, 0, None))
+            conversation.participants.append(ConversationParticipant(
+                user_id=user_id, other_user_id=other_user_id, unread_count=unread,
+                last_read_message_id=last_read, last_message_id=visible_id,
+                last_message_at=times.get(visible_id, (None, None))[0] if visible_id else None
+            ))
+        db.add(conversation)
+    db.flush()
+    return len(pairs)
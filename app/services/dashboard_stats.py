@@ -0,0 +1,505 @@
+"""
+Dashboard Stats Service
+Maintains the materialized user_dashboard_stats rows read by the web context processor.
+
+Every flush that writes jobs, gig interests, payments or ratings is turned into deltas for the
+specific transitions that happened (a job moving OPEN -> ASSIGNED, a payment becoming COMPLETED,
+a new rating, ...), read from the attributes' history. The deltas are applied right before the
+transaction commits with one in-database UPDATE per affected row, so the counters never drift
+from the data and concurrent writers never lose increments. Writes that touch none of the
+counted columns (payment status-check bookkeeping, for instance) cost nothing. Only the
+completed-gig lists (repeat clients, top sectors and job types, recent gigs) are recomputed, and
+only when one of the professional's completed gigs changes.
+
+Rows are created with their profile (in the same transaction) or by the startup backfill for
+older profiles; reads never write.
+"""
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import and_, case, event, func, desc, inspect
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models.dashboard_stats import UserDashboardStats
+from app.models.job import Job, GigInterest, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.rating import Rating
+from app.models.professional import Professional
+from app.models.institution import Institution
+
+RECENT_COMPLETED_LIMIT = 10
+TOP_ITEMS_LIMIT = 3
+
+_PENDING_KEY = 'dashboard_stats_pending'
+
+
+def _find_row(db, user_id: int, role: str) -> Optional[UserDashboardStats]:
+    return db.query(UserDashboardStats).filter(
+        UserDashboardStats.user_id == user_id,
+        UserDashboardStats.role == role
+    ).first()
+
+
+def _get_or_create_row(db, user_id: int, role: str) -> UserDashboardStats:
+    row = _find_row(db, user_id, role)
+    if row:
+        return row
+    try:
+        with db.begin_nested():
+            row = UserDashboardStats(user_id=user_id, role=role)
+            db.add(row)
+    except IntegrityError:
+        # Created concurrently by another transaction
+        row = _find_row(db, user_id, role)
+    return row
+
+
+def _completed_profile(db, professional_id: int) -> dict:
+    """The columns derived from the professional's completed gigs as a whole"""
+    repeat_clients = db.query(func.count(func.distinct(Job.institution_id))).filter(
+        Job.assigned_professional_id == professional_id,
+        Job.status == JobStatus.COMPLETED
+    ).scalar()
+
+    def _top(column):
+        rows = db.query(column, func.count(Job.id)).filter(
+            Job.assigned_professional_id == professional_id,
+            Job.status == JobStatus.COMPLETED,
+            column.isnot(None),
+            column != ''
+        ).group_by(column).order_by(desc(func.count(Job.id))).limit(TOP_ITEMS_LIMIT).all()
+        return [{'name': name, 'count': int(count)} for name, count in rows]
+
+    recent = db.query(
+        Job.id, Job.title, Job.location, Job.pay_amount, Job.updated_at, Institution.institution_name
+    ).outerjoin(
+        Institution, Institution.id == Job.institution_id
+    ).filter(
+        Job.assigned_professional_id == professional_id,
+        Job.status == JobStatus.COMPLETED
+    ).order_by(desc(Job.updated_at)).limit(RECENT_COMPLETED_LIMIT).all()
+
+    return {
+        'repeat_clients': int(repeat_clients or 0),
+        'top_sectors': json.dumps(_top(Job.sector)),
+        'top_job_types': json.dumps(_top(Job.job_type)),
+        'recent_completed_gigs': json.dumps([
+            {
+                'id': gig_id,
+                'title': title,
+                'location': location,
+                'pay_amount': pay_amount,
+                'updated_at': updated_at.isoformat() if updated_at else None,
+                'institution_name': institution_name
+            }
+            for gig_id, title, location, pay_amount, updated_at, institution_name in recent
+        ])
+    }
+
+
+def _compute_professional_stats(db, professional_id: int, row: UserDashboardStats) -> UserDashboardStats:
+    interested_gigs = db.query(func.count(GigInterest.id)).filter(
+        GigInterest.professional_id == professional_id
+    ).scalar() or 0
+
+    assigned_gigs = db.query(func.count(Job.id)).filter(
+        Job.assigned_professional_id == professional_id,
+        Job.status == JobStatus.ASSIGNED
+    ).scalar() or 0
+
+    completed_gigs, total_hours = db.query(
+        func.count(Job.id),
+        func.sum(Job.duration_hours)
+    ).filter(
+        Job.assigned_professional_id == professional_id,
+        Job.status == JobStatus.COMPLETED
+    ).first()
+
+    total_earned = db.query(func.sum(Payment.amount)).filter(
+        Payment.professional_id == professional_id,
+        Payment.status == TransactionStatus.COMPLETED
+    ).scalar() or 0
+
+    average_rating, total_ratings = db.query(
+        func.avg(Rating.rating),
+        func.count(Rating.id)
+    ).filter(Rating.professional_id == professional_id).first()
+
+    row.interested_gigs = int(interested_gigs)
+    row.assigned_gigs = int(assigned_gigs)
+    row.completed_gigs = int(completed_gigs or 0)
+    row.total_earned = float(total_earned)
+    row.average_rating = float(average_rating) if average_rating is not None else 0
+    row.total_ratings = int(total_ratings or 0)
+    row.total_hours = float(total_hours or 0)
+    for column, value in _completed_profile(db, professional_id).items():
+        setattr(row, column, value)
+    return row
+
+
+def refresh_professional_stats(db, professional_id: int) -> Optional[UserDashboardStats]:
+    """Recompute the professional dashboard row for one professional profile"""
+    user_id = db.query(Professional.user_id).filter(Professional.id == professional_id).scalar()
+    if not user_id:
+        return None
+    return _compute_professional_stats(db, professional_id, _get_or_create_row(db, user_id, 'professional'))
+
+
+def _compute_institution_stats(db, institution_id: int, row: UserDashboardStats) -> UserDashboardStats:
+    status_counts = dict(db.query(Job.status, func.count(Job.id)).filter(
+        Job.institution_id == institution_id
+    ).group_by(Job.status).all())
+
+    total_spent = db.query(func.sum(Payment.amount)).filter(
+        Payment.institution_id == institution_id,
+        Payment.status == TransactionStatus.COMPLETED
+    ).scalar() or 0
+
+    row.open_gigs = int(status_counts.get(JobStatus.OPEN, 0))
+    row.assigned_gigs = int(status_counts.get(JobStatus.ASSIGNED, 0))
+    row.completed_gigs = int(status_counts.get(JobStatus.COMPLETED, 0))
+    row.pending_interests = _pending_interests(db, institution_id)
+    row.total_spent = float(total_spent)
+    return row
+
+
+def _pending_interests(db, institution_id: int) -> int:
+    return int(db.query(func.count(GigInterest.id)).join(Job).filter(
+        Job.institution_id == institution_id,
+        Job.status == JobStatus.OPEN
+    ).scalar() or 0)
+
+
+def refresh_institution_stats(db, institution_id: int) -> Optional[UserDashboardStats]:
+    """Recompute the institution dashboard row for one institution profile"""
+    user_id = db.query(Institution.user_id).filter(Institution.id == institution_id).scalar()
+    if not user_id:
+        return None
+    return _compute_institution_stats(db, institution_id, _get_or_create_row(db, user_id, 'institution'))
+
+
+def rebuild_all_stats(db) -> int:
+    """Recompute every dashboard row from scratch. Returns the number of rows written."""
+    written = 0
+    for (professional_id,) in db.query(Professional.id).all():
+        if refresh_professional_stats(db, professional_id):
+            written += 1
+    for (institution_id,) in db.query(Institution.id).all():
+        if refresh_institution_stats(db, institution_id):
+            written += 1
+    return written
+
+
+def create_missing_stats(db) -> int:
+    """Build the rows of profiles that have none (profiles created before the table existed)"""
+    written = 0
+    for model, role, refresh in ((Professional, 'professional', refresh_professional_stats),
+                                 (Institution, 'institution', refresh_institution_stats)):
+        missing = db.query(model.id).outerjoin(UserDashboardStats, and_(
+            UserDashboardStats.user_id == model.user_id,
+            UserDashboardStats.role == role
+        )).filter(UserDashboardStats.id == None).all()
+        for (profile_id,) in missing:
+            if refresh(db, profile_id):
+                written += 1
+    return written
+
+
+def get_dashboard_stats(db, user_id: int, role: str, profile_id: int) -> UserDashboardStats:
+    """
+    Read the materialized row for (user, role) with one indexed lookup. A profile without a row
+    (not yet backfilled) gets its stats computed into an unsaved row; nothing is written.
+    """
+    row = _find_row(db, user_id, role)
+    if row:
+        return row
+
+    row = UserDashboardStats(user_id=user_id, role=role)
+    if role == 'professional':
+        return _compute_professional_stats(db, profile_id, row)
+    return _compute_institution_stats(db, profile_id, row)
+
+
+def professional_context(row: UserDashboardStats):
+    """Split a professional row into the role_stats, cv_boost and completed gigs the templates expect"""
+    role_stats = {
+        'interested_gigs': row.interested_gigs,
+        'assigned_gigs': row.assigned_gigs,
+        'completed_gigs': row.completed_gigs,
+        'total_earned': row.total_earned
+    }
+    cv_boost = {
+        'average_rating': row.average_rating or 0,
+        'total_ratings': row.total_ratings or 0,
+        'repeat_clients': row.repeat_clients or 0,
+        'top_sectors': json.loads(row.top_sectors or '[]'),
+        'top_job_types': json.loads(row.top_job_types or '[]'),
+        'total_hours': row.total_hours or 0
+    }
+    completed_gigs_list = []
+    for gig in json.loads(row.recent_completed_gigs or '[]'):
+        completed_gigs_list.append(SimpleNamespace(
+            id=gig['id'],
+            title=gig['title'],
+            location=gig['location'],
+            pay_amount=gig['pay_amount'],
+            updated_at=datetime.fromisoformat(gig['updated_at']) if gig['updated_at'] else None,
+            institution=SimpleNamespace(institution_name=gig['institution_name']) if gig['institution_name'] else None
+        ))
+    return role_stats, cv_boost, completed_gigs_list
+
+
+def institution_context(row: UserDashboardStats):
+    """role_stats for an institution row"""
+    return {
+        'open_gigs': row.open_gigs,
+        'assigned_gigs': row.assigned_gigs,
+        'completed_gigs': row.completed_gigs,
+        'pending_interests': row.pending_interests,
+        'total_spent': row.total_spent
+    }
+
+
+# Incremental maintenance
+
+# Columns whose old value the deltas need; their 'set' listeners load it when the row is expired
+_TRACKED_COLUMNS = {
+    Job: ('status', 'institution_id', 'assigned_professional_id', 'duration_hours'),
+    GigInterest: ('job_id', 'professional_id'),
+    Payment: ('status', 'amount', 'professional_id', 'institution_id'),
+    Rating: ('rating', 'professional_id'),
+}
+# Job columns shown in the completed-gig lists
+_PROFILE_COLUMNS = ('status', 'assigned_professional_id', 'institution_id', 'title', 'location',
+                    'pay_amount', 'sector', 'job_type')
+
+_JOB_STATUS_COUNTERS = {
+    JobStatus.OPEN: 'open_gigs',
+    JobStatus.ASSIGNED: 'assigned_gigs',
+    JobStatus.COMPLETED: 'completed_gigs',
+}
+
+
+def _track_old_values(model, column):
+    @event.listens_for(getattr(model, column), 'set', active_history=True)
+    def _load_old_value(target, value, oldvalue, initiator):
+        return value
+
+
+for _model, _columns in _TRACKED_COLUMNS.items():
+    for _column in _columns:
+        _track_old_values(_model, _column)
+
+
+def _values(session, obj, columns, old: bool) -> Optional[dict]:
+    """
+    The columns as they were before this flush (old=True) or as it wrote them, or None when the
+    row did not exist before / no longer exists after the flush
+    """
+    if old and obj in session.new or not old and obj in session.deleted:
+        return None
+    state = inspect(obj)
+    values = {}
+    for column in columns:
+        history = state.attrs[column].history
+        if old and history.added:
+            # Old values are always loaded (active_history), so no deleted entry means it was NULL
+            values[column] = history.deleted[0] if history.deleted else None
+        else:
+            values[column] = getattr(obj, column)
+    return values
+
+
+def _changed(obj, columns) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+def _pending(session) -> dict:
+    return session.info.setdefault(_PENDING_KEY, {
+        'professionals': defaultdict(Counter),
+        'institutions': defaultdict(Counter),
+        'interest_jobs': Counter(),
+        'completed_profiles': set(),
+        'recount_interests': set(),
+        'new_profiles': set(),
+    })
+
+
+def _job_deltas(pending, values, sign):
+    if not values:
+        return
+    status = values['status']
+    counter = _JOB_STATUS_COUNTERS.get(status)
+    if counter and values['institution_id']:
+        pending['institutions'][values['institution_id']][counter] += sign
+    professional_id = values['assigned_professional_id']
+    if professional_id and status == JobStatus.ASSIGNED:
+        pending['professionals'][professional_id]['assigned_gigs'] += sign
+    if professional_id and status == JobStatus.COMPLETED:
+        pending['professionals'][professional_id]['completed_gigs'] += sign
+        pending['professionals'][professional_id]['total_hours'] += sign * (values['duration_hours'] or 0)
+
+
+def _collect_job(session, pending, job):
+    columns = _TRACKED_COLUMNS[Job]
+    old, new = _values(session, job, columns, True), _values(session, job, columns, False)
+    _job_deltas(pending, old, -1)
+    _job_deltas(pending, new, +1)
+
+    profile_changed = old is None or new is None or _changed(job, _PROFILE_COLUMNS)
+    for values in (old, new):
+        if not values:
+            continue
+        if profile_changed and values['status'] == JobStatus.COMPLETED and values['assigned_professional_id']:
+            pending['completed_profiles'].add(values['assigned_professional_id'])
+        # A job entering or leaving OPEN takes all of its interests with it
+        opened = (old or {}).get('status') == JobStatus.OPEN or (new or {}).get('status') == JobStatus.OPEN
+        moved = old is None or new is None or old['status'] != new['status'] or old['institution_id'] != new['institution_id']
+        if opened and moved and values['institution_id']:
+            pending['recount_interests'].add(values['institution_id'])
+
+
+def _collect_interest(session, pending, interest):
+    for values, sign in ((_values(session, interest, _TRACKED_COLUMNS[GigInterest], True), -1),
+                         (_values(session, interest, _TRACKED_COLUMNS[GigInterest], False), +1)):
+        if values:
+            pending['professionals'][values['professional_id']]['interested_gigs'] += sign
+            pending['interest_jobs'][values['job_id']] += sign
+
+
+def _collect_payment(session, pending, payment):
+    for values, sign in ((_values(session, payment, _TRACKED_COLUMNS[Payment], True), -1),
+                         (_values(session, payment, _TRACKED_COLUMNS[Payment], False), +1)):
+        if values and values['status'] == TransactionStatus.COMPLETED:
+            amount = sign * (values['amount'] or 0)
+            pending['professionals'][values['professional_id']]['total_earned'] += amount
+            pending['institutions'][values['institution_id']]['total_spent'] += amount
+
+
+def _collect_rating(session, pending, rating):
+    for values, sign in ((_values(session, rating, _TRACKED_COLUMNS[Rating], True), -1),
+                         (_values(session, rating, _TRACKED_COLUMNS[Rating], False), +1)):
+        if values:
+            pending['professionals'][values['professional_id']]['rating_count'] += sign
+            pending['professionals'][values['professional_id']]['rating_sum'] += sign * (values['rating'] or 0)
+
+
+_COLLECTORS = (
+    (Job, _collect_job, _TRACKED_COLUMNS[Job] + _PROFILE_COLUMNS),
+    (GigInterest, _collect_interest, _TRACKED_COLUMNS[GigInterest]),
+    (Payment, _collect_payment, _TRACKED_COLUMNS[Payment]),
+    (Rating, _collect_rating, _TRACKED_COLUMNS[Rating]),
+)
+
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _collect_stat_deltas(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Professional, Institution)):
+            if obj in session.new:
+                _pending(session)['new_profiles'].add((type(obj), obj.id, obj.user_id))
+            continue
+        for model, collect, columns in _COLLECTORS:
+            if isinstance(obj, model):
+                # Updates that leave every counted column alone (bookkeeping) need no work
+                if obj in session.new or obj in session.deleted or _changed(obj, columns):
+                    collect(session, _pending(session), obj)
+                break
+
+
+def _row_ids(session, model, role, profile_ids):
+    """{profile_id: stats row id or None} for the given profiles"""
+    return dict(session.query(model.id, UserDashboardStats.id).outerjoin(UserDashboardStats, and_(
+        UserDashboardStats.user_id == model.user_id,
+        UserDashboardStats.role == role
+    )).filter(model.id.in_(profile_ids)).all())
+
+
+def _delta_values(deltas: Counter) -> dict:
+    values = {}
+    for column in ('interested_gigs', 'assigned_gigs', 'completed_gigs', 'open_gigs', 'pending_interests',
+                   'total_hours', 'total_earned', 'total_spent'):
+        if deltas.get(column):
+            attribute = getattr(UserDashboardStats, column)
+            values[attribute] = attribute + deltas[column]
+    if deltas.get('rating_count') or deltas.get('rating_sum'):
+        # SET expressions read the pre-UPDATE values, so both columns use the old count
+        total = UserDashboardStats.total_ratings
+        new_total = total + deltas['rating_count']
+        values[UserDashboardStats.total_ratings] = new_total
+        values[UserDashboardStats.average_rating] = case(
+            (new_total > 0, (UserDashboardStats.average_rating * total + deltas['rating_sum']) / new_total),
+            else_=0
+        )
+    return values
+
+
+def _apply_deltas(session, pending) -> None:
+    institutions = pending['institutions']
+    if pending['interest_jobs']:
+        for job_id, institution_id, status in session.query(Job.id, Job.institution_id, Job.status).filter(
+            Job.id.in_(list(pending['interest_jobs']))
+        ).all():
+            if status == JobStatus.OPEN:
+                institutions[institution_id]['pending_interests'] += pending['interest_jobs'][job_id]
+
+    professional_ids = {p for p, deltas in pending['professionals'].items() if p and any(deltas.values())}
+    professional_ids.update(p for p in pending['completed_profiles'] if p)
+    if professional_ids:
+        for professional_id, row_id in _row_ids(session, Professional, 'professional', professional_ids).items():
+            if row_id is None:
+                refresh_professional_stats(session, professional_id)
+                continue
+            values = _delta_values(pending['professionals'].get(professional_id, Counter()))
+            if professional_id in pending['completed_profiles']:
+                values.update({getattr(UserDashboardStats, column): value
+                               for column, value in _completed_profile(session, professional_id).items()})
+            if values:
+                session.query(UserDashboardStats).filter(UserDashboardStats.id == row_id).update(
+                    values, synchronize_session=False
+                )
+
+    institution_ids = {i for i, deltas in institutions.items() if i and any(deltas.values())}
+    institution_ids.update(i for i in pending['recount_interests'] if i)
+    if institution_ids:
+        for institution_id, row_id in _row_ids(session, Institution, 'institution', institution_ids).items():
+            if row_id is None:
+                refresh_institution_stats(session, institution_id)
+                continue
+            deltas = institutions.get(institution_id, Counter())
+            if institution_id in pending['recount_interests']:
+                deltas['pending_interests'] = 0
+            values = _delta_values(deltas)
+            if institution_id in pending['recount_interests']:
+                values[UserDashboardStats.pending_interests] = _pending_interests(session, institution_id)
+            if values:
+                session.query(UserDashboardStats).filter(UserDashboardStats.id == row_id).update(
+                    values, synchronize_session=False
+                )
+
+    # A new profile has nothing to count yet unless this transaction already gave it work
+    for model, profile_id, user_id in pending['new_profiles']:
+        if model is Professional and profile_id not in professional_ids:
+            _get_or_create_row(session, user_id, 'professional')
+        elif model is Institution and profile_id not in institution_ids:
+            _get_or_create_row(session, user_id, 'institution')
+
+
+@event.listens_for(SessionLocal, 'before_commit')
+def _apply_stat_deltas(session):
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _apply_deltas(session, pending)
+        # Flush newly created rows now, while the hook still runs inside the transaction
+        session.flush()
+
+
+@event.listens_for(SessionLocal, 'after_transaction_end')
+def _discard_stat_deltas(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,115 @@
+"""
+Earnings Service
+A professional's payment totals and monthly earnings series, shared by the earnings page and
+/api/analytics/professional.
+
+One grouped query buckets the professional's payments by completion month (time_bucket, portable
+to SQLite and Postgres) with conditional aggregates, so the totals, the pending amount, this
+month's and the last 30 days' earnings and the trend all come from a single statement. The
+result is kept in the page cache per professional and calendar day, and dropped as soon as a
+session commits a write to one of that professional's payments.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, func, inspect
+from app.models.payment import Payment, TransactionStatus
+from app.services import page_cache
+from app.services.time_buckets import bucket_label, months_back, time_bucket
+
+TREND_MONTHS = 6
+RECENT_DAYS = 30
+SUMMARY_TTL_SECONDS = 3600
+
+
+def _cache_prefix(professional_id: int) -> str:
+    return f'earnings:{professional_id}:'
+
+
+def _payment_cache_prefix(payment: Payment) -> Optional[str]:
+    return _cache_prefix(payment.professional_id) if payment.professional_id else None
+
+
+def _previous_professional_cache_prefix(payment: Payment) -> Optional[str]:
+    # A payment moved to another professional also leaves the previous one's totals
+    previous = inspect(payment).attrs.professional_id.history.deleted
+    return _cache_prefix(previous[0]) if previous and previous[0] else None
+
+
+page_cache.invalidate_on(Payment, _payment_cache_prefix,
+                         columns=('status', 'amount', 'completed_at', 'professional_id'))
+page_cache.invalidate_on(Payment, _previous_professional_cache_prefix, columns=('professional_id',))
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def _compute_summary(db, professional_id: int, today) -> dict:
+    recent_since = datetime.combine(today - timedelta(days=RECENT_DAYS), datetime.min.time())
+    completed = Payment.status == TransactionStatus.COMPLETED
+    pending = Payment.status == TransactionStatus.PENDING
+    month = time_bucket('month', Payment.completed_at)
+    rows = db.query(
+        month.label('month'),
+        _count_if(completed).label('completed_count'),
+        _sum_if(completed, Payment.amount).label('completed_amount'),
+        _count_if(pending).label('pending_count'),
+        _sum_if(pending, Payment.amount).label('pending_amount'),
+        _sum_if(completed & (Payment.completed_at >= recent_since), Payment.amount).label('recent_amount')
+    ).filter(
+        Payment.professional_id == professional_id,
+        Payment.status.in_([TransactionStatus.COMPLETED, TransactionStatus.PENDING])
+    ).group_by(month).all()
+
+    this_month = bucket_label('month', today)
+    first_trend_month = months_back(today, TREND_MONTHS - 1)
+    summary = {
+        'total_earnings': 0.0, 'completed_count': 0,
+        'pending_amount': 0.0, 'pending_count': 0,
+        'monthly_earnings': 0.0, 'monthly_count': 0,
+        'recent_earnings': 0.0,
+        'monthly_trend': []
+    }
+    for row in rows:
+        summary['total_earnings'] += float(row.completed_amount)
+        summary['completed_count'] += row.completed_count
+        summary['pending_amount'] += float(row.pending_amount)
+        summary['pending_count'] += row.pending_count
+        summary['recent_earnings'] += float(row.recent_amount)
+        if row.month is None or not row.completed_count:
+            continue
+        if row.month == this_month:
+            summary['monthly_earnings'] = float(row.completed_amount)
+            summary['monthly_count'] = row.completed_count
+        if first_trend_month <= row.month <= this_month:
+            summary['monthly_trend'].append({'month': row.month, 'amount': float(row.completed_amount)})
+    summary['monthly_trend'].sort(key=lambda point: point['month'])
+    return summary
+
+
+def earnings_summary(db, professional_id: int, now: Optional[datetime] = None) -> dict:
+    """
+    {'total_earnings', 'completed_count', 'pending_amount', 'pending_count', 'monthly_earnings',
+    'monthly_count' (this calendar month), 'recent_earnings' (last RECENT_DAYS days),
+    'monthly_trend': [{'month': 'YYYY-MM', 'amount'}] for the last TREND_MONTHS months with earnings}
+    """
+    today = (now or datetime.utcnow()).date()
+    return page_cache.cached(
+        f'{_cache_prefix(professional_id)}{today.isoformat()}',
+        lambda: _compute_summary(db, professional_id, today),
+        ttl=SUMMARY_TTL_SECONDS
+    )
+
+
+def trend_points(summary: dict) -> List[dict]:
+    """monthly_trend as {'year', 'month', 'earnings'} with integer year and month"""
+    points = []
+    for point in summary['monthly_trend']:
+        year, month = point['month'].split('-')
+        points.append({'year': int(year), 'month': int(month), 'earnings': point['amount']})
+    return points
@@ -0,0 +1,81 @@
+"""
+Inbox Service
+Conversation summaries for the message inbox: one row per conversation partner with the
+latest visible message, the unread count and the partner's display name.
+
+Summaries are read from conversation_participants, which the conversations service keeps
+current on every send, read and delete. One statement pages through the user's participant
+rows (newest first) and joins the last message, partner, profile name and gig, with the
+user's overall unread total computed by a window over the same rows.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from app.models.user import User, UserRole
+from app.models.conversation import Conversation, ConversationParticipant
+from app.models.message import Message
+from app.models.job import Job
+from app.models.professional import Professional
+from app.models.institution import Institution
+
+INBOX_CONVERSATION_LIMIT = 50
+
+
+def display_name(user: User, professional_name: Optional[str] = None, institution_name: Optional[str] = None) -> str:
+    """Name shown for a conversation partner, falling back to their email"""
+    if user.role == UserRole.PROFESSIONAL and professional_name:
+        return professional_name
+    if user.role == UserRole.INSTITUTION and institution_name:
+        return institution_name
+    return user.email
+
+
+def load_conversation_summaries(db, user_id: int, limit: int = INBOX_CONVERSATION_LIMIT) -> Tuple[List[dict], int]:
+    """
+    Return (conversations, total_unread) for the inbox, newest conversation first.
+    Each conversation is a dict with 'other_user', 'profile_name', 'last_message', 'unread_count' and 'job'.
+    """
+    views = db.query(
+        ConversationParticipant.conversation_id,
+        ConversationParticipant.other_user_id,
+        ConversationParticipant.last_message_id,
+        ConversationParticipant.last_message_at,
+        ConversationParticipant.unread_count,
+        func.sum(ConversationParticipant.unread_count).over().label('total_unread')
+    ).filter(
+        ConversationParticipant.user_id == user_id
+    ).subquery('inbox_views')
+
+    partner = aliased(User, name='partner')
+    rows = db.query(
+        Message, partner, Job, Professional.full_name, Institution.institution_name,
+        views.c.unread_count, views.c.total_unread
+    ).select_from(views).join(
+        Message, Message.id == views.c.last_message_id
+    ).join(
+        partner, partner.id == views.c.other_user_id
+    ).join(
+        Conversation, Conversation.id == views.c.conversation_id
+    ).outerjoin(
+        Job, Job.id == Conversation.job_id
+    ).outerjoin(
+        Professional, Professional.user_id == partner.id
+    ).outerjoin(
+        Institution, Institution.user_id == partner.id
+    ).order_by(
+        views.c.last_message_at.desc(), views.c.last_message_id.desc()
+    ).limit(limit).all()
+
+    conversations = []
+    total_unread = 0
+    for message, other_user, job, professional_name, institution_name, unread_count, overall_unread in rows:
+        total_unread = int(overall_unread or 0)
+        conversations.append({
+            'other_user': other_user,
+            'profile_name': display_name(other_user, professional_name, institution_name),
+            'last_message': message,
+            'unread_count': int(unread_count or 0),
+            'job': job
+        })
+    return conversations, total_unread
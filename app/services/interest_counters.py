@@ -0,0 +1,75 @@
+"""
+Interest Counters Service
+Maintains the denormalized jobs.interest_count, pending_interest_count and
+accepted_interest_count columns alongside writes to job_interests
+"""
+from typing import Iterable, Optional
+from app.models.job import Job
+from app.models.job_interest import InterestStatus
+from app.services.interest_loader import load_interest_summaries
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def adjust_interest_counts(db, job_id: int, total: int = 0, pending: int = 0, accepted: int = 0) -> None:
+    """
+    Apply counter deltas with a single in-database UPDATE so concurrent requests never lose increments.
+    Runs in the caller's transaction; the caller commits.
+    """
+    values = {}
+    if total:
+        values[Job.interest_count] = Job.interest_count + total
+    if pending:
+        values[Job.pending_interest_count] = Job.pending_interest_count + pending
+    if accepted:
+        values[Job.accepted_interest_count] = Job.accepted_interest_count + accepted
+    if not values:
+        return
+    db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+
+
+def record_interest_transition(db, job_id: int, old_status: Optional[InterestStatus],
+                               new_status: Optional[InterestStatus], count: int = 1) -> None:
+    """
+    Update counters for `count` interests moving from old_status to new_status.
+    None stands for "no row": (None, PENDING) is a new interest, (status, None) a deleted one.
+    """
+    def _weight(status, wanted):
+        return 1 if status == wanted else 0
+
+    adjust_interest_counts(
+        db,
+        job_id,
+        total=count * ((new_status is not None) - (old_status is not None)),
+        pending=count * (_weight(new_status, InterestStatus.PENDING) - _weight(old_status, InterestStatus.PENDING)),
+        accepted=count * (_weight(new_status, InterestStatus.ACCEPTED) - _weight(old_status, InterestStatus.ACCEPTED))
+    )
+
+
+def reconcile_interest_counts(db, job_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute counters from job_interests and repair rows that drifted.
+    Reconciles every job when job_ids is None. Returns the number of jobs repaired.
+    """
+    query = db.query(
+        Job.id, Job.interest_count, Job.pending_interest_count, Job.accepted_interest_count
+    ).order_by(Job.id)
+    if job_ids is not None:
+        query = query.filter(Job.id.in_(list(job_ids)))
+
+    rows = query.all()
+    repaired = 0
+    for start in range(0, len(rows), RECONCILE_BATCH_SIZE):
+        batch = rows[start:start + RECONCILE_BATCH_SIZE]
+        summaries = load_interest_summaries(db, [row[0] for row in batch])
+        for job_id, total, pending, accepted in batch:
+            summary = summaries[job_id]
+            if (total, pending, accepted) == (summary.total, summary.pending, summary.accepted):
+                continue
+            db.query(Job).filter(Job.id == job_id).update({
+                Job.interest_count: summary.total,
+                Job.pending_interest_count: summary.pending,
+                Job.accepted_interest_count: summary.accepted
+            }, synchronize_session=False)
+            repaired += 1
+    return repaired
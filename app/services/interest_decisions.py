@@ -0,0 +1,72 @@
+"""
+Interest Decisions Service
+Set-based decline of every other pending interest when an institution accepts an applicant.
+
+The statement count does not grow with the number of applicants: one SELECT finds the
+applicants, one UPDATE ... RETURNING declines those still pending, one multi-row INSERT creates
+their notifications and the real-time fan-out is a single multi-row outbox INSERT.
+"""
+from collections import namedtuple
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, update
+from app.models.job_interest import JobInterest, InterestStatus
+from app.models.notification import Notification
+from app.models.professional import Professional
+from app.services.interest_counters import record_interest_transition
+
+DeclinedInterest = namedtuple('DeclinedInterest', 'interest_id user_id notification_id')
+
+
+def decline_pending_interests(db, job_id: int, accepted_interest_id: int, title: str, message: str,
+                              role_context: Optional[str] = None,
+                              now: Optional[datetime] = None) -> List[DeclinedInterest]:
+    """
+    Decline every pending interest in job_id except accepted_interest_id, notify each applicant
+    and update the job's interest counters. Runs in the caller's transaction; the caller commits.
+    Notifications share the timestamp `now`.
+    """
+    now = now or datetime.utcnow()
+    applicants = db.query(JobInterest.id, Professional.user_id).join(
+        Professional, Professional.id == JobInterest.professional_id
+    ).filter(
+        JobInterest.job_id == job_id,
+        JobInterest.id != accepted_interest_id,
+        JobInterest.status == InterestStatus.PENDING
+    ).order_by(JobInterest.id).all()
+    if not applicants:
+        return []
+
+    # Re-check PENDING: an interest accepted or withdrawn since the SELECT is left alone, and only
+    # the rows this UPDATE declined are counted and notified
+    declined_ids = set(db.execute(
+        update(JobInterest).where(
+            JobInterest.id.in_([interest_id for interest_id, _ in applicants]),
+            JobInterest.status == InterestStatus.PENDING
+        ).values({
+            JobInterest.status: InterestStatus.DECLINED,
+            JobInterest.updated_at: now
+        }).returning(JobInterest.id).execution_options(synchronize_session=False)
+    ).scalars().all())
+    applicants = [(interest_id, user_id) for interest_id, user_id in applicants if interest_id in declined_ids]
+    if not applicants:
+        return []
+    record_interest_transition(db, job_id, InterestStatus.PENDING, InterestStatus.DECLINED, count=len(applicants))
+
+    # RETURNING rows are matched back by job_interest_id; their order is not guaranteed
+    notification_ids = dict(db.execute(
+        insert(Notification).returning(Notification.job_interest_id, Notification.id),
+        [{
+            'user_id': user_id,
+            'title': title,
+            'message': message,
+            'role_context': role_context,
+            'job_interest_id': interest_id,
+            'is_read': False,
+            'created_at': now
+        } for interest_id, user_id in applicants]
+    ).all())
+
+    return [DeclinedInterest(interest_id, user_id, notification_ids[interest_id])
+            for interest_id, user_id in applicants]
@@ -0,0 +1,96 @@
+"""
+Interest Loader Service
+Loads job interest counts and the viewer's own interests for a page of gigs in one grouped query.
+Listing pages read counts from the denormalized jobs columns; the grouped query backs reconciliation.
+"""
+from typing import Dict, Iterable, Optional, Set
+from sqlalchemy import func, case
+from app.models.job_interest import JobInterest, InterestStatus
+
+
+class InterestSummary:
+    """Interest counters for a single job"""
+
+    __slots__ = ('total', 'pending', 'accepted', 'declined', 'viewer_interested')
+
+    def __init__(self, total=0, pending=0, accepted=0, declined=0, viewer_interested=False):
+        self.total = total
+        self.pending = pending
+        self.accepted = accepted
+        self.declined = declined
+        self.viewer_interested = viewer_interested
+
+    @classmethod
+    def from_job(cls, job):
+        """Build a summary from the denormalized counters stored on the job row"""
+        total = job.interest_count or 0
+        pending = job.pending_interest_count or 0
+        accepted = job.accepted_interest_count or 0
+        return cls(total=total, pending=pending, accepted=accepted, declined=total - pending - accepted)
+
+    def to_dict(self):
+        return {
+            'total_interests': self.total,
+            'pending': self.pending,
+            'accepted': self.accepted,
+            'declined': self.declined
+        }
+
+
+def _status_count(status):
+    return func.sum(case((JobInterest.status == status, 1), else_=0))
+
+
+def load_interest_summaries(db, job_ids: Iterable[int], professional_id: Optional[int] = None) -> Dict[int, InterestSummary]:
+    """
+    Return {job_id: InterestSummary} for every requested job id.
+    Jobs without interests get an empty summary, so callers can index the result directly.
+    """
+    job_ids = list({job_id for job_id in job_ids if job_id is not None})
+    summaries = {job_id: InterestSummary() for job_id in job_ids}
+    if not job_ids:
+        return summaries
+
+    columns = [
+        JobInterest.job_id,
+        func.count(JobInterest.id),
+        _status_count(InterestStatus.PENDING),
+        _status_count(InterestStatus.ACCEPTED),
+        _status_count(InterestStatus.DECLINED)
+    ]
+    if professional_id:
+        columns.append(func.max(case((JobInterest.professional_id == professional_id, 1), else_=0)))
+
+    rows = db.query(*columns).filter(JobInterest.job_id.in_(job_ids)).group_by(JobInterest.job_id).all()
+
+    for row in rows:
+        summaries[row[0]] = InterestSummary(
+            total=int(row[1] or 0),
+            pending=int(row[2] or 0),
+            accepted=int(row[3] or 0),
+            declined=int(row[4] or 0),
+            viewer_interested=bool(row[5]) if professional_id else False
+        )
+    return summaries
+
+
+def load_viewer_interest_job_ids(db, job_ids: Iterable[int], professional_id: Optional[int]) -> Set[int]:
+    """Subset of job_ids the professional has already expressed interest in"""
+    job_ids = list({job_id for job_id in job_ids if job_id is not None})
+    if not professional_id or not job_ids:
+        return set()
+    rows = db.query(JobInterest.job_id).filter(
+        JobInterest.professional_id == professional_id,
+        JobInterest.job_id.in_(job_ids)
+    ).all()
+    return {job_id for (job_id,) in rows}
+
+
+def annotate_viewer_interest(db, gigs, professional_id: Optional[int] = None) -> None:
+    """
+    Set gig.user_has_interest on a list of loaded jobs with one query.
+    gig.interest_count is read straight from the denormalized jobs column.
+    """
+    interested_job_ids = load_viewer_interest_job_ids(db, [gig.id for gig in gigs], professional_id)
+    for gig in gigs:
+        gig.user_has_interest = gig.id in interested_job_ids
@@ -0,0 +1,95 @@
+"""
+Job Facets Service
+Counts of open, unexpired jobs per location, sector, job type and urgency for the browse filters.
+
+Facets are computed with one grouped query and kept in a small in-process cache. The cache
+expires after FACET_TTL_SECONDS and is dropped as soon as a session commits a job write.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event, func
+from app.database import SessionLocal
+from app.models.job import Job, JobStatus
+
+FACET_TTL_SECONDS = 300
+
+_DIRTY_KEY = 'job_facets_dirty'
+
+_cache = {'expires_at': 0.0, 'facets': None}
+_cache_lock = threading.Lock()
+
+
+def _compute_facets(db):
+    rows = db.query(
+        Job.location, Job.sector, Job.job_type, Job.is_urgent, func.count(Job.id)
+    ).filter(
+        Job.status == JobStatus.OPEN,
+        (Job.expiry_date == None) | (Job.expiry_date > datetime.utcnow())
+    ).group_by(Job.location, Job.sector, Job.job_type, Job.is_urgent).all()
+
+    locations, sectors, job_types = Counter(), Counter(), Counter()
+    urgent = total = 0
+    for location, sector, job_type, is_urgent, count in rows:
+        total += count
+        if location:
+            locations[location] += count
+        if sector:
+            sectors[sector] += count
+        if job_type:
+            job_types[job_type] += count
+        if is_urgent:
+            urgent += count
+
+    def _ordered(counter):
+        return [{'value': value, 'count': count}
+                for value, count in sorted(counter.items(), key=lambda item: (-item[1], item[0]))]
+
+    return {
+        'locations': _ordered(locations),
+        'sectors': _ordered(sectors),
+        'job_types': _ordered(job_types),
+        'urgent': urgent,
+        'total': total
+    }
+
+
+def get_job_facets(db):
+    """Return cached facets, recomputing them when expired or invalidated"""
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache['facets'] is not None and _cache['expires_at'] > now:
+            return _cache['facets']
+
+    facets = _compute_facets(db)
+    with _cache_lock:
+        _cache['facets'] = facets
+        _cache['expires_at'] = now + FACET_TTL_SECONDS
+    return facets
+
+
+def invalidate_job_facets():
+    with _cache_lock:
+        _cache['facets'] = None
+        _cache['expires_at'] = 0.0
+
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _track_job_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Job):
+            session.info[_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _invalidate_after_job_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        invalidate_job_facets()
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _discard_job_writes(session):
+    session.info.pop(_DIRTY_KEY, None)
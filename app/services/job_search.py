@@ -0,0 +1,178 @@
+"""
+Job Search Service
+Pluggable full-text search over jobs (title, description, location, sector, job_type).
+
+- PostgreSQL: GIN index on a weighted tsvector expression, ranked with ts_rank
+- SQLite: FTS5 external-content table kept in sync by triggers, ranked with bm25
+- Fallback: the original ILIKE '%term%' filters when neither index is available
+
+Both indexes follow job inserts and updates inside the database itself, so no
+application code has to remember to re-index.
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text, func, literal_column, or_, Float, Integer
+from app.config import settings
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(term: str) -> List[str]:
+    return _TOKEN_RE.findall(term or '')[:10]
+
+
+class LikeSearchBackend:
+    """Unindexed fallback matching the original substring search"""
+
+    name = 'like'
+
+    def ensure_index(self, engine) -> None:
+        return None
+
+    def apply(self, query, term: str) -> Tuple[object, Optional[object]]:
+        """Filter query by term. Returns (query, rank_order_clause or None)."""
+        pattern = f'%{term}%'
+        return query.filter(or_(
+            Job.title.ilike(pattern),
+            Job.description.ilike(pattern),
+            Job.location.ilike(pattern)
+        )), None
+
+
+class PostgresSearchBackend:
+    """tsvector + GIN index; the index expression must match the query expression exactly"""
+
+    name = 'postgres'
+    INDEX_NAME = 'ix_jobs_search_vector'
+
+    @staticmethod
+    def vector_sql(prefix: str = '') -> str:
+        return (
+            f"setweight(to_tsvector('simple', coalesce({prefix}title, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce({prefix}sector, '') || ' ' || coalesce({prefix}job_type, '')), 'B') || "
+            f"setweight(to_tsvector('simple', coalesce({prefix}location, '')), 'B') || "
+            f"setweight(to_tsvector('simple', coalesce({prefix}description, '')), 'C')"
+        )
+
+    def ensure_index(self, engine) -> None:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.INDEX_NAME} ON jobs USING GIN (({self.vector_sql()}))"
+            ))
+
+    def apply(self, query, term: str):
+        tokens = _tokens(term)
+        if not tokens:
+            return query, None
+        ts_query = func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        vector = literal_column(f"({self.vector_sql('jobs.')})")
+        rank = func.ts_rank(vector, ts_query)
+        return query.filter(vector.op('@@')(ts_query)), rank.desc()
+
+
+class SQLiteFTSSearchBackend:
+    """FTS5 external-content table over jobs, maintained by insert/update/delete triggers"""
+
+    name = 'sqlite_fts'
+    COLUMNS = ('title', 'description', 'location', 'sector', 'job_type')
+
+    def ensure_index(self, engine) -> None:
+        columns = ', '.join(self.COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in self.COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in self.COLUMNS)
+        with engine.begin() as conn:
+            # Triggers disappear with the jobs table, so a missing trigger means the index is stale
+            in_sync = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'jobs_fts_ai'"
+            )).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5({columns}, content='jobs', content_rowid='id')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN "
+                f"INSERT INTO jobs_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN "
+                f"INSERT INTO jobs_fts(jobs_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF {columns} ON jobs BEGIN "
+                f"INSERT INTO jobs_fts(jobs_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO jobs_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            ))
+            if not in_sync:
+                # Index rows that predate the FTS table or its triggers
+                conn.execute(text("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')"))
+
+    def apply(self, query, term: str):
+        tokens = _tokens(term)
+        if not tokens:
+            return query, None
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        matches = text(
+            "SELECT rowid AS job_id, bm25(jobs_fts, 10.0, 1.0, 5.0, 5.0, 5.0) AS rank "
+            "FROM jobs_fts WHERE jobs_fts MATCH :match"
+        ).bindparams(match=match).columns(job_id=Integer, rank=Float).subquery('job_search')
+        # bm25 scores are negative; lower means more relevant
+        return query.join(matches, matches.c.job_id == Job.id), matches.c.rank.asc()
+
+
+_backend = None
+
+
+def _sqlite_has_fts5(engine) -> bool:
+    try:
+        with engine.connect() as conn:
+            return bool(conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+    except Exception:
+        return False
+
+
+def _choose_backend(engine):
+    configured = (settings.SEARCH_BACKEND or 'auto').lower()
+    dialect = engine.dialect.name
+    if configured == 'like':
+        return LikeSearchBackend()
+    if configured in ('auto', 'postgres') and dialect == 'postgresql':
+        return PostgresSearchBackend()
+    if configured in ('auto', 'sqlite_fts') and dialect == 'sqlite' and _sqlite_has_fts5(engine):
+        return SQLiteFTSSearchBackend()
+    return LikeSearchBackend()
+
+
+def init_search_backend(engine):
+    """Pick the backend for this database and make sure its index exists. Falls back to LIKE on failure."""
+    global _backend
+    backend = _choose_backend(engine)
+    try:
+        backend.ensure_index(engine)
+    except Exception as e:
+        logger.error(f"Failed to set up {backend.name} job search index, falling back to LIKE: {e}")
+        backend = LikeSearchBackend()
+    _backend = backend
+    return backend
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        from app.database import engine
+        init_search_backend(engine)
+    return _backend
+
+
+def apply_job_search(query, term: str):
+    """
+    Restrict a Job query to rows matching term.
+    Returns (query, rank_order_clause); the clause is None when the backend cannot rank.
+    """
+    term = (term or '').strip()
+    if not term:
+        return query, None
+    return get_search_backend().apply(query, term)
@@ -0,0 +1,210 @@
+"""
+Metrics Rollup Service
+Maintains metrics_daily, the per-day buckets behind the dashboards' time series.
+
+Each bucket holds a count and an amount for (day, dimension, entity):
+- revenue: completed payments by completion day (count and amount), platform-wide
+- signups: new users, platform-wide
+- gigs: new jobs, platform-wide
+- interests: new job interests, platform-wide and per institution
+
+A day is rebuilt by one grouped query per dimension over that day's rows only, so refreshing
+costs the same however large the source tables grow. start_metrics_refresher(), started with the
+other background workers, calls refresh() every ROLLUP_REFRESH_SECONDS: it rebuilds today, and
+yesterday as well during the first ROLLUP_LATE_WINDOW after midnight, for rows committed after
+their timestamp. Dashboards only read the rollups. scripts/rollup_metrics.py backfills history
+and can run the refresh as its own process.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models.metrics_daily import MetricsDaily
+from app.models.user import User
+from app.models.job import Job
+from app.models.job_interest import JobInterest
+from app.models.payment import Payment, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_REFRESH_SECONDS = 60
+ROLLUP_LATE_WINDOW = timedelta(minutes=15)
+BACKFILL_CHUNK_DAYS = 90
+
+PLATFORM = ('platform', 0)
+
+def _as_date(value) -> date:
+    # func.date returns a date on Postgres and an ISO string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _bucket_sources(db, start: datetime, end: datetime):
+    """Yield (dimension, rows of (day, entity_type, entity_id, count, amount)) for [start, end)"""
+    created = func.date(User.created_at)
+    yield 'signups', db.query(created, func.count(User.id)).filter(
+        User.created_at >= start, User.created_at < end
+    ).group_by(created).all()
+
+    created = func.date(Job.created_at)
+    yield 'gigs', db.query(created, func.count(Job.id)).filter(
+        Job.created_at >= start, Job.created_at < end
+    ).group_by(created).all()
+
+    completed = func.date(Payment.completed_at)
+    yield 'revenue', db.query(completed, func.count(Payment.id), func.sum(Payment.amount)).filter(
+        Payment.status == TransactionStatus.COMPLETED,
+        Payment.completed_at >= start, Payment.completed_at < end
+    ).group_by(completed).all()
+
+    created = func.date(JobInterest.created_at)
+    rows = db.query(created, Job.institution_id, func.count(JobInterest.id)).join(
+        Job, Job.id == JobInterest.job_id
+    ).filter(
+        JobInterest.created_at >= start, JobInterest.created_at < end
+    ).group_by(created, Job.institution_id).all()
+    yield 'interests', rows
+
+
+def rebuild_days(db, first_day: date, last_day: date) -> int:
+    """
+    Recompute every bucket for first_day..last_day (inclusive) in the caller's transaction.
+    Returns the number of buckets written.
+    """
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    now = datetime.utcnow()
+
+    buckets = []
+    for dimension, rows in _bucket_sources(db, start, end):
+        if dimension == 'interests':
+            platform: Dict[date, int] = {}
+            for day, institution_id, count in rows:
+                day = _as_date(day)
+                platform[day] = platform.get(day, 0) + count
+                buckets.append((day, dimension, 'institution', institution_id, count, 0.0))
+            buckets.extend((day, dimension) + PLATFORM + (count, 0.0) for day, count in platform.items())
+            continue
+        for row in rows:
+            amount = float(row[2] or 0) if len(row) > 2 else 0.0
+            buckets.append((_as_date(row[0]), dimension) + PLATFORM + (row[1], amount))
+
+    db.query(MetricsDaily).filter(MetricsDaily.day >= first_day, MetricsDaily.day <= last_day).delete(
+        synchronize_session=False
+    )
+    if buckets:
+        db.execute(insert(MetricsDaily), [{
+            'day': day, 'dimension': dimension, 'entity_type': entity_type, 'entity_id': entity_id,
+            'event_count': count, 'amount_sum': amount, 'updated_at': now
+        } for day, dimension, entity_type, entity_id, count, amount in buckets])
+    return len(buckets)
+
+
+def backfill(db, since: Optional[date] = None, until: Optional[date] = None,
+             chunk_days: int = BACKFILL_CHUNK_DAYS) -> int:
+    """
+    Rebuild all buckets from `since` (default: the oldest source row) through `until` (default:
+    today), committing every chunk_days days. Returns the number of buckets written.
+    """
+    until = until or datetime.utcnow().date()
+    if since is None:
+        oldest = [value for value in (
+            db.query(func.min(User.created_at)).scalar(),
+            db.query(func.min(Job.created_at)).scalar(),
+            db.query(func.min(JobInterest.created_at)).scalar(),
+            db.query(func.min(Payment.completed_at)).scalar()
+        ) if value is not None]
+        if not oldest:
+            return 0
+        since = min(oldest).date()
+
+    written = 0
+    first_day = since
+    while first_day <= until:
+        last_day = min(first_day + timedelta(days=chunk_days - 1), until)
+        written += rebuild_days(db, first_day, last_day)
+        db.commit()
+        first_day = last_day + timedelta(days=1)
+    return written
+
+
+def refresh_recent(db, now: Optional[datetime] = None) -> int:
+    """Rebuild the buckets from the day ROLLUP_LATE_WINDOW ago through today"""
+    now = now or datetime.utcnow()
+    return rebuild_days(db, (now - ROLLUP_LATE_WINDOW).date(), now.date())
+
+
+def refresh() -> bool:
+    """refresh_recent() in a separate session and transaction. Returns False if it failed."""
+    db = SessionLocal()
+    try:
+        refresh_recent(db)
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another worker rebuilt the same buckets concurrently; theirs are as fresh
+        db.rollback()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Metrics rollup refresh failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+_refresher_lock = threading.Lock()
+_refresher_started = False
+
+
+def _refresh_loop(interval: float) -> None:
+    while True:
+        refresh()
+        time.sleep(interval)
+
+
+def start_metrics_refresher(socketio=None, interval: float = ROLLUP_REFRESH_SECONDS) -> bool:
+    """Refresh the recent buckets every `interval` seconds (once per process)"""
+    global _refresher_started
+    with _refresher_lock:
+        if _refresher_started:
+            return False
+        _refresher_started = True
+    if socketio is not None:
+        socketio.start_background_task(_refresh_loop, interval)
+    else:
+        threading.Thread(target=_refresh_loop, args=(interval,), name='metrics-refresher', daemon=True).start()
+    return True
+
+
+def daily_series(db, dimension: str, first_day: date, last_day: date,
+                 entity: Tuple[str, int] = PLATFORM) -> Dict[date, Tuple[int, float]]:
+    """{day: (count, amount)} for the days in range that have a bucket"""
+    rows = db.query(MetricsDaily.day, MetricsDaily.event_count, MetricsDaily.amount_sum).filter(
+        MetricsDaily.dimension == dimension,
+        MetricsDaily.entity_type == entity[0],
+        MetricsDaily.entity_id == entity[1],
+        MetricsDaily.day >= first_day,
+        MetricsDaily.day <= last_day
+    ).order_by(MetricsDaily.day).all()
+    return {day: (count, amount) for day, count, amount in rows}
+
+
+def multi_series(db, dimensions: List[str], first_day: date, last_day: date,
+                 entity: Tuple[str, int] = PLATFORM) -> Dict[str, Dict[date, Tuple[int, float]]]:
+    """daily_series for several dimensions in one query"""
+    series = {dimension: {} for dimension in dimensions}
+    rows = db.query(MetricsDaily.dimension, MetricsDaily.day, MetricsDaily.event_count, MetricsDaily.amount_sum).filter(
+        MetricsDaily.dimension.in_(dimensions),
+        MetricsDaily.entity_type == entity[0],
+        MetricsDaily.entity_id == entity[1],
+        MetricsDaily.day >= first_day,
+        MetricsDaily.day <= last_day
+    ).order_by(MetricsDaily.day).all()
+    for dimension, day, count, amount in rows:
+        series[dimension][day] = (count, amount)
+    return series
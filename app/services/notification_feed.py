@@ -0,0 +1,112 @@
+"""
+Notification Feed Service
+Cursor-paginated notification feed shared by the notifications page and /api/notifications.
+
+Each page is one query for the notifications (with their job interest, job and professional
+joined in) plus one IN query for the CVs and certificates of every professional on the page.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from app.models.notification import Notification
+from app.models.job_interest import JobInterest
+from app.models.document import Document, DocumentType
+from app.services.pagination import KeysetPage, paginate_keyset
+
+FEED_ORDER = [(Notification.created_at, True), (Notification.id, True)]
+
+
+def notification_query(db, user_id: int, active_role: Optional[str] = None):
+    """Notifications for user_id, limited to active_role plus role-agnostic ones when a role is given"""
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    if active_role:
+        query = query.filter(or_(
+            Notification.role_context == active_role,
+            Notification.role_context == None  # Include notifications for all roles
+        ))
+    return query
+
+
+def load_professional_documents(db, professional_ids: Iterable[int]) -> Dict[int, Dict[str, object]]:
+    """Return {professional_id: {'cv': Document|None, 'certificates': [Document]}} from one query"""
+    professional_ids = list({pid for pid in professional_ids if pid is not None})
+    documents = {pid: {'cv': None, 'certificates': []} for pid in professional_ids}
+    if not professional_ids:
+        return documents
+
+    rows = db.query(Document).filter(
+        Document.professional_id.in_(professional_ids),
+        Document.document_type.in_([DocumentType.CV, DocumentType.CERTIFICATE])
+    ).order_by(Document.id).all()
+
+    for document in rows:
+        entry = documents[document.professional_id]
+        if document.document_type == DocumentType.CV:
+            if entry['cv'] is None:
+                entry['cv'] = document
+        else:
+            entry['certificates'].append(document)
+    return documents
+
+
+def _is_verified(professional) -> bool:
+    requires_registration = (professional.profession_category in ['Health', 'Formal']) if professional.profession_category else False
+    return bool(requires_registration and professional.registration_number and professional.issuing_body)
+
+
+def load_notification_feed(db, user_id: int, active_role: Optional[str] = None, cursor: Optional[str] = None,
+                           per_page: int = 20, with_documents: bool = True) -> KeysetPage:
+    """
+    Load one page of the user's notifications, newest first.
+    page.items is a list of dicts with 'notification', 'profile', 'documents' and 'is_verified'.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    query = notification_query(db, user_id, active_role).options(
+        joinedload(Notification.job_interest).joinedload(JobInterest.job),
+        joinedload(Notification.job_interest).joinedload(JobInterest.professional)
+    )
+    page = paginate_keyset(query, FEED_ORDER, cursor=cursor, per_page=per_page)
+
+    professionals = {}
+    for notif in page.items:
+        interest = notif.job_interest if notif.job_interest_id else None
+        if interest and interest.professional:
+            professionals[interest.professional.id] = interest.professional
+    documents = load_professional_documents(db, professionals) if with_documents else {}
+
+    items: List[dict] = []
+    for notif in page.items:
+        item = {
+            'notification': notif,
+            'profile': None,
+            'documents': {'cv': None, 'certificates': []},
+            'is_verified': False
+        }
+        interest = notif.job_interest if notif.job_interest_id else None
+        if interest and interest.professional:
+            professional = interest.professional
+            item['profile'] = professional
+            item['is_verified'] = _is_verified(professional)
+            item['documents'] = documents.get(professional.id, item['documents'])
+        items.append(item)
+
+    page.items = items
+    return page
+
+
+def count_unread(db, user_id: int, active_role: Optional[str] = None) -> int:
+    return notification_query(db, user_id, active_role).filter(Notification.is_read == False).count()
+
+
+def serialize_notification(notif: Notification) -> dict:
+    data = {
+        'id': notif.id,
+        'title': notif.title,
+        'message': notif.message,
+        'is_read': notif.is_read,
+        'created_at': notif.created_at.isoformat()
+    }
+    if notif.job_interest_id:
+        data['job_interest_id'] = notif.job_interest_id
+    return data
@@ -0,0 +1,215 @@
+"""
+Notification Outbox Service
+Transactional outbox for Socket.IO events.
+
+Routes call enqueue_emit inside their database transaction instead of emitting directly, so an
+event is stored only if the change it announces commits. A background dispatcher drains the
+outbox in batches and emits, keeping request latency independent of the number of recipients.
+
+Dispatchers claim a batch with one UPDATE before emitting, so several workers (or a separate
+dispatcher process) can drain the same table without sending a row twice. A failed emit is
+retried with exponential backoff (next_attempt_at) and dead-lettered with failed_at after
+OUTBOX_MAX_ATTEMPTS; dead letters are kept for inspection rather than pruned.
+"""
+import json
+import logging
+import threading
+import uuid
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Tuple
+
+from sqlalchemy import event, insert, or_
+from app.database import SessionLocal
+from app.models.notification_outbox import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_SECONDS = 2.0
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BASE_BACKOFF = timedelta(seconds=5)
+OUTBOX_MAX_BACKOFF = timedelta(minutes=5)
+OUTBOX_RETENTION = timedelta(days=1)
+OUTBOX_PRUNE_SECONDS = 3600
+
+_PENDING_KEY = 'notification_outbox_pending'
+
+
+def enqueue_emit(db, event_name: str, data: dict, room: str) -> None:
+    """Store a Socket.IO event in the caller's transaction; it is emitted after commit"""
+    db.add(NotificationOutbox(event=event_name, room=room, payload=json.dumps(data, default=str)))
+    db.info[_PENDING_KEY] = True
+
+
+def enqueue_user_emit(db, user_id: int, event_name: str, data: dict) -> None:
+    enqueue_emit(db, event_name, data, f'user_{user_id}')
+
+
+def enqueue_many(db, events: Iterable[Tuple[str, dict, str]]) -> int:
+    """
+    Store many (event_name, data, room) events with one multi-row INSERT in the caller's
+    transaction. Returns the number of events queued.
+    """
+    now = datetime.utcnow()
+    rows = [{'event': event_name, 'room': room, 'payload': json.dumps(data, default=str),
+             'attempts': 0, 'created_at': now} for event_name, data, room in events]
+    if not rows:
+        return 0
+    db.execute(insert(NotificationOutbox), rows)
+    db.info[_PENDING_KEY] = True
+    return len(rows)
+
+
+def _emit(event_name: str, data: dict, room: str) -> None:
+    from app.sockets import get_socketio
+    socketio = get_socketio()
+    if socketio is None:
+        raise RuntimeError("SocketIO not initialized")
+    socketio.emit(event_name, data, room=room, namespace='/')
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(OUTBOX_BASE_BACKOFF * (2 ** max(attempts - 1, 0)), OUTBOX_MAX_BACKOFF)
+
+
+def _due_filter(now: datetime):
+    return (
+        NotificationOutbox.dispatched_at == None,
+        or_(NotificationOutbox.next_attempt_at == None, NotificationOutbox.next_attempt_at <= now)
+    )
+
+
+def _claim_batch(db, batch_size: int):
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    pending_ids = db.query(NotificationOutbox.id).filter(
+        *_due_filter(now)
+    ).order_by(NotificationOutbox.id).limit(batch_size).scalar_subquery()
+    claimed = db.query(NotificationOutbox).filter(
+        NotificationOutbox.id.in_(pending_ids),
+        *_due_filter(now)
+    ).update({
+        NotificationOutbox.dispatched_at: now,
+        NotificationOutbox.claim_token: token
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return []
+    return db.query(NotificationOutbox).filter(
+        NotificationOutbox.claim_token == token
+    ).order_by(NotificationOutbox.id).all()
+
+
+def dispatch_pending(db, emit: Optional[Callable[[str, dict, str], None]] = None,
+                     batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Claim and emit one batch of due events. Failed emits go back to the queue after a backoff
+    until they reach OUTBOX_MAX_ATTEMPTS, then are dead-lettered. Returns the number of rows claimed.
+    """
+    emit = emit or _emit
+    rows = _claim_batch(db, batch_size)
+    for row in rows:
+        try:
+            emit(row.event, json.loads(row.payload), row.room)
+        except Exception as e:
+            now = datetime.utcnow()
+            row.attempts += 1
+            row.last_error = str(e)
+            if row.attempts < OUTBOX_MAX_ATTEMPTS:
+                row.dispatched_at = None
+                row.claim_token = None
+                row.next_attempt_at = now + _backoff(row.attempts)
+            else:
+                row.failed_at = now
+            logger.error(f"Failed to emit outbox event {row.id} ({row.event} to {row.room}): {e}")
+    if rows:
+        db.commit()
+    return len(rows)
+
+
+def drain_outbox(emit: Optional[Callable[[str, dict, str], None]] = None,
+                 batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Dispatch batches until the outbox is empty. Returns the number of rows claimed."""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            claimed = dispatch_pending(db, emit=emit, batch_size=batch_size)
+            total += claimed
+            if claimed < batch_size:
+                return total
+    finally:
+        db.close()
+
+
+def prune_outbox(db, retention: timedelta = OUTBOX_RETENTION) -> int:
+    """Delete events dispatched more than `retention` ago (not dead letters). Returns the number of rows removed."""
+    removed = db.query(NotificationOutbox).filter(
+        NotificationOutbox.dispatched_at != None,
+        NotificationOutbox.failed_at == None,
+        NotificationOutbox.dispatched_at < datetime.utcnow() - retention
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+class OutboxDispatcher:
+    """Background loop that drains the outbox whenever a commit enqueues events, and on a timer"""
+
+    def __init__(self, poll_interval: float = OUTBOX_POLL_SECONDS, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self, start_background_task: Optional[Callable] = None) -> bool:
+        """Start the loop once per process; start_background_task lets Socket.IO pick thread or greenlet"""
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+        if start_background_task:
+            start_background_task(self._run)
+        else:
+            threading.Thread(target=self._run, name='notification-outbox', daemon=True).start()
+        return True
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        next_prune = time.monotonic() + OUTBOX_PRUNE_SECONDS
+        while True:
+            try:
+                drain_outbox(batch_size=self.batch_size)
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + OUTBOX_PRUNE_SECONDS
+                    db = SessionLocal()
+                    try:
+                        prune_outbox(db)
+                    finally:
+                        db.close()
+            except Exception as e:
+                logger.error(f"Notification outbox dispatch failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+dispatcher = OutboxDispatcher()
+
+
+def start_outbox_dispatcher(socketio=None) -> bool:
+    return dispatcher.start(socketio.start_background_task if socketio is not None else None)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _wake_dispatcher_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        dispatcher.wake()
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _discard_pending_flag(session):
+    session.info.pop(_PENDING_KEY, None)
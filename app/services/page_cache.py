@@ -0,0 +1,318 @@
+"""
+Page Cache Service
+Caches rendered-page fragments (counts, short lists) that many anonymous visitors share.
+
+Fragments are stored under keys such as 'home:stats' with a TTL, and dropped as soon as a session
+commits a write to the columns a fragment is built from (see invalidate_on), whether flushed or
+run as a bulk UPDATE/DELETE; bookkeeping updates to other columns of the same rows leave the
+cache alone. Concurrent misses on one key in a process wait for a single computation, so a
+traffic spike on a cold key costs one round of queries instead of one per request.
+
+The backend follows PAGE_CACHE_URL:
+- unset or memory://: in-process LRU (per worker, bounded by PAGE_CACHE_MAX_ENTRIES)
+- redis:// or rediss://: Redis keys shared by every worker; values must be JSON-serializable
+Hit and miss counters are kept per process and reported by stats().
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import event, inspect
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_ENTRIES = 1024
+
+_DIRTY_KEY = 'page_cache_dirty'
+
+_MISSING = object()
+
+
+class InMemoryPageCache:
+    """LRU of (expires_at, value) entries for a single process"""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= now:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisPageCache:
+    """Fragments in Redis (JSON with SETEX), shared by all workers"""
+
+    backend = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'qgig-page-cache'):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.evictions = 0  # Redis evicts on its own maxmemory policy
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str):
+        try:
+            raw = self._redis.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Page cache read failed for {key}: {e}")
+            return _MISSING
+        return _MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value, ttl: float) -> None:
+        try:
+            self._redis.setex(self._key(key), max(1, int(ttl)), json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Page cache write failed for {key}: {e}")
+
+    def delete_prefix(self, prefix: str) -> None:
+        try:
+            keys = list(self._redis.scan_iter(match=self._key(prefix) + '*'))
+            if keys:
+                self._redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Page cache invalidation failed for {prefix}: {e}")
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class PageCache:
+    """Fragment cache with hit/miss counters, single-flight misses and write invalidation"""
+
+    def __init__(self, store, default_ttl: float = DEFAULT_TTL_SECONDS):
+        self.store = store
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # Per in-flight key, bumped by invalidations of a matching prefix so a computation that
+        # raced one is not stored (other keys keep caching)
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None):
+        value = self.store.get(key)
+        if value is not _MISSING:
+            self._count(True)
+            return value
+
+        lock = self._key_lock(key)
+        with lock:
+            try:
+                # Another request may have filled the key while this one waited
+                value = self.store.get(key)
+                if value is not _MISSING:
+                    self._count(True)
+                    return value
+                self._count(False)
+                with self._lock:
+                    generation = self._generations.setdefault(key, 0)
+                value = compute()
+                with self._lock:
+                    current = self._generations.get(key) == generation
+                if current:
+                    self.store.set(key, value, self.default_ttl if ttl is None else ttl)
+                return value
+            finally:
+                with self._lock:
+                    if self._key_locks.get(key) is lock:
+                        del self._key_locks[key]
+                        self._generations.pop(key, None)
+
+    def invalidate(self, prefix: str = '') -> None:
+        with self._lock:
+            for key in self._generations:
+                if key.startswith(prefix):
+                    self._generations[key] += 1
+            self.invalidations += 1
+        self.store.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.store.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.store.evictions,
+                'entries': self.store.size()
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+
+def create_page_cache(url: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                      max_entries: int = DEFAULT_MAX_ENTRIES, prefix: str = 'qgig-page-cache') -> PageCache:
+    """Page cache for a PAGE_CACHE_URL"""
+    url = (url or '').strip()
+    if url.startswith(('redis://', 'rediss://')):
+        return PageCache(RedisPageCache(url, prefix=prefix), default_ttl=ttl)
+    if url and not url.startswith('memory://'):
+        logger.warning(f"Unsupported PAGE_CACHE_URL {url}; using the in-process cache")
+    return PageCache(InMemoryPageCache(max_entries), default_ttl=ttl)
+
+
+page_cache = create_page_cache()
+
+
+def configure_page_cache(url: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                         max_entries: int = DEFAULT_MAX_ENTRIES) -> PageCache:
+    """Replace the process-wide cache (called by create_app)"""
+    global page_cache
+    page_cache = create_page_cache(url, ttl=ttl, max_entries=max_entries)
+    return page_cache
+
+
+def cached(key: str, compute: Callable[[], Any], ttl: Optional[float] = None):
+    """Return the cached value of `key`, calling compute() on a miss"""
+    return page_cache.get_or_compute(key, compute, ttl)
+
+
+def invalidate(prefix: str = '') -> None:
+    """Drop every fragment whose key starts with `prefix` (all of them by default)"""
+    page_cache.invalidate(prefix)
+
+
+def stats() -> dict:
+    return page_cache.stats()
+
+
+Prefix = Union[str, Callable[[Any], Optional[str]]]
+
+# model class -> [(key prefix or callable returning the prefix for a written row, watched columns)]
+_watched: Dict[type, List[Tuple[Prefix, Optional[Tuple[str, ...]]]]] = {}
+
+
+def invalidate_on(model: type, *prefixes: Prefix, columns: Optional[Iterable[str]] = None) -> None:
+    """
+    Drop the fragments under `prefixes` whenever a committed flush inserted or deleted a `model`
+    row, or updated one of `columns` (any column when None; inserts and deletes only when empty).
+    A prefix can be a callable taking the written row, for per-entity fragments (None skips the row).
+    Bulk UPDATE and DELETE statements run through a session count too; a callable then gets each
+    row the statement matches, loaded before it runs. Writes outside SessionLocal go unnoticed.
+    """
+    columns = tuple(columns) if columns is not None else None
+    entries = _watched.setdefault(model, [])
+    entries.extend((prefix, columns) for prefix in prefixes if (prefix, columns) not in entries)
+
+
+def _updated(obj, columns: Optional[Tuple[str, ...]]) -> bool:
+    if columns is None:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _track_watched_writes(session, flush_context):
+    if not _watched:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        entries = _watched.get(type(obj))
+        if not entries:
+            continue
+        written = obj in session.new or obj in session.deleted
+        for prefix, columns in entries:
+            if not written and not _updated(obj, columns):
+                continue
+            if callable(prefix):
+                prefix = prefix(obj)
+            if prefix is not None:
+                session.info.setdefault(_DIRTY_KEY, set()).add(prefix)
+
+
+@event.listens_for(SessionLocal, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state):
+    # query(...).update() / .delete() and update()/delete() statements bypass the flush
+    if not _watched or not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    entries = _watched.get(mapper.class_) if mapper is not None else None
+    if not entries:
+        return
+    statement = orm_execute_state.statement
+    assigned = None
+    if orm_execute_state.is_update:
+        assigned = {getattr(column, 'key', column) for column in (statement._values or {})}
+
+    session = orm_execute_state.session
+    rows = None
+    for prefix, columns in entries:
+        if assigned is not None and columns is not None and not assigned.intersection(columns):
+            continue
+        if not callable(prefix):
+            session.info.setdefault(_DIRTY_KEY, set()).add(prefix)
+            continue
+        if rows is None:
+            # Per-entity prefixes are resolved on the matched rows as they are before the statement
+            query = session.query(mapper.class_)
+            rows = (query.filter(statement.whereclause) if statement.whereclause is not None else query).all()
+        for row in rows:
+            row_prefix = prefix(row)
+            if row_prefix is not None:
+                session.info.setdefault(_DIRTY_KEY, set()).add(row_prefix)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _invalidate_after_commit(session):
+    for prefix in session.info.pop(_DIRTY_KEY, ()):
+        invalidate(prefix)
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _discard_watched_writes(session):
+    session.info.pop(_DIRTY_KEY, None)
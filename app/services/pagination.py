@@ -0,0 +1,198 @@
+"""
+Pagination Service
+Keyset (cursor) pagination shared by gig browsing, list APIs and dashboard lists.
+
+Pages are addressed by opaque cursors that encode the sort key of the first/last row,
+so fetching page N costs the same as fetching page 1. Totals are estimates served from
+a short-lived in-process count cache instead of a COUNT(*) per request. Count keys include
+user-supplied filters (search text), so the cache is an LRU bounded by COUNT_CACHE_MAX_ENTRIES.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+from app.services.page_cache import InMemoryPageCache, PageCache
+
+COUNT_CACHE_TTL_SECONDS = 60
+COUNT_CACHE_MAX_ENTRIES = 512
+
+_count_cache = PageCache(InMemoryPageCache(COUNT_CACHE_MAX_ENTRIES), default_ttl=COUNT_CACHE_TTL_SECONDS)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or does not match the requested sort"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], direction: str = 'next', extra: Optional[Dict[str, Any]] = None) -> str:
+    payload = {'v': [_encode_value(v) for v in values], 'd': direction}
+    if extra:
+        payload['x'] = extra
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[List[Any], str, Dict[str, Any]]:
+    """Return (values, direction, extra) for a cursor produced by encode_cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(v) for v in payload['v']]
+        direction = payload.get('d', 'next')
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return values, direction, payload.get('x') or {}
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+
+
+class KeysetPage:
+    """One page of results plus the cursors needed to move forwards and backwards"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, estimated_total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.estimated_total = estimated_total
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev,
+            'limit': self.per_page,
+            'estimated_total': self.estimated_total
+        }
+
+
+def _after(order_by, values, reverse=False):
+    """
+    Row-value comparison "sort key comes after values" expanded into OR/AND so it works
+    for mixed directions and on every dialect:
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        forward = descending == reverse
+        step = column > values[i] if forward else column < values[i]
+        equal_prefix = [order_by[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, step) if equal_prefix else step)
+    return or_(*clauses)
+
+
+def _ordering(order_by, reverse=False):
+    return [
+        (column.desc() if descending != reverse else column.asc())
+        for column, descending in order_by
+    ]
+
+
+def _row_key(item, order_by):
+    return [getattr(item, column.key) for column, _ in order_by]
+
+
+def _sort_signature(order_by):
+    return ','.join(f"{'-' if descending else ''}{column.key}" for column, descending in order_by)
+
+
+def paginate_keyset(query, order_by: Sequence[Tuple[Any, bool]], cursor: Optional[str] = None,
+                    per_page: int = 20, estimated_total: Optional[int] = None) -> KeysetPage:
+    """
+    Fetch one page of query ordered by order_by, a list of (mapped column, descending) pairs.
+    The last pair must be a unique column (normally the primary key) so the order is total,
+    and sort columns must not be NULL.
+    """
+    order_by = list(order_by)
+    signature = {'s': _sort_signature(order_by)}
+    direction = 'next'
+    if cursor:
+        values, direction, extra = decode_cursor(cursor)
+        if len(values) != len(order_by) or extra.get('s') != signature['s']:
+            raise InvalidCursor("Cursor does not match the requested sort order")
+        query = query.filter(_after(order_by, values, reverse=direction == 'prev'))
+
+    rows = query.order_by(*_ordering(order_by, reverse=direction == 'prev')).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        more_after = has_more if direction == 'next' else True
+        more_before = bool(cursor) if direction == 'next' else has_more
+        if more_after:
+            next_cursor = encode_cursor(_row_key(rows[-1], order_by), 'next', signature)
+        if more_before:
+            prev_cursor = encode_cursor(_row_key(rows[0], order_by), 'prev', signature)
+    elif cursor and direction == 'next':
+        # Paged past the end (rows deleted meanwhile); offer the way back
+        prev_cursor = encode_cursor(values, 'prev', signature)
+
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, estimated_total)
+
+
+def paginate_ranked(query, order_clauses: Sequence[Any], cursor: Optional[str] = None,
+                    per_page: int = 20, estimated_total: Optional[int] = None) -> KeysetPage:
+    """
+    Cursor pagination for orderings that are not row attributes (e.g. search rank).
+    The cursor carries a bounded offset; use paginate_keyset whenever the sort key is a column.
+    """
+    offset = 0
+    if cursor:
+        _, _, extra = decode_cursor(cursor)
+        try:
+            offset = max(int(extra.get('offset', 0)), 0)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursor(f"Invalid cursor offset: {extra.get('offset')!r}") from e
+
+    rows = query.order_by(*order_clauses).offset(offset).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = encode_cursor([], 'next', {'offset': offset + per_page}) if has_more else None
+    prev_cursor = encode_cursor([], 'next', {'offset': max(offset - per_page, 0)}) if offset > 0 else None
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, estimated_total)
+
+
+def estimated_count(cache_key: str, count_fn: Callable[[], int], ttl: int = COUNT_CACHE_TTL_SECONDS) -> int:
+    """Return a cached COUNT for cache_key, recomputing it at most once per ttl seconds"""
+    return _count_cache.get_or_compute(cache_key, lambda: int(count_fn() or 0), ttl)
+
+
+def invalidate_counts(prefix: str = '') -> None:
+    """Drop cached counts whose key starts with prefix (all of them by default)"""
+    _count_cache.invalidate(prefix)
+
+
+def page_args(args, default_limit: int = 20, max_limit: int = 100) -> Tuple[Optional[str], int]:
+    """Read (cursor, limit) from request args, clamping limit to [1, max_limit]"""
+    cursor = args.get('cursor') or None
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        limit = default_limit
+    return cursor, max(1, min(limit, max_limit))
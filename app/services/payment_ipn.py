@@ -0,0 +1,193 @@
+"""
+Payment IPN Service
+Queues PesaPal IPN deliveries so the webhook can acknowledge them immediately.
+
+The webhook only records the delivery (one row per OrderTrackingId and notification type) and
+returns; a worker later checks the transaction status and applies it with the same transitions
+as the reconciler. Repeated deliveries of a notification that is queued or already applied only
+bump delivery_count, so PesaPal's retries cost one UPDATE and never a second status call. A
+delivery for a payment that is still pending after processing re-queues its row.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, or_
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models.payment import Payment, TransactionStatus
+from app.models.pesapal_ipn import PesapalIpnEvent
+from app.services.payment_reconciliation import (
+    apply_transaction_status, check_statuses, RECONCILE_CONCURRENCY, RECONCILE_LEASE
+)
+
+logger = logging.getLogger(__name__)
+
+IPN_BATCH_SIZE = 50
+IPN_MAX_ATTEMPTS = 8
+IPN_BASE_BACKOFF = timedelta(seconds=10)
+IPN_MAX_BACKOFF = timedelta(minutes=10)
+DEFAULT_NOTIFICATION_TYPE = 'IPNCHANGE'
+
+
+def ipn_fields(data: dict) -> dict:
+    """OrderTrackingId / OrderNotificationType / OrderMerchantReference from an IPN body or query string"""
+    return {
+        'order_tracking_id': data.get('OrderTrackingId') or data.get('orderTrackingId'),
+        'notification_type': (data.get('OrderNotificationType') or data.get('orderNotificationType')
+                              or DEFAULT_NOTIFICATION_TYPE),
+        'merchant_reference': data.get('OrderMerchantReference') or data.get('orderMerchantReference'),
+    }
+
+
+def _record_duplicate(db, order_tracking_id: str, notification_type: str) -> int:
+    key = (PesapalIpnEvent.order_tracking_id == order_tracking_id,
+           PesapalIpnEvent.notification_type == notification_type)
+    updated = db.query(PesapalIpnEvent).filter(*key).update(
+        {PesapalIpnEvent.delivery_count: PesapalIpnEvent.delivery_count + 1}, synchronize_session=False
+    )
+    if updated:
+        # Already processed but the payment is still pending: PesaPal has news, check again
+        payment_pending = exists().where(
+            Payment.pesapal_order_tracking_id == order_tracking_id,
+            Payment.status == TransactionStatus.PENDING
+        )
+        db.query(PesapalIpnEvent).filter(*key, PesapalIpnEvent.processed_at != None, payment_pending).update({
+            PesapalIpnEvent.processed_at: None,
+            PesapalIpnEvent.next_attempt_at: None,
+            PesapalIpnEvent.attempts: 0
+        }, synchronize_session=False)
+    return updated
+
+
+def record_ipn(db, data: dict) -> bool:
+    """
+    Store an IPN delivery and commit. Returns True for a new notification, False for a repeat.
+    Raises ValueError when OrderTrackingId is missing.
+    """
+    fields = ipn_fields(data)
+    if not fields['order_tracking_id']:
+        raise ValueError("Missing OrderTrackingId")
+
+    if _record_duplicate(db, fields['order_tracking_id'], fields['notification_type']):
+        db.commit()
+        return False
+
+    db.add(PesapalIpnEvent(payload=json.dumps(data), **fields))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        # The same notification arrived concurrently on another worker
+        db.rollback()
+        _record_duplicate(db, fields['order_tracking_id'], fields['notification_type'])
+        db.commit()
+        return False
+
+
+def _due_filter(now: datetime):
+    return (
+        PesapalIpnEvent.processed_at == None,
+        or_(PesapalIpnEvent.next_attempt_at == None, PesapalIpnEvent.next_attempt_at <= now)
+    )
+
+
+def claim_ipn_events(db, batch_size: int = IPN_BATCH_SIZE):
+    """Lease up to batch_size queued IPNs; returns [(event_id, order_tracking_id)]"""
+    now = datetime.utcnow()
+    candidate_ids = [event_id for (event_id,) in db.query(PesapalIpnEvent.id).filter(
+        *_due_filter(now)
+    ).order_by(PesapalIpnEvent.id).limit(batch_size).all()]
+    if not candidate_ids:
+        return []
+
+    lease_until = now + RECONCILE_LEASE
+    db.query(PesapalIpnEvent).filter(PesapalIpnEvent.id.in_(candidate_ids), *_due_filter(now)).update(
+        {PesapalIpnEvent.next_attempt_at: lease_until}, synchronize_session=False
+    )
+    db.commit()
+    return db.query(PesapalIpnEvent.id, PesapalIpnEvent.order_tracking_id).filter(
+        PesapalIpnEvent.id.in_(candidate_ids),
+        PesapalIpnEvent.next_attempt_at == lease_until
+    ).order_by(PesapalIpnEvent.id).all()
+
+
+def _retry(event: PesapalIpnEvent, error: str, now: datetime) -> None:
+    event.attempts += 1
+    event.last_error = error
+    if event.attempts >= IPN_MAX_ATTEMPTS:
+        # Give up; the reconciler still polls the payment if it exists
+        event.processed_at = now
+        event.next_attempt_at = None
+        logger.warning(f"Giving up on IPN {event.id} ({event.order_tracking_id}): {error}")
+    else:
+        event.next_attempt_at = now + min(IPN_BASE_BACKOFF * (2 ** (event.attempts - 1)), IPN_MAX_BACKOFF)
+
+
+def process_ipn_events(client=None, batch_size: int = IPN_BATCH_SIZE,
+                       concurrency: int = RECONCILE_CONCURRENCY) -> dict:
+    """
+    Apply one batch of queued IPNs. Payments that are no longer pending are marked processed
+    without calling PesaPal. Returns counts: {'processed', 'settled', 'retried'}.
+    """
+    summary = {'processed': 0, 'settled': 0, 'retried': 0}
+    db = SessionLocal()
+    try:
+        claimed = claim_ipn_events(db, batch_size)
+        if not claimed:
+            return summary
+
+        tracking_ids = sorted({order_tracking_id for _, order_tracking_id in claimed})
+        payments = {p.pesapal_order_tracking_id: p for p in db.query(Payment).filter(
+            Payment.pesapal_order_tracking_id.in_(tracking_ids)
+        ).all()}
+        to_check = [tid for tid in tracking_ids if tid in payments and payments[tid].status == TransactionStatus.PENDING]
+
+        if to_check and client is None:
+            from app.services.pesapal import PesaPal
+            client = PesaPal()
+        # Outbound calls run without holding a transaction open
+        results = dict(zip(to_check, check_statuses(client, to_check, concurrency)))
+
+        events = db.query(PesapalIpnEvent).filter(PesapalIpnEvent.id.in_([event_id for event_id, _ in claimed])).all()
+        now = datetime.utcnow()
+        for event in events:
+            payment = payments.get(event.order_tracking_id)
+            if payment is None:
+                # The IPN can beat initiate_payment's commit of the tracking id
+                _retry(event, 'Payment not found', now)
+                summary['retried'] += 1
+                continue
+
+            if event.order_tracking_id in results:
+                status_response, error = results.pop(event.order_tracking_id)
+                if error is not None:
+                    _retry(event, str(error), now)
+                    summary['retried'] += 1
+                    continue
+                payment.status_checked_at = now
+                if apply_transaction_status(db, payment, status_response):
+                    summary['settled'] += 1
+
+            event.processed_at = now
+            event.next_attempt_at = None
+            event.last_error = None
+            summary['processed'] += 1
+        db.commit()
+        return summary
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def drain_ipn_events(client=None, batch_size: int = IPN_BATCH_SIZE) -> int:
+    """Process batches until the queue has nothing due; returns the number of IPNs handled"""
+    handled = 0
+    while True:
+        summary = process_ipn_events(client=client, batch_size=batch_size)
+        batch = summary['processed'] + summary['retried']
+        handled += batch
+        if batch < batch_size:
+            return handled
@@ -0,0 +1,226 @@
+"""
+Payment Reconciliation Service
+Settles PENDING payments by polling PesaPal in the background instead of inside user requests.
+
+A reconciler periodically claims PENDING payments that have an order tracking id and are due for
+a check, queries GetTransactionStatus for them with bounded concurrency, and applies the same
+COMPLETED / FAILED / CANCELLED transitions as the IPN webhook. Payments that are still pending (or
+whose check failed) are retried with exponential backoff, so a payment that never receives an IPN
+still settles while a stuck one costs at most one call per RECONCILE_MAX_BACKOFF.
+
+The same loop processes the IPNs the webhook queues (app.services.payment_ipn).
+
+Claiming a batch pushes next_status_check_at forward by RECONCILE_LEASE with one UPDATE, so several
+workers can run the reconciler without checking the same payment twice.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import or_
+from app.database import SessionLocal
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 50
+RECONCILE_CONCURRENCY = 4
+RECONCILE_INTERVAL_SECONDS = 30.0
+RECONCILE_POLL_SECONDS = 2.0  # how often the loop picks up queued IPNs
+RECONCILE_BASE_BACKOFF = timedelta(seconds=30)
+RECONCILE_MAX_BACKOFF = timedelta(hours=1)
+RECONCILE_LEASE = timedelta(minutes=2)
+RECONCILE_MAX_AGE = timedelta(days=7)
+
+_FINAL_STATUSES = {
+    'completed': TransactionStatus.COMPLETED,
+    'failed': TransactionStatus.FAILED,
+    'cancelled': TransactionStatus.CANCELLED,
+}
+
+
+def apply_transaction_status(db, payment: Payment, status_response: dict) -> Optional[TransactionStatus]:
+    """
+    Apply a GetTransactionStatus response to a payment (the webhook and the reconciler share this).
+    Only PENDING payments change. Returns the new status, or None if the payment is unchanged.
+    """
+    payment_status = (status_response.get('payment_status_description') or '').lower()
+    new_status = _FINAL_STATUSES.get(payment_status)
+    if new_status is None or payment.status != TransactionStatus.PENDING:
+        return None
+
+    now = datetime.utcnow()
+    payment.status = new_status
+    if new_status == TransactionStatus.COMPLETED:
+        payment.completed_at = now
+        payment.pesapal_transaction_id = status_response.get('transaction_id') or status_response.get('confirmation_code')
+        payment.payment_method = status_response.get('payment_method')
+
+        gig = db.query(Job).filter(Job.id == payment.gig_id).first()
+        if gig:
+            gig.status = JobStatus.COMPLETED
+
+    payment.updated_at = now
+    payment.status_checked_at = now
+    payment.next_status_check_at = None
+    return new_status
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(RECONCILE_BASE_BACKOFF * (2 ** max(attempts - 1, 0)), RECONCILE_MAX_BACKOFF)
+
+
+def _due_filter(now: datetime):
+    return (
+        Payment.status == TransactionStatus.PENDING,
+        Payment.pesapal_order_tracking_id != None,
+        Payment.created_at >= now - RECONCILE_MAX_AGE,
+        or_(Payment.next_status_check_at == None, Payment.next_status_check_at <= now)
+    )
+
+
+def claim_due_payments(db, batch_size: int = RECONCILE_BATCH_SIZE):
+    """Lease up to batch_size due payments; returns [(payment_id, order_tracking_id)]"""
+    now = datetime.utcnow()
+    candidate_ids = [payment_id for (payment_id,) in db.query(Payment.id).filter(*_due_filter(now)).order_by(
+        Payment.next_status_check_at.is_(None).desc(), Payment.next_status_check_at, Payment.id
+    ).limit(batch_size).all()]
+    if not candidate_ids:
+        return []
+
+    # The lease expiry doubles as the claim token: only rows this UPDATE touched carry it
+    lease_until = now + RECONCILE_LEASE
+    db.query(Payment).filter(Payment.id.in_(candidate_ids), *_due_filter(now)).update(
+        {Payment.next_status_check_at: lease_until}, synchronize_session=False
+    )
+    db.commit()
+    return db.query(Payment.id, Payment.pesapal_order_tracking_id).filter(
+        Payment.id.in_(candidate_ids),
+        Payment.next_status_check_at == lease_until
+    ).order_by(Payment.id).all()
+
+
+def _check_status(client, order_tracking_id):
+    try:
+        return client.get_transaction_status(order_tracking_id), None
+    except Exception as e:
+        return None, e
+
+
+def check_statuses(client, order_tracking_ids, concurrency: int = RECONCILE_CONCURRENCY):
+    """GetTransactionStatus for each tracking id in parallel; returns [(status_response, error)] in order"""
+    if not order_tracking_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(order_tracking_ids)))) as pool:
+        return list(pool.map(lambda order_tracking_id: _check_status(client, order_tracking_id), order_tracking_ids))
+
+
+def reconcile_pending_payments(client=None, batch_size: int = RECONCILE_BATCH_SIZE,
+                               concurrency: int = RECONCILE_CONCURRENCY) -> dict:
+    """
+    Check one batch of due payments against PesaPal and apply the results.
+    Returns counts: {'checked', 'settled', 'pending', 'errors'}.
+    """
+    if client is None:
+        from app.services.pesapal import PesaPal
+        client = PesaPal()
+
+    summary = {'checked': 0, 'settled': 0, 'pending': 0, 'errors': 0}
+    db = SessionLocal()
+    try:
+        claimed = claim_due_payments(db, batch_size)
+        if not claimed:
+            return summary
+
+        # Outbound calls run without holding a transaction open
+        results = check_statuses(client, [order_tracking_id for _, order_tracking_id in claimed], concurrency)
+
+        payments = {p.id: p for p in db.query(Payment).filter(Payment.id.in_([row[0] for row in claimed])).all()}
+        now = datetime.utcnow()
+        for (payment_id, order_tracking_id), (status_response, error) in zip(claimed, results):
+            payment = payments.get(payment_id)
+            if payment is None or payment.status != TransactionStatus.PENDING:
+                continue  # settled by the webhook meanwhile
+            summary['checked'] += 1
+
+            if error is None and apply_transaction_status(db, payment, status_response):
+                summary['settled'] += 1
+                continue
+
+            if error is not None:
+                summary['errors'] += 1
+                logger.warning(f"Status check failed for payment {payment_id} ({order_tracking_id}): {error}")
+            else:
+                summary['pending'] += 1
+            payment.status_check_attempts = (payment.status_check_attempts or 0) + 1
+            payment.status_checked_at = now
+            payment.next_status_check_at = now + _backoff(payment.status_check_attempts)
+        db.commit()
+        return summary
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class PaymentReconciler:
+    """
+    Background loop that processes queued IPNs every poll_interval (or as soon as the webhook
+    wakes it) and reconciles due payments every interval
+    """
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL_SECONDS, poll_interval: float = RECONCILE_POLL_SECONDS):
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self, start_background_task: Optional[Callable] = None) -> bool:
+        """Start the loop once per process; start_background_task lets Socket.IO pick thread or greenlet"""
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+        if start_background_task:
+            start_background_task(self._run)
+        else:
+            threading.Thread(target=self._run, name='payment-reconciler', daemon=True).start()
+        return True
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        from app.services import payment_ipn
+        next_reconcile = time.monotonic() + self.interval
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                payment_ipn.drain_ipn_events()
+            except Exception as e:
+                logger.error(f"IPN processing failed: {e}")
+
+            if time.monotonic() < next_reconcile:
+                continue
+            next_reconcile = time.monotonic() + self.interval
+            try:
+                while True:
+                    summary = reconcile_pending_payments()
+                    if summary['checked'] < RECONCILE_BATCH_SIZE:
+                        break
+            except Exception as e:
+                logger.error(f"Payment reconciliation failed: {e}")
+
+
+reconciler = PaymentReconciler()
+
+
+def start_payment_reconciler(socketio=None) -> bool:
+    return reconciler.start(socketio.start_background_task if socketio is not None else None)
@@ -1,16 +1,157 @@
+"""
+PesaPal Service
+Client for the PesaPal v3 API.
+
+All calls share one pooled requests.Session (keep-alive, connect retries, status retries for
+idempotent GETs). The OAuth token is cached process-wide until shortly before the expiryDate
+PesaPal returns, and the IPN id is looked up once per callback URL and persisted in
+pesapal_ipn_registrations, so submitting an order or checking a status costs a single
+upstream call in the steady state.
+
+Registering the IPN URL is single-flight across workers: the first worker inserts the
+registration row with an empty ipn_id as a claim, calls RegisterIPN and fills it in, while the
+others wait for the id to appear instead of registering again.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sqlalchemy.exc import IntegrityError
+
 from app.config import settings
-import uuid
+from app.database import SessionLocal
+from app.models.pesapal_ipn import PesapalIpnRegistration
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+POOL_SIZE = 20
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+TOKEN_FALLBACK_TTL_SECONDS = 240  # PesaPal tokens live five minutes
+IPN_REGISTRATION_WAIT_SECONDS = 15  # how long to wait for another worker's RegisterIPN call
+IPN_REGISTRATION_POLL_SECONDS = 0.2
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide pooled session for PesaPal calls"""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                retry = Retry(
+                    total=3, connect=3, read=2, status=2,
+                    backoff_factor=0.3,
+                    status_forcelist=(502, 503, 504),
+                    # Never replay a POST that may have reached PesaPal (SubmitOrderRequest is not idempotent)
+                    allowed_methods=frozenset(['GET']),
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http = session
+    return _http
+
+
+class _TokenCache:
+    """OAuth tokens keyed by (base_url, consumer_key), valid until their expiry minus a margin"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            entry = self._tokens.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def put(self, key, token: str, expires_in: float) -> None:
+        with self._lock:
+            self._tokens[key] = (token, time.monotonic() + max(expires_in - TOKEN_REFRESH_MARGIN_SECONDS, 0))
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+
+_token_cache = _TokenCache()
+_ipn_ids = {}
+_ipn_lock = threading.Lock()
+
+
+def _seconds_until(expiry_date: Optional[str]) -> float:
+    """Seconds until PesaPal's expiryDate (e.g. 2021-08-26T12:29:30.5177702Z); fallback TTL if unparseable"""
+    if not expiry_date:
+        return TOKEN_FALLBACK_TTL_SECONDS
+    value = expiry_date.strip().replace('Z', '+00:00')
+    # Python accepts at most six fractional digits
+    if '.' in value:
+        head, _, tail = value.partition('.')
+        digits = ''.join(ch for ch in tail if ch.isdigit())
+        value = f"{head}.{digits[:6]}{tail[len(digits):]}"
+    try:
+        expires_at = datetime.fromisoformat(value)
+    except ValueError:
+        return TOKEN_FALLBACK_TTL_SECONDS
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def clear_caches() -> None:
+    """Forget cached tokens and IPN ids (tests, credential rotation)"""
+    _token_cache.clear()
+    _ipn_ids.clear()
+
 
 class PesaPal:
     BASE_URL = settings.PESAPAL_BASE_URL
-    _ipn_id = None
 
-    def get_token(self):
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.http = get_http_session()
+
+    @property
+    def _token_key(self):
+        return (self.base_url, settings.PESAPAL_CONSUMER_KEY)
+
+    def _request(self, method, path, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return self.http.request(method, f"{self.base_url}{path}", headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+
+    def _authorized(self, method, path, **kwargs):
+        """Call an authenticated endpoint with the cached token, refreshing it once on 401"""
+        response = self._request(method, path, token=self.get_token(), **kwargs)
+        if response.status_code == 401:
+            _token_cache.invalidate(self._token_key)
+            response = self._request(method, path, token=self.get_token(), **kwargs)
+        return response
+
+    def get_token(self, force_refresh=False):
         if not settings.PESAPAL_CONSUMER_KEY or not settings.PESAPAL_CONSUMER_SECRET:
             raise ValueError("Missing PESAPAL_CONSUMER_KEY and/or PESAPAL_CONSUMER_SECRET in environment")
 
-        url = f"{self.BASE_URL}/Auth/RequestToken"
+        if not force_refresh:
+            token = _token_cache.get(self._token_key)
+            if token:
+                return token
 
         payload = {
             "consumer_key": settings.PESAPAL_CONSUMER_KEY,
@@ -18,7 +159,7 @@ class PesaPal:
         }
 
         try:
-            response = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=30)
+            response = self._request("POST", "/Auth/RequestToken", json=payload)
 
             try:
                 data = response.json()
@@ -32,87 +173,140 @@ class PesaPal:
             if not token:
                 raise Exception(f"PesaPal token missing in response (status={response.status_code}): {data}")
 
+            _token_cache.put(self._token_key, token, _seconds_until(data.get("expiryDate")))
             return token
         except Exception as e:
-            print(f"PesaPal token error: {e}")
+            logger.error(f"PesaPal token error: {e}")
             raise
 
-    def register_ipn(self, token):
-        """Register IPN URL and get IPN ID"""
+    def get_ipn_id(self):
+        """
+        IPN id for PESAPAL_CALLBACK_URL: PESAPAL_IPN_ID if configured, else the process cache,
+        else the persisted registration, else a new registration (which is then persisted).
+        None if PesaPal has no IPN for the callback URL and registering one failed.
+        """
+        if settings.PESAPAL_IPN_ID:
+            return settings.PESAPAL_IPN_ID
+        if not settings.PESAPAL_CALLBACK_URL:
+            raise ValueError("Missing PESAPAL_CALLBACK_URL in environment")
+
+        key = (self.base_url, settings.PESAPAL_CALLBACK_URL)
+        if key in _ipn_ids:
+            return _ipn_ids[key]
+
+        # One lookup or registration per process at a time; the claim row covers other workers
+        with _ipn_lock:
+            if key in _ipn_ids:
+                return _ipn_ids[key]
+            db = SessionLocal()
+            try:
+                ipn_id = self._load_or_register_ipn(db)
+            finally:
+                db.close()
+            if ipn_id:
+                _ipn_ids[key] = ipn_id
+            return ipn_id
+
+    def _find_ipn_registration(self, db) -> Optional[PesapalIpnRegistration]:
+        return db.query(PesapalIpnRegistration).filter(
+            PesapalIpnRegistration.base_url == self.base_url,
+            PesapalIpnRegistration.callback_url == settings.PESAPAL_CALLBACK_URL
+        ).first()
+
+    def _load_or_register_ipn(self, db) -> Optional[str]:
+        registration = self._find_ipn_registration(db)
+        if registration is None:
+            # Claim the registration; the unique (base_url, callback_url) row admits one worker
+            claim = PesapalIpnRegistration(base_url=self.base_url, callback_url=settings.PESAPAL_CALLBACK_URL,
+                                           ipn_id='')
+            db.add(claim)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return self._wait_for_ipn_registration(db)
+
+            ipn_id = self.register_ipn()
+            if ipn_id:
+                claim.ipn_id = ipn_id
+            else:
+                # Release the claim so the next payment tries again
+                db.delete(claim)
+            db.commit()
+            return ipn_id
+        if registration.ipn_id:
+            return registration.ipn_id
+        return self._wait_for_ipn_registration(db)
+
+    def _wait_for_ipn_registration(self, db) -> Optional[str]:
+        """Poll for the IPN id another worker is registering; None if it gave up or took too long"""
+        deadline = time.monotonic() + IPN_REGISTRATION_WAIT_SECONDS
+        while True:
+            db.rollback()  # start a new transaction so the other worker's commit is visible
+            registration = self._find_ipn_registration(db)
+            if registration is None:
+                return None
+            if registration.ipn_id:
+                return registration.ipn_id
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(IPN_REGISTRATION_POLL_SECONDS)
+
+        if registration.created_at < datetime.utcnow() - timedelta(seconds=IPN_REGISTRATION_WAIT_SECONDS * 2):
+            # The claiming worker died mid-registration; drop its claim so the next call can register
+            db.delete(registration)
+            db.commit()
+        logger.error(f"Timed out waiting for the PesaPal IPN registration of {settings.PESAPAL_CALLBACK_URL}")
+        return None
+
+    def register_ipn(self):
+        """Register the IPN URL with PesaPal and return its IPN id"""
         if not settings.PESAPAL_CALLBACK_URL:
             raise ValueError("Missing PESAPAL_CALLBACK_URL in environment")
 
-        if self._ipn_id:
-            return self._ipn_id
-            
-        url = f"{self.BASE_URL}/URLSetup/RegisterIPN"
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "url": settings.PESAPAL_CALLBACK_URL,
             "ipn_notification_type": "POST"
         }
-        
+
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._authorized("POST", "/URLSetup/RegisterIPN", json=payload)
             response.raise_for_status()
             data = response.json()
-            self._ipn_id = data.get("ipn_id")
-            return self._ipn_id
+            ipn_id = data.get("ipn_id")
+            if ipn_id:
+                return ipn_id
+            raise Exception(f"PesaPal IPN registration returned no ipn_id: {data}")
         except Exception as e:
-            print(f"PesaPal IPN registration error: {e}")
+            logger.error(f"PesaPal IPN registration error: {e}")
             # If IPN already exists, try to get existing IPNs
-            return self.get_ipn_list(token)
-    
-    def get_ipn_list(self, token):
-        """Get list of registered IPNs"""
-        url = f"{self.BASE_URL}/URLSetup/GetIpnList"
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
+            return self.get_ipn_list()
+
+    def get_ipn_list(self):
+        """
+        Get the IPN id registered for our callback URL, or None. An IPN for any other URL is never
+        used: PesaPal would deliver our payments' notifications there.
+        """
         try:
-            response = requests.get(url, headers=headers)
+            response = self._authorized("GET", "/URLSetup/GetIpnList")
             response.raise_for_status()
             ipns = response.json()
-            
-            # Find IPN matching our callback URL
+
             for ipn in ipns:
                 if ipn.get("url") == settings.PESAPAL_CALLBACK_URL:
-                    self._ipn_id = ipn.get("ipn_id")
-                    return self._ipn_id
-            
-            # If no match, use first active IPN
-            if ipns and len(ipns) > 0:
-                self._ipn_id = ipns[0].get("ipn_id")
-                return self._ipn_id
-                
+                    return ipn.get("ipn_id")
+
+            logger.error(f"PesaPal has no IPN registered for {settings.PESAPAL_CALLBACK_URL}")
             return None
         except Exception as e:
-            print(f"PesaPal get IPN list error: {e}")
+            logger.error(f"PesaPal get IPN list error: {e}")
             return None
 
     def initiate_payment(self, amount, email, phone, merchant_reference=None):
-        token = self.get_token()
-        
-        # Register/Get IPN ID
-        ipn_id = self.register_ipn(token)
+        ipn_id = self.get_ipn_id()
         if not ipn_id:
             raise Exception("Failed to get IPN ID")
 
-        url = f"{self.BASE_URL}/Transactions/SubmitOrderRequest"
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
         if not merchant_reference:
             merchant_reference = f"QGIG-{uuid.uuid4().hex[:12].upper()}"
 
@@ -132,8 +326,9 @@ class PesaPal:
             }
         }
 
+        response = None
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._authorized("POST", "/Transactions/SubmitOrderRequest", json=payload)
 
             try:
                 data = response.json()
@@ -145,24 +340,15 @@ class PesaPal:
 
             return data
         except Exception as e:
-            print(f"PesaPal payment initiation error: {e}")
-            print(f"Response: {response.text if 'response' in locals() else 'No response'}")
+            logger.error(f"PesaPal payment initiation error: {e}")
+            logger.error(f"Response: {response.text if response is not None else 'No response'}")
             raise
 
     def get_transaction_status(self, order_tracking_id):
-        token = self.get_token()
-
-        url = f"{self.BASE_URL}/Transactions/GetTransactionStatus"
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
         params = {"orderTrackingId": order_tracking_id}
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=30)
+            response = self._authorized("GET", "/Transactions/GetTransactionStatus", params=params)
 
             try:
                 data = response.json()
@@ -174,5 +360,5 @@ class PesaPal:
 
             return data
         except Exception as e:
-            print(f"PesaPal status check error: {e}")
+            logger.error(f"PesaPal status check error: {e}")
             raise
@@ -0,0 +1,265 @@
+"""
+Presence Service
+Tracks which users have at least one open Socket.IO connection.
+
+Every socket id (sid) is recorded against its user and the rooms it joined, so a user with
+several tabs stays online until the last one disconnects. Joins and leaves are O(1).
+Shared entries expire unless the worker holding the socket keeps refreshing them (see
+start_presence_heartbeat), so a crashed worker cannot leave its users online forever.
+
+The backend follows SOCKETIO_MESSAGE_QUEUE so presence is shared the same way rooms are:
+- unset or memory://: in-process registry (one worker, or tests)
+- redis:// or rediss://: Redis sets shared by every worker
+- any other queue: presence cannot be shared, so every user is reported online and callers
+  fall back to always building payloads
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL_SECONDS = 90
+PRESENCE_HEARTBEAT_SECONDS = 30
+
+
+class InMemoryPresence:
+    """Presence registry for a single process"""
+
+    shared = True  # answers are authoritative
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._user_sids: Dict[int, Set[str]] = {}
+        self._room_sids: Dict[str, Set[str]] = {}
+        self._sids: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+
+    def connect(self, sid: str, user_id: int, rooms: Iterable[str] = ()) -> None:
+        rooms = tuple(rooms)
+        with self._lock:
+            self._sids[sid] = (user_id, rooms)
+            self._user_sids.setdefault(user_id, set()).add(sid)
+            for room in rooms:
+                self._room_sids.setdefault(room, set()).add(sid)
+
+    def disconnect(self, sid: str) -> Optional[int]:
+        """Forget a socket; returns its user id (None if unknown)"""
+        with self._lock:
+            entry = self._sids.pop(sid, None)
+            if entry is None:
+                return None
+            user_id, rooms = entry
+            _discard(self._user_sids, user_id, sid)
+            for room in rooms:
+                _discard(self._room_sids, room, sid)
+            return user_id
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._user_sids
+
+    def is_room_online(self, room: str) -> bool:
+        return room in self._room_sids
+
+    def online_users(self, user_ids: Iterable[int]) -> Set[int]:
+        """The subset of user_ids with at least one open socket"""
+        return {user_id for user_id in user_ids if user_id in self._user_sids}
+
+    def user_sids(self, user_id: int) -> Set[str]:
+        return set(self._user_sids.get(user_id, ()))
+
+    def online_count(self) -> int:
+        return len(self._user_sids)
+
+    def refresh(self) -> int:
+        """Nothing to extend: the registry lives and dies with the process that holds the sockets"""
+        return len(self._sids)
+
+
+def _discard(index: dict, key, sid: str) -> None:
+    sids = index.get(key)
+    if sids is not None:
+        sids.discard(sid)
+        if not sids:
+            del index[key]
+
+
+class RedisPresence:
+    """
+    Presence registry in Redis, shared by all workers.
+    Keys: {prefix}:user_sids:{id} and {prefix}:room_sids:{room} are sorted sets of sids scored by
+    the time each entry expires, {prefix}:sid:{sid} holds the sid's user and rooms, and
+    {prefix}:online_users scores user ids the same way. Each worker re-extends the entries of its
+    own sockets every PRESENCE_HEARTBEAT_SECONDS (refresh), so the sockets of a worker that
+    crashed or was redeployed without running disconnect drop out after PRESENCE_TTL_SECONDS.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = 'qgig-presence', ttl: float = PRESENCE_TTL_SECONDS):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Sockets connected to this process, re-extended by refresh()
+        self._local: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+
+    def _key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(str(part) for part in parts))
+
+    def _write(self, pipe, sid: str, user_id: int, rooms: Tuple[str, ...], now: float) -> None:
+        expires_at = now + self.ttl
+        ttl = int(self.ttl) + 1
+        pipe.hset(self._key('sid', sid), mapping={'user_id': user_id, 'rooms': ' '.join(rooms)})
+        pipe.expire(self._key('sid', sid), ttl)
+        for key in [self._key('user_sids', user_id)] + [self._key('room_sids', room) for room in rooms]:
+            pipe.zadd(key, {sid: expires_at})
+            pipe.expire(key, ttl)
+        pipe.zadd(self._key('online_users'), {user_id: expires_at})
+
+    def connect(self, sid: str, user_id: int, rooms: Iterable[str] = ()) -> None:
+        rooms = tuple(rooms)
+        with self._lock:
+            self._local[sid] = (user_id, rooms)
+        pipe = self._redis.pipeline()
+        self._write(pipe, sid, user_id, rooms, time.time())
+        pipe.execute()
+
+    def refresh(self) -> int:
+        """Extend the entries of this process's sockets; returns how many were refreshed"""
+        with self._lock:
+            local = list(self._local.items())
+        now = time.time()
+        pipe = self._redis.pipeline()
+        for sid, (user_id, rooms) in local:
+            self._write(pipe, sid, user_id, rooms, now)
+        # Expired entries of every worker are only skipped by reads; trim them here
+        pipe.zremrangebyscore(self._key('online_users'), '-inf', now)
+        pipe.execute()
+        return len(local)
+
+    def disconnect(self, sid: str) -> Optional[int]:
+        with self._lock:
+            self._local.pop(sid, None)
+        entry = self._redis.hgetall(self._key('sid', sid))
+        if not entry:
+            return None
+        user_id = int(entry['user_id'])
+        user_key = self._key('user_sids', user_id)
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key('sid', sid))
+        pipe.zrem(user_key, sid)
+        for room in entry.get('rooms', '').split():
+            pipe.zrem(self._key('room_sids', room), sid)
+        pipe.zcount(user_key, time.time(), '+inf')
+        remaining = pipe.execute()[-1]
+        if not remaining:
+            self._redis.zrem(self._key('online_users'), user_id)
+        return user_id
+
+    def is_online(self, user_id: int) -> bool:
+        return self._redis.zcount(self._key('user_sids', user_id), time.time(), '+inf') > 0
+
+    def is_room_online(self, room: str) -> bool:
+        return self._redis.zcount(self._key('room_sids', room), time.time(), '+inf') > 0
+
+    def online_users(self, user_ids: Iterable[int]) -> Set[int]:
+        user_ids = list(user_ids)
+        now = time.time()
+        pipe = self._redis.pipeline()
+        for user_id in user_ids:
+            pipe.zcount(self._key('user_sids', user_id), now, '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+    def user_sids(self, user_id: int) -> Set[str]:
+        return set(self._redis.zrangebyscore(self._key('user_sids', user_id), time.time(), '+inf'))
+
+    def online_count(self) -> int:
+        return self._redis.zcount(self._key('online_users'), time.time(), '+inf')
+
+
+class UnsharedPresence(InMemoryPresence):
+    """
+    Local registry used when the queue backend has no shared store: sockets on other workers are
+    invisible, so is_online and is_room_online answer True rather than risk dropping a notification.
+    """
+
+    shared = False
+
+    def is_online(self, user_id: int) -> bool:
+        return True
+
+    def is_room_online(self, room: str) -> bool:
+        return True
+
+    def online_users(self, user_ids: Iterable[int]) -> Set[int]:
+        return set(user_ids)
+
+
+def create_presence(url: Optional[str] = None, prefix: str = 'qgig-presence'):
+    """Presence backend matching a SOCKETIO_MESSAGE_QUEUE url"""
+    url = (url or '').strip()
+    if not url or url.startswith('memory://'):
+        return InMemoryPresence()
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisPresence(url, prefix=prefix)
+    logger.warning("Presence is not shared for this Socket.IO queue; treating all users as online")
+    return UnsharedPresence()
+
+
+presence = InMemoryPresence()
+
+
+def configure_presence(url: Optional[str] = None, prefix: str = 'qgig-presence'):
+    """Replace the process-wide registry (called by create_app)"""
+    global presence
+    presence = create_presence(url, prefix=prefix)
+    return presence
+
+
+def get_presence():
+    return presence
+
+
+def is_online(user_id: int) -> bool:
+    return presence.is_online(user_id)
+
+
+def is_room_online(room: str) -> bool:
+    return presence.is_room_online(room)
+
+
+def online_users(user_ids: Iterable[int]) -> Set[int]:
+    return presence.online_users(user_ids)
+
+
+def online_count() -> int:
+    return presence.online_count()
+
+
+_heartbeat_lock = threading.Lock()
+_heartbeat_started = False
+
+
+def _heartbeat_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            presence.refresh()
+        except Exception as e:
+            logger.error(f"Presence heartbeat failed: {e}")
+
+
+def start_presence_heartbeat(socketio=None, interval: float = PRESENCE_HEARTBEAT_SECONDS) -> bool:
+    """Refresh this process's presence entries every `interval` seconds (once per process)"""
+    global _heartbeat_started
+    with _heartbeat_lock:
+        if _heartbeat_started:
+            return False
+        _heartbeat_started = True
+    if socketio is not None:
+        socketio.start_background_task(_heartbeat_loop, interval)
+    else:
+        threading.Thread(target=_heartbeat_loop, args=(interval,), name='presence-heartbeat', daemon=True).start()
+    return True
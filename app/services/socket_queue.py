@@ -0,0 +1,84 @@
+"""
+Socket.IO Message Queue
+Lets several app workers share Socket.IO rooms by routing every emit through a pub/sub queue.
+
+SOCKETIO_MESSAGE_QUEUE selects the backend:
+- unset: single-process mode, rooms live in this worker only (the original behaviour)
+- redis:// or rediss://: Redis pub/sub (any Redis-compatible server), one channel per deployment
+- amqp://, kafka://, zmq+...: the other python-socketio queue backends
+- memory://: in-process stand-in for tests and local runs, shared by every server in the process
+
+With a queue configured, emit_notification_to_user and friends reach a user's sockets
+whichever worker they are connected to.
+"""
+import json
+import logging
+import queue
+import threading
+from typing import Dict, List, Optional
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+IN_PROCESS_SCHEME = 'memory://'
+
+
+class InProcessPubSubManager(socketio.PubSubManager):
+    """
+    Pub/sub client manager backed by in-memory queues.
+    Every manager on the same channel in this process receives every published message,
+    which mimics several workers sharing a Redis channel.
+    """
+
+    name = 'inprocess'
+
+    _subscribers: Dict[str, List[queue.Queue]] = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self._inbox)
+
+    def _publish(self, data):
+        payload = json.dumps(data)
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(self.channel, []))
+        for inbox in subscribers:
+            inbox.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+    def close(self):
+        """Stop receiving messages (used by tests that create throwaway servers)"""
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(self.channel, [])
+            if self._inbox in subscribers:
+                subscribers.remove(self._inbox)
+
+
+def socketio_queue_options(url: Optional[str], channel: str = 'qgig-socketio', write_only: bool = False) -> dict:
+    """
+    Keyword arguments for flask_socketio.SocketIO for the given queue URL.
+    Returns an empty dict (single-process mode) when url is empty.
+    """
+    url = (url or '').strip()
+    if not url:
+        return {}
+    if url.startswith(IN_PROCESS_SCHEME):
+        return {'client_manager': InProcessPubSubManager(channel=channel, write_only=write_only)}
+    return {'message_queue': url, 'channel': channel}
+
+
+def describe_queue(url: Optional[str]) -> str:
+    """Queue URL safe for logs (credentials removed)"""
+    url = (url or '').strip()
+    if not url:
+        return 'none (single process)'
+    scheme, _, rest = url.partition('://')
+    return f"{scheme}://{rest.rpartition('@')[2]}"
@@ -0,0 +1,110 @@
+"""
+Socket Rooms Service
+Resolves the Socket.IO rooms a user joins (user_<id> plus institution_<id> or professional_<id>
+for the active role) without touching the database on connect.
+
+Rooms are computed at login and role switch and stored in the Flask session as a claim; the
+session cookie is signed with SECRET_KEY, so the connect handler only has to check the claim
+still matches the session's user and active role. Sessions without a claim (issued before this
+change, or JWT-authenticated sockets) are resolved with one query and kept in a small TTL cache,
+so a reconnect storm costs at most one query per user per SOCKET_ROOMS_TTL_SECONDS.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.models.user import User
+from app.models.institution import Institution
+from app.models.professional import Professional
+
+SOCKET_ROOMS_TTL_SECONDS = 300
+SOCKET_ROOMS_CACHE_SIZE = 10000
+
+SESSION_CLAIM_KEY = 'socket_rooms'
+
+_cache: Dict[Tuple[int, str], Tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def build_claim(user_id: int, active_role: str, institution_id: Optional[int] = None,
+                professional_id: Optional[int] = None) -> dict:
+    """Room claim for a user acting in active_role"""
+    rooms: List[str] = [f'user_{user_id}']
+    profile_id = None
+    if active_role == 'institution' and institution_id:
+        profile_id = institution_id
+        rooms.append(f'institution_{institution_id}')
+    elif active_role == 'professional' and professional_id:
+        profile_id = professional_id
+        rooms.append(f'professional_{professional_id}')
+    return {'user_id': user_id, 'active_role': active_role, 'profile_id': profile_id, 'rooms': rooms}
+
+
+def resolve_claim(db, user_id: int, active_role: Optional[str] = None) -> Optional[dict]:
+    """Build the claim from the database (one query); None if the user does not exist"""
+    row = db.query(User.role, Institution.id, Professional.id).outerjoin(
+        Institution, Institution.user_id == User.id
+    ).outerjoin(
+        Professional, Professional.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    role, institution_id, professional_id = row
+    return build_claim(user_id, active_role or role.value, institution_id, professional_id)
+
+
+def store_session_claim(db, session, user_id: int, active_role: str) -> dict:
+    """Compute the claim for a fresh login or role switch and save it in the session"""
+    claim = resolve_claim(db, user_id, active_role) or build_claim(user_id, active_role)
+    session[SESSION_CLAIM_KEY] = claim
+    _cache_put(claim)
+    return claim
+
+
+def _is_complete(claim: dict) -> bool:
+    # A professional/institution claim without its profile room was issued before the profile
+    # existed; resolve it again rather than leaving the socket out of its role room
+    return claim['active_role'] not in ('institution', 'professional') or claim['profile_id'] is not None
+
+
+def claim_from_session(session, user_id: int, active_role: Optional[str]) -> Optional[dict]:
+    """Return the session's claim if it belongs to this user and role"""
+    claim = session.get(SESSION_CLAIM_KEY)
+    if not isinstance(claim, dict) or claim.get('user_id') != user_id:
+        return None
+    if active_role and claim.get('active_role') != active_role:
+        return None
+    return claim if _is_complete(claim) else None
+
+
+def _cache_put(claim: dict) -> None:
+    with _cache_lock:
+        if len(_cache) >= SOCKET_ROOMS_CACHE_SIZE:
+            now = time.monotonic()
+            for key in [k for k, (expires_at, _) in _cache.items() if expires_at <= now]:
+                del _cache[key]
+            if len(_cache) >= SOCKET_ROOMS_CACHE_SIZE:
+                _cache.clear()
+        _cache[(claim['user_id'], claim['active_role'])] = (time.monotonic() + SOCKET_ROOMS_TTL_SECONDS, claim)
+
+
+def cached_claim(db_factory, user_id: int, active_role: Optional[str] = None) -> Optional[dict]:
+    """
+    Return the claim for (user_id, active_role) from the TTL cache, querying through a session
+    from db_factory on a miss. active_role None means the user's primary role.
+    """
+    if active_role:
+        with _cache_lock:
+            cached = _cache.get((user_id, active_role))
+        if cached and cached[0] > time.monotonic() and _is_complete(cached[1]):
+            return cached[1]
+
+    db = db_factory()
+    try:
+        claim = resolve_claim(db, user_id, active_role)
+    finally:
+        db.close()
+    if claim is not None:
+        _cache_put(claim)
+    return claim
+
@@ -0,0 +1,85 @@
+"""
+Time Buckets Service
+Dialect-portable truncation of timestamps to calendar buckets for GROUP BY.
+
+time_bucket('month', column) renders to_char(date_trunc('month', column), 'YYYY-MM') on
+PostgreSQL, strftime('%Y-%m', column) on SQLite and DATE_FORMAT on MySQL, so every backend
+returns the same ISO label ('2025-03', '2025-03-14', '2025') and callers can compare, sort and
+parse buckets without caring which database produced them.
+"""
+from datetime import date, datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import String
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# unit -> (Postgres date_trunc field and to_char format, SQLite strftime format, MySQL DATE_FORMAT format)
+BUCKET_FORMATS: Dict[str, Tuple[str, str, str, str]] = {
+    'year': ('year', 'YYYY', '%Y', '%Y'),
+    'month': ('month', 'YYYY-MM', '%Y-%m', '%Y-%m'),
+    'day': ('day', 'YYYY-MM-DD', '%Y-%m-%d', '%Y-%m-%d'),
+}
+
+
+class _TimeBucket(FunctionElement):
+    """ISO label of the bucket containing a timestamp; one subclass per unit so it is part of the cache key"""
+
+    type = String()
+    name = 'time_bucket'
+    inherit_cache = True
+    unit = None
+
+
+_BUCKET_CLASSES = {
+    unit: type(f'{unit}_bucket', (_TimeBucket,), {'unit': unit, 'inherit_cache': True})
+    for unit in BUCKET_FORMATS
+}
+
+
+def time_bucket(unit: str, column) -> _TimeBucket:
+    """time_bucket('month', Payment.completed_at) -> '2025-03' on every supported dialect"""
+    if unit not in _BUCKET_CLASSES:
+        raise ValueError(f"Unsupported time bucket: {unit}")
+    return _BUCKET_CLASSES[unit](column)
+
+
+def _column(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(_TimeBucket)
+def _time_bucket_default(element, compiler, **kw):
+    raise CompileError(f"time_bucket is not supported on {compiler.dialect.name}")
+
+
+@compiles(_TimeBucket, 'postgresql')
+def _time_bucket_postgresql(element, compiler, **kw):
+    field, pg_format, _, _ = BUCKET_FORMATS[element.unit]
+    return f"to_char(date_trunc('{field}', {_column(element, compiler, **kw)}), '{pg_format}')"
+
+
+@compiles(_TimeBucket, 'sqlite')
+def _time_bucket_sqlite(element, compiler, **kw):
+    # pysqlite uses qmark parameters, so '%' needs no escaping
+    return f"strftime('{BUCKET_FORMATS[element.unit][2]}', {_column(element, compiler, **kw)})"
+
+
+@compiles(_TimeBucket, 'mysql')
+def _time_bucket_mysql(element, compiler, **kw):
+    mysql_format = BUCKET_FORMATS[element.unit][3].replace('%', '%%')  # pyformat drivers
+    return f"DATE_FORMAT({_column(element, compiler, **kw)}, '{mysql_format}')"
+
+
+def bucket_label(unit: str, value) -> str:
+    """The label time_bucket() produces for a Python date or datetime"""
+    if not isinstance(value, (date, datetime)):
+        raise TypeError(f"Expected a date, got {value!r}")
+    return value.strftime(BUCKET_FORMATS[unit][2])
+
+
+def months_back(today: date, count: int) -> str:
+    """Label of the month `count` calendar months before today's"""
+    index = today.year * 12 + today.month - 1 - count
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
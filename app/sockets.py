@@ -4,16 +4,14 @@ Socket.IO event handlers for real-time notifications
 from flask_socketio import emit, join_room, leave_room
 from flask import session, request
 from app.database import SessionLocal
-from app.models.user import User
-from app.models.institution import Institution
-from app.models.professional import Professional
+from app.config import settings
+from app.services import presence as presence_service
+from app.services.socket_rooms import claim_from_session, cached_claim
+import jwt
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Store user socket connections (user_id -> socket_id)
-user_connections = {}
-
 # Global socketio instance reference
 _socketio = None
 
@@ -22,110 +20,89 @@ def set_socketio(socketio_instance):
     global _socketio
     _socketio = socketio_instance
 
+def get_socketio():
+    """Return the global socketio instance (None before create_app)"""
+    return _socketio
+
 def register_socketio_events(socketio_instance):
     """Register all socket.io event handlers"""
     
     @socketio_instance.on('connect')
     def handle_connect(auth=None):
-        """Handle client connection"""
-        logger.info("=== Socket.IO Connection Attempt ===")
-        logger.info(f"Session data: {dict(session)}")
-        
+        """
+        Handle client connection.
+        Rooms come from the signed session claim written at login / role switch (or the
+        socket_rooms TTL cache), so a reconnect does not query the database.
+        """
         # Check if user is authenticated via session or auth parameter
         user_id = session.get('user_id')
+        active_role = session.get('active_role')
         
-        # If no session, check auth parameter (for JWT-based connections)
-        if not user_id and auth and isinstance(auth, dict):
-            user_id = auth.get('user_id')
+        # If no session, check auth parameter (a JWT issued by /api/auth/login or switch-role)
+        if not user_id and auth and isinstance(auth, dict) and auth.get('token'):
+            try:
+                data = jwt.decode(auth['token'], settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+            except jwt.InvalidTokenError:
+                logger.warning("Socket connection with invalid token rejected")
+                return False
+            user_id = data.get('user_id')
+            active_role = data.get('active_role') or data.get('role')
             if user_id:
                 session['user_id'] = user_id
-                logger.info(f"User {user_id} authenticated via auth parameter")
+                session['active_role'] = active_role
+                logger.info(f"User {user_id} authenticated via auth token")
         
         if not user_id:
             logger.warning("Unauthenticated socket connection attempt rejected")
             return False  # Reject connection
         
-        socket_id = request.sid
+        claim = claim_from_session(session, user_id, active_role)
+        if claim is None:
+            try:
+                claim = cached_claim(SessionLocal, user_id, active_role)
+            except Exception as e:
+                logger.error(f'Error during socket connection setup: {e}', exc_info=True)
+                emit('error', {'message': 'Connection error occurred'})
+                return False
+            if claim is None:
+                logger.error(f"User {user_id} not found in database")
+                return False
         
-        # Store connection
-        user_connections[user_id] = socket_id
+        socket_id = request.sid
+        for room in claim['rooms']:
+            join_room(room)
         
-        # Join user's personal room
-        join_room(f'user_{user_id}')
-        logger.info(f'User {user_id} joined room: user_{user_id}')
+        # Track this socket (users with several tabs have several)
+        presence_service.get_presence().connect(socket_id, user_id, claim['rooms'])
         
-        # Get user details and join role-based rooms
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                logger.error(f"User {user_id} not found in database")
-                return False
-            
-            # Get active role from session (supports role switching)
-            active_role = session.get('active_role', user.role.value)
-            logger.info(f"User {user_id} connecting with active_role: {active_role}")
-            
-            # Join role-based room based on active_role
-            if active_role == 'institution':
-                institution = db.query(Institution).filter(Institution.user_id == user_id).first()
-                if institution:
-                    room_name = f'institution_{institution.id}'
-                    join_room(room_name)
-                    logger.info(f'✓ Institution user {user_id} joined room: {room_name}')
-                    print(f'✓ Institution {institution.id} connected to room: {room_name}')
-                    emit('connected', {
-                        'user_id': user_id,
-                        'role': 'institution',
-                        'institution_id': institution.id,
-                        'room': room_name,
-                        'message': 'Connected to notification service'
-                    })
-                else:
-                    logger.warning(f"Institution profile not found for user {user_id}")
-                    emit('connected', {'user_id': user_id, 'message': 'Connected (no institution profile)'})
-                    
-            elif active_role == 'professional':
-                professional = db.query(Professional).filter(Professional.user_id == user_id).first()
-                if professional:
-                    room_name = f'professional_{professional.id}'
-                    join_room(room_name)
-                    logger.info(f'✓ Professional user {user_id} joined room: {room_name}')
-                    print(f'✓ Professional {professional.id} connected to room: {room_name}')
-                    emit('connected', {
-                        'user_id': user_id,
-                        'role': 'professional',
-                        'professional_id': professional.id,
-                        'room': room_name,
-                        'message': 'Connected to notification service'
-                    })
-                else:
-                    logger.warning(f"Professional profile not found for user {user_id}")
-                    emit('connected', {'user_id': user_id, 'message': 'Connected (no professional profile)'})
+        role = claim['active_role']
+        if role in ('institution', 'professional'):
+            if claim['profile_id']:
+                emit('connected', {
+                    'user_id': user_id,
+                    'role': role,
+                    f'{role}_id': claim['profile_id'],
+                    'room': claim['rooms'][-1],
+                    'message': 'Connected to notification service'
+                })
             else:
-                # Admin or other roles
-                logger.info(f'User {user_id} connected with active_role: {active_role}')
-                emit('connected', {'user_id': user_id, 'role': active_role, 'message': 'Connected to notification service'})
-            
-        except Exception as e:
-            logger.error(f'Error during socket connection setup: {e}', exc_info=True)
-            emit('error', {'message': 'Connection error occurred'})
-            return False
-        finally:
-            db.close()
+                logger.warning(f"{role.capitalize()} profile not found for user {user_id}")
+                emit('connected', {'user_id': user_id, 'message': f'Connected (no {role} profile)'})
+        else:
+            # Admin or other roles
+            emit('connected', {'user_id': user_id, 'role': role, 'message': 'Connected to notification service'})
         
-        print(f'✓ User {user_id} connected with socket ID {socket_id}')
+        logger.info(f'User {user_id} connected with socket ID {socket_id}, rooms: {claim["rooms"]}')
 
     @socketio_instance.on('disconnect')
     def handle_disconnect():
         """Handle client disconnection"""
+        # Forget this socket only; the user stays online while other tabs are connected
+        presence_service.get_presence().disconnect(request.sid)
+        
         if 'user_id' in session:
             user_id = session['user_id']
             
-            # Remove connection
-            if user_id in user_connections:
-                del user_connections[user_id]
-            
             # Leave user's personal room
             leave_room(f'user_{user_id}')
             
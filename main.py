@@ -1,6 +1,7 @@
-from app import create_app
+from app import create_app, start_background_workers
 
 app, socketio = create_app()
+start_background_workers(socketio)
 
 if __name__ == "__main__":
     socketio.run(app, debug=True, allow_unsafe_werkzeug=True)
@@ -0,0 +1,144 @@
+"""
+Benchmark accepting an interest against the number of competing applicants.
+
+For each applicant count a throwaway institution, job and professionals are created, every
+professional is marked online (worst case: a real-time event for each declined applicant),
+and POST /interests/<id>/accept is timed through the Flask test client. Reports latency and
+SQL statements per accept; the statement count should stay flat as applicants grow.
+
+Usage: python scripts/benchmark_accept_interest.py [--applicants 10 50 100 300] [--repeat 3]
+Point DATABASE_URL at a scratch database.
+"""
+
+import sys
+import os
+import time
+import argparse
+import logging
+import threading
+import statistics
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job
+from app.models.job_interest import JobInterest
+from app.models.notification import Notification
+from app.models.message import Message
+from app.models.notification_outbox import NotificationOutbox
+from app.services.conversations import delete_user_conversations
+from app.services.presence import get_presence
+
+EMAIL_DOMAIN = 'accept-benchmark.qgig.local'
+
+
+def _seed(applicants):
+    """Create an institution, a job and `applicants` pending interests; returns ids"""
+    db = SessionLocal()
+    try:
+        inst_user = User(email=f'inst@{EMAIL_DOMAIN}', password='x', role=UserRole.INSTITUTION)
+        db.add(inst_user)
+        db.flush()
+        institution = Institution(user_id=inst_user.id, institution_name='Accept Benchmark')
+        db.add(institution)
+        db.flush()
+        job = Job(institution_id=institution.id, title='Benchmark gig', description='d', location='K', pay_amount=100)
+        pro_users = [User(email=f'pro{i}@{EMAIL_DOMAIN}', password='x', role=UserRole.PROFESSIONAL)
+                     for i in range(applicants)]
+        db.add(job)
+        db.add_all(pro_users)
+        db.flush()
+        professionals = [Professional(user_id=u.id, full_name=f'Benchmark Pro {i}') for i, u in enumerate(pro_users)]
+        db.add_all(professionals)
+        db.flush()
+        interests = [JobInterest(job_id=job.id, professional_id=p.id) for p in professionals]
+        db.add_all(interests)
+        db.commit()
+        return inst_user.id, interests[0].id, [u.id for u in pro_users]
+    finally:
+        db.close()
+
+
+def _cleanup():
+    db = SessionLocal()
+    try:
+        user_ids = [uid for (uid,) in db.query(User.id).filter(User.email.like(f'%@{EMAIL_DOMAIN}'))]
+        if user_ids:
+            for user_id in user_ids:
+                delete_user_conversations(db, user_id)
+            db.query(Message).filter(Message.sender_id.in_(user_ids)).delete(synchronize_session=False)
+            db.query(Notification).filter(Notification.user_id.in_(user_ids)).delete(synchronize_session=False)
+            db.query(NotificationOutbox).filter(
+                NotificationOutbox.room.in_([f'user_{uid}' for uid in user_ids])
+            ).delete(synchronize_session=False)
+            institution_ids = [iid for (iid,) in db.query(Institution.id).filter(Institution.user_id.in_(user_ids))]
+            job_ids = [jid for (jid,) in db.query(Job.id).filter(Job.institution_id.in_(institution_ids))]
+            db.query(JobInterest).filter(JobInterest.job_id.in_(job_ids)).delete(synchronize_session=False)
+            db.query(Job).filter(Job.id.in_(job_ids)).delete(synchronize_session=False)
+            db.query(Professional).filter(Professional.user_id.in_(user_ids)).delete(synchronize_session=False)
+            db.query(Institution).filter(Institution.id.in_(institution_ids)).delete(synchronize_session=False)
+            db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _accept_once(app, applicants):
+    inst_user_id, interest_id, pro_user_ids = _seed(applicants)
+    presence = get_presence()
+    for user_id in pro_user_ids:
+        presence.connect(f'benchmark-{user_id}', user_id, [f'user_{user_id}'])
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = inst_user_id
+        sess['active_role'] = 'institution'
+
+    statements, me = [0], threading.get_ident()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        start = time.perf_counter()
+        response = client.post(f'/interests/{interest_id}/accept')
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+        for user_id in pro_user_ids:
+            presence.disconnect(f'benchmark-{user_id}')
+        _cleanup()
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Accept failed with status {response.status_code}: {response.get_data(as_text=True)}")
+    return elapsed * 1000, statements[0]
+
+
+def benchmark(applicant_counts, repeat):
+    """Print median accept latency and statement count for each applicant count"""
+    app, _ = create_app()
+    logging.disable(logging.INFO)
+    _cleanup()
+
+    print(f"{'applicants':>10}  {'median ms':>10}  {'statements':>10}")
+    for applicants in applicant_counts:
+        runs = [_accept_once(app, applicants) for _ in range(repeat)]
+        latency = statistics.median(ms for ms, _ in runs)
+        print(f"{applicants:>10}  {latency:>10.1f}  {runs[-1][1]:>10}")
+    print("✓ Benchmark complete")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--applicants', type=int, nargs='+', default=[10, 50, 100, 300])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.applicants, args.repeat)
@@ -0,0 +1,238 @@
+"""
+Benchmark the whole payment lifecycle against a local fake PesaPal.
+
+Starts scripts/fake_pesapal_server.py in-process (with the given latency and failure
+injection), points the PesaPal client at it and drives, with one institution per worker thread:
+initiate payment, retry for every fifth gig, status check while pending, IPN webhook deliveries
+(with duplicates), IPN processing and reconciliation, then a final status check. Reports
+throughput and p50/p95/p99 latency per phase plus the calls the fake PesaPal received.
+
+Usage: python scripts/benchmark_payment_flow.py [--gigs 200] [--concurrency 8] [--latency 150]
+       [--jitter 50] [--failure-rate 0.02] [--duplicates 2]
+Point DATABASE_URL at a scratch database.
+"""
+
+import sys
+import os
+import time
+import argparse
+import logging
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+from fake_pesapal_server import FakePesaPalServer
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.pesapal_ipn import PesapalIpnEvent, PesapalIpnRegistration
+from app.services import pesapal
+from app.services.pesapal import PesaPal
+from app.services.payment_ipn import drain_ipn_events
+from app.services.payment_reconciliation import reconcile_pending_payments, RECONCILE_BATCH_SIZE
+
+EMAIL_DOMAIN = 'payment-benchmark.qgig.local'
+RETRY_EVERY = 5
+
+
+def _seed(workers, gigs):
+    """One institution (with its assigned professional) per worker, gigs spread over them"""
+    db = SessionLocal()
+    try:
+        plan = []
+        for w in range(workers):
+            inst_user = User(email=f'inst{w}@{EMAIL_DOMAIN}', password='x', role=UserRole.INSTITUTION)
+            pro_user = User(email=f'pro{w}@{EMAIL_DOMAIN}', password='x', role=UserRole.PROFESSIONAL)
+            db.add_all([inst_user, pro_user])
+            db.flush()
+            institution = Institution(user_id=inst_user.id, institution_name=f'Payment Benchmark {w}')
+            professional = Professional(user_id=pro_user.id, full_name=f'Benchmark Pro {w}')
+            db.add_all([institution, professional])
+            db.flush()
+            jobs = [Job(institution_id=institution.id, title=f'Benchmark gig {w}-{i}', description='d', location='K',
+                        pay_amount=50000, status=JobStatus.ASSIGNED, assigned_professional_id=professional.id)
+                    for i in range(w, gigs, workers)]
+            db.add_all(jobs)
+            db.flush()
+            plan.append((inst_user.id, [job.id for job in jobs]))
+        db.commit()
+        return plan
+    finally:
+        db.close()
+
+
+def _cleanup(base_url=None):
+    db = SessionLocal()
+    try:
+        user_ids = [uid for (uid,) in db.query(User.id).filter(User.email.like(f'%@{EMAIL_DOMAIN}'))]
+        if user_ids:
+            institution_ids = [iid for (iid,) in db.query(Institution.id).filter(Institution.user_id.in_(user_ids))]
+            job_ids = [jid for (jid,) in db.query(Job.id).filter(Job.institution_id.in_(institution_ids))]
+            tracking_ids = [tid for (tid,) in db.query(Payment.pesapal_order_tracking_id).filter(
+                Payment.gig_id.in_(job_ids), Payment.pesapal_order_tracking_id != None)]
+            db.query(PesapalIpnEvent).filter(PesapalIpnEvent.order_tracking_id.in_(tracking_ids)).delete(synchronize_session=False)
+            db.query(Payment).filter(Payment.gig_id.in_(job_ids)).delete(synchronize_session=False)
+            db.query(Job).filter(Job.id.in_(job_ids)).delete(synchronize_session=False)
+            db.query(Professional).filter(Professional.user_id.in_(user_ids)).delete(synchronize_session=False)
+            db.query(Institution).filter(Institution.id.in_(institution_ids)).delete(synchronize_session=False)
+            db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        if base_url:
+            db.query(PesapalIpnRegistration).filter(PesapalIpnRegistration.base_url == base_url).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['active_role'] = 'institution'
+    return client
+
+
+def _timed(call):
+    start = time.perf_counter()
+    response = call()
+    return (time.perf_counter() - start) * 1000, response.status_code
+
+
+def _run_phase(name, pool, worker_tasks, ok_statuses, rows):
+    """Run each worker's list of calls sequentially, all workers in parallel; record one table row"""
+    start = time.perf_counter()
+    results = [r for batch in pool.map(lambda calls: [_timed(call) for call in calls], worker_tasks) for r in batch]
+    wall = time.perf_counter() - start
+    latencies = sorted(ms for ms, _ in results)
+    errors = sum(1 for _, status in results if status not in ok_statuses)
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    rows.append((name, len(results), errors, len(results) / wall if wall else 0.0, p50, p95, p99))
+
+
+def _pending_tracking_ids(job_ids):
+    db = SessionLocal()
+    try:
+        return [tid for (tid,) in db.query(Payment.pesapal_order_tracking_id).filter(
+            Payment.gig_id.in_(job_ids),
+            Payment.status == TransactionStatus.PENDING,
+            Payment.pesapal_order_tracking_id != None
+        )]
+    finally:
+        db.close()
+
+
+def benchmark(gigs, concurrency, latency, jitter, failure_rate, duplicates, settle_after):
+    fake = FakePesaPalServer(latency_ms=latency, jitter_ms=jitter, failure_rate=failure_rate,
+                             settle_after=settle_after, seed=42)
+    base_url = fake.start()
+
+    # Configure before create_app so the in-process reconciler stays off and phases are measured alone
+    settings.PAYMENT_RECONCILER = 'off'
+    settings.PESAPAL_CONSUMER_KEY = settings.PESAPAL_CONSUMER_KEY or 'benchmark-key'
+    settings.PESAPAL_CONSUMER_SECRET = settings.PESAPAL_CONSUMER_SECRET or 'benchmark-secret'
+    settings.PESAPAL_CALLBACK_URL = 'http://127.0.0.1:5000/api/payments/webhook'
+    settings.PESAPAL_IPN_ID = None
+    PesaPal.BASE_URL = base_url
+    pesapal.clear_caches()
+
+    from app import create_app
+    app, _ = create_app()
+    logging.disable(logging.ERROR)  # injected failures are counted in the table instead
+    _cleanup()
+
+    plan = _seed(concurrency, gigs)
+    clients = [_client(app, user_id) for user_id, _ in plan]
+    all_jobs = [job_id for _, job_ids in plan for job_id in job_ids]
+    webhook_client = app.test_client()
+    rows = []
+    print(f"Fake PesaPal at {base_url}: latency {latency:.0f}±{jitter:.0f} ms, failure rate {failure_rate:.0%}")
+    print(f"{gigs} gigs over {concurrency} workers\n")
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            _run_phase('initiate', pool, [
+                [lambda c=client, j=job_id: c.post(f'/jobs/{j}/initiate-payment') for job_id in job_ids]
+                for client, (_, job_ids) in zip(clients, plan)
+            ], {201}, rows)
+
+            _run_phase('retry', pool, [
+                [lambda c=client, j=job_id: c.post(f'/jobs/{j}/retry-payment')
+                 for i, job_id in enumerate(job_ids) if i % RETRY_EVERY == 0]
+                for client, (_, job_ids) in zip(clients, plan)
+            ], {200, 201}, rows)
+
+            _run_phase('status (pending)', pool, [
+                [lambda c=client, j=job_id: c.get(f'/jobs/{j}/payment-status') for job_id in job_ids]
+                for client, (_, job_ids) in zip(clients, plan)
+            ], {200}, rows)
+
+            tracking_ids = _pending_tracking_ids(all_jobs)
+            deliveries = [{'OrderTrackingId': tid, 'OrderNotificationType': 'IPNCHANGE'}
+                          for tid in tracking_ids for _ in range(1 + duplicates)]
+            _run_phase('webhook', pool, [
+                [lambda d=delivery: webhook_client.post('/api/payments/webhook', json=d)
+                 for delivery in deliveries[w::concurrency]]
+                for w in range(concurrency)
+            ], {200}, rows)
+
+            time.sleep(settle_after)
+            start = time.perf_counter()
+            handled = drain_ipn_events()
+            ipn_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            reconciled = 0
+            while True:
+                summary = reconcile_pending_payments()
+                reconciled += summary['settled']
+                if summary['checked'] < RECONCILE_BATCH_SIZE:
+                    break
+            reconcile_seconds = time.perf_counter() - start
+
+            _run_phase('status (final)', pool, [
+                [lambda c=client, j=job_id: c.get(f'/jobs/{j}/payment-status') for job_id in job_ids]
+                for client, (_, job_ids) in zip(clients, plan)
+            ], {200}, rows)
+
+        print(f"{'phase':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, count, errors, rate, p50, p95, p99 in rows:
+            print(f"{name:<18}{count:>9}{errors:>8}{rate:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}")
+
+        db = SessionLocal()
+        try:
+            statuses = {status.value: count for status, count in db.query(Payment.status, func.count(Payment.id)).filter(
+                Payment.gig_id.in_(all_jobs)).group_by(Payment.status).all()}
+        finally:
+            db.close()
+        print(f"\nIPN worker: {handled} IPNs in {ipn_seconds:.2f}s; "
+              f"reconciler: {reconciled} settled in {reconcile_seconds:.2f}s")
+        print(f"Payments: {statuses}")
+        print(f"Fake PesaPal: {fake.stats()}")
+        print("✓ Benchmark complete")
+    finally:
+        _cleanup(base_url)
+        fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--gigs', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=150.0, help='fake PesaPal mean latency in ms')
+    parser.add_argument('--jitter', type=float, default=50.0)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--duplicates', type=int, default=2, help='extra deliveries of each IPN')
+    parser.add_argument('--settle-after', type=float, default=0.0, help='seconds orders stay Pending at PesaPal')
+    args = parser.parse_args()
+    benchmark(args.gigs, args.concurrency, args.latency, args.jitter, args.failure_rate, args.duplicates,
+              args.settle_after)
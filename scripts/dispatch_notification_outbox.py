@@ -0,0 +1,42 @@
+"""
+Run the notification outbox dispatcher as its own process.
+
+Use this with NOTIFICATION_OUTBOX_DISPATCHER=off on the web workers. Events are published
+through SOCKETIO_MESSAGE_QUEUE, so the web workers holding the sockets deliver them.
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask_socketio import SocketIO
+from app.config import settings
+from app.sockets import set_socketio
+from app.services.notification_outbox import drain_outbox, OUTBOX_POLL_SECONDS
+from app.services.socket_queue import socketio_queue_options, describe_queue
+
+
+def dispatch(once=False):
+    """Drain the outbox every OUTBOX_POLL_SECONDS (or once) through a write-only queue emitter"""
+    if not settings.SOCKETIO_MESSAGE_QUEUE:
+        print("Error: SOCKETIO_MESSAGE_QUEUE must be set to reach the web workers")
+        sys.exit(1)
+
+    set_socketio(SocketIO(**socketio_queue_options(settings.SOCKETIO_MESSAGE_QUEUE,
+                                                   settings.SOCKETIO_CHANNEL, write_only=True)))
+    print(f"Dispatching notification outbox via {describe_queue(settings.SOCKETIO_MESSAGE_QUEUE)}")
+
+    while True:
+        sent = drain_outbox()
+        if sent:
+            print(f"✓ Dispatched {sent} events")
+        if once:
+            return
+        time.sleep(OUTBOX_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    dispatch(once='--once' in sys.argv)
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the PesaPal v3 API, for exercising the payment flow offline.
+
+Implements Auth/RequestToken, URLSetup/RegisterIPN, URLSetup/GetIpnList,
+Transactions/SubmitOrderRequest and Transactions/GetTransactionStatus under any path ending
+in /api (so PESAPAL_BASE_URL=http://127.0.0.1:8765/pesapalv3/api works). Every response can be
+delayed (--latency / --jitter) and a share of them replaced by 503s (--failure-rate). Orders
+report Pending until --settle-after seconds have passed, then the --outcome status.
+GET /__stats returns the number of calls per endpoint.
+
+Usage: python scripts/fake_pesapal_server.py [--port 8765] [--latency 150] [--jitter 50]
+       [--failure-rate 0.05] [--settle-after 2] [--outcome completed|failed|cancelled|mixed]
+Then run the app with PESAPAL_BASE_URL=http://127.0.0.1:8765/pesapalv3/api and any
+PESAPAL_CONSUMER_KEY / PESAPAL_CONSUMER_SECRET.
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+OUTCOMES = {
+    'completed': ('Completed', 1),
+    'failed': ('Failed', 2),
+    'cancelled': ('Cancelled', 3),
+}
+
+
+class FakePesaPalServer:
+    """Threaded HTTP server answering the PesaPal endpoints the app uses"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0,
+                 settle_after=0.0, outcome='completed', token_ttl=300, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.settle_after = settle_after
+        self.outcome = outcome
+        self.token_ttl = token_ttl
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.ipns = {}
+        self.calls = Counter()
+        self.failures = Counter()
+        self.httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/pesapalv3/api"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-pesapal', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'failures': dict(self.failures), 'orders': len(self.orders)}
+
+    def _delay(self):
+        delay = self.latency_ms + (self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _order_status(self, order):
+        if time.monotonic() - order['submitted'] < self.settle_after:
+            return 'Pending', 0
+        outcome = self.outcome
+        if outcome == 'mixed':
+            outcome = ('completed', 'completed', 'failed', 'cancelled')[order['sequence'] % 4]
+        return OUTCOMES[outcome]
+
+    def handle(self, method, path, query, body):
+        """Return (status, payload) for one request"""
+        endpoint = path.split('/api', 1)[-1]
+        with self.lock:
+            self.calls[endpoint] += 1
+        self._delay()
+        if endpoint != '/__stats' and self.failure_rate and self.random.random() < self.failure_rate:
+            with self.lock:
+                self.failures[endpoint] += 1
+            return 503, {'error': {'code': 'service_unavailable', 'message': 'Injected failure'}}
+
+        if endpoint == '/__stats':
+            return 200, self.stats()
+
+        if method == 'POST' and endpoint == '/Auth/RequestToken':
+            if not body.get('consumer_key') or not body.get('consumer_secret'):
+                return 400, {'error': {'code': 'invalid_consumer_key_or_secret_provided'}}
+            expiry = datetime.utcnow() + timedelta(seconds=self.token_ttl)
+            return 200, {'token': uuid.uuid4().hex, 'expiryDate': expiry.strftime('%Y-%m-%dT%H:%M:%S.%f0Z'),
+                         'status': '200', 'message': 'Request processed successfully'}
+
+        if method == 'POST' and endpoint == '/URLSetup/RegisterIPN':
+            url = body.get('url')
+            with self.lock:
+                ipn_id = self.ipns.setdefault(url, str(uuid.uuid4()))
+            return 200, {'url': url, 'ipn_id': ipn_id, 'ipn_notification_type_description': 'POST',
+                         'ipn_status_description': 'Active', 'status': '200'}
+
+        if method == 'GET' and endpoint == '/URLSetup/GetIpnList':
+            with self.lock:
+                return 200, [{'url': url, 'ipn_id': ipn_id, 'ipn_status_description': 'Active'}
+                             for url, ipn_id in self.ipns.items()]
+
+        if method == 'POST' and endpoint == '/Transactions/SubmitOrderRequest':
+            if not body.get('id') or not body.get('notification_id'):
+                return 400, {'error': {'code': 'missing_mandatory_field'}, 'status': '400'}
+            order_tracking_id = str(uuid.uuid4())
+            with self.lock:
+                self.orders[order_tracking_id] = {
+                    'merchant_reference': body['id'], 'amount': body.get('amount'),
+                    'currency': body.get('currency'), 'submitted': time.monotonic(),
+                    'sequence': len(self.orders)
+                }
+            return 200, {'order_tracking_id': order_tracking_id, 'merchant_reference': body['id'],
+                         'redirect_url': f"https://pay.pesapal.test/iframe?OrderTrackingId={order_tracking_id}",
+                         'error': None, 'status': '200'}
+
+        if method == 'GET' and endpoint == '/Transactions/GetTransactionStatus':
+            order_tracking_id = query.get('orderTrackingId', [None])[0]
+            with self.lock:
+                order = self.orders.get(order_tracking_id)
+            if not order:
+                return 404, {'error': {'code': 'order_not_found'}, 'status': '404'}
+            description, status_code = self._order_status(order)
+            return 200, {
+                'payment_method': 'MpesaKE' if status_code else '',
+                'amount': order['amount'],
+                'created_date': datetime.utcnow().isoformat(),
+                'confirmation_code': f"CONF{order['sequence']:08d}" if status_code == 1 else '',
+                'payment_status_description': description,
+                'description': '',
+                'message': 'Request processed successfully',
+                'payment_account': '',
+                'call_back_url': '',
+                'status_code': status_code,
+                'merchant_reference': order['merchant_reference'],
+                'currency': order['currency'],
+                'status': '200'
+            }
+
+        return 404, {'error': {'code': 'not_found', 'message': f'{method} {endpoint}'}}
+
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def _serve(self, method):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                body = {}
+            status, payload = server.handle(method, url.path, parse_qs(url.query), body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._serve('GET')
+
+        def do_POST(self):
+            self._serve('POST')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='mean response delay in ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='uniform +/- jitter in ms')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--settle-after', type=float, default=0.0, help='seconds an order stays Pending')
+    parser.add_argument('--outcome', choices=sorted(OUTCOMES) + ['mixed'], default='completed')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakePesaPalServer(args.host, args.port, args.latency, args.jitter, args.failure_rate,
+                             args.settle_after, args.outcome, seed=args.seed)
+    print(f"✓ Fake PesaPal listening on {fake.base_url}")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
+        sys.exit(0)
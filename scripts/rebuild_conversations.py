@@ -0,0 +1,39 @@
+"""
+Rebuild the conversations and conversation_participants tables from messages.
+
+Conversation pointers and unread counters are maintained by the messaging routes; this
+repairs drift left by bulk deletes, manual SQL or failed deploys. Run it once after the
+migration that adds the tables, so existing messages show up in the inbox.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.conversations import rebuild_conversations
+
+
+def rebuild():
+    """Recompute every conversation from the messages table"""
+    db = SessionLocal()
+
+    try:
+        print("Rebuilding conversations from messages...")
+        built = rebuild_conversations(db)
+        db.commit()
+        print(f"✓ Rebuilt {built} conversations")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,50 @@
+"""
+Rebuild the materialized user_dashboard_stats table.
+
+Rows are normally kept current by the write path; run this after bulk imports or manual SQL
+fixes. Run it with --missing once after the table is first introduced: it only builds the rows
+of profiles that have none. Dashboards compute a missing row on read until then.
+
+Usage: python scripts/rebuild_dashboard_stats.py [--missing]
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal, Base, engine
+from app.services.dashboard_stats import rebuild_all_stats, create_missing_stats
+
+
+def rebuild_dashboard_stats(missing_only=False):
+    """Recompute every professional and institution dashboard row, or only the missing ones"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        if missing_only:
+            print("Building missing dashboard stats...")
+            written = create_missing_stats(db)
+        else:
+            print("Rebuilding dashboard stats...")
+            written = rebuild_all_stats(db)
+        db.commit()
+        print(f"✓ Wrote {written} dashboard stats rows")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--missing', action='store_true', help='only build rows for profiles that have none')
+    args = parser.parse_args()
+    rebuild_dashboard_stats(missing_only=args.missing)
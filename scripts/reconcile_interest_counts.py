@@ -0,0 +1,39 @@
+"""
+Reconcile the denormalized jobs interest counters with job_interests.
+
+interest_count, pending_interest_count and accepted_interest_count are maintained by the
+interest routes; this repairs drift left by bulk deletes, manual SQL or failed deploys, and
+fills the columns when the app adds them to a database that skipped the alembic migration.
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.interest_counters import reconcile_interest_counts
+
+
+def reconcile():
+    """Recompute interest counters for every job and fix the ones that drifted"""
+    db = SessionLocal()
+
+    try:
+        print("Reconciling job interest counters...")
+        repaired = reconcile_interest_counts(db)
+        db.commit()
+        print(f"✓ Repaired {repaired} jobs")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reconcile()
@@ -0,0 +1,49 @@
+"""
+Run the pending payment reconciler as its own process.
+
+Use this with PAYMENT_RECONCILER=off on the web workers. It applies the IPNs queued by the
+webhook every RECONCILE_POLL_SECONDS and checks due payments against PesaPal every
+RECONCILE_INTERVAL_SECONDS.
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.payment_ipn import drain_ipn_events
+from app.services.payment_reconciliation import (
+    reconcile_pending_payments, RECONCILE_BATCH_SIZE, RECONCILE_INTERVAL_SECONDS, RECONCILE_POLL_SECONDS
+)
+
+
+def reconcile(once=False):
+    """Apply queued IPNs and reconcile due payments on their intervals (or until none are due, once)"""
+    print("Reconciling pending payments")
+
+    next_reconcile = 0.0
+    while True:
+        handled = drain_ipn_events()
+        if handled:
+            print(f"✓ Handled {handled} IPNs")
+        if time.monotonic() < next_reconcile:
+            time.sleep(RECONCILE_POLL_SECONDS)
+            continue
+        next_reconcile = time.monotonic() + RECONCILE_INTERVAL_SECONDS
+
+        while True:
+            summary = reconcile_pending_payments()
+            if summary['checked']:
+                print(f"✓ Checked {summary['checked']} payments: {summary['settled']} settled, "
+                      f"{summary['pending']} still pending, {summary['errors']} errors")
+            if summary['checked'] < RECONCILE_BATCH_SIZE:
+                break
+        if once:
+            return
+        time.sleep(RECONCILE_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    reconcile(once='--once' in sys.argv)
@@ -0,0 +1,59 @@
+"""
+Maintain the metrics_daily rollups.
+
+Without arguments, rebuilds the recent buckets (today, and yesterday shortly after midnight);
+--watch keeps doing so every ROLLUP_REFRESH_SECONDS, for deployments that run the refresher as
+its own process (METRICS_ROLLUP_REFRESHER=off) instead of inside the web workers. --backfill
+rebuilds history, from --since (YYYY-MM-DD) or the oldest row: once after the table is
+introduced, and after a bulk import, a change to a rollup definition or a refresher outage.
+
+Usage: python scripts/rollup_metrics.py [--backfill [--since 2025-01-01]] [--watch]
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import date
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.metrics_rollup import backfill, refresh_recent, ROLLUP_REFRESH_SECONDS
+
+
+def run(backfill_history=False, since=None, watch=False):
+    db = SessionLocal()
+
+    try:
+        if backfill_history:
+            print(f"Backfilling metrics_daily from {since or 'the oldest row'}...")
+            written = backfill(db, since=since)
+            print(f"✓ Wrote {written} buckets")
+        while True:
+            written = refresh_recent(db)
+            db.commit()
+            print(f"✓ Refreshed {written} recent buckets")
+            if not watch:
+                return
+            time.sleep(ROLLUP_REFRESH_SECONDS)
+    except KeyboardInterrupt:
+        db.rollback()
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backfill', action='store_true', help='rebuild history before refreshing today')
+    parser.add_argument('--since', type=date.fromisoformat, default=None)
+    parser.add_argument('--watch', action='store_true')
+    args = parser.parse_args()
+    run(args.backfill, args.since, args.watch)
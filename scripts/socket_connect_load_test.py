@@ -0,0 +1,111 @@
+"""
+Measure how many Socket.IO connects per second a single worker sustains.
+
+Runs the real connect/disconnect handlers in-process through the Flask-SocketIO test client,
+once with the room claim stored at login (the normal path) and once with the claim and cache
+dropped before every connect (the old query-per-connect path; this also rewrites the session
+cookie each time, so it slightly overstates the gap), and reports connects/second
+and SQL statements per connect. A throwaway institution user is created and removed.
+
+Usage: python scripts/socket_connect_load_test.py [--connects 2000]
+Point DATABASE_URL at a scratch database.
+"""
+
+import sys
+import os
+import time
+import io
+import argparse
+import logging
+import threading
+from contextlib import redirect_stdout
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.services import socket_rooms
+
+LOAD_TEST_EMAIL = 'socket-load-test@qgig.local'
+
+
+def _create_user():
+    db = SessionLocal()
+    try:
+        password = bcrypt.hashpw(b'load-test', bcrypt.gensalt()).decode()
+        user = User(email=LOAD_TEST_EMAIL, password=password, role=UserRole.INSTITUTION)
+        db.add(user)
+        db.commit()
+        db.add(Institution(user_id=user.id, institution_name='Socket Load Test'))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _delete_user(user_id):
+    db = SessionLocal()
+    try:
+        db.query(Institution).filter(Institution.user_id == user_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run(app, socketio, http, connects, cold):
+    statements, me = [0], threading.get_ident()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        # Keep per-connect prints out of the measurement
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for _ in range(connects):
+                if cold:
+                    with http.session_transaction() as sess:
+                        sess.pop(socket_rooms.SESSION_CLAIM_KEY, None)
+                    socket_rooms._cache.clear()
+                client = socketio.test_client(app, flask_test_client=http)
+                if not client.is_connected():
+                    raise RuntimeError("Socket connection was rejected")
+                client.disconnect()
+            elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+    return connects / elapsed, statements[0] / connects
+
+
+def load_test(connects):
+    """Report connect throughput with and without precomputed rooms"""
+    app, socketio = create_app()
+    logging.disable(logging.INFO)
+    user_id = _create_user()
+    try:
+        http = app.test_client()
+        response = http.post('/login', data={'email': LOAD_TEST_EMAIL, 'password': 'load-test'})
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed with status {response.status_code}")
+
+        print(f"Connecting {connects} sockets per scenario...")
+        for label, cold in (('query per connect', True), ('session room claim', False)):
+            rate, per_connect = _run(app, socketio, http, connects, cold)
+            print(f"✓ {label:<20} {rate:8.0f} connects/s  {per_connect:.2f} SQL statements/connect")
+    finally:
+        _delete_user(user_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connects', type=int, default=2000)
+    args = parser.parse_args()
+    load_test(args.connects)
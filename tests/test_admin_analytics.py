@@ -0,0 +1,139 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.document import Document, DocumentStatus, DocumentType
+from app.models.rating import Rating
+from app.services import admin_analytics, metrics_rollup
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    db = SessionLocal()
+    now = datetime.utcnow()
+    admin = User(email='analytics-admin@test.com', password='x', role=UserRole.ADMIN)
+    inst_user = User(email='analytics-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    pro_users = [User(email=f'analytics-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL,
+                      is_active=i != 2, created_at=now - timedelta(days=40 * i)) for i in range(3)]
+    db.add_all([admin, inst_user] + pro_users)
+    db.flush()
+    institution = Institution(user_id=inst_user.id, institution_name='Analytics Inc.')
+    professionals = [Professional(user_id=u.id, full_name=f'Analytics Pro {i}') for i, u in enumerate(pro_users)]
+    db.add(institution)
+    db.add_all(professionals)
+    db.flush()
+    statuses = [JobStatus.OPEN, JobStatus.OPEN, JobStatus.ASSIGNED, JobStatus.COMPLETED, JobStatus.COMPLETED]
+    jobs = [Job(institution_id=institution.id, title=f'Analytics gig {i}', description='d', location='K',
+                pay_amount=100 * (i + 1), status=status, created_at=now - timedelta(days=10 * i),
+                assigned_professional_id=professionals[0].id if status != JobStatus.OPEN else None)
+            for i, status in enumerate(statuses)]
+    db.add_all(jobs)
+    db.flush()
+    db.add_all([
+        Payment(gig_id=jobs[3].id, institution_id=institution.id, professional_id=professionals[0].id, amount=400,
+                pesapal_merchant_reference='AN-1', status=TransactionStatus.COMPLETED, completed_at=now - timedelta(days=2)),
+        Payment(gig_id=jobs[4].id, institution_id=institution.id, professional_id=professionals[0].id, amount=500,
+                pesapal_merchant_reference='AN-2', status=TransactionStatus.COMPLETED, completed_at=now - timedelta(days=20)),
+        Payment(gig_id=jobs[2].id, institution_id=institution.id, professional_id=professionals[0].id, amount=300,
+                pesapal_merchant_reference='AN-3', status=TransactionStatus.PENDING),
+        Payment(gig_id=jobs[2].id, institution_id=institution.id, professional_id=professionals[0].id, amount=300,
+                pesapal_merchant_reference='AN-4', status=TransactionStatus.FAILED),
+    ])
+    db.add_all([
+        Document(user_id=pro_users[0].id, professional_id=professionals[0].id, document_type=DocumentType.CV,
+                 file_path='a', file_name='a', status=DocumentStatus.APPROVED),
+        Document(user_id=pro_users[0].id, professional_id=professionals[0].id, document_type=DocumentType.NIN,
+                 file_path='b', file_name='b', status=DocumentStatus.APPROVED),
+        Document(user_id=pro_users[1].id, professional_id=professionals[1].id, document_type=DocumentType.CV,
+                 file_path='c', file_name='c', status=DocumentStatus.PENDING),
+    ])
+    db.add(Rating(gig_id=jobs[3].id, institution_id=institution.id, professional_id=professionals[0].id,
+                  rater_id=inst_user.id, rated_id=pro_users[0].id, rating=4.5))
+    db.commit()
+    admin_id = admin.id
+    db.close()
+    return admin_id
+
+
+def _admin_client(app, admin_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['active_role'] = 'admin'
+    return client
+
+
+def _count_statements(call):
+    statements, me = [0], threading.get_ident()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+    return response, statements[0]
+
+
+def test_breakdowns(seeded):
+    db = SessionLocal()
+    try:
+        users = admin_analytics.user_breakdown(db)
+        assert (users['total'], users['active'], users['professional_accounts'], users['new']) == (5, 4, 3, 3)
+        assert (users['professionals'], users['institutions']) == (3, 1)
+
+        jobs = admin_analytics.job_breakdown(db)
+        assert (jobs['total'], jobs['open'], jobs['assigned'], jobs['completed'], jobs['new']) == (5, 2, 1, 2, 3)
+
+        payments = admin_analytics.payment_breakdown(db)
+        assert (payments['total'], payments['completed'], payments['pending'], payments['failed']) == (4, 2, 1, 1)
+        assert (payments['revenue'], payments['revenue_30d'], payments['revenue_7d']) == (900.0, 900.0, 400.0)
+        assert payments['pending_amount'] == 300.0
+
+        documents = admin_analytics.document_breakdown(db)
+        assert (documents['total'], documents['approved'], documents['pending']) == (3, 2, 1)
+        assert documents['verified_professionals'] == 1
+
+        assert metrics_rollup.refresh()
+        series = admin_analytics.daily_signups(db, days=7)
+        assert len(series) == 7
+        assert series[-1]['users'] == 3 and series[-1]['jobs'] == 1
+
+        # The refresher only rebuilds today; history comes from the backfill
+        metrics_rollup.backfill(db)
+        assert [r['revenue'] for r in admin_analytics.daily_revenue(db, days=30)] == [500.0, 400.0]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('/api/analytics/admin/dashboard', 8),  # five breakdowns, two top-5 lists, daily revenue
+    ('/api/admin/metrics', 5),
+    ('/admin', 11),  # seven as above without ratings, three tab lists, notification badge
+    ('/admin/analytics', 5),  # users, jobs, documents, 7-day series, notification badge
+])
+def test_dashboard_statement_counts(app, seeded, url, expected):
+    client = _admin_client(app, seeded)
+    client.get(url)  # warm the per-user identity cache so only the dashboard's own queries count
+    response, statements = _count_statements(lambda: client.get(url))
+    assert response.status_code == 200
+    assert statements == expected
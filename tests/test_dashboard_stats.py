@@ -0,0 +1,204 @@
+import pytest
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, GigInterest, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.dashboard_stats import UserDashboardStats
+from app.services.dashboard_stats import rebuild_all_stats
+
+
+@pytest.fixture(scope='module')
+def app_context():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='function')
+def profiles(app_context):
+    db = SessionLocal()
+    institution_user = User(email='stats-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    professional_user = User(email='stats-prof@test.com', password='x', role=UserRole.PROFESSIONAL)
+    db.add_all([institution_user, professional_user])
+    db.commit()
+    institution = Institution(user_id=institution_user.id, institution_name='Stats Inc.')
+    professional = Professional(user_id=professional_user.id, full_name='Jane Doe')
+    db.add_all([institution, professional])
+    db.commit()
+    ids = (institution_user.id, institution.id, professional_user.id, professional.id)
+    db.close()
+
+    yield ids
+
+    db = SessionLocal()
+    for model in (UserDashboardStats, Payment, GigInterest, Job, Institution, Professional, User):
+        db.query(model).delete()
+    db.commit()
+    db.close()
+
+
+def _stats(db, user_id, role):
+    return db.query(UserDashboardStats).filter(
+        UserDashboardStats.user_id == user_id,
+        UserDashboardStats.role == role
+    ).first()
+
+
+def test_stats_follow_writes_in_same_transaction(profiles):
+    institution_user_id, institution_id, professional_user_id, professional_id = profiles
+    db = SessionLocal()
+    job = Job(institution_id=institution_id, title='Night shift', description='d', location='Kampala',
+              pay_amount=500, duration_hours=8, sector='Health')
+    db.add(job)
+    db.commit()
+    db.add(GigInterest(job_id=job.id, professional_id=professional_id))
+    db.commit()
+
+    assert _stats(db, institution_user_id, 'institution').open_gigs == 1
+    assert _stats(db, institution_user_id, 'institution').pending_interests == 1
+    assert _stats(db, professional_user_id, 'professional').interested_gigs == 1
+
+    job.status = JobStatus.COMPLETED
+    job.assigned_professional_id = professional_id
+    db.add(Payment(gig_id=job.id, institution_id=institution_id, professional_id=professional_id, amount=500,
+                   pesapal_merchant_reference='STATS-1', status=TransactionStatus.COMPLETED))
+    db.commit()
+
+    professional_stats = _stats(db, professional_user_id, 'professional')
+    assert professional_stats.completed_gigs == 1
+    assert professional_stats.total_earned == 500
+    assert professional_stats.total_hours == 8
+    institution_stats = _stats(db, institution_user_id, 'institution')
+    assert institution_stats.open_gigs == 0
+    assert institution_stats.completed_gigs == 1
+    assert institution_stats.total_spent == 500
+    db.close()
+
+
+def test_rebuild_recreates_rows(profiles):
+    db = SessionLocal()
+    db.query(UserDashboardStats).delete()
+    db.commit()
+
+    assert rebuild_all_stats(db) == 2
+    db.commit()
+    assert db.query(UserDashboardStats).count() == 2
+    db.close()
+
+
+def _rebuilt(db, professional_id, institution_id):
+    from app.services.dashboard_stats import _compute_professional_stats, _compute_institution_stats
+    return (_compute_professional_stats(db, professional_id, UserDashboardStats()),
+            _compute_institution_stats(db, institution_id, UserDashboardStats()))
+
+
+_PROFESSIONAL_COLUMNS = ('interested_gigs', 'assigned_gigs', 'completed_gigs', 'total_earned', 'average_rating',
+                         'total_ratings', 'total_hours', 'repeat_clients', 'top_sectors', 'recent_completed_gigs')
+_INSTITUTION_COLUMNS = ('open_gigs', 'assigned_gigs', 'completed_gigs', 'pending_interests', 'total_spent')
+
+
+def _assert_matches_rebuild(db, profiles):
+    institution_user_id, institution_id, professional_user_id, professional_id = profiles
+    db.expire_all()
+    expected_professional, expected_institution = _rebuilt(db, professional_id, institution_id)
+    for row, expected, columns in (
+        (_stats(db, professional_user_id, 'professional'), expected_professional, _PROFESSIONAL_COLUMNS),
+        (_stats(db, institution_user_id, 'institution'), expected_institution, _INSTITUTION_COLUMNS)
+    ):
+        for column in columns:
+            assert (column, getattr(row, column)) == (column, pytest.approx(getattr(expected, column)))
+
+
+def test_transition_deltas_match_a_full_rebuild(profiles):
+    from app.models.rating import Rating
+    institution_user_id, institution_id, professional_user_id, professional_id = profiles
+    db = SessionLocal()
+    try:
+        jobs = [Job(institution_id=institution_id, title=f'Delta gig {i}', description='d', location='K',
+                    pay_amount=100, duration_hours=i + 1, sector='Health') for i in range(3)]
+        db.add_all(jobs)
+        db.commit()
+        db.add_all([GigInterest(job_id=job.id, professional_id=professional_id) for job in jobs])
+        db.commit()
+        _assert_matches_rebuild(db, profiles)
+
+        # Expired instances: the old values are loaded when the columns are set
+        jobs[0].status = JobStatus.ASSIGNED
+        jobs[0].assigned_professional_id = professional_id
+        jobs[1].status = JobStatus.COMPLETED
+        jobs[1].assigned_professional_id = professional_id
+        payment = Payment(gig_id=jobs[1].id, institution_id=institution_id, professional_id=professional_id,
+                          amount=100, pesapal_merchant_reference='DELTA-1', status=TransactionStatus.COMPLETED)
+        rating = Rating(gig_id=jobs[1].id, institution_id=institution_id, professional_id=professional_id,
+                        rater_id=institution_user_id, rated_id=professional_user_id, rating=4)
+        db.add_all([payment, rating])
+        db.commit()
+        _assert_matches_rebuild(db, profiles)
+
+        payment.status = TransactionStatus.FAILED
+        rating.rating = 2
+        db.add(Rating(gig_id=jobs[0].id, institution_id=institution_id, professional_id=professional_id,
+                      rater_id=institution_user_id, rated_id=professional_user_id, rating=5))
+        jobs[1].title = 'Renamed delta gig'
+        db.delete(db.query(GigInterest).filter(GigInterest.job_id == jobs[2].id).one())
+        db.commit()
+        _assert_matches_rebuild(db, profiles)
+
+        jobs[0].status = JobStatus.OPEN
+        jobs[0].assigned_professional_id = None
+        db.delete(rating)
+        db.commit()
+        _assert_matches_rebuild(db, profiles)
+        db.query(Rating).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_bookkeeping_updates_do_not_touch_stats(profiles):
+    from sqlalchemy import event
+    institution_user_id, institution_id, professional_user_id, professional_id = profiles
+    db = SessionLocal()
+    try:
+        job = Job(institution_id=institution_id, title='Pending pay', description='d', location='K', pay_amount=100)
+        db.add(job)
+        db.flush()
+        payment = Payment(gig_id=job.id, institution_id=institution_id, professional_id=professional_id, amount=100,
+                          pesapal_merchant_reference='BOOK-1', status=TransactionStatus.PENDING)
+        db.add(payment)
+        db.commit()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            payment.status_check_attempts = (payment.status_check_attempts or 0) + 1
+            db.commit()
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        assert statements and not any('user_dashboard_stats' in statement for statement in statements)
+    finally:
+        db.close()
+
+
+def test_reads_never_write_and_new_profiles_get_rows(profiles):
+    from app.services.dashboard_stats import get_dashboard_stats
+    institution_user_id, institution_id, professional_user_id, professional_id = profiles
+    db = SessionLocal()
+    try:
+        assert _stats(db, professional_user_id, 'professional') is not None  # created with the profile
+
+        db.query(UserDashboardStats).delete()
+        db.commit()
+        row = get_dashboard_stats(db, professional_user_id, 'professional', professional_id)
+        assert row.interested_gigs == 0
+        assert not db.new and not db.dirty
+        db.rollback()
+        assert db.query(UserDashboardStats).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,183 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import column, event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.services import earnings, page_cache
+from app.services.time_buckets import bucket_label, months_back, time_bucket
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+def _months_ago(now, months):
+    year, month = months_back(now.date(), months).split('-')
+    return now.replace(year=int(year), month=int(month), day=15)
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    db = SessionLocal()
+    now = datetime.utcnow()
+    inst_user = User(email='earnings-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    pro_users = [User(email=f'earnings-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL) for i in range(2)]
+    db.add_all([inst_user] + pro_users)
+    db.flush()
+    institution = Institution(user_id=inst_user.id, institution_name='Earnings Clinic')
+    professionals = [Professional(user_id=u.id, full_name=f'Earnings Pro {i}') for i, u in enumerate(pro_users)]
+    db.add(institution)
+    db.add_all(professionals)
+    db.flush()
+    job = Job(institution_id=institution.id, title='Earnings gig', description='d', location='K', pay_amount=100,
+              status=JobStatus.COMPLETED, assigned_professional_id=professionals[0].id)
+    db.add(job)
+    db.flush()
+
+    def payment(professional, amount, status, completed_at=None):
+        return Payment(gig_id=job.id, institution_id=institution.id, professional_id=professional.id, amount=amount,
+                       pesapal_merchant_reference=f'EA-{professional.id}-{amount}', status=status,
+                       completed_at=completed_at)
+
+    db.add_all([
+        payment(professionals[0], 100, TransactionStatus.COMPLETED, now),
+        payment(professionals[0], 200, TransactionStatus.COMPLETED, _months_ago(now, 2)),
+        payment(professionals[0], 400, TransactionStatus.COMPLETED, _months_ago(now, 8)),
+        payment(professionals[0], 50, TransactionStatus.PENDING),
+        payment(professionals[0], 75, TransactionStatus.FAILED),
+        payment(professionals[1], 999, TransactionStatus.COMPLETED, now),
+    ])
+    db.commit()
+    ids = [p.id for p in professionals]
+    db.close()
+    return ids
+
+
+def _count_statements(call):
+    statements, me = [0], threading.get_ident()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        result = call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+    return result, statements[0]
+
+
+def test_time_bucket_renders_per_dialect():
+    query = select(time_bucket('month', column('completed_at')))
+    assert "to_char(date_trunc('month', completed_at), 'YYYY-MM')" in str(query.compile(dialect=postgresql.dialect()))
+    assert "strftime('%Y-%m', completed_at)" in str(query.compile(dialect=sqlite.dialect()))
+    assert bucket_label('month', datetime(2025, 3, 14)) == '2025-03'
+    assert months_back(datetime(2025, 2, 1).date(), 3) == '2024-11'
+    with pytest.raises(ValueError):
+        time_bucket('fortnight', column('completed_at'))
+
+
+def test_summary_is_one_query_and_cached_until_a_payment_changes(seeded):
+    page_cache.invalidate()
+    professional_id, other_id = seeded
+    db = SessionLocal()
+    try:
+        summary, statements = _count_statements(lambda: earnings.earnings_summary(db, professional_id))
+        assert statements == 1
+        assert (summary['total_earnings'], summary['completed_count']) == (700.0, 3)
+        assert (summary['pending_amount'], summary['pending_count']) == (50.0, 1)
+        assert (summary['monthly_earnings'], summary['monthly_count']) == (100.0, 1)
+        assert summary['recent_earnings'] == 100.0
+        assert [point['amount'] for point in summary['monthly_trend']] == [200.0, 100.0]
+
+        _, statements = _count_statements(lambda: earnings.earnings_summary(db, professional_id))
+        assert statements == 0
+
+        # Another professional's payment leaves this cache alone
+        other = db.query(Payment).filter(Payment.professional_id == other_id).one()
+        other.amount = 1000
+        db.commit()
+        _, statements = _count_statements(lambda: earnings.earnings_summary(db, professional_id))
+        assert statements == 0
+
+        pending = db.query(Payment).filter(Payment.professional_id == professional_id,
+                                           Payment.status == TransactionStatus.PENDING).one()
+        pending.status = TransactionStatus.COMPLETED
+        pending.completed_at = datetime.utcnow()
+        db.commit()
+        summary = earnings.earnings_summary(db, professional_id)
+        assert (summary['total_earnings'], summary['pending_count'], summary['monthly_earnings']) == (750.0, 0, 150.0)
+    finally:
+        db.close()
+
+
+def test_professional_analytics_api_uses_summary(app, seeded):
+    professional_id, _ = seeded
+    db = SessionLocal()
+    user_id = db.query(Professional.user_id).filter(Professional.id == professional_id).scalar()
+    db.close()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['active_role'] = 'professional'
+
+    response = client.get('/api/analytics/professional/dashboard')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['earnings']['total'] == 750.0
+    now = datetime.utcnow()
+    assert data['monthly_trend'][-1] == {'year': now.year, 'month': now.month, 'earnings': 150.0}
+
+    assert client.get('/professional/earnings').status_code == 200
+
+
+def test_moving_a_payment_invalidates_both_professionals(seeded):
+    page_cache.invalidate()
+    professional_id, other_id = seeded
+    db = SessionLocal()
+    try:
+        before = earnings.earnings_summary(db, professional_id)['total_earnings']
+        earnings.earnings_summary(db, other_id)
+
+        moved = db.query(Payment).filter(Payment.professional_id == other_id).one()
+        moved.professional_id = professional_id
+        db.commit()
+        _, statements = _count_statements(lambda: earnings.earnings_summary(db, other_id))
+        assert statements == 1
+        assert earnings.earnings_summary(db, other_id)['total_earnings'] == 0.0
+        assert earnings.earnings_summary(db, professional_id)['total_earnings'] == before + moved.amount
+
+        moved.professional_id = other_id
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_bulk_payment_updates_invalidate_the_professional(seeded):
+    page_cache.invalidate()
+    _, other_id = seeded
+    db = SessionLocal()
+    try:
+        before = earnings.earnings_summary(db, other_id)['total_earnings']
+        payments = db.query(Payment).filter(Payment.professional_id == other_id)
+        payments.update({Payment.amount: Payment.amount + 1}, synchronize_session=False)
+        db.commit()
+        assert earnings.earnings_summary(db, other_id)['total_earnings'] == before + 1
+
+        payments.update({Payment.amount: Payment.amount - 1}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import pytest
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.job_interest import JobInterest
+from app.models.payment import Payment, TransactionStatus
+from app.services.exports import stream_export
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    db = SessionLocal()
+    admin = User(email='export-admin@test.com', password='x', role=UserRole.ADMIN)
+    inst_user = User(email='export-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    pro_users = [User(email=f'export-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL) for i in range(3)]
+    db.add_all([admin, inst_user] + pro_users)
+    db.flush()
+    institution = Institution(user_id=inst_user.id, institution_name='Export Clinic')
+    professionals = [Professional(user_id=u.id, full_name=f'Export Pro {i}', phone_number=f'07000000{i}')
+                     for i, u in enumerate(pro_users)]
+    db.add(institution)
+    db.add_all(professionals)
+    db.flush()
+    job = Job(institution_id=institution.id, title='Export gig', description='d', location='K', pay_amount=500,
+              status=JobStatus.ASSIGNED, assigned_professional_id=professionals[0].id)
+    db.add(job)
+    db.flush()
+    db.add_all([JobInterest(job_id=job.id, professional_id=p.id) for p in professionals])
+    db.add(Payment(gig_id=job.id, institution_id=institution.id, professional_id=professionals[0].id, amount=500,
+                   pesapal_merchant_reference='EXP-1', status=TransactionStatus.COMPLETED))
+    db.commit()
+    ids = {'admin': admin.id, 'institution': inst_user.id}
+    db.close()
+    return ids
+
+
+def _client(app, user_id, role):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['active_role'] = role
+    return client
+
+
+def test_institution_export_streams_csv_and_ndjson(app, seeded):
+    client = _client(app, seeded['institution'], 'institution')
+
+    response = client.get('/api/institution/analytics/export')
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers['Content-Disposition'].endswith('.csv')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 3
+    by_name = {row['professional_name']: row for row in rows}
+    assert (by_name['Export Pro 0']['payment_paid'], by_name['Export Pro 0']['payment_status']) == ('500.0', 'completed')
+    assert (by_name['Export Pro 1']['payment_paid'], by_name['Export Pro 1']['payment_status']) == ('', 'unpaid')
+    assert by_name['Export Pro 2']['email'] == 'export-pro2@test.com'
+
+    response = client.get('/api/institution/analytics/export?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == 3 and {r['payment_status'] for r in records} == {'completed', 'unpaid'}
+
+    assert client.get('/api/institution/analytics/export?format=xlsx').status_code == 400
+
+
+@pytest.mark.parametrize('kind,expected', [('users', 5), ('payments', 1), ('jobs', 1), ('documents', 0)])
+def test_admin_exports(app, seeded, kind, expected):
+    client = _client(app, seeded['admin'], 'admin')
+    response = client.get(f'/api/admin/export/{kind}?format=ndjson')
+    assert response.status_code == 200 and response.is_streamed
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == expected
+    if kind == 'payments':
+        assert records[0]['gig_title'] == 'Export gig' and records[0]['status'] == 'completed'
+
+
+def test_admin_export_requires_admin_and_known_kind(app, seeded):
+    assert _client(app, seeded['institution'], 'institution').get('/api/admin/export/users').status_code == 403
+    assert _client(app, seeded['admin'], 'admin').get('/api/admin/export/ratings').status_code == 404
+
+
+def test_rows_are_encoded_batch_by_batch(app, seeded):
+    columns = [('email', User.email), ('role', User.role)]
+    with app.test_request_context():
+        response = stream_export(columns, lambda query: query.order_by(User.id), 'csv', 'users', batch_size=2)
+        chunks = list(response.response)
+    # header + 5 rows in chunks of two lines
+    assert len(chunks) == 3
+    assert chunks[0].splitlines()[0] == 'email,role'
+    assert ''.join(chunks).count('\n') == 6
@@ -0,0 +1,202 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.message import Message
+from app.models.conversation import Conversation, ConversationParticipant
+from app.services.inbox import load_conversation_summaries
+from app.services.conversations import (
+    record_message, record_message_deleted, mark_conversation_read, get_unread_message_count, rebuild_conversations,
+    load_thread_page, mark_thread_read
+)
+
+
+@pytest.fixture(scope='module')
+def inbox_users():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        me = User(email='inbox-inst@test.com', password='x', role=UserRole.INSTITUTION)
+        alice = User(email='inbox-alice@test.com', password='x', role=UserRole.PROFESSIONAL)
+        bob = User(email='inbox-bob@test.com', password='x', role=UserRole.PROFESSIONAL)
+        db.add_all([me, alice, bob])
+        db.commit()
+        db.add_all([
+            Institution(user_id=me.id, institution_name='Inbox Clinic'),
+            Professional(user_id=alice.id, full_name='Alice A.')
+        ])
+
+        def _message(sender, receiver, day, content, **kwargs):
+            return Message(sender_id=sender.id, receiver_id=receiver.id, content=content,
+                           created_at=datetime(2026, 3, day), **kwargs)
+
+        db.add_all([
+            _message(alice, me, 1, 'alice 1'),
+            _message(me, alice, 2, 'me to alice'),
+            _message(alice, me, 3, 'alice 2'),
+            _message(alice, me, 4, 'alice read', is_read=True),
+            _message(bob, me, 5, 'bob hidden', is_deleted_by_receiver=True),
+            _message(bob, me, 2, 'bob 1'),
+        ])
+        db.commit()
+        rebuild_conversations(db)
+        db.commit()
+        ids = {'me': me.id, 'alice': alice.id, 'bob': bob.id}
+        db.close()
+        yield ids
+        db = SessionLocal()
+        for model in (ConversationParticipant, Conversation, Message, Professional, Institution, User):
+            db.query(model).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_one_row_per_partner_with_unread_counts(inbox_users):
+    db = SessionLocal()
+    conversations, total_unread = load_conversation_summaries(db, inbox_users['me'])
+    assert [conv['other_user'].id for conv in conversations] == [inbox_users['alice'], inbox_users['bob']]
+
+    alice, bob = conversations
+    assert alice['last_message'].content == 'alice read'
+    assert alice['unread_count'] == 2
+    assert alice['profile_name'] == 'Alice A.'
+    # Deleted messages are neither the latest message nor unread
+    assert bob['last_message'].content == 'bob 1'
+    assert bob['unread_count'] == 1
+    assert bob['profile_name'] == 'inbox-bob@test.com'
+    assert total_unread == 3
+
+    conversations, _ = load_conversation_summaries(db, inbox_users['alice'])
+    assert conversations[0]['profile_name'] == 'Inbox Clinic'
+    assert conversations[0]['unread_count'] == 1
+    db.close()
+
+
+def test_summary_is_a_single_statement(inbox_users):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        conversations, _ = load_conversation_summaries(db, inbox_users['me'], limit=1)
+        assert len(conversations) == 1
+        assert len(statements) == 1
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+        db.close()
+
+
+def test_counters_follow_send_read_and_delete(inbox_users):
+    db = SessionLocal()
+    me, bob = inbox_users['me'], inbox_users['bob']
+    try:
+        before = get_unread_message_count(db, me)
+        message = Message(sender_id=bob, receiver_id=me, content='bob 2')
+        db.add(message)
+        db.flush()
+        record_message(db, message)
+        db.commit()
+        assert get_unread_message_count(db, me) == before + 1
+        conversations, _ = load_conversation_summaries(db, me)
+        assert conversations[0]['last_message'].content == 'bob 2'
+
+        message.is_deleted_by_receiver = True
+        db.flush()
+        record_message_deleted(db, message, me, was_unread=True)
+        db.commit()
+        assert get_unread_message_count(db, me) == before
+        conversations, _ = load_conversation_summaries(db, me)
+        assert [conv['last_message'].content for conv in conversations] == ['alice read', 'bob 1']
+
+        mark_conversation_read(db, me, bob, message.id, marked=1)
+        db.commit()
+        assert get_unread_message_count(db, me) == before - 1
+    finally:
+        db.close()
+
+
+def test_thread_pages_back_and_marks_read_in_one_update(inbox_users):
+    db = SessionLocal()
+    me, alice = inbox_users['me'], inbox_users['alice']
+    try:
+        latest, has_older = load_thread_page(db, me, alice, limit=2)
+        assert [msg.content for msg in latest] == ['alice 2', 'alice read']
+        assert has_older
+
+        older, has_older = load_thread_page(db, me, alice, before_id=latest[0].id, limit=2)
+        assert [msg.content for msg in older] == ['alice 1', 'me to alice']
+        assert not has_older
+
+        newer, _ = load_thread_page(db, me, alice, after_id=older[-1].id)
+        assert [msg.content for msg in newer] == ['alice 2', 'alice read']
+
+        assert mark_thread_read(db, me, alice, latest[-1].id) == 2
+        db.commit()
+        assert db.query(Message).filter(Message.receiver_id == me, Message.sender_id == alice,
+                                        Message.is_read == False).count() == 0
+        conversations, _ = load_conversation_summaries(db, me)
+        assert next(c for c in conversations if c['other_user'].id == alice)['unread_count'] == 0
+    finally:
+        db.close()
+
+
+def test_marking_part_of_a_thread_keeps_the_rest_unread(inbox_users):
+    db = SessionLocal()
+    me = inbox_users['me']
+    try:
+        carol = User(email='inbox-carol@test.com', password='x', role=UserRole.PROFESSIONAL)
+        db.add(carol)
+        db.flush()
+        sent = []
+        for i in range(3):
+            message = Message(sender_id=carol.id, receiver_id=me, content=f'carol {i}')
+            db.add(message)
+            db.flush()
+            record_message(db, message)
+            sent.append(message)
+        db.commit()
+        before = get_unread_message_count(db, me)
+
+        # A polling page that only reached the first of the three new messages
+        assert mark_thread_read(db, me, carol.id, sent[0].id) == 1
+        db.commit()
+        assert get_unread_message_count(db, me) == before - 1
+        conversations, _ = load_conversation_summaries(db, me)
+        assert next(c for c in conversations if c['other_user'].id == carol.id)['unread_count'] == 2
+
+        assert mark_thread_read(db, me, carol.id, sent[-1].id) == 2
+        db.commit()
+        assert get_unread_message_count(db, me) == before - 3
+    finally:
+        db.close()
+
+
+def test_messages_to_oneself_are_rejected_and_never_form_a_conversation(inbox_users):
+    app, _ = create_app()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = inbox_users['me']
+        sess['active_role'] = 'institution'
+    response = client.post('/messages/send', json={'receiver_id': inbox_users['me'], 'content': 'note to self'})
+    assert response.status_code == 400
+
+    db = SessionLocal()
+    try:
+        conversations = db.query(Conversation).count()
+        message = Message(sender_id=inbox_users['me'], receiver_id=inbox_users['me'], content='legacy self message')
+        db.add(message)
+        db.flush()
+        assert record_message(db, message) is None
+        assert db.query(Conversation).count() == conversations
+        db.rollback()
+    finally:
+        db.close()
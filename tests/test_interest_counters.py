@@ -0,0 +1,172 @@
+import threading
+import pytest
+from sqlalchemy import event, text
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job
+from app.models.job_interest import JobInterest, InterestStatus
+from app.models.notification import Notification
+from app.models.message import Message
+from app.models.dashboard_stats import UserDashboardStats
+from app.services.interest_counters import reconcile_interest_counts
+from app.services.interest_decisions import decline_pending_interests
+import bcrypt
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='function')
+def gig(app):
+    db = SessionLocal()
+    hashed_password = bcrypt.hashpw('password'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    institution_user = User(email='counter-inst@test.com', password=hashed_password, role=UserRole.INSTITUTION)
+    db.add(institution_user)
+    db.commit()
+    institution = Institution(user_id=institution_user.id, institution_name='Counter Inc.')
+    db.add(institution)
+    for i in range(3):
+        user = User(email=f'counter-prof{i}@test.com', password=hashed_password, role=UserRole.PROFESSIONAL)
+        db.add(user)
+        db.commit()
+        db.add(Professional(user_id=user.id, full_name=f'Pro {i}'))
+    db.commit()
+    job = Job(institution_id=institution.id, title='Counted Gig', description='d', location='Kampala', pay_amount=100)
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+
+    yield job_id
+
+    db = SessionLocal()
+    for model in (Notification, Message, JobInterest, UserDashboardStats, Job, Institution, Professional, User):
+        db.query(model).delete()
+    db.commit()
+    db.close()
+
+
+def _login(client, email):
+    client.get('/logout')
+    client.post('/login', data={'email': email, 'password': 'password'})
+
+
+def _counters(job_id):
+    db = SessionLocal()
+    job = db.query(Job).filter(Job.id == job_id).first()
+    counters = (job.interest_count, job.pending_interest_count, job.accepted_interest_count)
+    db.close()
+    return counters
+
+
+def test_counters_follow_interest_lifecycle(app, gig):
+    client = app.test_client()
+    for i in range(3):
+        _login(client, f'counter-prof{i}@test.com')
+        assert client.post(f'/gigs/{gig}/express-interest').status_code == 200
+    assert _counters(gig) == (3, 3, 0)
+
+    _login(client, 'counter-prof2@test.com')
+    assert client.post(f'/jobs/{gig}/cancel-interest').status_code == 200
+    assert _counters(gig) == (2, 2, 0)
+
+    db = SessionLocal()
+    interest_id = db.query(JobInterest.id).filter(JobInterest.job_id == gig).order_by(JobInterest.id).first()[0]
+    db.close()
+    _login(client, 'counter-inst@test.com')
+    assert client.post(f'/interests/{interest_id}/accept').status_code == 200
+    assert _counters(gig) == (2, 0, 1)
+
+
+def test_reconcile_repairs_drift(app, gig):
+    db = SessionLocal()
+    professional = db.query(Professional).first()
+    db.add(JobInterest(job_id=gig, professional_id=professional.id, status=InterestStatus.PENDING))
+    db.commit()
+    assert _counters(gig) == (0, 0, 0)
+
+    assert reconcile_interest_counts(db) == 1
+    db.commit()
+    db.close()
+    assert _counters(gig) == (1, 1, 0)
+
+
+def test_bulk_decline_uses_a_fixed_number_of_statements(app, gig):
+    db = SessionLocal()
+    professionals = db.query(Professional).order_by(Professional.id).all()
+    interests = [JobInterest(job_id=gig, professional_id=p.id) for p in professionals]
+    db.add_all(interests)
+    db.commit()
+    reconcile_interest_counts(db)
+    db.commit()
+    accepted_id = interests[0].id
+
+    statements, me = [], threading.get_ident()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        declined = decline_pending_interests(db, gig, accepted_id, title='Declined', message='Position filled')
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+    db.commit()
+
+    # Applicant SELECT, interests UPDATE, counters UPDATE, notifications INSERT
+    assert len(statements) == 4
+    assert [d.interest_id for d in declined] == [i.id for i in interests[1:]]
+    assert [d.user_id for d in declined] == [p.user_id for p in professionals[1:]]
+    notifications = db.query(Notification).order_by(Notification.id).all()
+    assert [(n.id, n.user_id, n.job_interest_id) for n in notifications] == \
+        [(d.notification_id, d.user_id, d.interest_id) for d in declined]
+    assert db.query(JobInterest).filter(JobInterest.status == InterestStatus.DECLINED).count() == 2
+    db.close()
+    assert _counters(gig) == (3, 1, 0)
+
+
+def test_bulk_decline_skips_interests_decided_concurrently(app, gig):
+    db = SessionLocal()
+    professionals = db.query(Professional).order_by(Professional.id).all()
+    interests = [JobInterest(job_id=gig, professional_id=p.id) for p in professionals]
+    db.add_all(interests)
+    db.commit()
+    reconcile_interest_counts(db)
+    db.commit()
+    accepted_id, raced_id = interests[0].id, interests[1].id
+
+    # Another decision lands on one applicant between the SELECT and the UPDATE
+    def _decide_before_update(orm_execute_state):
+        if orm_execute_state.is_update and not raced:
+            raced.append(raced_id)
+            orm_execute_state.session.connection().execute(
+                text("UPDATE job_interests SET status = 'accepted' WHERE id = :id"), {'id': raced_id}
+            )
+            orm_execute_state.session.connection().execute(text(
+                "UPDATE jobs SET pending_interest_count = pending_interest_count - 1, "
+                "accepted_interest_count = accepted_interest_count + 1 WHERE id = :id"
+            ), {'id': gig})
+
+    raced = []
+    event.listen(db, 'do_orm_execute', _decide_before_update)
+    try:
+        declined = decline_pending_interests(db, gig, accepted_id, title='Declined', message='Position filled')
+    finally:
+        event.remove(db, 'do_orm_execute', _decide_before_update)
+    db.commit()
+
+    assert [d.interest_id for d in declined] == [interests[2].id]
+    assert db.query(JobInterest.status).filter(JobInterest.id == raced_id).scalar() == InterestStatus.ACCEPTED
+    assert db.query(Notification).count() == 1
+    db.close()
+    assert _counters(gig) == (3, 1, 1)
@@ -0,0 +1,67 @@
+import pytest
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.job import Job
+from app.services.job_search import apply_job_search, get_search_backend, LikeSearchBackend
+
+
+@pytest.fixture(scope='module')
+def jobs():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        user = User(email='search-inst@test.com', password='x', role=UserRole.INSTITUTION)
+        db.add(user)
+        db.commit()
+        institution = Institution(user_id=user.id, institution_name='Search Inc.')
+        db.add(institution)
+        db.commit()
+        db.add_all([
+            Job(institution_id=institution.id, title='Night nurse', description='Ward cover for a clinic',
+                location='Kampala', pay_amount=100, sector='Health'),
+            Job(institution_id=institution.id, title='Accountant', description='Month end close, nurse station budget',
+                location='Entebbe', pay_amount=200, sector='Finance'),
+            Job(institution_id=institution.id, title='Driver', description='Deliveries', location='Jinja',
+                pay_amount=50, sector='Logistics'),
+        ])
+        db.commit()
+        db.close()
+        yield
+        db = SessionLocal()
+        db.query(Job).delete()
+        db.query(Institution).delete()
+        db.query(User).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _search(term):
+    db = SessionLocal()
+    query, rank = apply_job_search(db.query(Job), term)
+    if rank is not None:
+        query = query.order_by(rank)
+    titles = [job.title for job in query.all()]
+    db.close()
+    return titles
+
+
+def test_search_matches_and_ranks_title_first(jobs):
+    titles = _search('nurse')
+    assert set(titles) == {'Night nurse', 'Accountant'}
+    if not isinstance(get_search_backend(), LikeSearchBackend):
+        assert titles[0] == 'Night nurse'
+
+
+def test_search_index_follows_updates(jobs):
+    db = SessionLocal()
+    job = db.query(Job).filter(Job.title == 'Driver').first()
+    job.title = 'Pharmacist'
+    db.commit()
+    db.close()
+
+    assert _search('pharmac') == ['Pharmacist']
+    assert _search('driver') == []
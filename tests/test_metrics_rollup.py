@@ -0,0 +1,157 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job
+from app.models.job_interest import JobInterest
+from app.models.payment import Payment, TransactionStatus
+from app.models.metrics_daily import MetricsDaily
+from app.services import metrics_rollup
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='function')
+def history(app):
+    db = SessionLocal()
+    now = datetime.utcnow()
+    three_days_ago = now - timedelta(days=3)
+    inst_user = User(email='rollup-inst@test.com', password='x', role=UserRole.INSTITUTION, created_at=three_days_ago)
+    pro_users = [User(email=f'rollup-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL, created_at=now)
+                 for i in range(2)]
+    db.add_all([inst_user] + pro_users)
+    db.flush()
+    institution = Institution(user_id=inst_user.id, institution_name='Rollup Inc.')
+    professionals = [Professional(user_id=u.id, full_name=f'Rollup Pro {i}') for i, u in enumerate(pro_users)]
+    db.add(institution)
+    db.add_all(professionals)
+    db.flush()
+    old_job = Job(institution_id=institution.id, title='Old', description='d', location='K', pay_amount=100,
+                  created_at=three_days_ago)
+    new_job = Job(institution_id=institution.id, title='New', description='d', location='K', pay_amount=200)
+    db.add_all([old_job, new_job])
+    db.flush()
+    db.add_all([
+        JobInterest(job_id=old_job.id, professional_id=professionals[0].id, created_at=three_days_ago),
+        JobInterest(job_id=old_job.id, professional_id=professionals[1].id, created_at=three_days_ago),
+        JobInterest(job_id=new_job.id, professional_id=professionals[0].id),
+        Payment(gig_id=old_job.id, institution_id=institution.id, professional_id=professionals[0].id, amount=100,
+                pesapal_merchant_reference='ROLL-1', status=TransactionStatus.COMPLETED, completed_at=three_days_ago),
+    ])
+    db.commit()
+    ids = {'institution': institution.id, 'old_job': old_job.id, 'professional': professionals[1].id,
+           'three_days_ago': three_days_ago.date(), 'today': now.date()}
+    db.close()
+
+    yield ids
+
+    db = SessionLocal()
+    for model in (MetricsDaily, Payment, JobInterest, Job, Institution, Professional, User):
+        db.query(model).delete()
+    db.commit()
+    db.close()
+
+
+def test_backfill_then_refresh_only_touches_recent_buckets(history):
+    db = SessionLocal()
+    try:
+        first_day, today = history['three_days_ago'], history['today']
+        metrics_rollup.backfill(db)
+
+        series = metrics_rollup.multi_series(db, ['signups', 'gigs', 'interests', 'revenue'], first_day, today)
+        assert series['signups'] == {first_day: (1, 0.0), today: (2, 0.0)}
+        assert series['gigs'] == {first_day: (1, 0.0), today: (1, 0.0)}
+        assert series['interests'] == {first_day: (2, 0.0), today: (1, 0.0)}
+        assert series['revenue'] == {first_day: (1, 100.0)}
+        assert metrics_rollup.daily_series(db, 'interests', first_day, today,
+                                           entity=('institution', history['institution'])) == series['interests']
+
+        # A late row for an old day is not picked up by the incremental refresh...
+        db.add(JobInterest(job_id=history['old_job'], professional_id=history['professional'],
+                           created_at=datetime.combine(first_day, datetime.min.time()) + timedelta(hours=12)))
+        db.add(User(email='rollup-late@test.com', password='x', role=UserRole.PROFESSIONAL))
+        db.commit()
+        metrics_rollup.refresh_recent(db, now=datetime.combine(today, datetime.min.time()) + timedelta(hours=12))
+        db.commit()
+        series = metrics_rollup.multi_series(db, ['signups', 'interests'], first_day, today)
+        assert series['signups'][today] == (3, 0.0)
+        assert series['interests'][first_day] == (2, 0.0)
+
+        # ...until that day is rebuilt
+        metrics_rollup.rebuild_days(db, first_day, first_day)
+        db.commit()
+        assert metrics_rollup.daily_series(db, 'interests', first_day, first_day) == {first_day: (3, 0.0)}
+    finally:
+        db.close()
+
+
+def test_refresh_rebuilds_a_fixed_window(history):
+    db = SessionLocal()
+    try:
+        today = history['today']
+        yesterday = today - timedelta(days=1)
+        midnight = datetime.combine(today, datetime.min.time())
+        metrics_rollup.backfill(db)
+        # The last refresh ran days ago; a row from late yesterday is committed just after midnight
+        db.query(MetricsDaily).update({MetricsDaily.updated_at: midnight - timedelta(days=30)},
+                                      synchronize_session=False)
+        db.add(JobInterest(job_id=history['old_job'], professional_id=history['professional'],
+                           created_at=midnight - timedelta(minutes=1)))
+        db.commit()
+
+        # Within the late window yesterday is rebuilt too; older days are left alone however long
+        # the refresher was idle
+        metrics_rollup.refresh_recent(db, now=midnight + timedelta(minutes=5))
+        db.commit()
+        assert metrics_rollup.daily_series(db, 'interests', yesterday, yesterday) == {yesterday: (1, 0.0)}
+        assert db.query(MetricsDaily).filter(MetricsDaily.day < yesterday,
+                                             MetricsDaily.updated_at > midnight - timedelta(days=1)).count() == 0
+
+        # Past the window only today is rebuilt
+        db.query(MetricsDaily).update({MetricsDaily.updated_at: midnight - timedelta(days=30)},
+                                      synchronize_session=False)
+        db.commit()
+        metrics_rollup.refresh_recent(db, now=midnight + timedelta(hours=12))
+        db.commit()
+        assert db.query(MetricsDaily).filter(MetricsDaily.day < today,
+                                             MetricsDaily.updated_at > midnight - timedelta(days=1)).count() == 0
+    finally:
+        db.close()
+
+
+def test_institution_analytics_reads_rollups(app, history):
+    db = SessionLocal()
+    inst_user_id = db.query(Institution.user_id).filter(Institution.id == history['institution']).scalar()
+    db.close()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = inst_user_id
+        sess['active_role'] = 'institution'
+
+    # The page only reads; nothing is rolled up until the refresher runs
+    assert client.get('/institution/analytics').status_code == 200
+    db = SessionLocal()
+    try:
+        assert db.query(MetricsDaily).count() == 0
+    finally:
+        db.close()
+
+    # The refresher rebuilds today; older days wait for the backfill
+    assert metrics_rollup.refresh()
+    db = SessionLocal()
+    try:
+        assert metrics_rollup.daily_series(db, 'interests', history['three_days_ago'], history['today'],
+                                           entity=('institution', history['institution'])) == {history['today']: (1, 0.0)}
+    finally:
+        db.close()
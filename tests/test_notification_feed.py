@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job
+from app.models.job_interest import JobInterest
+from app.models.notification import Notification
+from app.models.document import Document, DocumentType
+from app.services.notification_feed import load_notification_feed
+
+
+@pytest.fixture(scope='module')
+def feed_user_id():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        inst_user = User(email='feed-inst@test.com', password='x', role=UserRole.INSTITUTION)
+        db.add(inst_user)
+        db.commit()
+        institution = Institution(user_id=inst_user.id, institution_name='Feed Inc.')
+        job = Job(institution=institution, title='Night shift', description='d', location='K', pay_amount=10)
+        db.add_all([institution, job])
+        db.commit()
+
+        for i in range(4):
+            pro_user = User(email=f'feed-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL)
+            db.add(pro_user)
+            db.commit()
+            professional = Professional(user_id=pro_user.id, full_name=f'Pro {i}')
+            db.add(professional)
+            db.commit()
+            db.add_all([
+                Document(user_id=pro_user.id, professional_id=professional.id, document_type=DocumentType.CV,
+                         file_path=f'cv{i}.pdf', file_name=f'cv{i}.pdf'),
+                Document(user_id=pro_user.id, professional_id=professional.id, document_type=DocumentType.CERTIFICATE,
+                         file_path=f'cert{i}.pdf', file_name=f'cert{i}.pdf')
+            ])
+            interest = JobInterest(job_id=job.id, professional_id=professional.id)
+            db.add(interest)
+            db.commit()
+            db.add(Notification(user_id=inst_user.id, title='New interest', message=f'Pro {i}',
+                                job_interest_id=interest.id, role_context='institution',
+                                created_at=datetime(2026, 1, 1 + i)))
+        db.add(Notification(user_id=inst_user.id, title='Other role', message='x',
+                            role_context='professional', created_at=datetime(2026, 2, 1)))
+        db.commit()
+        user_id = inst_user.id
+        db.close()
+        yield user_id
+        db = SessionLocal()
+        for model in (Notification, JobInterest, Document, Professional, Job, Institution, User):
+            db.query(model).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_pages_newest_first_with_documents(feed_user_id):
+    db = SessionLocal()
+    first = load_notification_feed(db, feed_user_id, 'institution', per_page=3)
+    assert [item['notification'].message for item in first.items] == ['Pro 3', 'Pro 2', 'Pro 1']
+    assert all(item['documents']['cv'] and len(item['documents']['certificates']) == 1 for item in first.items)
+    assert first.items[0]['documents']['cv'].file_name == 'cv3.pdf'
+
+    second = load_notification_feed(db, feed_user_id, 'institution', cursor=first.next_cursor, per_page=3)
+    assert [item['notification'].message for item in second.items] == ['Pro 0']
+    assert not second.has_next and second.has_prev
+    db.close()
+
+
+def test_document_prefetch_does_not_grow_with_page_size(feed_user_id):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        load_notification_feed(db, feed_user_id, 'institution', per_page=1)
+        small = len(statements)
+        statements.clear()
+        load_notification_feed(db, feed_user_id, 'institution', per_page=4)
+        assert len(statements) == small == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+        db.close()
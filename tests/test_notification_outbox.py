@@ -0,0 +1,151 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.job_interest import JobInterest
+from app.models.notification import Notification
+from app.models.message import Message
+from app.models.conversation import Conversation, ConversationParticipant
+from app.models.notification_outbox import NotificationOutbox
+from app.services import notification_outbox
+from app.services.presence import get_presence
+from app.services.notification_outbox import enqueue_user_emit, drain_outbox, prune_outbox, OUTBOX_MAX_ATTEMPTS
+
+
+@pytest.fixture(scope='module')
+def outbox_app():
+    app, _ = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        db = SessionLocal()
+        for model in (NotificationOutbox, ConversationParticipant, Conversation, Message, Notification,
+                      JobInterest, Job, Professional, Institution, User):
+            db.query(model).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def emitted(monkeypatch, outbox_app):
+    """Record emits instead of sending them (the app's own dispatcher thread uses the same hook)"""
+    db = SessionLocal()
+    db.query(NotificationOutbox).delete()
+    db.commit()
+    db.close()
+    sent = []
+    monkeypatch.setattr(notification_outbox, '_emit', lambda event, data, room: sent.append((event, data, room)))
+    return sent
+
+
+def _drained(sent, expected, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(sent) < expected and time.monotonic() < deadline:
+        drain_outbox()
+        time.sleep(0.02)
+    return sent
+
+
+def test_events_are_emitted_only_after_commit(emitted):
+    db = SessionLocal()
+    try:
+        enqueue_user_emit(db, 7, 'notification', {'message': 'rolled back'})
+        db.rollback()
+        enqueue_user_emit(db, 7, 'notification', {'message': 'committed'})
+        db.commit()
+    finally:
+        db.close()
+
+    assert _drained(emitted, 1) == [('notification', {'message': 'committed'}, 'user_7')]
+    db = SessionLocal()
+    assert db.query(NotificationOutbox).filter(NotificationOutbox.dispatched_at == None).count() == 0
+    db.close()
+
+
+def test_failed_emits_are_retried_then_abandoned(monkeypatch, emitted):
+    def _fail(event, data, room):
+        raise RuntimeError('queue down')
+
+    monkeypatch.setattr(notification_outbox, '_emit', _fail)
+    db = SessionLocal()
+    try:
+        enqueue_user_emit(db, 8, 'notification', {'message': 'x'})
+        db.commit()
+        for attempt in range(1, OUTBOX_MAX_ATTEMPTS + 1):
+            assert drain_outbox() == 1
+            row = db.query(NotificationOutbox).one()
+            assert row.attempts == attempt
+            if attempt < OUTBOX_MAX_ATTEMPTS:
+                # Backed off: not claimed again until next_attempt_at, then made due for the next round
+                assert row.next_attempt_at > datetime.utcnow() and row.dispatched_at is None
+                assert drain_outbox() == 0
+                row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.commit()
+        assert drain_outbox() == 0
+        row = db.query(NotificationOutbox).one()
+        assert row.attempts == OUTBOX_MAX_ATTEMPTS
+        assert row.dispatched_at is not None and row.failed_at is not None
+        assert row.last_error == 'queue down'
+        # Dead letters outlive the retention of dispatched rows
+        assert prune_outbox(db, retention=timedelta(0)) == 0
+    finally:
+        db.close()
+
+
+def test_accept_interest_queues_decisions_for_connected_users(outbox_app, emitted):
+    db = SessionLocal()
+    inst_user = User(email='outbox-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    db.add(inst_user)
+    db.commit()
+    institution = Institution(user_id=inst_user.id, institution_name='Outbox Clinic')
+    job = Job(institution=institution, title='Ward round', description='d', location='K', pay_amount=10)
+    db.add_all([institution, job])
+    db.commit()
+    interests, user_ids = [], []
+    for i in range(3):
+        pro_user = User(email=f'outbox-pro{i}@test.com', password='x', role=UserRole.PROFESSIONAL)
+        db.add(pro_user)
+        db.commit()
+        professional = Professional(user_id=pro_user.id, full_name=f'Pro {i}')
+        db.add(professional)
+        db.commit()
+        interest = JobInterest(job_id=job.id, professional_id=professional.id)
+        db.add(interest)
+        db.commit()
+        interests.append(interest.id)
+        user_ids.append(pro_user.id)
+    inst_user_id = inst_user.id
+    db.close()
+
+    # The third applicant has no socket open, so no payload is built for them
+    presence = get_presence()
+    presence.connect('sid-0', user_ids[0], [f'user_{user_ids[0]}'])
+    presence.connect('sid-1', user_ids[1], [f'user_{user_ids[1]}'])
+
+    client = outbox_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = inst_user_id
+        sess['active_role'] = 'institution'
+    try:
+        response = client.post(f'/interests/{interests[0]}/accept')
+    finally:
+        presence.disconnect('sid-0')
+        presence.disconnect('sid-1')
+    assert response.status_code == 200
+
+    _drained(emitted, 3)
+    by_room = sorted((room, event) for event, _, room in emitted)
+    assert by_room == sorted([
+        (f'user_{user_ids[0]}', 'interest_accepted'),
+        (f'user_{user_ids[0]}', 'new_message'),
+        (f'user_{user_ids[1]}', 'interest_rejected'),
+    ])
+    rejected = next(data for event, data, _ in emitted if event == 'interest_rejected')
+    assert rejected['job_title'] == 'Ward round' and rejected['notification_id']
@@ -0,0 +1,174 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.job import Job, JobStatus
+from app.services import page_cache
+from app.services.page_cache import InMemoryPageCache, PageCache
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='module')
+def institution_id(app):
+    db = SessionLocal()
+    user = User(email='page-cache-inst@test.com', password='x', role=UserRole.INSTITUTION)
+    db.add(user)
+    db.flush()
+    institution = Institution(user_id=user.id, institution_name='Cache Clinic')
+    db.add(institution)
+    db.flush()
+    db.add_all([Job(institution_id=institution.id, title=f'Cached gig {i}', description='d', location='K',
+                    pay_amount=1000, status=JobStatus.OPEN) for i in range(3)])
+    db.commit()
+    institution_id = institution.id
+    db.close()
+    return institution_id
+
+
+def _count_statements(call):
+    statements, me = [0], threading.get_ident()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+    return response, statements[0]
+
+
+def test_lru_ttl_and_counters():
+    cache = PageCache(InMemoryPageCache(max_entries=2), default_ttl=60)
+    calls = []
+
+    def compute(value):
+        return lambda: calls.append(value) or value
+
+    assert cache.get_or_compute('a', compute(1)) == 1
+    assert cache.get_or_compute('a', compute(2)) == 1
+    cache.get_or_compute('b', compute(3))
+    cache.get_or_compute('c', compute(4))  # evicts 'a', the least recently used
+    assert cache.get_or_compute('a', compute(5)) == 5
+    assert cache.get_or_compute('short', compute(6), ttl=0.01) == 6
+    time.sleep(0.02)
+    assert cache.get_or_compute('short', compute(7)) == 7
+    cache.invalidate('s')
+    assert cache.get_or_compute('short', compute(8)) == 8
+
+    assert calls == [1, 3, 4, 5, 6, 7, 8]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 7, 1)
+    assert stats['evictions'] >= 1 and stats['entries'] == 2
+
+
+def test_home_served_from_cache_until_a_job_write(app, institution_id):
+    client = app.test_client()
+    page_cache.invalidate()
+    first = client.get('/')
+    assert first.status_code == 200 and b'Cached gig 2' in first.data
+
+    response, statements = _count_statements(lambda: client.get('/'))
+    assert response.status_code == 200 and b'Cached gig 2' in response.data
+    assert statements == 0
+
+    db = SessionLocal()
+    try:
+        db.add(Job(institution_id=institution_id, title='Fresh cached gig', description='d', location='K',
+                   pay_amount=2000, status=JobStatus.OPEN))
+        db.commit()
+    finally:
+        db.close()
+
+    response, statements = _count_statements(lambda: client.get('/'))
+    assert b'Fresh cached gig' in response.data
+    assert statements > 0
+    assert page_cache.stats()['invalidations'] >= 1
+
+
+def test_home_skips_gigs_that_expired_while_cached(app, institution_id):
+    db = SessionLocal()
+    try:
+        db.add(Job(institution_id=institution_id, title='Expiring cached gig', description='d', location='K',
+                   pay_amount=2000, status=JobStatus.OPEN, is_urgent=True,
+                   expiry_date=datetime.utcnow() + timedelta(seconds=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    client = app.test_client()
+    assert b'Expiring cached gig' in client.get('/').data
+    time.sleep(1.1)
+    assert b'Expiring cached gig' not in client.get('/').data
+
+
+def test_invalidation_during_a_computation_only_skips_matching_keys():
+    cache = PageCache(InMemoryPageCache(), default_ttl=60)
+
+    def compute_and_invalidate(prefix, value):
+        def compute():
+            cache.invalidate(prefix)
+            return value
+        return compute
+
+    cache.get_or_compute('home:stats', compute_and_invalidate('earnings:', 1))
+    cache.get_or_compute('earnings:1:today', compute_and_invalidate('earnings:1:', 2))
+    assert cache.get_or_compute('home:stats', lambda: 3) == 1
+    assert cache.get_or_compute('earnings:1:today', lambda: 4) == 4
+
+
+def test_bookkeeping_updates_keep_the_cache(app, institution_id):
+    client = app.test_client()
+    page_cache.invalidate()
+    client.get('/')
+
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.institution_id == institution_id).first()
+        job.interest_count = (job.interest_count or 0) + 1
+        db.commit()
+        _, statements = _count_statements(lambda: client.get('/'))
+        assert statements == 0
+
+        job.title = 'Renamed cached gig'
+        db.commit()
+        response, statements = _count_statements(lambda: client.get('/'))
+        assert statements > 0 and b'Renamed cached gig' in response.data
+    finally:
+        db.close()
+
+
+def test_bulk_updates_invalidate_like_flushed_writes(app, institution_id):
+    client = app.test_client()
+    page_cache.invalidate()
+    client.get('/')
+
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job).filter(Job.institution_id == institution_id)
+        jobs.update({Job.interest_count: Job.interest_count + 1}, synchronize_session=False)
+        db.commit()
+        _, statements = _count_statements(lambda: client.get('/'))
+        assert statements == 0
+
+        jobs.filter(Job.title == 'Cached gig 1').update({Job.title: 'Bulk renamed gig'}, synchronize_session=False)
+        db.commit()
+        response, statements = _count_statements(lambda: client.get('/'))
+        assert statements > 0 and b'Bulk renamed gig' in response.data
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.job import Job
+from app.services import pagination
+from app.services.pagination import paginate_keyset, paginate_ranked, encode_cursor, estimated_count, InvalidCursor
+
+NEWEST_FIRST = [(Job.created_at, True), (Job.id, True)]
+
+
+@pytest.fixture(scope='module')
+def job_ids():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        user = User(email='page-inst@test.com', password='x', role=UserRole.INSTITUTION)
+        db.add(user)
+        db.commit()
+        institution = Institution(user_id=user.id, institution_name='Paging Inc.')
+        db.add(institution)
+        db.commit()
+        # Several jobs share a created_at so the id tie-breaker matters
+        stamps = [datetime(2026, 1, 1 + i // 3) for i in range(11)]
+        jobs = [Job(institution_id=institution.id, title=f'Job {i}', description='d', location='K',
+                    pay_amount=10 * i, created_at=stamp) for i, stamp in enumerate(stamps)]
+        db.add_all(jobs)
+        db.commit()
+        expected = [job.id for job in sorted(jobs, key=lambda j: (j.created_at, j.id), reverse=True)]
+        db.close()
+        yield expected
+        db = SessionLocal()
+        db.query(Job).delete()
+        db.query(Institution).delete()
+        db.query(User).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_walks_forward_and_back_without_gaps(job_ids):
+    db = SessionLocal()
+    seen, pages, cursor = [], [], None
+    while True:
+        page = paginate_keyset(db.query(Job), NEWEST_FIRST, cursor, per_page=4)
+        pages.append(page)
+        seen.extend(job.id for job in page.items)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    assert seen == job_ids
+    assert not pages[0].has_prev
+
+    back = paginate_keyset(db.query(Job), NEWEST_FIRST, pages[-1].prev_cursor, per_page=4)
+    assert [job.id for job in back.items] == [job.id for job in pages[-2].items]
+    db.close()
+
+
+def test_rejects_cursor_for_other_sort(job_ids):
+    db = SessionLocal()
+    page = paginate_keyset(db.query(Job), NEWEST_FIRST, None, per_page=4)
+    with pytest.raises(InvalidCursor):
+        paginate_keyset(db.query(Job), [(Job.pay_amount, True), (Job.id, True)], page.next_cursor, per_page=4)
+    with pytest.raises(InvalidCursor):
+        paginate_keyset(db.query(Job), NEWEST_FIRST, 'not-a-cursor', per_page=4)
+    db.close()
+
+
+def test_ranked_cursor_with_bad_offset_is_invalid(job_ids):
+    db = SessionLocal()
+    page = paginate_ranked(db.query(Job), [Job.id.desc()], None, per_page=4)
+    assert [job.id for job in paginate_ranked(db.query(Job), [Job.id.desc()], page.next_cursor, per_page=4).items]
+    for offset in ('abc', None, [1]):
+        with pytest.raises(InvalidCursor):
+            paginate_ranked(db.query(Job), [Job.id.desc()], encode_cursor([], 'next', {'offset': offset}), per_page=4)
+    db.close()
+
+
+def test_count_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(pagination._count_cache.store, 'max_entries', 3)
+    pagination.invalidate_counts()
+    for term in ('a', 'b', 'c', 'd', 'e'):
+        assert estimated_count(f'search:{term}', lambda: 7) == 7
+    assert pagination._count_cache.store.size() == 3
+    # The oldest keys were evicted and are counted again
+    calls = []
+    estimated_count('search:a', lambda: calls.append(1) or 8)
+    assert calls == [1]
+    pagination.invalidate_counts()
@@ -0,0 +1,195 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.models.professional import Professional
+from app.models.job import Job, JobStatus
+from app.models.payment import Payment, TransactionStatus
+from app.models.pesapal_ipn import PesapalIpnEvent
+from app.services.payment_ipn import process_ipn_events
+from app.services.payment_reconciliation import reconcile_pending_payments, RECONCILE_BASE_BACKOFF
+import bcrypt
+
+
+class FakeStatusClient:
+    """Stands in for PesaPal: answers get_transaction_status from a dict of tracking id -> status"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = []
+
+    def get_transaction_status(self, order_tracking_id):
+        self.calls.append(order_tracking_id)
+        status = self.statuses[order_tracking_id]
+        if isinstance(status, Exception):
+            raise status
+        return {'payment_status_description': status, 'transaction_id': f'tx-{order_tracking_id}',
+                'payment_method': 'MTN'}
+
+
+@pytest.fixture(scope='module')
+def app():
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        yield app
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope='function')
+def payments(app):
+    db = SessionLocal()
+    hashed_password = bcrypt.hashpw('password'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    institution_user = User(email='recon-inst@test.com', password=hashed_password, role=UserRole.INSTITUTION)
+    professional_user = User(email='recon-prof@test.com', password=hashed_password, role=UserRole.PROFESSIONAL)
+    db.add_all([institution_user, professional_user])
+    db.commit()
+    institution = Institution(user_id=institution_user.id, institution_name='Recon Inc.')
+    professional = Professional(user_id=professional_user.id, full_name='Recon Pro')
+    db.add_all([institution, professional])
+    db.commit()
+
+    ids = {}
+    for name in ('completed', 'failed', 'pending', 'error'):
+        job = Job(institution_id=institution.id, title=f'Gig {name}', description='d', location='Kampala',
+                  pay_amount=100, status=JobStatus.ASSIGNED)
+        db.add(job)
+        db.commit()
+        payment = Payment(gig_id=job.id, institution_id=institution.id, professional_id=professional.id,
+                          amount=100, pesapal_order_tracking_id=f'track-{name}',
+                          pesapal_merchant_reference=f'REF-{name}')
+        db.add(payment)
+        db.commit()
+        ids[name] = payment.id
+    # Not due yet: must not be checked
+    job = Job(institution_id=institution.id, title='Gig later', description='d', location='Kampala', pay_amount=100)
+    db.add(job)
+    db.commit()
+    db.add(Payment(gig_id=job.id, institution_id=institution.id, professional_id=professional.id, amount=100,
+                   pesapal_order_tracking_id='track-later', pesapal_merchant_reference='REF-later',
+                   next_status_check_at=datetime.utcnow() + timedelta(minutes=10)))
+    db.commit()
+    db.close()
+
+    yield ids
+
+    db = SessionLocal()
+    for model in (PesapalIpnEvent, Payment, Job, Institution, Professional, User):
+        db.query(model).delete()
+    db.commit()
+    db.close()
+
+
+def test_reconciler_applies_webhook_transitions_and_backs_off(payments):
+    client = FakeStatusClient({
+        'track-completed': 'Completed',
+        'track-failed': 'Failed',
+        'track-pending': 'Pending',
+        'track-error': RuntimeError('PesaPal unavailable'),
+    })
+
+    summary = reconcile_pending_payments(client=client, concurrency=2)
+
+    assert sorted(client.calls) == ['track-completed', 'track-error', 'track-failed', 'track-pending']
+    assert summary == {'checked': 4, 'settled': 2, 'pending': 1, 'errors': 1}
+
+    db = SessionLocal()
+    try:
+        rows = {p.id: p for p in db.query(Payment).all()}
+        completed = rows[payments['completed']]
+        assert completed.status == TransactionStatus.COMPLETED
+        assert completed.pesapal_transaction_id == 'tx-track-completed'
+        assert completed.next_status_check_at is None
+        assert db.query(Job).filter(Job.id == completed.gig_id).first().status == JobStatus.COMPLETED
+        assert rows[payments['failed']].status == TransactionStatus.FAILED
+
+        for name in ('pending', 'error'):
+            payment = rows[payments[name]]
+            assert payment.status == TransactionStatus.PENDING
+            assert payment.status_check_attempts == 1
+            assert payment.next_status_check_at >= payment.status_checked_at + RECONCILE_BASE_BACKOFF
+    finally:
+        db.close()
+
+    # Nothing is due until the backoff expires
+    client.calls.clear()
+    assert reconcile_pending_payments(client=client)['checked'] == 0
+    assert client.calls == []
+
+
+def test_status_endpoint_reads_local_row(app, payments, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('status endpoint must not call PesaPal')
+    monkeypatch.setattr('app.services.pesapal.PesaPal.get_transaction_status', fail)
+
+    db = SessionLocal()
+    payment = db.query(Payment).filter(Payment.id == payments['completed']).first()
+    gig_id = payment.gig_id
+    db.close()
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'recon-inst@test.com', 'password': 'password'})
+    response = client.get(f'/jobs/{gig_id}/payment-status')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'pending'}
+
+    reconcile_pending_payments(client=FakeStatusClient({
+        'track-completed': 'Completed', 'track-failed': 'Pending', 'track-pending': 'Pending', 'track-error': 'Pending'
+    }))
+    response = client.get(f'/jobs/{gig_id}/payment-status')
+    assert response.get_json()['status'] == 'completed'
+
+
+def test_webhook_acks_before_processing_and_ignores_duplicates(app, payments, monkeypatch):
+    db = SessionLocal()
+    payment = db.query(Payment).filter(Payment.id == payments['completed']).first()
+    # Out of the reconciler's window, so only the IPN path checks this payment
+    payment.created_at = datetime.utcnow() - timedelta(days=30)
+    db.commit()
+    db.close()
+
+    release = threading.Event()
+    calls = []
+
+    def get_transaction_status(self, order_tracking_id):
+        calls.append(order_tracking_id)
+        release.wait(5)
+        return {'payment_status_description': 'Completed', 'transaction_id': 'tx-ipn', 'payment_method': 'MTN'}
+    monkeypatch.setattr('app.services.pesapal.PesaPal.get_transaction_status', get_transaction_status)
+
+    client = app.test_client()
+    ipn = {'OrderTrackingId': 'track-completed', 'OrderNotificationType': 'IPNCHANGE',
+           'OrderMerchantReference': 'REF-completed'}
+    started = time.monotonic()
+    for _ in range(3):
+        response = client.post('/api/payments/webhook', json=ipn)
+        assert response.status_code == 200
+        assert response.get_json() == {'orderNotificationType': 'IPNCHANGE', 'orderTrackingId': 'track-completed',
+                                       'orderMerchantReference': 'REF-completed', 'status': 200}
+    # The status call blocks until released, so the webhook cannot have waited on it
+    assert time.monotonic() - started < 2
+
+    release.set()
+    process_ipn_events()
+    deadline = time.monotonic() + 5
+    while True:
+        db = SessionLocal()
+        event = db.query(PesapalIpnEvent).filter(PesapalIpnEvent.order_tracking_id == 'track-completed').one()
+        status = db.query(Payment.status).filter(Payment.id == payments['completed']).scalar()
+        db.close()
+        if event.processed_at or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+
+    assert event.delivery_count == 3
+    assert status == TransactionStatus.COMPLETED
+    assert calls == ['track-completed']
+
+    # A redelivery after the payment settled is a no-op
+    assert client.post('/api/payments/webhook', json=ipn).status_code == 200
+    assert process_ipn_events()['processed'] == 0
+    assert calls == ['track-completed']
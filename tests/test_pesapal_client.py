@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+import pytest
+import requests
+from datetime import datetime, timedelta
+from requests.adapters import BaseAdapter
+from app import create_app
+from app.config import settings
+from app.database import SessionLocal, Base, engine
+from app.models.pesapal_ipn import PesapalIpnRegistration
+from app.services import pesapal
+from app.services.pesapal import PesaPal, get_http_session
+
+FAKE_BASE_URL = 'http://pesapal.test/api'
+
+
+class FakePesaPalAdapter(BaseAdapter):
+    """Answers PesaPal endpoints in-process and records the paths called"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.token_expiry = timedelta(minutes=5)
+        self.tokens_issued = 0
+        self.reject_token = None
+        self.ipn_registration_fails = False
+        self.ipn_list = []
+
+    def send(self, request, **kwargs):
+        path = request.path_url.split('/api', 1)[1].split('?')[0]
+        self.calls.append(path)
+        status, body = 200, {}
+        if path == '/Auth/RequestToken':
+            self.tokens_issued += 1
+            expiry = datetime.utcnow() + self.token_expiry
+            body = {'token': f'token-{self.tokens_issued}', 'expiryDate': expiry.strftime('%Y-%m-%dT%H:%M:%S.%f0Z')}
+        elif request.headers.get('Authorization') == f'Bearer {self.reject_token}':
+            status, body = 401, {'error': 'token expired'}
+        elif path == '/URLSetup/RegisterIPN' and self.ipn_registration_fails:
+            status, body = 500, {'error': 'already registered'}
+        elif path == '/URLSetup/RegisterIPN':
+            body = {'ipn_id': 'ipn-123', 'url': settings.PESAPAL_CALLBACK_URL}
+        elif path == '/URLSetup/GetIpnList':
+            body = self.ipn_list
+        elif path == '/Transactions/SubmitOrderRequest':
+            order = json.loads(request.body)
+            body = {'order_tracking_id': f"track-{order['id']}", 'redirect_url': 'http://pay.test', 'status': '200'}
+        elif path == '/Transactions/GetTransactionStatus':
+            body = {'payment_status_description': 'Completed', 'status_code': 1}
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_pesapal(monkeypatch):
+    app, _ = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        monkeypatch.setattr(settings, 'PESAPAL_CONSUMER_KEY', 'key')
+        monkeypatch.setattr(settings, 'PESAPAL_CONSUMER_SECRET', 'secret')
+        monkeypatch.setattr(settings, 'PESAPAL_CALLBACK_URL', 'https://qgig.test/api/payments/webhook')
+        monkeypatch.setattr(settings, 'PESAPAL_IPN_ID', None)
+        adapter = FakePesaPalAdapter()
+        get_http_session().mount('http://pesapal.test', adapter)
+        pesapal.clear_caches()
+        yield adapter
+        pesapal.clear_caches()
+        del get_http_session().adapters['http://pesapal.test']
+        db = SessionLocal()
+        db.query(PesapalIpnRegistration).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_payments_reuse_token_and_persisted_ipn(fake_pesapal):
+    client = PesaPal(base_url=FAKE_BASE_URL)
+    for i in range(3):
+        response = client.initiate_payment(1000, 'i@qgig.test', '0700000000', merchant_reference=f'REF-{i}')
+        assert response['order_tracking_id'] == f'track-REF-{i}'
+    assert client.get_transaction_status('track-REF-0')['status_code'] == 1
+
+    assert fake_pesapal.calls == ['/Auth/RequestToken', '/URLSetup/RegisterIPN'] + \
+        ['/Transactions/SubmitOrderRequest'] * 3 + ['/Transactions/GetTransactionStatus']
+
+    # A new process finds the IPN id in the database instead of registering again
+    pesapal.clear_caches()
+    db = SessionLocal()
+    assert db.query(PesapalIpnRegistration.ipn_id).scalar() == 'ipn-123'
+    db.close()
+    del fake_pesapal.calls[:]
+    PesaPal(base_url=FAKE_BASE_URL).initiate_payment(1000, 'i@qgig.test', '0700000000', merchant_reference='REF-9')
+    assert fake_pesapal.calls == ['/Auth/RequestToken', '/Transactions/SubmitOrderRequest']
+
+
+def test_token_is_refreshed_on_expiry_and_on_401(fake_pesapal):
+    client = PesaPal(base_url=FAKE_BASE_URL)
+    fake_pesapal.token_expiry = timedelta(seconds=30)  # inside the refresh margin
+    client.get_transaction_status('t1')
+    client.get_transaction_status('t2')
+    assert fake_pesapal.tokens_issued == 2
+
+    fake_pesapal.token_expiry = timedelta(minutes=5)
+    client.get_transaction_status('t3')
+    fake_pesapal.reject_token = 'token-3'
+    assert client.get_transaction_status('t4')['status_code'] == 1
+    assert fake_pesapal.tokens_issued == 4
+    assert client.get_token() == 'token-4'
+
+
+def test_ipn_for_another_url_is_never_used(fake_pesapal):
+    fake_pesapal.ipn_registration_fails = True
+    fake_pesapal.ipn_list = [{'url': 'https://other.test/ipn', 'ipn_id': 'ipn-other'}]
+    client = PesaPal(base_url=FAKE_BASE_URL)
+    with pytest.raises(Exception, match='Failed to get IPN ID'):
+        client.initiate_payment(1000, 'i@qgig.test', '0700000000', merchant_reference='REF-X')
+    db = SessionLocal()
+    assert db.query(PesapalIpnRegistration).count() == 0  # the claim was released
+    db.close()
+
+    # Once PesaPal lists our own URL, its IPN is adopted
+    fake_pesapal.ipn_list.append({'url': settings.PESAPAL_CALLBACK_URL, 'ipn_id': 'ipn-ours'})
+    assert client.get_ipn_id() == 'ipn-ours'
+
+
+def test_ipn_registration_is_single_flight(fake_pesapal, monkeypatch):
+    client = PesaPal(base_url=FAKE_BASE_URL)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_ipn_id())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['ipn-123'] * 4
+    assert fake_pesapal.calls.count('/URLSetup/RegisterIPN') == 1
+
+    # Another worker holds the claim: wait for its id instead of registering again
+    pesapal.clear_caches()
+    monkeypatch.setattr(pesapal, 'IPN_REGISTRATION_POLL_SECONDS', 0.02)
+    monkeypatch.setattr(settings, 'PESAPAL_CALLBACK_URL', 'https://qgig.test/api/payments/webhook-2')
+    db = SessionLocal()
+    db.add(PesapalIpnRegistration(base_url=FAKE_BASE_URL, callback_url=settings.PESAPAL_CALLBACK_URL, ipn_id=''))
+    db.commit()
+
+    def _finish_registration():
+        time.sleep(0.1)
+        other = SessionLocal()
+        other.query(PesapalIpnRegistration).filter(PesapalIpnRegistration.ipn_id == '').update({'ipn_id': 'ipn-456'})
+        other.commit()
+        other.close()
+
+    finisher = threading.Thread(target=_finish_registration)
+    finisher.start()
+    assert client.get_ipn_id() == 'ipn-456'
+    finisher.join()
+    db.close()
+    assert fake_pesapal.calls.count('/URLSetup/RegisterIPN') == 1
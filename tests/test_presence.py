@@ -0,0 +1,96 @@
+import os
+import time
+import pytest
+from app import create_app
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.services.presence import InMemoryPresence, UnsharedPresence, create_presence, get_presence
+
+
+def test_user_stays_online_until_last_tab_closes():
+    presence = InMemoryPresence()
+    presence.connect('tab-1', 5, ['user_5', 'institution_2'])
+    presence.connect('tab-2', 5, ['user_5', 'institution_2'])
+    presence.connect('tab-3', 6, ['user_6'])
+    assert presence.online_count() == 2
+    assert presence.user_sids(5) == {'tab-1', 'tab-2'}
+
+    assert presence.disconnect('tab-1') == 5
+    assert presence.is_online(5) and presence.is_room_online('institution_2')
+
+    presence.disconnect('tab-2')
+    assert not presence.is_online(5) and not presence.is_room_online('institution_2')
+    assert presence.disconnect('tab-2') is None
+    assert presence.online_count() == 1
+
+
+def test_backend_follows_message_queue():
+    assert isinstance(create_presence(None), InMemoryPresence)
+    assert isinstance(create_presence('memory://'), InMemoryPresence)
+    unshared = create_presence('amqp://guest@rabbit//')
+    assert isinstance(unshared, UnsharedPresence) and unshared.is_online(123)
+
+
+@pytest.fixture(scope='module')
+def presence_app():
+    app, socketio = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        user = User(email='presence-inst@test.com', password='x', role=UserRole.INSTITUTION)
+        db.add(user)
+        db.commit()
+        institution = Institution(user_id=user.id, institution_name='Presence Clinic')
+        db.add(institution)
+        db.commit()
+        ids = {'user': user.id, 'institution': institution.id}
+        db.close()
+        yield app, socketio, ids
+        db = SessionLocal()
+        for model in (Institution, User):
+            db.query(model).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_socket_handlers_track_every_tab(presence_app):
+    app, socketio, ids = presence_app
+    http = app.test_client()
+    with http.session_transaction() as sess:
+        sess['user_id'] = ids['user']
+        sess['active_role'] = 'institution'
+
+    tabs = [socketio.test_client(app, flask_test_client=http) for _ in range(2)]
+    presence = get_presence()
+    assert all(tab.is_connected() for tab in tabs)
+    assert len(presence.user_sids(ids['user'])) == 2
+    assert presence.is_room_online(f"institution_{ids['institution']}")
+
+    tabs[0].disconnect()
+    assert presence.is_online(ids['user'])
+    tabs[1].disconnect()
+    assert not presence.is_online(ids['user'])
+    assert not presence.is_room_online(f"institution_{ids['institution']}")
+
+
+def test_redis_entries_expire_without_heartbeat():
+    url = os.environ.get('TEST_REDIS_URL')
+    if not url:
+        pytest.skip('TEST_REDIS_URL not set')
+    from app.services.presence import RedisPresence
+    crashed = RedisPresence(url, prefix='qgig-presence-test', ttl=1)
+    alive = RedisPresence(url, prefix='qgig-presence-test', ttl=1)
+    crashed.connect('dead-tab', 41, ['user_41'])
+    alive.connect('live-tab', 42, ['user_42'])
+    assert alive.online_users([41, 42]) == {41, 42}
+
+    # Only the live worker keeps refreshing; the crashed one never disconnects
+    time.sleep(0.6)
+    assert alive.refresh() == 1
+    time.sleep(0.6)
+    assert not alive.is_online(41) and not alive.is_room_online('user_41')
+    assert alive.is_online(42) and alive.online_count() == 1
+    alive.disconnect('live-tab')
+    assert not alive.is_online(42)
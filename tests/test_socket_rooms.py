@@ -0,0 +1,105 @@
+import threading
+import bcrypt
+import jwt
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from app.config import settings
+from app.database import SessionLocal, Base, engine
+from app.models.user import User, UserRole
+from app.models.institution import Institution
+from app.services import socket_rooms
+from app.services.presence import get_presence
+
+
+@pytest.fixture(scope='module')
+def rooms_app():
+    app, socketio = create_app()
+    with app.app_context():
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        password = bcrypt.hashpw(b'password', bcrypt.gensalt()).decode()
+        user = User(email='rooms-inst@test.com', password=password, role=UserRole.INSTITUTION)
+        db.add(user)
+        db.commit()
+        institution = Institution(user_id=user.id, institution_name='Rooms Clinic')
+        db.add(institution)
+        db.commit()
+        ids = {'user': user.id, 'institution': institution.id}
+        db.close()
+        yield app, socketio, ids
+        db = SessionLocal()
+        for model in (Institution, User):
+            db.query(model).delete()
+        db.commit()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def statements():
+    """SQL statements issued by this thread (the outbox dispatcher thread is ignored)"""
+    recorded, me = [], threading.get_ident()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == me:
+            recorded.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    socket_rooms._cache.clear()
+    yield recorded
+    event.remove(engine, 'before_cursor_execute', _record)
+
+
+def _connect(app, socketio, http=None, **kwargs):
+    client = socketio.test_client(app, flask_test_client=http, **kwargs)
+    received = client.get_received() if client.is_connected() else []
+    return client, received
+
+
+def test_login_claim_lets_connect_skip_the_database(rooms_app, statements):
+    app, socketio, ids = rooms_app
+    http = app.test_client()
+    http.post('/login', data={'email': 'rooms-inst@test.com', 'password': 'password'})
+    with http.session_transaction() as sess:
+        assert sess['socket_rooms']['rooms'] == [f"user_{ids['user']}", f"institution_{ids['institution']}"]
+
+    del statements[:]
+    client, received = _connect(app, socketio, http)
+    try:
+        assert statements == []
+        assert received[0]['args'][0]['institution_id'] == ids['institution']
+        assert get_presence().is_room_online(f"institution_{ids['institution']}")
+    finally:
+        client.disconnect()
+
+
+def test_session_without_claim_is_resolved_once(rooms_app, statements):
+    app, socketio, ids = rooms_app
+    http = app.test_client()
+    with http.session_transaction() as sess:
+        sess['user_id'] = ids['user']
+        sess['active_role'] = 'institution'
+
+    for _ in range(3):
+        client, received = _connect(app, socketio, http)
+        assert received[0]['args'][0]['room'] == f"institution_{ids['institution']}"
+        client.disconnect()
+    assert len(statements) == 1
+
+
+def test_token_auth_is_verified(rooms_app, statements):
+    app, socketio, ids = rooms_app
+    token = jwt.encode({'user_id': ids['user'], 'active_role': 'institution',
+                        'exp': datetime.utcnow() + timedelta(hours=1)},
+                       settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+    client, received = _connect(app, socketio, auth={'token': token})
+    assert client.is_connected() and received[0]['args'][0]['user_id'] == ids['user']
+    client.disconnect()
+
+    forged, _ = _connect(app, socketio, auth={'token': token[:-2] + 'xx'})
+    assert not forged.is_connected()
+    bare, _ = _connect(app, socketio, auth={'user_id': ids['user']})
+    assert not bare.is_connected()
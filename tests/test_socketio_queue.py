@@ -0,0 +1,54 @@
+import time
+from flask import Flask
+from flask_socketio import SocketIO
+from socketio.packet import Packet
+from app import sockets
+from app.services.socket_queue import socketio_queue_options, InProcessPubSubManager
+
+
+def _worker(channel):
+    """A Flask-SocketIO server as one gunicorn worker would run it, recording the packets it sends"""
+    socketio = SocketIO(Flask(__name__), async_mode='threading', **socketio_queue_options('memory://', channel))
+    sent = []
+    socketio.server._send_eio_packet = lambda eio_sid, eio_pkt: sent.append(
+        (eio_sid, Packet(encoded_packet=eio_pkt.data).data))
+    socketio.server.manager.initialize()
+    return socketio, sent
+
+
+def _wait_for(sent, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not sent and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return sent
+
+
+def test_queue_options_pick_backend():
+    assert socketio_queue_options(None) == {}
+    assert socketio_queue_options('redis://cache:6379/0', 'qgig') == {'message_queue': 'redis://cache:6379/0',
+                                                                     'channel': 'qgig'}
+    assert isinstance(socketio_queue_options('memory://')['client_manager'], InProcessPubSubManager)
+
+
+def test_emit_reaches_socket_on_another_worker():
+    socketio_a, sent_a = _worker('cross-worker')
+    socketio_b, sent_b = _worker('cross-worker')
+
+    # A client connected to worker B and joined its personal room
+    manager_b = socketio_b.server.manager
+    sid = manager_b.connect('eio-42', '/')
+    manager_b.enter_room(sid, '/', 'user_42')
+
+    previous = sockets._socketio
+    sockets.set_socketio(socketio_a)
+    try:
+        sockets.send_message_notification(42, {'message_id': 1, 'content': 'hello'})
+        received = _wait_for(sent_b)
+    finally:
+        sockets.set_socketio(previous)
+        for socketio in (socketio_a, socketio_b):
+            socketio.server.manager.close()
+
+    assert not sent_a
+    assert received and received[0][0] == 'eio-42'
+    assert received[0][1] == ['new_message', {'message_id': 1, 'content': 'hello'}]
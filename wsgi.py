@@ -2,6 +2,7 @@ import eventlet
 
 eventlet.monkey_patch()
 
-from app import create_app
+from app import create_app, start_background_workers
 
 app, socketio = create_app()
+start_background_workers(socketio)